@@ -254,20 +254,17 @@ function createTextLabel(text) { const canvas=document.createElement('canvas');c
 
 // --- WebSocket Connection & Handlers ---
 const socket = io();
-socket.on('connect', () => { console.log(`Connected with ID: ${socket.id}`); });
+socket.on('connect', () => {
+    console.log(`Connected with ID: ${socket.id}`);
+    // Best protocol first; the server falls back to plain JSON frames if it supports none of these
+    const accept = (typeof MessagePack !== 'undefined') ? ['msgpack-v1', 'compact-json-v1'] : ['compact-json-v1'];
+    socket.emit('negotiate_protocol', { accept: accept });
+});
 socket.on('connect_error', (err) => { console.error('WS Connect Error:', err); alert(`Connection Error: ${err.message}`);});
 socket.on('disconnect', (reason) => { console.log(`Disconnected. Reason: ${reason}`); });
 
-socket.on('update_agent', (data) => {
-    // --- START DEBUG ---
-    console.log(`[DEBUG] Received update_agent event for agent: ${data?.agent_id}`);
-    // Log the entire state object received to check for the role property
-    console.log(`[DEBUG] Received state object:`, data?.state);
-    // --- END DEBUG ---
-
-    const agentId = data.agent_id;
-    const state = data.state;
-
+// Applies a full or partial (changed keys only) agent state
+function applyAgentState(agentId, state) {
     // More robust check for state object
     if (!state || typeof state !== 'object') {
         console.error(`Invalid or missing state received for agent ${agentId}:`, state);
@@ -315,6 +312,7 @@ socket.on('update_agent', (data) => {
             name: agentName,
             thoughts: state.current_thoughts || '...',
             status: state.status || 'idle',
+            idleSubState: state.current_idle_sub_state || null,
              label: label
             };
         console.log(`Created agent ${agentId} (${state.role}) at ${initialPos.x.toFixed(1)}, ${initialPos.y.toFixed(1)}, ${initialPos.z.toFixed(1)}`); // Log creation success
@@ -330,6 +328,7 @@ socket.on('update_agent', (data) => {
 
         // Update thoughts and status/emissive color
         if (state.current_thoughts !== undefined) { agentData.thoughts = state.current_thoughts; }
+        if (state.current_idle_sub_state !== undefined) { agentData.idleSubState = state.current_idle_sub_state; }
         if (state.status !== undefined && agentData.status !== state.status) {
             // console.log(`Agent ${agentId} status changed to ${state.status}`); // Reduce log noise
             agentData.status = state.status;
@@ -343,7 +342,7 @@ socket.on('update_agent', (data) => {
                 case 'meeting': emissiveColor = 0x000055; break; // STATUS_MEETING
                 case 'using_tool_in_zone': emissiveColor = 0x005555; break; // STATUS_USING_TOOL_IN_ZONE
                 case 'idle':
-                     const idleSubState = state.current_idle_sub_state; // Check sub-state
+                     const idleSubState = agentData.idleSubState; // Deltas may omit the sub-state
                      if (idleSubState === 'at_water_cooler') emissiveColor = 0x004488;
                      else if (idleSubState === 'wandering') emissiveColor = 0x331133;
                      else emissiveColor = 0x111111; // Default idle/at desk
@@ -356,12 +355,65 @@ socket.on('update_agent', (data) => {
              }
         }
     }
+}
+socket.on('update_agent', (data) => { if (data) applyAgentState(data.agent_id, data.state); });
+
+// Batched state frames: {seq, full?, agents: {id: changedKeys}, tasks: {id: changedFields}}
+const taskStates = {};
+function applyStateBatch(batch) {
+    if (!batch) return;
+    const agents = batch.agents || {};
+    for (const agentId in agents) applyAgentState(agentId, agents[agentId]);
+    const tasks = batch.tasks || {};
+    for (const taskId in tasks) taskStates[taskId] = Object.assign(taskStates[taskId] || { task_id: taskId }, tasks[taskId]);
+}
+socket.on('sync_state', applyStateBatch);
+
+// --- Compact wire protocol (see src/simulation/wire_protocol.py) ---
+let wireProtocol = null; // Set by the server's protocol_selected handshake
+socket.on('protocol_selected', (info) => {
+    if (!info || info.protocol === 'json-v1') { wireProtocol = null; return; }
+    const invert = (fields) => { const out = {}; for (const key in fields) out[fields[key]] = key; return out; };
+    wireProtocol = { name: info.protocol, agentKeys: invert(info.agent_fields), taskKeys: invert(info.task_fields),
+                     enumFields: info.enum_fields, scale: info.position_scale, enums: info.enums };
+    console.log(`Using wire protocol ${info.protocol}`);
 });
+function decodeWireFields(fields, keyMap) {
+    const state = {};
+    for (const wireKey in fields) {
+        const key = keyMap[wireKey]; if (!key) continue;
+        let value = fields[wireKey];
+        const table = wireProtocol.enumFields[wireKey];
+        if (table && typeof value === 'number') value = wireProtocol.enums[table][value];
+        else if (wireKey === 'p' && Array.isArray(value)) value = value.map(c => c / wireProtocol.scale);
+        else if (wireKey === 'g' && typeof value === 'number') value = value / 100;
+        state[key] = value;
+    }
+    return state;
+}
+function applyCompactFrame(frame) {
+    if (!frame || !wireProtocol) return;
+    const announced = frame.n || {}; // {table: [firstId, [values]]}, idempotent
+    for (const table in announced) { const [firstId, values] = announced[table]; const target = wireProtocol.enums[table] || (wireProtocol.enums[table] = []); values.forEach((v, i) => { target[firstId + i] = v; }); }
+    const batch = { seq: frame.q, full: !!frame.f, agents: {}, tasks: {} };
+    const agents = frame.a || {}; for (const agentId in agents) batch.agents[agentId] = decodeWireFields(agents[agentId], wireProtocol.agentKeys);
+    const tasks = frame.t || {}; for (const taskId in tasks) batch.tasks[taskId] = decodeWireFields(tasks[taskId], wireProtocol.taskKeys);
+    applyStateBatch(batch);
+}
+socket.on('sync_state_bin', (buffer) => { if (typeof MessagePack !== 'undefined') applyCompactFrame(MessagePack.decode(new Uint8Array(buffer))); });
+socket.on('sync_state_compact', (text) => { applyCompactFrame(JSON.parse(text)); });
 socket.on('remove_agent', (data) => { if(!data || !data.agent_id) return; const agentId = data.agent_id; if (agentMeshes[agentId]) { scene.remove(agentMeshes[agentId].mesh); delete agentMeshes[agentId]; console.log(`Removed agent ${agentId}`); } });
 socket.on('simulation_complete', (data) => { console.log('Simulation Complete:', data); alert(`Simulation Complete!\nSuccess: ${data.success}\nOutput: ${data.output}`); const configPanels = document.getElementById('config-panels-container'); const startButtonCont = document.getElementById('start-button-container'); if(configPanels) configPanels.classList.remove('hidden'); if(startButtonCont) startButtonCont.classList.remove('hidden');});
 socket.on('request_user_input', (data) => { const response = prompt(`Input Required for Task ${data.task_id}:\n${data.question}`); if (response !== null) { socket.emit('user_response', { task_id: data.task_id, response: response }); } else { console.log('User cancelled input request.'); } });
 socket.on('simulation_status', (data) => { console.log('Simulation Status:', data.status); if(data.status === 'error') alert(`Simulation Error: ${data.message || 'Unknown error'}`); });
 socket.on('simulation_error', (data) => { console.error('Simulation Error from Backend:', data.error); alert(`Simulation Error: ${data.error}`); const configPanels = document.getElementById('config-panels-container'); const startButtonCont = document.getElementById('start-button-container'); if(configPanels) configPanels.classList.remove('hidden'); if(startButtonCont) startButtonCont.classList.remove('hidden'); });
+// Replay of recorded runs (no LLM calls). From the console: listRecordedRuns(); replayRun('run_...', 10); stopReplay();
+socket.on('event_log_list', (data) => { console.table((data && data.runs || []).map(runId => ({ run_id: runId }))); });
+socket.on('replay_status', (data) => { console.log('Replay Status:', data); if (data.status === 'error') alert(`Replay Error: ${data.message || 'Unknown error'}`); if (data.status === 'started') { const configPanels = document.getElementById('config-panels-container'); const startButtonCont = document.getElementById('start-button-container'); if(configPanels) configPanels.classList.add('hidden'); if(startButtonCont) startButtonCont.classList.add('hidden'); } });
+window.listRecordedRuns = () => socket.emit('list_event_logs');
+window.replayRun = (runId, speed = 1) => socket.emit('replay_run', { run_id: runId, speed: speed });
+window.stopReplay = () => socket.emit('stop_replay');
+window.stopSimulation = () => socket.emit('stop_simulation');
 
 
 // --- UI Interaction ---
@@ -1,6 +1,11 @@
 # main.py
 
+import time
+STARTUP_T0 = time.perf_counter() # Startup benchmark origin: before any heavy import
+
 import asyncio
+import concurrent.futures
+import json
 import logging
 import os
 import sys
@@ -9,7 +14,7 @@ from typing import Dict, Any, Optional
 
 # *** ADD FLASK request IMPORT ***
 from flask import Flask, render_template, send_from_directory, request
-from flask_socketio import SocketIO, emit
+from flask_socketio import SocketIO, emit, join_room, leave_room
 
 # --- Add src directory to Python path ---
 project_root = os.path.dirname(os.path.abspath(__file__))
@@ -20,7 +25,14 @@ if src_path not in sys.path:
 
 # Import core components
 from src.llm_integration.api_clients import LLMService
-from src.simulation.workflow_manager import WorkflowManager
+from src.simulation.workflow_manager import WorkflowManager, CHECKPOINT_ROOT_DIR, EVENT_LOG_ROOT_DIR, DEFAULT_OUTPUT_DIR
+from src.simulation.checkpoint import list_checkpoints, load_checkpoint
+from src.simulation.event_log import ReplayEngine, list_event_logs
+from src.simulation.state_sync import StateSync, DEFAULT_SYNC_HZ
+from src.simulation.wire_protocol import (CompactEncoder, choose_protocol, available_protocols,
+                                          PROTOCOL_MSGPACK, PROTOCOL_COMPACT_JSON, PROTOCOL_JSON)
+
+STARTUP_PHASES: Dict[str, float] = {'imports_s': round(time.perf_counter() - STARTUP_T0, 3)}
 
 # --- Logging Setup ---
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(name)s - %(message)s')
@@ -38,14 +50,62 @@ llm_service: LLMService | None = None
 workflow_manager: WorkflowManager | None = None
 simulation_loop_thread: threading.Thread | None = None
 simulation_event_loop: asyncio.AbstractEventLoop | None = None
+replay_engine: ReplayEngine | None = None
+replay_thread: threading.Thread | None = None
+current_run_future: concurrent.futures.Future | None = None # Warm mode: the run scheduled on the persistent loop
+# --- ---
+
+# --- State Sync (batched, delta-only agent/task updates) ---
+# Each client negotiates a wire protocol and sits in the matching room. A frame is built once
+# per flush and encoded once per protocol in use, not once per client.
+PROTOCOL_EVENTS = {PROTOCOL_MSGPACK: 'sync_state_bin', PROTOCOL_COMPACT_JSON: 'sync_state_compact', PROTOCOL_JSON: 'sync_state'}
+wire_encoder = CompactEncoder({'zone': list(WorkflowManager.ZONE_COORDINATES)})
+client_protocols: Dict[str, str] = {} # sid -> negotiated protocol
+
+def protocol_room(protocol: str) -> str:
+    return f"proto:{protocol}"
+
+def emit_state_batch(batch: Dict[str, Any]):
+    protocols_in_use = set(client_protocols.values())
+    if PROTOCOL_JSON in protocols_in_use: socketio.emit('sync_state', batch, to=protocol_room(PROTOCOL_JSON))
+    compact_protocols = protocols_in_use - {PROTOCOL_JSON}
+    if not compact_protocols: return
+    frame = wire_encoder.build_frame(batch)
+    if frame is None: return
+    for protocol in compact_protocols:
+        socketio.emit(PROTOCOL_EVENTS[protocol], wire_encoder.encode(frame, protocol), to=protocol_room(protocol))
+
+state_sync = StateSync(emit_state_batch, tick_hz=float(os.getenv('STATE_SYNC_HZ', DEFAULT_SYNC_HZ)))
+# --- ---
+
+# --- Startup benchmark ---
+# Phase timings since process start, completed by time-to-first-request (first client connect) and
+# appended as one JSON line per start to output/startup_benchmarks.jsonl.
+STARTUP_BENCHMARK_PATH = os.path.join(DEFAULT_OUTPUT_DIR, 'startup_benchmarks.jsonl')
+startup_recorded = threading.Event()
+
+def mark_startup_phase(name: str):
+    STARTUP_PHASES[name] = round(time.perf_counter() - STARTUP_T0, 3)
+
+def record_startup_benchmark(first_request: bool):
+    if startup_recorded.is_set(): return
+    startup_recorded.set()
+    if first_request: mark_startup_phase('time_to_first_request_s')
+    row = {'at': time.time(), **STARTUP_PHASES, 'providers': llm_service.configured_providers() if llm_service else [],
+           'preflight': os.getenv('LLM_PREFLIGHT', '1') != '0'}
+    logger.info(f"Startup benchmark: {row}")
+    try:
+        os.makedirs(os.path.dirname(STARTUP_BENCHMARK_PATH), exist_ok=True)
+        with open(STARTUP_BENCHMARK_PATH, 'a', encoding='utf-8') as f: f.write(json.dumps(row) + '\n')
+    except OSError as e: logger.warning(f"Could not record startup benchmark: {e}")
 # --- ---
 
 
 # --- Simulation Control Functions (called via WebSocket) ---
-def start_simulation_thread(user_request: str, llm_agent_configs: Optional[Dict[str, Dict[str, str]]] = None):
-    """Runs the simulation in a separate thread with its own event loop."""
+def start_simulation_thread(user_request: str, llm_agent_configs: Optional[Dict[str, Dict[str, str]]] = None, resume_run_id: Optional[str] = None, sla_s: Optional[float] = None):
+    """Runs the simulation (or resumes a checkpointed run) in a separate thread with its own event loop."""
     global workflow_manager, simulation_event_loop, llm_service # Ensure llm_service is accessible
-    logger.info(f"Starting simulation thread with request: '{user_request}'")
+    logger.info(f"Starting simulation thread with request: '{user_request}'" + (f" (resuming run '{resume_run_id}')" if resume_run_id else ""))
     if llm_agent_configs:
          logger.info(f"Using provided LLM agent configs: {llm_agent_configs}")
     else:
@@ -68,35 +128,102 @@ def start_simulation_thread(user_request: str, llm_agent_configs: Optional[Dict[
             emit_final_output=emit_final_output_callback
         )
 
+        state_sync.reset()
         if workflow_manager and workflow_manager.agents:
             logger.info("Sending initial agent states to frontend...")
             for agent_id, agent in workflow_manager.agents.items(): # [cite: uploaded:SoftwareSim3d/src/agent_base.py]
-                 initial_state = agent.internal_state.copy() # [cite: uploaded:SoftwareSim3d/src/agent_base.py]
-                 initial_state['position'] = agent.initial_position # [cite: uploaded:SoftwareSim3d/src/agent_base.py]
-                 initial_state['role'] = agent.role
-                 emit_agent_update_callback(agent_id, initial_state)
+                 emit_agent_update_callback(agent_id, agent.get_public_state())
 
-        simulation_event_loop.run_until_complete(workflow_manager.start_simulation(user_request))
+        if resume_run_id: simulation_event_loop.run_until_complete(workflow_manager.resume(resume_run_id, sla_s))
+        else: simulation_event_loop.run_until_complete(workflow_manager.start_simulation(user_request, sla_s))
         logger.info("Simulation thread finished.")
 
     except Exception as e:
          logger.error(f"Error in simulation thread: {e}", exc_info=True)
          socketio.emit('simulation_error', {'error': str(e)})
     finally:
-         if simulation_event_loop and simulation_event_loop.is_running():
+         # Release the finished run so repeated runs keep a flat memory profile
+         if workflow_manager is not None:
+             try: workflow_manager.dispose()
+             except Exception as e: logger.error(f"Error disposing WorkflowManager: {e}")
+             workflow_manager = None
+         if simulation_event_loop and not simulation_event_loop.is_running() and not simulation_event_loop.is_closed():
              simulation_event_loop.close()
          logger.info("Simulation event loop closed.")
 
+# --- Warm manager ---
+# With WARM_MANAGER on (default) one simulation loop thread and one WorkflowManager live for the whole process:
+# a new run only resets per-run state (milliseconds), and stopping a run never blocks a socket handler.
+warm_manager_enabled = os.getenv('WARM_MANAGER', '1') != '0'
+
+def ensure_simulation_loop() -> asyncio.AbstractEventLoop:
+    """Starts the persistent simulation loop thread on first use."""
+    global simulation_event_loop, simulation_loop_thread
+    if simulation_event_loop is not None and not simulation_event_loop.is_closed() and simulation_loop_thread and simulation_loop_thread.is_alive():
+        return simulation_event_loop
+    loop = asyncio.new_event_loop(); loop_ready = threading.Event()
+    def run_loop():
+        asyncio.set_event_loop(loop); loop.call_soon(loop_ready.set)
+        try: loop.run_forever()
+        finally: loop.close(); logger.info("Simulation event loop closed.")
+    simulation_event_loop = loop
+    simulation_loop_thread = threading.Thread(target=run_loop, name='simulation-loop', daemon=True)
+    simulation_loop_thread.start(); loop_ready.wait(timeout=5)
+    return loop
+
+async def run_warm_simulation(user_request: str, llm_agent_configs: Optional[Dict[str, Dict[str, str]]] = None, resume_run_id: Optional[str] = None, sla_s: Optional[float] = None):
+    """One run on the persistent loop: builds the manager the first time, otherwise resets the warm one."""
+    global workflow_manager
+    prepare_start = time.perf_counter(); reused = workflow_manager is not None
+    try:
+        if workflow_manager is None:
+            workflow_manager = WorkflowManager(llm_service=llm_service, loop=asyncio.get_running_loop(), llm_agent_configs=llm_agent_configs)
+            workflow_manager.register_websocket_callbacks(
+                emit_agent_update=emit_agent_update_callback,
+                emit_task_update=emit_task_update_callback,
+                request_user_input=request_user_input_callback,
+                emit_final_output=emit_final_output_callback
+            )
+        else:
+            workflow_manager.reset_for_run(llm_agent_configs or {})
+        state_sync.reset()
+        for agent_id, agent in workflow_manager.agents.items(): emit_agent_update_callback(agent_id, agent.get_public_state())
+        logger.info(f"Run prepared in {(time.perf_counter() - prepare_start) * 1000:.1f} ms ({'warm manager reused' if reused else 'manager built'}).")
+        if resume_run_id: await workflow_manager.resume(resume_run_id, sla_s)
+        else: await workflow_manager.start_simulation(user_request, sla_s)
+        logger.info("Simulation run finished.")
+    except Exception as e:
+        logger.error(f"Error in simulation run: {e}", exc_info=True)
+        socketio.emit('simulation_error', {'error': str(e)})
+    finally:
+        if workflow_manager is not None:
+            try:
+                if workflow_manager._agents_started: await workflow_manager.stop_simulation() # Run failed before its own cleanup
+                workflow_manager.dispose() # Per-run state only; agents, bus and pools stay warm
+            except Exception as e:
+                logger.error(f"Error cleaning up after run, dropping the warm manager: {e}", exc_info=True)
+                workflow_manager = None
+
+def shutdown_simulation_loop(timeout: float = 10.0):
+    """Process exit in warm mode: ends the active run, waits for its cleanup, then stops the loop."""
+    if not simulation_event_loop or simulation_event_loop.is_closed(): return
+    if current_run_future and not current_run_future.done():
+        if workflow_manager: simulation_event_loop.call_soon_threadsafe(workflow_manager.request_stop, "Server shutting down.")
+        try: current_run_future.result(timeout=timeout)
+        except Exception as e: logger.error(f"Error during final simulation stop: {e}")
+    simulation_event_loop.call_soon_threadsafe(simulation_event_loop.stop)
+    if simulation_loop_thread: simulation_loop_thread.join(timeout=5)
+# --- ---
+
 # --- WebSocket Callback Functions ---
+# Agent/task updates are queued on the state-sync layer and emitted by its flush loop,
+# so the simulation thread never blocks on socket I/O.
 def emit_agent_update_callback(agent_id: str, state: Dict[str, Any]):
-    data_to_send = {'agent_id': agent_id,'state': state }
-    socketio.emit('update_agent', data_to_send)
-    socketio.sleep(0.01)
+    state_sync.push_agent(agent_id, state)
 
 def emit_task_update_callback(task_id: str, task_data: Dict[str, Any]):
-    logger.debug(f"[WebSocket Emit] Update Task: {task_id} - Status: {task_data.get('status', 'N/A')}")
-    socketio.emit('update_task', {'task_id': task_id, 'data': task_data})
-    socketio.sleep(0.01)
+    logger.debug(f"[StateSync] Update Task: {task_id} - Status: {task_data.get('status', 'N/A')}")
+    state_sync.push_task(task_id, task_data)
 
 def request_user_input_callback(task_id: str, question: str):
     logger.info(f"[WebSocket Emit] Requesting User Input (Task {task_id}): {question}")
@@ -127,6 +254,11 @@ def handle_connect():
         logger.info(f'Client connected: {request.sid}')
     else:
         logger.info('Client connected (no request context available)')
+    if not startup_recorded.is_set(): record_startup_benchmark(first_request=True)
+    # Legacy JSON until the client negotiates a compact protocol
+    client_protocols[request.sid] = PROTOCOL_JSON; join_room(protocol_room(PROTOCOL_JSON))
+    # Bring a client joining mid-run up to date; later frames are deltas
+    emit('sync_state', state_sync.snapshot())
 
 # Corrected disconnect handler
 @socketio.on('disconnect')
@@ -136,12 +268,26 @@ def handle_disconnect():
         logger.info(f'Client disconnected: {request.sid}')
     else:
         logger.info('Client disconnected (no request context available)')
-    # Optional disconnect logic...
+    if request: client_protocols.pop(request.sid, None)
+
+@socketio.on('negotiate_protocol')
+def handle_negotiate_protocol(data: Dict):
+    """Client sends {'accept': [protocols...]}; replies with the chosen protocol, its tables and a full snapshot."""
+    protocol = choose_protocol((data or {}).get('accept'))
+    previous = client_protocols.get(request.sid, PROTOCOL_JSON)
+    if previous != protocol: leave_room(protocol_room(previous)); join_room(protocol_room(protocol))
+    client_protocols[request.sid] = protocol
+    logger.info(f"Client {request.sid} negotiated wire protocol '{protocol}' (server supports {available_protocols()}).")
+    snapshot = state_sync.snapshot()
+    if protocol == PROTOCOL_JSON:
+        emit('protocol_selected', {'protocol': protocol}); emit('sync_state', snapshot); return
+    frame = wire_encoder.build_frame(snapshot, announce=False) # Interns first so describe() covers every id used
+    emit('protocol_selected', {'protocol': protocol, **wire_encoder.describe()})
+    if frame is not None: emit(PROTOCOL_EVENTS[protocol], wire_encoder.encode(frame, protocol))
 
 # Corrected start_simulation handler
 @socketio.on('start_simulation')
 def handle_start_simulation(data: Dict):
-    global simulation_loop_thread, workflow_manager
     if not isinstance(data, dict):
          logger.error(f"Invalid data received for start_simulation: {data}")
          emit('simulation_status', {'status': 'error', 'message': 'Invalid start data received.'})
@@ -154,10 +300,33 @@ def handle_start_simulation(data: Dict):
     if llm_configs: logger.info(f"Received LLM Configs: {llm_configs}")
     else: logger.warning("No LLM configs received from frontend.")
 
-    if simulation_loop_thread and simulation_loop_thread.is_alive():
+    launch_simulation_thread(user_request, llm_configs, sla_s=parse_sla(data.get('sla_s')))
+
+def parse_sla(value: Any) -> Optional[float]:
+    """Run deadline requested by the client, in seconds (None: the server default RUN_SLA_S)."""
+    try: return float(value) if value is not None else None
+    except (TypeError, ValueError): logger.warning(f"Ignoring invalid sla_s: {value!r}"); return None
+
+def simulation_run_active() -> bool:
+    """True while a run is in progress. In warm mode the loop thread lives on between runs, so the run's future decides."""
+    if warm_manager_enabled: return current_run_future is not None and not current_run_future.done()
+    return bool(simulation_loop_thread and simulation_loop_thread.is_alive())
+
+def launch_simulation_thread(user_request: str, llm_configs: Optional[Dict[str, Dict[str, str]]], resume_run_id: Optional[str] = None, sla_s: Optional[float] = None):
+    """Cleans up any previous simulation and starts a new simulation thread (called from socket handlers)."""
+    global simulation_loop_thread, workflow_manager, current_run_future
+    if simulation_run_active():
          logger.warning("Simulation is already running. Ignoring request.")
          emit('simulation_status', {'status': 'already_running'})
          return
+    if replay_thread and replay_thread.is_alive():
+         logger.info("Stopping the running replay before starting a simulation.")
+         replay_engine.stop(); replay_thread.join(timeout=5)
+
+    if warm_manager_enabled: # Nothing to tear down: the previous run already stopped and disposed itself
+         current_run_future = asyncio.run_coroutine_threadsafe(run_warm_simulation(user_request, llm_configs, resume_run_id, sla_s), ensure_simulation_loop())
+         emit('simulation_status', {'status': 'resumed' if resume_run_id else 'started', 'run_id': resume_run_id})
+         return
 
     if workflow_manager and simulation_event_loop and workflow_manager.agents:
          logger.warning("Attempting to clean up previous simulation instance...")
@@ -176,11 +345,40 @@ def handle_start_simulation(data: Dict):
 
     simulation_loop_thread = threading.Thread(
         target=start_simulation_thread,
-        args=(user_request, llm_configs),
+        args=(user_request, llm_configs, resume_run_id, sla_s),
         daemon=True
     )
     simulation_loop_thread.start()
-    emit('simulation_status', {'status': 'started'})
+    emit('simulation_status', {'status': 'resumed' if resume_run_id else 'started', 'run_id': resume_run_id})
+
+@socketio.on('stop_simulation')
+def handle_stop_simulation():
+    """Non-blocking: the run ends at its next loop check and cleans up in the background."""
+    if workflow_manager and simulation_event_loop and simulation_event_loop.is_running() and not workflow_manager.simulation_complete:
+         simulation_event_loop.call_soon_threadsafe(workflow_manager.request_stop)
+         emit('simulation_status', {'status': 'stopping', 'run_id': workflow_manager.run_id})
+    else:
+         emit('simulation_status', {'status': 'not_running'})
+
+@socketio.on('list_checkpoints')
+def handle_list_checkpoints():
+    emit('checkpoint_list', {'runs': list_checkpoints(CHECKPOINT_ROOT_DIR)})
+
+@socketio.on('resume_simulation')
+def handle_resume_simulation(data: Dict):
+    run_id = data.get('run_id') if isinstance(data, dict) else None
+    if not run_id:
+         logger.error(f"Invalid data received for resume_simulation: {data}")
+         emit('simulation_status', {'status': 'error', 'message': 'resume_simulation requires a run_id.'})
+         return
+    checkpoint = load_checkpoint(CHECKPOINT_ROOT_DIR, run_id)
+    if not checkpoint:
+         emit('simulation_status', {'status': 'error', 'message': f"No usable checkpoint for run '{run_id}'."})
+         return
+    meta = checkpoint['meta']
+    llm_configs = data.get('llm_configs') or meta.get('llm_agent_configs') # Same agent/model mix as the original run
+    logger.info(f"Received resume_simulation request for run '{run_id}'")
+    launch_simulation_thread(meta.get('user_request') or '', llm_configs, resume_run_id=run_id, sla_s=parse_sla(data.get('sla_s')))
 
 # Corrected user_response handler
 @socketio.on('user_response')
@@ -205,12 +403,43 @@ def handle_user_response(data: Dict):
         emit('simulation_status', {'status': 'error', 'message': 'Simulation not active to handle response.'})
 # --- ---
 
+# --- Replay (recorded runs, no LLM calls) ---
+def run_replay_thread(engine: ReplayEngine, speed: float):
+    stats = engine.run(speed)
+    socketio.emit('replay_status', {'status': 'finished', **stats})
+
+@socketio.on('list_event_logs')
+def handle_list_event_logs():
+    emit('event_log_list', {'runs': list_event_logs(EVENT_LOG_ROOT_DIR)})
+
+@socketio.on('replay_run')
+def handle_replay_run(data: Dict):
+    global replay_engine, replay_thread
+    run_id = data.get('run_id') if isinstance(data, dict) else None
+    if not run_id or run_id not in list_event_logs(EVENT_LOG_ROOT_DIR):
+         emit('replay_status', {'status': 'error', 'message': f"No event log for run '{run_id}'."}); return
+    if simulation_run_active() or (replay_thread and replay_thread.is_alive()):
+         emit('replay_status', {'status': 'error', 'message': 'A simulation or replay is already running.'}); return
+    try: speed = float(data.get('speed', 1.0)) # 1, 10, ... ; 0 = as fast as possible
+    except (TypeError, ValueError): speed = 1.0
+    logger.info(f"Replaying run '{run_id}' at speed {speed or 'max'}")
+    state_sync.reset() # Replayed updates flow through the same state-sync path as a live run
+    replay_engine = ReplayEngine(EVENT_LOG_ROOT_DIR, run_id, emit_agent_update_callback, emit_task_update_callback, emit_final_output_callback)
+    replay_thread = threading.Thread(target=run_replay_thread, args=(replay_engine, speed), daemon=True)
+    replay_thread.start()
+    emit('replay_status', {'status': 'started', 'run_id': run_id, 'speed': speed})
+
+@socketio.on('stop_replay')
+def handle_stop_replay():
+    if replay_engine: replay_engine.stop()
+# --- ---
+
 # --- Main Execution ---
 if __name__ == "__main__":
     logger.info("Starting Application Server...")
     try:
         llm_service = LLMService() # [cite: uploaded:SoftwareSim3d/src/llm_integration/api_clients.py]
-        if not llm_service.google_client and not llm_service.openai_client and not llm_service.anthropic_client: # [cite: uploaded:SoftwareSim3d/src/llm_integration/api_clients.py]
+        if not llm_service.configured_providers(): # Key check only; SDKs are imported when first needed
             logger.error("FATAL: No LLM clients could be configured. Check API keys in .env file.")
             print("\nERROR: Could not configure any LLM clients. Check .env file or API service status. Exiting.")
             sys.exit(1)
@@ -220,13 +449,22 @@ if __name__ == "__main__":
         logger.critical(f"Failed to initialize LLM Service: {e}", exc_info=True)
         print(f"\nFATAL ERROR initializing LLM Service: {e}. Exiting.")
         sys.exit(1)
+    mark_startup_phase('llm_service_s')
+    # Import the provider SDKs in the background while the server comes up (SDK import dominates cold start)
+    if os.getenv('LLM_PREFLIGHT', '1') != '0': threading.Thread(target=llm_service.warm_up, name='llm-warmup', daemon=True).start()
 
     host = '127.0.0.1'; port = 5000
+    socketio.start_background_task(state_sync.run, socketio.sleep)
+    mark_startup_phase('ready_s')
+    if '--startup-benchmark' in sys.argv[1:]: # Measure the cold start up to the point the server would accept requests
+        record_startup_benchmark(first_request=False); sys.exit(0)
     logger.info(f"Flask-SocketIO server starting on http://{host}:{port}")
     socketio.run(app, host=host, port=port, debug=False, use_reloader=False)
 
     logger.info("Application server stopped.")
-    if simulation_loop_thread and simulation_loop_thread.is_alive():
+    state_sync.stop()
+    if warm_manager_enabled: shutdown_simulation_loop()
+    elif simulation_loop_thread and simulation_loop_thread.is_alive():
          logger.info("Attempting final cleanup of simulation thread...")
          if workflow_manager and simulation_event_loop:
              try:
@@ -5,15 +5,22 @@ import asyncio
 import logging
 import random
 import time # Using time for simple state delays initially
-from typing import Optional, Dict, Any, Callable, Awaitable, Tuple, List, Set
+from typing import Optional, Dict, Any, Callable, Awaitable, Tuple, List, Set, Union, Iterable
 import concurrent.futures # Added import for join fix
 
+from .simulation.message_bus import Message, MANAGER_ID, unwrap_agent_message
+from .simulation.artifact_store import ArtifactStore, is_artifact_handle
+from .llm_integration.llm_scheduler import DEFAULT_LLM_PRIORITY
+from .simulation.deadline import RunDeadline, LEVEL_TIGHT, LEVEL_CRITICAL, CRITICAL_WAIT_S, FAST_MODELS, DEFAULT_LLM_CALL_TIMEOUT_S
+
 # Type hinting imports
 from typing import TYPE_CHECKING
 if TYPE_CHECKING:
     # Ensure correct relative path if structure changes
     from .llm_integration.api_clients import LLMService #
-    StateUpdateCallback = Callable[[str, Dict[str, Any]], None]
+    from .simulation.context_archive import ContextArchive
+    from .simulation.actor_runtime import ActorRuntime
+    StateUpdateCallback = Callable[[str, Dict[str, Any]], None] # (agent_id, changed keys only)
 
 logger = logging.getLogger(__name__)
 
@@ -33,6 +40,15 @@ IDLE_WANDERING = 'wandering'
 
 # Default timeout for waiting on dependencies
 DEFAULT_DEPENDENCY_TIMEOUT = 120.0 # seconds
+HTML_WAIT_TIMEOUT_S = 120.0 # CSS/JS specialists waiting for the page's HTML structure before using a fallback
+FIX_CONTEXT_WAIT_S = 15.0 # Specialists waiting for the context of a fix task
+
+# Turn pacing (step()); the legacy run() loop always sleeps DECISION_INTERVAL_S
+DECISION_INTERVAL_S = 0.1
+MAX_WAIT_BACKOFF_S = 1.0 # Ceiling for repeated 'wait' decisions; messages and state changes wake the agent sooner under a runtime
+IDLE_TURN_INTERVAL_S = 1.0 # Idle agents without a task only need a turn for idle animations
+IDLE_ACTION_RATE_PER_S = 0.1 # Chance per second that an idle agent starts an idle action
+AGENT_JOIN_TIMEOUT_S = 2.0 # Upper bound only: stop() cancels all agent work, so joins normally finish at once
 
 class Agent(abc.ABC):
     def __init__(self,
@@ -49,6 +65,8 @@ class Agent(abc.ABC):
                  available_tools: Optional[Set[str]] = None,
                  required_tool_zones: Optional[Dict[str, str]] = None,
                  zone_coordinates_map: Optional[Dict[str, Tuple[float, float, float]]] = None,
+                 artifact_store: Optional[ArtifactStore] = None,
+                 context_archive: Optional['ContextArchive'] = None,
                  **kwargs): # Accept remaining kwargs silently if needed
         self.agent_id = agent_id
         self.role = role
@@ -64,6 +82,8 @@ class Agent(abc.ABC):
         self.required_tool_zones = required_tool_zones if required_tool_zones is not None else {}
         # Store zone coordinates locally for quicker access
         self.zone_coordinates = zone_coordinates_map if zone_coordinates_map is not None else {}
+        self.artifact_store = artifact_store # Shared content-addressed store for generated code/docs
+        self.context_archive = context_archive # Where finished task contexts go when evicted
         self.current_task: Optional[Dict[str, Any]] = None
         self.task_context: Dict[str, Any] = {}
         self.internal_state: Dict[str, Any] = {
@@ -74,8 +94,26 @@ class Agent(abc.ABC):
              'position': initial_position # Ensure position is part of initial state
         }
         self.state_update_callback: Optional['StateUpdateCallback'] = None
+        self.llm_call_listener: Optional[Callable[[Dict[str, Any]], None]] = None # Receives one timing record per LLM call
+        self.llm_priority_source: Optional[Callable[[Dict[str, Any]], float]] = None # task -> LLM scheduling priority (critical path first)
+        self.deadline: Optional[RunDeadline] = None # The run's SLA budget (set by the manager per run)
+        self._unsynced_state: Dict[str, Any] = {} # Changes made with trigger_callback=False
+        self._pending_tool_ops: Dict[Optional[str], List[Dict[str, Any]]] = {} # Required zone -> tool operations run on the next visit
+        self.overlap_llm = kwargs.get('overlap_llm', True) # Start LLM calls as soon as their inputs are read, while the agent walks
+        self._background_llm: Dict[str, asyncio.Task] = {} # task_id -> LLM call running alongside movement
+        self._spawned_tasks: Set[asyncio.Task] = set() # Fire-and-forget work (spawn_task); cancelled by stop()
         self._is_running = True
         self._main_task_handle: Optional[asyncio.Future] = None # Use Future for threadsafe tasks
+        self.runtime: Optional['ActorRuntime'] = None # Set by ActorRuntime.attach; turns are then scheduled centrally
+        self._wait_turns = 0 # Consecutive 'wait' decisions (turn backoff)
+        # Dispatch table for manager/system messages (keyed by content 'type')
+        self._system_message_handlers: Dict[str, Callable[[Dict[str, Any]], Awaitable[None]]] = {
+            'new_task': self._on_new_task_message,
+            'tool_result': self._on_tool_result_message,
+            'tool_batch_result': self._on_tool_batch_result_message,
+            'arrived_at_zone': self._on_arrived_at_zone_message,
+            'stop_agent': self._on_stop_agent_message,
+        }
 
         llm_info_str = f"LLM: {self.llm_type} ({self.llm_model_name or 'default'})" if self.llm_service and self.llm_type else "No LLM assigned"
         logger.info(f"Agent {self.agent_id} ({self.role}) initialized. {llm_info_str}. Tools: {self.available_tools}. Desk: {self.target_desk_position}")
@@ -83,6 +121,25 @@ class Agent(abc.ABC):
     def register_state_update_callback(self, callback: 'StateUpdateCallback'):
         self.state_update_callback = callback
 
+    def register_llm_call_listener(self, listener: Callable[[Dict[str, Any]], None]):
+        self.llm_call_listener = listener
+
+    def register_llm_priority_source(self, source: Callable[[Dict[str, Any]], float]):
+        self.llm_priority_source = source
+
+    # --- Run deadline ---
+    def set_deadline(self, deadline: Optional[RunDeadline]):
+        self.deadline = deadline
+
+    def deadline_at_least(self, level: str) -> bool:
+        """True if the run's budget has reached `level` (deadline.LEVEL_TIGHT / LEVEL_CRITICAL / LEVEL_EXPIRED)."""
+        return bool(self.deadline and self.deadline.enabled and self.deadline.at_least(level))
+
+    def wait_expired(self, wait_start: float, timeout: float) -> bool:
+        """True once a wait started at wait_start (time.time()) should give up: after timeout, or after CRITICAL_WAIT_S once the run's budget is critical."""
+        elapsed = time.time() - wait_start
+        return elapsed > timeout or (elapsed > CRITICAL_WAIT_S and self.deadline_at_least(LEVEL_CRITICAL))
+
     @abc.abstractmethod
     def get_prompt(self, task_details: Dict[str, Any], context: Dict[str, Any]) -> Optional[str]: pass
 
@@ -95,25 +152,110 @@ class Agent(abc.ABC):
     @abc.abstractmethod
     async def _process_tool_result(self, tool_name: str, result: Any): pass
 
+    async def _process_llm_sections(self, responses: Dict[str, Optional[str]]):
+        """Responses of a sectioned LLM call ({section: response, None if that call failed}). Default: each answered section in order."""
+        for response in responses.values():
+            if response is not None: await self._process_llm_response(response)
+
     # --- State Management ---
     def update_state(self, updates: Dict[str, Any], trigger_callback: bool = True):
-        state_changed = False
+        """Applies updates and reports only the keys that actually changed to the state callback."""
+        changes: Dict[str, Any] = {}
         for key, value in updates.items():
             if self.internal_state.get(key) != value:
                 self.internal_state[key] = value
-                state_changed = True
-        if 'status' in updates: self._update_thoughts_on_status_change(updates['status'])
-        if state_changed and trigger_callback and self.state_update_callback:
-            current_state_copy = self.internal_state.copy()
-            if 'target_position' not in current_state_copy: current_state_copy['target_position'] = self.get_state('target_position', self.target_desk_position)
-            # Ensure position is always included
-            if 'position' not in current_state_copy: current_state_copy['position'] = self.get_state('position', self.initial_position)
-            try: self.state_update_callback(self.agent_id, current_state_copy)
-            except Exception as e: logger.error(f"Error calling state_update_callback for agent {self.agent_id}: {e}")
+                changes[key] = value
+        if 'status' in updates:
+            previous_thoughts = self.internal_state.get('current_thoughts')
+            self._update_thoughts_on_status_change(updates['status'])
+            if self.internal_state.get('current_thoughts') != previous_thoughts: changes['current_thoughts'] = self.internal_state['current_thoughts']
+        if not changes: return
+        if self.runtime is not None and ('status' in changes or 'current_action' in changes): self.runtime.wake(self.agent_id)
+        if not trigger_callback or not self.state_update_callback:
+            self._unsynced_state.update(changes) # Sent with the next triggered update
+            return
+        if self._unsynced_state:
+            self._unsynced_state.update(changes); changes = self._unsynced_state; self._unsynced_state = {}
+        try: self.state_update_callback(self.agent_id, changes)
+        except Exception as e: logger.error(f"Error calling state_update_callback for agent {self.agent_id}: {e}")
+
+    # --- Checkpointing ---
+    def checkpoint_state(self) -> Dict[str, Any]:
+        """JSON-friendly snapshot of the current task, task contexts and public state. Artifact handles stay handles."""
+        return {'current_task': self.current_task, 'task_context': self.task_context,
+                'state': {key: value for key, value in self.internal_state.items() if not key.startswith('_')},
+                'pending_tool_ops': [[zone, ops] for zone, ops in self._pending_tool_ops.items() if ops]}
+
+    def restore_checkpoint(self, snapshot: Dict[str, Any]):
+        """Restores a checkpoint_state() snapshot. Work that was in flight (moves, tool calls, an LLM call) is redone."""
+        self.current_task = snapshot.get('current_task')
+        self.task_context = snapshot.get('task_context') or {}
+        self._pending_tool_ops = {zone: ops for zone, ops in snapshot.get('pending_tool_ops') or []}
+        state = dict(snapshot.get('state') or {})
+        for key in ('position', 'target_position'):
+            if isinstance(state.get(key), list): state[key] = tuple(state[key])
+        if state.get('current_action') == 'executing_llm': self._rewind_interrupted_llm_call()
+        if state.get('status') in (STATUS_MOVING_TO_ZONE, STATUS_USING_TOOL_IN_ZONE):
+            state.update({'status': STATUS_WORKING if self.current_task else STATUS_IDLE, 'target_zone': None})
+        if state.get('current_action') in ('executing_llm', 'executing_tool', 'executing_tool_batch') or str(state.get('current_action', '')).startswith('ready_to_use_'):
+            state['current_action'] = None # Let the decision loop pick the step up again
+        self.internal_state.update(state)
+        self._unsynced_state = {}
+        logger.info(f"Agent {self.agent_id} restored from checkpoint (Task: {self.current_task.get('task_id') if self.current_task else None}, Status: {self.get_state('status')}).")
+
+    def _rewind_interrupted_llm_call(self):
+        """Clears the 'LLM already called' markers of the current task so an unanswered call is issued again."""
+        task_id = self.current_task.get('task_id') if self.current_task else None
+        context = self.task_context.get(task_id) if task_id else None
+        if not isinstance(context, dict): return
+        for key in ('llm_called', 'llm_call_time', 'prompt_generated'): context.pop(key, None)
+        logger.info(f"Agent {self.agent_id}: LLM call for task {task_id} was interrupted by the restart; it will be retried.")
+
+    # --- Artifacts ---
+    def store_artifact(self, content: Any, kind: Optional[str] = None) -> Any:
+        """Returns a handle for string content to pass around instead of the text (content unchanged without a store)."""
+        if self.artifact_store is None or not isinstance(content, str): return content
+        return self.artifact_store.put(content, kind)
+
+    def resolve_artifact(self, value: Any, default: Any = '') -> Any:
+        """Returns the content behind a handle. Call only where the text is actually needed (prompts, assembly)."""
+        if not is_artifact_handle(value): return value if value is not None else default
+        if self.artifact_store is None: logger.error(f"Agent {self.agent_id}: cannot resolve artifact without a store."); return default
+        return self.artifact_store.resolve(value, default)
+
+    async def resolve_artifact_async(self, value: Any, default: Any = '') -> Any:
+        """resolve_artifact() for async code: a blob no longer cached is read off the event loop."""
+        if not is_artifact_handle(value): return value if value is not None else default
+        if self.artifact_store is None: logger.error(f"Agent {self.agent_id}: cannot resolve artifact without a store."); return default
+        return await self.artifact_store.resolve_async(value, default)
+
+    async def prefetch_artifacts(self, values: Iterable[Any]):
+        """Caches the blobs behind any handles in values before synchronous code resolves them on the loop."""
+        if self.artifact_store is not None: await self.artifact_store.prefetch(values)
+
+    async def _prefetch_task_artifacts(self):
+        task_id = self.current_task.get('task_id') if self.current_task else None
+        context = self.task_context.get(task_id) if task_id else None
+        if isinstance(context, dict): await self.prefetch_artifacts(context.values())
+
+    # --- Task Context Lifecycle ---
+    def recall_task_context(self, task_id: str) -> Optional[Dict[str, Any]]:
+        """Live context for task_id, reinstating it from the archive if it was evicted after the task finished."""
+        context = self.task_context.get(task_id)
+        if context is not None or not task_id or self.context_archive is None: return context
+        context = self.context_archive.recall(self.agent_id, task_id)
+        if context is not None: self.task_context[task_id] = context; logger.info(f"Agent {self.agent_id}: recalled archived context for task {task_id}.")
+        return context
 
     def get_state(self, key: str, default: Any = None) -> Any: return self.internal_state.get(key, default)
     def get_thoughts(self) -> str: return self.get_state('current_thoughts', "No thoughts available.")
 
+    def get_public_state(self) -> Dict[str, Any]:
+        """Full state for (re)synchronising a client; private keys are omitted."""
+        state = {key: value for key, value in self.internal_state.items() if not key.startswith('_')}
+        state['role'] = self.role
+        return state
+
     def _update_thoughts_on_status_change(self, new_status: str):
         """ Auto-update thoughts based on primary status. """
         task_desc = self.current_task.get('description', '...') if self.current_task else '...'
@@ -189,22 +331,84 @@ class Agent(abc.ABC):
             'state_timer': 0.0, 'wait_start_time': None # Reset wait timer
         })
 
-    async def _execute_llm_task(self, prompt: str) -> Optional[str]:
-        """Helper to call LLM service, returns response or None on error."""
+    async def _execute_llm_task(self, prompt: str, track_action: bool = True) -> Optional[str]:
+        """Helper to call LLM service, returns response or None on error. track_action=False leaves current_action alone (background calls)."""
         if not prompt: logger.error(f"Agent {self.agent_id} ({self.role}): LLM task called with empty prompt."); self.update_state({'last_error': 'LLM called with empty prompt.'}); return None
         if not self.llm_service or not self.llm_type: logger.error(f"Agent {self.agent_id} ({self.role}): LLM service or type not available."); self.update_state({'last_error': 'LLM service unavailable.'}); return None
-        self.update_state({ 'current_thoughts': f"Consulting LLM ({self.llm_type})...", 'current_action': 'executing_llm' })
-        llm_result = await self.llm_service.generate( llm_type=self.llm_type, prompt=prompt, model_name=self.llm_model_name ) #
+        self.update_state({ 'current_thoughts': f"Consulting LLM ({self.llm_type})...", **({'current_action': 'executing_llm'} if track_action else {}) })
+        started_at = time.time(); started = time.monotonic()
+        priority = self.llm_priority_source(self.current_task) if self.llm_priority_source and self.current_task else DEFAULT_LLM_PRIORITY
+        model_name = FAST_MODELS.get(self.llm_type, self.llm_model_name) if self.deadline_at_least(LEVEL_TIGHT) else self.llm_model_name # Cheaper model once the budget is tight
+        timeout_s = self.deadline.cap(DEFAULT_LLM_CALL_TIMEOUT_S) if self.deadline else DEFAULT_LLM_CALL_TIMEOUT_S
+        llm_result = await self.llm_service.generate( llm_type=self.llm_type, prompt=prompt, model_name=model_name, priority=priority, timeout_s=timeout_s ) #
+        self._report_llm_call(prompt, llm_result, model_name, started_at, time.monotonic() - started)
         if llm_result is None or llm_result.startswith("Error:"):
              error_msg = f"LLM call failed for agent {self.agent_id}: {llm_result or 'No response'}"; logger.error(error_msg)
-             self.update_state({ 'current_thoughts': error_msg, 'last_error': error_msg, 'current_action': 'processed_llm_response' })
+             self.update_state({ 'current_thoughts': error_msg, 'last_error': error_msg, **({'current_action': 'processed_llm_response'} if track_action else {}) })
              if self.current_task: self.task_context[self.current_task.get('task_id')]['llm_result_type'] = 'error' # Mark error type in context
              return None
         else:
-            self.update_state({ 'current_thoughts': "Received LLM response.", 'current_action': 'processing_llm_response' });
+            self.update_state({ 'current_thoughts': "Received LLM response.", **({'current_action': 'processing_llm_response'} if track_action else {}) });
             return llm_result
 
+    async def _execute_llm_sections(self, prompts: Dict[str, str], track_action: bool = True) -> Dict[str, Optional[str]]:
+        """Runs independent prompts of the current task as concurrent LLM calls; takes as long as the slowest one. Returns {section: response or None}."""
+        if track_action: self.update_state({'current_action': 'executing_llm'})
+        sections = list(prompts)
+        responses = await asyncio.gather(*(self._execute_llm_task(prompts[section], track_action=False) for section in sections))
+        logger.info(f"Agent {self.agent_id}: {sum(response is not None for response in responses)}/{len(sections)} LLM section(s) answered.")
+        return dict(zip(sections, responses))
 
+    # --- Background LLM calls (overlap with movement) ---
+    def start_background_llm(self, prompt: Optional[Union[str, Dict[str, str]]]) -> bool:
+        """
+        Starts the current task's LLM call right away, without waiting for the agent to reach its desk. The response
+        goes through _process_llm_response when it arrives (if the task is still current); until then
+        background_llm_pending() is True and the decision loop must not issue the same call again.
+        A dict of section prompts runs as concurrent calls whose responses go together through _process_llm_sections.
+        """
+        task_id = self.current_task.get('task_id') if self.current_task else None
+        if not self.overlap_llm or not prompt or not task_id or task_id in self._background_llm: return False
+        if not self.llm_service or not self.llm_type: return False # Foreground path reports the missing service
+        self._background_llm[task_id] = self.loop.create_task(self._run_background_llm(task_id, prompt))
+        logger.info(f"Agent {self.agent_id}: started LLM call for task {task_id} ahead of movement.")
+        return True
+
+    def spawn_task(self, coro: Awaitable[Any]) -> asyncio.Task:
+        """Runs coro alongside the agent's turns. Use instead of loop.create_task so stop() can cancel it."""
+        task = self.loop.create_task(coro)
+        self._spawned_tasks.add(task); task.add_done_callback(self._spawned_tasks.discard)
+        return task
+
+    def background_llm_pending(self, task_id: Optional[str] = None) -> bool:
+        task_id = task_id or (self.current_task.get('task_id') if self.current_task else None)
+        return task_id in self._background_llm
+
+    async def _run_background_llm(self, task_id: str, prompt: Union[str, Dict[str, str]]):
+        try:
+            if isinstance(prompt, dict): llm_response = await self._execute_llm_sections(prompt, track_action=False)
+            else: llm_response = await self._execute_llm_task(prompt, track_action=False)
+            if llm_response is None or (isinstance(llm_response, dict) and all(response is None for response in llm_response.values())): return # Nothing recorded: the decision loop falls back to a regular call
+            if not self.current_task or self.current_task.get('task_id') != task_id:
+                logger.info(f"Agent {self.agent_id}: discarding background LLM response for task {task_id} (no longer current)."); return
+            if isinstance(llm_response, dict): await self._process_llm_sections(llm_response)
+            else: await self._process_llm_response(llm_response)
+        except asyncio.CancelledError: logger.info(f"Agent {self.agent_id}: background LLM call for task {task_id} cancelled."); raise
+        except Exception as e: logger.error(f"Agent {self.agent_id}: background LLM call for task {task_id} failed: {e}", exc_info=True)
+        finally: self._background_llm.pop(task_id, None)
+
+
+
+    def _report_llm_call(self, prompt: str, llm_result: Optional[str], model_name: str, started_at: float, duration_s: float):
+        if not self.llm_call_listener: return
+        task_id = self.current_task.get('task_id') if self.current_task else None
+        context = self.task_context.get(task_id) if task_id else None
+        purpose = (context.get('task_type') if isinstance(context, dict) else None) or (self.current_task.get('task_type') if self.current_task else None)
+        try:
+            self.llm_call_listener({'agent_id': self.agent_id, 'role': self.role, 'task_id': task_id, 'purpose': purpose, 'llm_type': self.llm_type,
+                                    'model': model_name, 'started_at': started_at, 'duration_s': duration_s, 'prompt_chars': len(prompt),
+                                    'response_chars': len(llm_result or ''), 'ok': bool(llm_result) and not llm_result.startswith("Error:")})
+        except Exception as e: logger.error(f"Agent {self.agent_id}: llm_call_listener failed: {e}")
 
     async def _execute_tool(self, tool_name: str, params: Dict[str, Any]) -> bool:
         """
@@ -249,12 +453,53 @@ class Agent(abc.ABC):
         }
         try:
             await self._send_message_to_manager(message_content)
-            return True
         except Exception as e:
             error_msg = f"Error sending tool request for {tool_name}: {e}"
             logger.error(f"Agent {self.agent_id}: {error_msg}", exc_info=True)
             self.update_state({'last_error': error_msg, 'status': STATUS_FAILED})
             return False
+        if self._pending_tool_ops.get(required_zone): await self.flush_tool_ops(required_zone) # Queued work for this zone rides along
+        return True
+
+    # --- Zone-batched tool operations ---
+    def queue_tool_op(self, tool_name: str, params: Dict[str, Any]) -> bool:
+        """Queues a tool operation for the next visit to its required zone instead of a trip per operation."""
+        if tool_name not in self.available_tools:
+            logger.error(f"Agent {self.agent_id} attempted to queue unavailable tool: {tool_name}"); return False
+        zone = self.required_tool_zones.get(tool_name)
+        ops = self._pending_tool_ops.setdefault(zone, [])
+        if tool_name == 'file_write': ops[:] = [op for op in ops if not (op['tool_name'] == 'file_write' and op['parameters'].get('filename') == params.get('filename'))] # Last write wins
+        ops.append({'tool_name': tool_name, 'parameters': params, 'task_id': self.current_task.get('task_id') if self.current_task else None})
+        return True
+
+    def pending_tool_op_count(self, zone: Optional[str] = None) -> int:
+        return len(self._pending_tool_ops.get(zone, ()))
+
+    async def flush_tool_ops(self, zone: Optional[str] = None) -> bool:
+        """
+        Sends every operation queued for zone as one batch request (results come back in one 'tool_batch_result').
+        Outside the zone the agent walks there first and the batch goes out on arrival. Returns False if nothing was queued.
+        """
+        ops = self._pending_tool_ops.get(zone)
+        if not ops: return False
+        if zone and self.get_state('current_zone') != zone:
+            if self.get_state('status') == STATUS_MOVING_TO_ZONE and self.get_state('target_zone') == zone: return True
+            zone_coords = self.zone_coordinates.get(zone) if self.zone_coordinates else None
+            if not zone_coords:
+                await self._fail_current_task(f"Missing coordinates for zone {zone} for {len(ops)} queued tool operation(s)."); return False
+            logger.info(f"Agent {self.agent_id} moving to zone '{zone}' to run {len(ops)} queued tool operation(s).")
+            await self._move_to_zone(zone, zone_coords)
+            if self.get_state('current_zone') != zone: return True # Flushed on arrival
+            if not self._pending_tool_ops.get(zone): return True # Already at the zone; the arrival handler sent them
+        ops = self._pending_tool_ops.pop(zone)
+        logger.info(f"Agent {self.agent_id} running {len(ops)} tool operation(s) in zone '{zone or 'current location'}' as one batch.")
+        self.update_state({'status': STATUS_WORKING, 'current_action': 'executing_tool_batch', 'current_thoughts': f"Running {len(ops)} tool operations..."})
+        try:
+            await self._send_message_to_manager({'type': 'request_tool_batch', 'operations': ops, 'task_id': self.current_task.get('task_id') if self.current_task else None})
+        except Exception as e:
+            self._pending_tool_ops.setdefault(zone, [])[:0] = ops # Keep them for the next visit
+            self.update_state({'last_error': f"Error sending tool batch: {e}"}); return False
+        return True
 
 
     async def _move_to_zone(self, zone_name: str, target_position: Tuple[float, float, float]):
@@ -300,12 +545,12 @@ class Agent(abc.ABC):
 
     # --- Communication ---
     async def _send_message_to_manager(self, message_content: Dict[str, Any]):
-        message = { 'sender_id': self.agent_id, 'recipient_id': 'workflow_manager', 'content': message_content }
+        message = Message(self.agent_id, MANAGER_ID, message_content)
         try: await self.broadcast_callback(message); logger.debug(f"Agent {self.agent_id} sent message to manager: Type {message_content.get('type', 'N/A')}")
         except Exception as e: logger.error(f"Agent {self.agent_id} failed to send message to manager: {e}", exc_info=True); raise
 
     async def _send_message_to_agent(self, target_agent_id: str, message_content: Dict[str, Any]):
-        message = { 'sender_id': self.agent_id, 'recipient_id': target_agent_id, 'content': message_content }
+        message = Message(self.agent_id, target_agent_id, message_content)
         try: await self.broadcast_callback(message); logger.debug(f"Agent {self.agent_id} sent message to agent {target_agent_id}: Type {message_content.get('type', 'N/A')}")
         except Exception as e: logger.error(f"Agent {self.agent_id} failed to send message to agent {target_agent_id}: {e}", exc_info=True); raise
 
@@ -341,63 +586,53 @@ class Agent(abc.ABC):
     #     else:
     #         await self._handle_subclass_message(message_type, content, sender_id)
 
-    async def _handle_message(self, message: Dict[str, Any]):
+    async def _handle_message(self, message: Message):
         """Processes an incoming message from the agent's queue, routing appropriately."""
         sender_id = message.get('sender_id', 'Unknown')
         content = message.get('content', {})
-        
-        # --- Integrated Routing Logic ---
-        # Check if the message is from another agent first
-        is_from_another_agent = sender_id != 'workflow_manager' and sender_id != 'user_interface'
-        
-        # Extract inner type (primarily for manager messages or logging)
+        # Messages from other agents go to the subclass handler; manager/UI messages use the dispatch table
+        is_from_another_agent = sender_id != MANAGER_ID and sender_id != 'user_interface'
         inner_message_type = content.get('type', 'unknown')
-        
-        logger.info(f"BASE HANDLER ({self.agent_id}): Received message from {sender_id}. IsAgentMsg={is_from_another_agent}. InnerType='{inner_message_type}'")
+        logger.debug(f"BASE HANDLER ({self.agent_id}): Received message from {sender_id}. IsAgentMsg={is_from_another_agent}. InnerType='{inner_message_type}'")
 
         try:
             if is_from_another_agent:
-                # Route direct agent-to-agent messages to the specific handler
-                # Pass the entire 'content' dict as message_data
-                logger.info(f"DEBUG BASE HANDLER ({self.agent_id} - {self.role}): Routing direct message from {sender_id} to _handle_agent_specific_message.")
-                await self._handle_agent_specific_message(sender_id, content)
-                
-            # Handle messages FROM Workflow Manager or UI based on INNER type
-            elif inner_message_type == 'new_task':
-                await self.assign_task(content.get('task_data', {}))
-            elif inner_message_type == 'tool_result':
-                tool_name = content.get('tool_name'); result_dict = content # Pass the whole content as result_dict
-                self.update_state({'status': STATUS_WORKING, 'current_action': f'processing_{tool_name}_result'})
-                await self._process_tool_result(tool_name, result_dict)
-            elif inner_message_type == 'arrived_at_zone':
-                zone_name = content.get('zone_name')
-                logger.info(f"Agent {self.agent_id} officially arrived at zone: {zone_name}")
-                # Update state *before* calling arrival handler
-                self.update_state({ 'current_zone': zone_name, 'status': STATUS_WORKING, 'target_zone': None, 'current_action': 'arrived' })
-                await self._handle_arrival(zone_name) # Use the arrival helper method
-            elif inner_message_type == 'stop_agent':
-                logger.info(f"Agent {self.agent_id} received stop signal."); self.stop()
-                
-            # Handle other specific manager/system message types if needed
-            # elif inner_message_type == 'some_other_manager_type':
-            #     # Handle it
-            #     pass
-                
-            else:
-                # If it wasn't from another agent and wasn't a known manager type,
-                # treat it as a potential subclass message or log as unhandled.
-                # This replaces the previous _handle_subclass_message placeholder call.
-                logger.warning(f"Agent {self.agent_id} received unhandled message type '{inner_message_type}' from sender '{sender_id}'. Content: {content}")
-                # Optionally, add specific handling for types expected by subclasses here,
-                # or rely on _handle_agent_specific_message for all inter-agent comms.
-
+                await self._handle_agent_specific_message(sender_id, unwrap_agent_message(content))
+                return
+            handler = self._system_message_handlers.get(inner_message_type)
+            if handler: await handler(content)
+            else: logger.warning(f"Agent {self.agent_id} received unhandled message type '{inner_message_type}' from sender '{sender_id}'.")
         except Exception as e:
-            # Catch errors during message handling itself
             logger.error(f"Agent {self.agent_id} error directly within _handle_message (Type: {inner_message_type}): {e}", exc_info=True)
-            # Fail the current task if an error occurs during handling
             await self._fail_current_task(f"Error handling message type {inner_message_type}: {e}")
 
+    async def _on_new_task_message(self, content: Dict[str, Any]):
+        await self.assign_task(content.get('task_data', {}))
 
+    async def _on_tool_result_message(self, content: Dict[str, Any]):
+        tool_name = content.get('tool_name') # The whole content is passed on as the result dict
+        self.update_state({'status': STATUS_WORKING, 'current_action': f'processing_{tool_name}_result'})
+        await self._process_tool_result(tool_name, content)
+
+    async def _on_tool_batch_result_message(self, content: Dict[str, Any]):
+        results = content.get('results') or []
+        self.update_state({'status': STATUS_WORKING, 'current_action': 'processing_tool_batch_result'})
+        await self._process_tool_batch_result(results)
+
+    async def _process_tool_batch_result(self, results: List[Dict[str, Any]]):
+        """Default: each result goes through _process_tool_result in queue order. Override to handle the batch at once."""
+        for result in results: await self._process_tool_result(result.get('tool_name'), result)
+
+    async def _on_arrived_at_zone_message(self, content: Dict[str, Any]):
+        zone_name = content.get('zone_name')
+        logger.info(f"Agent {self.agent_id} officially arrived at zone: {zone_name}")
+        # Update state *before* calling arrival handler
+        self.update_state({ 'current_zone': zone_name, 'status': STATUS_WORKING, 'target_zone': None, 'current_action': 'arrived' })
+        if self._pending_tool_ops.get(zone_name): await self.flush_tool_ops(zone_name)
+        await self._handle_arrival(zone_name)
+
+    async def _on_stop_agent_message(self, content: Dict[str, Any]):
+        logger.info(f"Agent {self.agent_id} received stop signal."); self.stop()
 
     # --- Added _handle_arrival ---
     async def _handle_arrival(self, zone: str):
@@ -415,44 +650,60 @@ class Agent(abc.ABC):
          """Placeholder for subclasses to potentially handle more manager message types."""
          logger.warning(f"Agent {self.agent_id} received unhandled message type: {message_type} from {sender_id}")
 
+    async def step(self, delta_time: float = DECISION_INTERVAL_S) -> float:
+        """
+        One turn of the agent: handles at most one queued message, then decides and executes the next action.
+        Returns the delay before the next turn is due (used by ActorRuntime; run() ignores it).
+        """
+        # Process Incoming Messages
+        message_processed_this_cycle = False
+        try:
+            message = self.message_queue.get_nowait() # Use get_nowait for non-blocking check
+            if message:
+                await self._handle_message(message); self.message_queue.task_done()
+                message_processed_this_cycle = True
+        except asyncio.QueueEmpty: pass # No message is normal
+        except asyncio.CancelledError: raise
+        except Exception as e: logger.error(f"Agent {self.agent_id} error handling message: {e}", exc_info=True); await self._fail_current_task(f"Error handling message: {e}")
+
+        # Core Decision Logic - Only if not currently moving or actively using a tool waiting for result
+        current_status = self.get_state('status')
+        # Decide if agent is in a state where it should make a decision
+        # It should decide if IDLE, or WORKING *unless* it just executed something and is waiting
+        # Avoid deciding immediately after sending a tool request or LLM call
+        is_waiting_for_response = self.get_state('current_action') in ['executing_llm', f'ready_to_use_{self.get_state("last_tool_used")}'] # Example check
+        decided_wait = False
+
+        if current_status in [STATUS_IDLE, STATUS_WORKING] and not is_waiting_for_response:
+             try:
+                # logger.debug(f"{self.agent_id} calling _decide_next_action... (Status: {current_status}, Action: {self.get_state('current_action')})")
+                await self._prefetch_task_artifacts() # Prompts are built synchronously from the context's handles
+                action_decision = await self._decide_next_action()
+                decided_wait = not action_decision or action_decision.get('action') == 'wait'
+                # Execute action immediately if decided
+                await self.execute_action(action_decision) # Renamed from _execute_action for clarity
+             except Exception as e: logger.error(f"Agent {self.agent_id} error in decision/action execution: {e}", exc_info=True); await self._fail_current_task(f"Error in decision logic: {e}")
+        # --- Idle Action Trigger ---
+        elif current_status == STATUS_IDLE and not self.get_state('current_idle_sub_state'): # removed state_timer check
+             if random.random() < IDLE_ACTION_RATE_PER_S * min(delta_time, IDLE_TURN_INTERVAL_S): await self._perform_idle_action()
+
+        # --- Next turn ---
+        self._wait_turns = self._wait_turns + 1 if decided_wait and not message_processed_this_cycle else 0
+        if not self.message_queue.empty(): return 0.0
+        if current_status == STATUS_IDLE and not self.current_task: return IDLE_TURN_INTERVAL_S
+        if current_status not in [STATUS_IDLE, STATUS_WORKING] or is_waiting_for_response: return MAX_WAIT_BACKOFF_S # Arrivals/results come as messages
+        return min(DECISION_INTERVAL_S * (2 ** min(self._wait_turns, 4)), MAX_WAIT_BACKOFF_S)
+
     async def run(self):
-        """The main execution loop for the agent."""
+        """The main execution loop for the agent (used when no ActorRuntime schedules it)."""
         logger.info(f"{self.agent_id} ({self.role}) starting run loop.")
         last_state_time = self.loop.time()
 
         while self._is_running:
             current_time = self.loop.time(); delta_time = current_time - last_state_time; last_state_time = current_time
-
-            # Process Incoming Messages
-            message_processed_this_cycle = False
-            try:
-                message = self.message_queue.get_nowait() # Use get_nowait for non-blocking check
-                if message:
-                    await self._handle_message(message); self.message_queue.task_done()
-                    message_processed_this_cycle = True
-            except asyncio.QueueEmpty: pass # No message is normal
+            try: await self.step(delta_time)
             except asyncio.CancelledError: logger.info(f"{self.agent_id} run loop task cancelled."); break
-            except Exception as e: logger.error(f"Agent {self.agent_id} error handling message: {e}", exc_info=True); await self._fail_current_task(f"Error handling message: {e}")
-
-            # Core Decision Logic - Only if not currently moving or actively using a tool waiting for result
-            current_status = self.get_state('status')
-            # Decide if agent is in a state where it should make a decision
-            # It should decide if IDLE, or WORKING *unless* it just executed something and is waiting
-            # Avoid deciding immediately after sending a tool request or LLM call
-            is_waiting_for_response = self.get_state('current_action') in ['executing_llm', f'ready_to_use_{self.get_state("last_tool_used")}'] # Example check
-
-            if current_status in [STATUS_IDLE, STATUS_WORKING] and not is_waiting_for_response:
-                 try:
-                    # logger.debug(f"{self.agent_id} calling _decide_next_action... (Status: {current_status}, Action: {self.get_state('current_action')})")
-                    action_decision = await self._decide_next_action()
-                    # Execute action immediately if decided
-                    await self.execute_action(action_decision) # Renamed from _execute_action for clarity
-                 except Exception as e: logger.error(f"Agent {self.agent_id} error in decision/action execution: {e}", exc_info=True); await self._fail_current_task(f"Error in decision logic: {e}")
-            # --- Idle Action Trigger ---
-            elif current_status == STATUS_IDLE and not self.get_state('current_idle_sub_state'): # removed state_timer check
-                 if random.random() < 0.01: await self._perform_idle_action()
-
-            await asyncio.sleep(0.1) # Main loop sleep
+            await asyncio.sleep(DECISION_INTERVAL_S) # Main loop sleep
         logger.info(f"{self.agent_id} ({self.role}) run loop stopped.")
 
     async def execute_action(self, action: Optional[Dict[str, Any]]): # Renamed from _execute_action
@@ -472,6 +723,12 @@ class Agent(abc.ABC):
                      self.update_state({'current_action': 'processing_llm_response'})
                      await self._process_llm_response(llm_response)
                 # Error state updated within _execute_llm_task if it fails
+            elif action_type == 'use_llm_sections':
+                responses = await self._execute_llm_sections(action.get('prompts') or {})
+                if any(response is not None for response in responses.values()):
+                     self.update_state({'current_action': 'processing_llm_response'})
+                     await self._process_llm_sections(responses)
+                else: self.update_state({'current_action': 'processed_llm_response'})
             elif action_type == 'use_tool':
                 tool_name = action.get('tool_name'); params = action.get('params', {})
                 self.update_state({'last_tool_used': tool_name}) # Store last tool for wait check
@@ -544,8 +801,24 @@ class Agent(abc.ABC):
             await self.execute_action({'action': 'move_to_zone', 'zone_name': 'WATER_COOLER_ZONE'})
         # No explicit timer state needed if idle state implies temporary pause
 
+    def can_reclaim(self) -> bool:
+        """True when the agent holds no work or per-task state and can be dropped (and rebuilt on its next message)."""
+        return (self.get_state('status') == STATUS_IDLE and not self.current_task and not self.task_context and self.message_queue.empty()
+                and not any(self._pending_tool_ops.values()) and not self._background_llm)
+
+    def reset_for_run(self):
+        """Drops all per-run state and puts the agent back at its start position (warm reuse; call while stopped)."""
+        self.current_task = None; self.task_context = {}; self._pending_tool_ops = {}
+        self._background_llm = {}; self._wait_turns = 0
+        self.update_state({'status': STATUS_IDLE, 'position': self.initial_position, 'target_position': self.target_desk_position, 'current_zone': None, 'target_zone': None,
+                           'current_action': None, 'current_idle_sub_state': None, 'last_error': None, 'progress': 0.0}, trigger_callback=False)
+        self._unsynced_state = {} # The caller emits the full state
+
     # --- Lifecycle ---
     def start(self):
+        if self.runtime is not None:
+            self._is_running = True; self.runtime.start_actor(self.agent_id)
+            logger.info(f"Agent {self.agent_id} scheduled on the actor runtime."); return
         if not self._main_task_handle or self._main_task_handle.done():
             self._is_running = True
             async def run_wrapper(): await self.run()
@@ -555,20 +828,22 @@ class Agent(abc.ABC):
 
     def stop(self):
         self._is_running = False
+        if self.runtime is not None: self.runtime.stop_actor(self.agent_id)
+        for background in list(self._background_llm.values()) + list(self._spawned_tasks): # In-flight LLM requests are aborted with their task
+            try: self.loop.call_soon_threadsafe(background.cancel)
+            except RuntimeError: pass # Loop already closed
         if self._main_task_handle and not self._main_task_handle.done():
              try: self.loop.call_soon_threadsafe(self._main_task_handle.cancel)
              except Exception as e: logger.error(f"Error trying to cancel task future for agent {self.agent_id}: {e}")
 
-    async def join(self):
-        """Waits for the agent's main task (Future) to complete."""
-        if self._main_task_handle and isinstance(self._main_task_handle, concurrent.futures.Future):
-             future = self._main_task_handle; logger.debug(f"Agent {self.agent_id} attempting join via Future.result()...")
-             try:
-                  # Use run_in_executor for compatibility if loop is different thread
-                  await asyncio.wait_for(self.loop.run_in_executor(None, future.result), timeout=7.0)
-                  logger.info(f"Agent {self.agent_id} main task joined successfully.")
-             except asyncio.CancelledError: logger.info(f"Agent {self.agent_id}'s main task was cancelled.")
-             except asyncio.TimeoutError: logger.warning(f"Agent {self.agent_id} main task join timed out after 7s.")
-             except concurrent.futures.TimeoutError: logger.warning(f"Agent {self.agent_id} main task join timed out (concurrent).") # If future.result times out internally
-             except Exception as e: logger.error(f"Agent {self.agent_id} join encountered exception: {e}", exc_info=False)
-        else: logger.debug(f"Agent {self.agent_id} join called but no valid task handle.")
\ No newline at end of file
+    async def join(self, timeout: float = AGENT_JOIN_TIMEOUT_S):
+        """Waits (bounded) for the agent's main task or runtime turn and its cancelled side tasks to unwind. Call from the agent's loop after stop()."""
+        pending = [task for task in list(self._background_llm.values()) + list(self._spawned_tasks) if not task.done()]
+        if self.runtime is not None: await self.runtime.join_actor(self.agent_id, timeout=timeout)
+        elif self._main_task_handle and isinstance(self._main_task_handle, concurrent.futures.Future):
+             if not self._main_task_handle.done(): pending.append(asyncio.wrap_future(self._main_task_handle, loop=self.loop)) # Awaited on the loop, no executor thread
+        else: logger.debug(f"Agent {self.agent_id} join called but no valid task handle.")
+        if not pending: return
+        _, still_running = await asyncio.wait(pending, timeout=timeout)
+        if still_running: logger.warning(f"Agent {self.agent_id}: {len(still_running)} task(s) still running {timeout}s after stop.")
+        else: logger.debug(f"Agent {self.agent_id} joined.")
@@ -9,6 +9,7 @@ from typing import Dict, Any, Optional, List, Callable, Awaitable, Tuple, Set
 # Assuming Agent, Task are correctly imported from project structure
 from ..agent_base import Agent #[cite: uploaded:SoftwareSim3d/src/agent_base.py]
 from ..simulation.task import Task #[cite: uploaded:SoftwareSim3d/src/simulation/task.py]
+from ..simulation.message_bus import Message, unwrap_agent_message
 
 # Assuming WorkflowManager is accessible for agent lookup
 # from ..simulation.workflow_manager import WorkflowManager # Import if type hinting needed
@@ -68,10 +69,22 @@ class CEOAgent(Agent): # Inherit from Agent
         self.project_name: Optional[str] = None
         self.original_request: Optional[str] = None
         # task_context is initialized in the base class
+        self._agent_message_handlers = {'user_request': self._handle_user_request_from_messenger, 'qa_approved': self._handle_qa_approval}
+        # Optional lookup of a past run with a near-identical request (set by the WorkflowManager)
+        self.reuse_lookup: Optional[Callable[[str], Optional[Dict[str, Any]]]] = kwargs.get('reuse_lookup')
 
         logger.info(f"CEOAgent {self.agent_id} initialized. Managers: {list(self.manager_ids.keys())}, Messenger: {self.messenger_id}")
 
 
+    def reset_for_run(self):
+        super().reset_for_run(); self.project_name = None; self.original_request = None
+
+    def checkpoint_state(self) -> Dict[str, Any]:
+        return {**super().checkpoint_state(), 'project_name': self.project_name, 'original_request': self.original_request}
+
+    def restore_checkpoint(self, snapshot: Dict[str, Any]):
+        super().restore_checkpoint(snapshot); self.project_name = snapshot.get('project_name'); self.original_request = snapshot.get('original_request')
+
     # --- Context Management ---
     def _cleanup_task_context(self):
         """Removes the context for the current task ID if it exists."""
@@ -81,34 +94,28 @@ class CEOAgent(Agent): # Inherit from Agent
             logger.debug(f"{self.agent_id}: Cleaned up context for task {task_id}.")
 
     # --- Message Handling ---
-    async def _handle_message(self, message: Dict[str, Any]):
+    async def _handle_message(self, message: Message):
         """Processes an incoming message from the agent's queue."""
         sender_id = message.get('sender_id', 'Unknown')
         content = message.get('content', {})
         message_type = content.get('type', 'unknown')
         logger.debug(f"CEO {self.agent_id} received message type '{message_type}' from {sender_id}")
 
-        if message_type == 'new_task':
-            await self.assign_task(content.get('task_data', {})) #[cite: uploaded:SoftwareSim3d/src/agent_base.py]
-        elif message_type == 'agent_message':
-            await self._handle_agent_specific_message(sender_id, content.get('message_data'))
+        if message_type == 'agent_message':
+            await self._handle_agent_specific_message(sender_id, unwrap_agent_message(content))
         else:
-            # Let base class handle tool_result, arrived_at_zone, stop_agent, etc.
+            # Let base class handle new_task, tool_result, arrived_at_zone, stop_agent, etc.
             await super()._handle_message(message) #[cite: uploaded:SoftwareSim3d/src/agent_base.py]
 
     async def _handle_agent_specific_message(self, sender_id: Optional[str], message_data: Dict[str, Any]):
         """Processes messages received directly from other agents (e.g., via Messenger)."""
         data_type = message_data.get('type')
         logger.info(f"CEO {self.agent_id}: Received agent message from {sender_id or 'Unknown'} of type {data_type}.")
+        handler = self._agent_message_handlers.get(data_type)
+        if handler: await handler(sender_id, message_data)
+        else: logger.warning(f"CEO {self.agent_id}: Received unhandled agent message type: {data_type} from {sender_id}")
 
-        if data_type == 'user_request':
-            await self._handle_user_request_from_messenger(message_data)
-        elif data_type == 'qa_approved':
-            await self._handle_qa_approval(sender_id, message_data)
-        else:
-            logger.warning(f"CEO {self.agent_id}: Received unhandled agent message type: {data_type} from {sender_id}")
-
-    async def _handle_user_request_from_messenger(self, message_data: Dict[str, Any]):
+    async def _handle_user_request_from_messenger(self, sender_id: Optional[str], message_data: Dict[str, Any]):
         """Processes an incoming user request relayed by the messenger."""
         self.project_name = message_data.get('project_name', f'Project_{self._generate_id(4)}')
         self.original_request = message_data.get('request')
@@ -183,6 +190,13 @@ class CEOAgent(Agent): # Inherit from Agent
 
         if task_type == 'decompose_request':
             if step == 'start':
+                reuse = self.reuse_lookup(task.get('details', {}).get('original_request')) if self.reuse_lookup else None
+                if reuse and reuse.get('decomposition'):
+                    logger.info(f"CEO {self.agent_id}: Reusing decomposition of run {reuse['run_id']} (confidence {reuse['confidence']}, mode '{reuse['mode']}') for task {task_id}.")
+                    context['decomposed_tasks'] = reuse['decomposition']; context['reuse'] = reuse; context['step'] = 'delegate_tasks'
+                    self.update_state({'current_action': 'reusing_past_run', 'current_thoughts': f"Similar request seen before ({reuse['confidence']:.0%} match)."})
+                    await self._execute_delegate_tasks(task, context)
+                    return {'action': 'wait'}
                 prompt = self._get_decomposition_prompt_internal(task.get('details',{}).get('original_request'))
                 return {'action': 'use_llm', 'prompt': prompt} #[cite: uploaded:SoftwareSim3d/src/agent_base.py]
             elif step == 'delegate_tasks':
@@ -384,6 +398,13 @@ class CEOAgent(Agent): # Inherit from Agent
         delegation_list = []
         delegation_failed = False
 
+        # Reused upstream artifacts: skipped roles' outputs are delivered right after the consumer's task
+        reuse = context.get('reuse') or {}
+        cached_specs = reuse.get('specifications') or {}
+        reuse_specs = reuse.get('mode') == 'skip' and bool(cached_specs) and any(t.get('role') == 'Coder' for t in decomposed_tasks)
+        reuse_strategy = bool(reuse.get('marketing_strategy')) or reuse_specs
+        strategy_forwarded = specs_forwarded = False
+
         task_type_map = {
             "Marketer": "develop_strategy",
             "ProductManager": "define_specifications", # Assuming this is the key used in manager_ids
@@ -414,6 +435,10 @@ class CEOAgent(Agent): # Inherit from Agent
                 delegation_failed = True
                 break # Stop delegation if an agent ID is missing
 
+            if (normalized_role == "Marketer" and reuse_strategy) or (normalized_role == "Product Manager" and reuse_specs):
+                logger.info(f"CEO {self.agent_id}: Skipping {role} sub-task (output reused from run {reuse.get('run_id')}): '{sub_task_desc[:40]}'")
+                continue
+
             # --- MODIFIED: Add original_request to sub_task_data details ---
             sub_task_data = {
                 'description': sub_task_desc,
@@ -426,7 +451,17 @@ class CEOAgent(Agent): # Inherit from Agent
                 'assigned_to_role': role # Use the role name from the LLM response for the task assignment itself
             }
             # --- END MODIFICATION ---
-            delegation_list.append({'target_agent_id': target_agent_id, 'task_data': sub_task_data})
+            follow_up_messages = []
+            if normalized_role == "Product Manager" and reuse_strategy and not strategy_forwarded:
+                follow_up_messages.append({'type': 'task_dependency_ready', 'dependency_type': 'marketing_strategy', 'saved_filename': reuse['marketing_strategy'],
+                                           'details': {'project_name': project_name}})
+                strategy_forwarded = True
+            elif normalized_role == "Coder" and reuse_specs and not specs_forwarded:
+                follow_up_messages.extend({'type': 'task_dependency_ready', 'dependency_type': 'specifications', 'saved_filename': filename,
+                                           'details': {'originating_task_id': task_id, 'original_request': original_request, 'page_name': page_name}}
+                                          for page_name, filename in cached_specs.items())
+                specs_forwarded = True # One Coder task gets the pages
+            delegation_list.append({'target_agent_id': target_agent_id, 'task_data': sub_task_data, 'follow_up_messages': follow_up_messages})
 
         if delegation_failed:
             context['step'] = 'error'
@@ -436,7 +471,7 @@ class CEOAgent(Agent): # Inherit from Agent
             return
 
         if delegation_list:
-            delegation_message = {'type': 'delegate_sub_tasks', 'tasks_to_delegate': delegation_list}
+            delegation_message = {'type': 'delegate_sub_tasks', 'tasks_to_delegate': delegation_list, 'decomposition': decomposed_tasks, 'reused_from': reuse.get('run_id')}
             try:
                 await self._send_message_to_manager(delegation_message) #[cite: Sims/src/src/agent_base.py]
                 logger.info(f"CEO {self.agent_id}: Sent delegation request to WorkflowManager.")
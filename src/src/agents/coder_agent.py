@@ -13,7 +13,9 @@ import uuid
 
 # --- Assume Base Agent and Task imports are correct ---
 from ..agent_base import Agent, STATUS_IDLE, STATUS_WORKING, STATUS_MOVING_TO_ZONE, STATUS_FAILED
-from ..simulation.task import Task
+from ..simulation.task import Task, STATUS_IN_PROGRESS
+from ..simulation.artifact_store import describe_artifact
+from ..simulation.code_patch import FIX_MODE_PATCH, FIX_MODE_FULL, PatchError, apply_patch
 
 logger = logging.getLogger(__name__)
 
@@ -26,6 +28,29 @@ SAVE_ZONE_NAME = "SAVE_ZONE"
 
 # Required components for a page
 REQUIRED_COMPONENTS = ['html_structure', 'css_styles', 'js_logic']
+# Specialist message type -> (component key, code key, is_update)
+COMPONENT_MESSAGE_TYPES = {
+    'html_component_ready': ('html_structure', 'html_code', False),
+    'css_styles_ready': ('css_styles', 'css_code', False),
+    'js_logic_ready': ('js_logic', 'js_code', False),
+    'updated_html_component_ready': ('html_structure', 'fixed_code', True),
+    'updated_css_styles_ready': ('css_styles', 'fixed_code', True),
+    'updated_js_logic_ready': ('js_logic', 'fixed_code', True)
+}
+# Component key -> (specialist agent id attribute, fix message type, artifact kind)
+COMPONENT_FIX_MESSAGE_TYPES = {
+    'html_structure': ('html_agent_id', 'fix_html_component', 'html'),
+    'css_styles': ('css_agent_id', 'fix_css_styles', 'css'),
+    'js_logic': ('js_agent_id', 'fix_js_logic', 'js')
+}
+# Specialist fix failure message type -> component key
+FIX_FAILED_MESSAGE_TYPES = {'html_fix_failed': 'html_structure', 'css_fix_failed': 'css_styles', 'js_fix_failed': 'js_logic'}
+# QA findings mentioning these words are sent to that component's specialist (all three when none match)
+FIX_COMPONENT_KEYWORDS = {
+    'html_structure': re.compile(r'\b(html|markup|structure|elements?|tags?|headings?|sections?|forms?|buttons?|images?|alt|semantic\w*|accessib\w*|aria)\b', re.IGNORECASE),
+    'css_styles': re.compile(r'\b(css|styles?|styling|layout|colou?rs?|fonts?|spacing|margins?|padding|responsive|mobile|alignment)\b', re.IGNORECASE),
+    'js_logic': re.compile(r'\b(javascript|js|scripts?|behaviou?r|events?|clicks?|handlers?|functions?|console|interactiv\w*|validation)\b', re.IGNORECASE),
+}
 
 class CoderAgent(Agent):
     def __init__(self,
@@ -43,7 +68,7 @@ class CoderAgent(Agent):
             target_desk_position=target_desk_position, llm_service=kwargs.get('llm_service'),
             llm_type=kwargs.get('llm_type'), llm_model_name=kwargs.get('llm_model_name'),
             available_tools=kwargs.get('available_tools'), required_tool_zones=kwargs.get('required_tool_zones'),
-            zone_coordinates_map=kwargs.get('zone_coordinates_map')
+            zone_coordinates_map=kwargs.get('zone_coordinates_map'), artifact_store=kwargs.get('artifact_store'), context_archive=kwargs.get('context_archive')
         )
 
         self.ceo_agent_id = kwargs.get('ceo_agent_id', "ceo-01")
@@ -56,6 +81,12 @@ class CoderAgent(Agent):
         if CODER_DESK_ZONE_NAME not in self.zone_coordinates: self.zone_coordinates[CODER_DESK_ZONE_NAME] = target_desk_position; logger.warning(f"Added {CODER_DESK_ZONE_NAME} position.")
         if SAVE_ZONE_NAME not in self.zone_coordinates: save_zone = (35, 0.1, -25); logger.warning(f"Using default {SAVE_ZONE_NAME} position: {save_zone}"); self.zone_coordinates[SAVE_ZONE_NAME] = save_zone
 
+        # Dispatch table for agent messages (keyed by inner message 'type')
+        self._agent_message_handlers = {'task_dependency_ready': self._on_dependency_ready, 'qa_feedback': self._on_qa_feedback}
+        for component_msg_type in COMPONENT_MESSAGE_TYPES: self._agent_message_handlers[component_msg_type] = self._on_component_message
+        for failed_msg_type in FIX_FAILED_MESSAGE_TYPES: self._agent_message_handlers[failed_msg_type] = self._on_component_fix_failed
+        self._task_ids_by_origin: Dict[str, str] = {} # Originating CEO task id -> Coder task id (entries checked against task_context)
+
         logger.info(f"CoderAgent {self.agent_id} (Coordinator) initialized. Team: {self.html_agent_id}, {self.css_agent_id}, {self.js_agent_id}.")
 
     # --- Helper Methods (Sanitize, Get Zone Position, Send, etc.) ---
@@ -102,6 +133,40 @@ class CoderAgent(Agent):
         await self._send_message_to_agent(target_agent_id, message_payload) # Use the inherited sender
         logger.info(f"{self.agent_id}: Sent dependency message '{message_type}' to {specialist_role} ({target_agent_id}).")
 
+    async def request_component_fix(self, task_id: str, page_name: str, component_key: str, qa_feedback: Any,
+                                    fix_mode: str = FIX_MODE_PATCH, current_code: Any = None):
+        """Sends a fix task for one page component to its specialist; patch mode asks for edit blocks instead of the whole component."""
+        context = self.task_context.get(task_id)
+        if not context or component_key not in COMPONENT_FIX_MESSAGE_TYPES:
+            logger.error(f"{self.agent_id}: Cannot request fix of '{component_key}' for task {task_id} (unknown component or missing context)."); return
+        agent_attr, message_type, _ = COMPONENT_FIX_MESSAGE_TYPES[component_key]
+        target_agent_id = getattr(self, agent_attr)
+        page_components_info = context.setdefault('page_components', {}).setdefault(page_name, {})
+        if current_code is None: current_code = page_components_info.get('received_components', {}).get(component_key, '')
+        fix_details = {'original_coder_task_id': task_id, 'original_request': context.get('original_request'),
+                       'specs': context.get('page_specs', {}).get(page_name, {}).get('content'), 'target_page_context': page_name}
+        fix_msg_data = {'component_name': f"{page_name}_{component_key}", 'details': fix_details, 'qa_feedback': qa_feedback,
+                        'current_code': current_code, 'fix_mode': fix_mode}
+        await self._send_message_to_agent(target_agent_id, {'type': message_type, 'message_data': fix_msg_data})
+        page_components_info.setdefault('delegated_components', {})[component_key] = {'status': 'fix_pending', 'agent_id': target_agent_id, 'fix_mode': fix_mode, 'qa_feedback': qa_feedback}
+        self.task_context[task_id] = context
+        logger.info(f"{self.agent_id}: Requested {fix_mode} fix of '{component_key}' for page '{page_name}' from {target_agent_id} (Task: {task_id}).")
+
+    async def _apply_component_patch(self, task_id: str, page_name: str, component_key: str, inner_message_data: Dict[str, Any]) -> Optional[Any]:
+        """Applies a specialist's edit blocks to the code they were based on. On failure requests a full regeneration and returns None."""
+        context = self.task_context[task_id]
+        page_components_info = context.setdefault('page_components', {}).setdefault(page_name, {})
+        base_ref = inner_message_data.get('base_code') or page_components_info.get('received_components', {}).get(component_key)
+        try:
+            patched_code, edit_count = apply_patch(await self.resolve_artifact_async(base_ref, ''), inner_message_data.get('patch', ''))
+        except PatchError as e:
+            fix_info = page_components_info.get('delegated_components', {}).get(component_key, {})
+            logger.warning(f"{self.agent_id}: Patch for '{component_key}' on page '{page_name}' did not apply ({e}); requesting full regeneration.")
+            await self.request_component_fix(task_id, page_name, component_key, fix_info.get('qa_feedback') or context.get('qa_feedback_details'), FIX_MODE_FULL, base_ref)
+            return None
+        logger.info(f"{self.agent_id}: Applied {edit_count} edit(s) to '{component_key}' for page '{page_name}'.")
+        return self.store_artifact(patched_code, kind=COMPONENT_FIX_MESSAGE_TYPES[component_key][2])
+
     async def _send_message_to_agent(self, target_agent_id: str, message_data: Any):
         """Helper to send message via broadcast callback, ensuring proper structure."""
         # Pass the actual message data directly to the base class sender
@@ -122,6 +187,14 @@ class CoderAgent(Agent):
         else:
             self.update_state({'status': STATUS_FAILED, 'last_error': error_msg})
 
+    def reset_for_run(self):
+        super().reset_for_run(); self._task_ids_by_origin = {}
+
+    def restore_checkpoint(self, snapshot: Dict[str, Any]):
+        super().restore_checkpoint(snapshot)
+        self._task_ids_by_origin = {ctx['details']['originating_task_id']: tid for tid, ctx in self.task_context.items()
+                                    if isinstance(ctx, dict) and isinstance(ctx.get('details'), dict) and ctx['details'].get('originating_task_id')}
+
     # --- Overridden Abstract Methods ---
 
     def get_prompt(self, task_details: Dict[str, Any], context: Dict[str, Any]) -> Optional[str]:
@@ -134,6 +207,80 @@ class CoderAgent(Agent):
         logger.warning(f"{self.agent_id}: _process_llm_response called unexpectedly.")
         self.update_state({'current_action': 'processed_llm_response_ignored'})
 
+    async def _decide_next_action(self) -> Optional[Dict[str, Any]]:
+        """
+        Builds the site page by page: reads a page's specs at the save zone, delegates its components, assembles them at the
+        desk and saves the page's files in one visit. Once every expected page is saved QA is notified and the task completes.
+        QA fix rounds are driven by messages (see _on_qa_feedback); here they only need a timeout.
+        """
+        if not self.current_task: return {'action': 'wait'}
+        task_id = self.current_task.get('task_id'); context = self.task_context.get(task_id)
+        if context is None: return {'action': 'fail_task', 'error': f"Context missing for task {task_id}."}
+        step = context.get('step', 'start')
+        if step == 'error': return {'action': 'fail_task', 'error': context.get('error_details', 'Unknown error.')}
+        if step in ('qa_notified', 'fixes_submitted'):
+            return {'action': 'complete_task', 'result': f"Code for {len(context.get('ordered_page_names', []))} page(s) saved and sent to QA."}
+        if step == 'waiting_for_fixes':
+            if self.wait_expired(context.get('fix_requested_at', time.time()), DEFAULT_DEPENDENCY_TIMEOUT): await self._handle_fix_timeout(task_id)
+            return {'action': 'wait', 'reason': 'waiting_for_fixes'}
+
+        ordered_page_names = context.setdefault('ordered_page_names', [])
+        if not ordered_page_names:
+            if self.wait_expired(context.setdefault('wait_start_time_for_any_specs', time.time()), DEFAULT_DEPENDENCY_TIMEOUT):
+                return {'action': 'fail_task', 'error': 'Timeout waiting for page specifications.'}
+            return {'action': 'wait', 'reason': 'waiting_for_specs'}
+        page_name = context.get('fix_page') if step == 'saving_fixes' else ordered_page_names[context.get('current_page_index', 0)]
+        page_specs_info = context.setdefault('page_specs', {}).setdefault(page_name, {})
+        page_components_info = context.setdefault('page_components', {}).setdefault(page_name, {})
+        if page_components_info.get('save_errors'):
+            return {'action': 'fail_task', 'error': f"Could not save page '{page_name}': {page_components_info['save_errors']}"}
+        if step == 'saving_fixes': return {'action': 'wait', 'reason': f'saving_fixes_{page_name}'}
+
+        if not page_specs_info.get('read'):
+            if not page_specs_info.get('reading'): # One trip to the save zone per page's specs
+                page_specs_info['reading'] = True; context['step'] = f'reading_specs_{page_name}'; self.task_context[task_id] = context
+                self.queue_tool_op('file_read', {'filename': page_specs_info.get('filename')})
+                await self.flush_tool_ops(self.required_tool_zones.get('file_read', SAVE_ZONE_NAME))
+            return {'action': 'wait', 'reason': f'reading_specs_{page_name}'}
+        if not page_components_info.get('delegated'):
+            await self._coordinate_code_development(page_name)
+            return {'action': 'wait', 'reason': f'coordinating_specialists_{page_name}'}
+        if not page_components_info.get('assembled'):
+            if not all(key in page_components_info.get('received_components', {}) for key in REQUIRED_COMPONENTS):
+                if self.wait_expired(page_components_info.get('delegation_time', time.time()), DEFAULT_DEPENDENCY_TIMEOUT): await self._handle_component_timeout(task_id, page_name)
+                return {'action': 'wait', 'reason': f'waiting_for_specialists_{page_name}'}
+            if self.get_state('current_zone') != CODER_DESK_ZONE_NAME: return {'action': 'move_to_zone', 'zone_name': CODER_DESK_ZONE_NAME}
+            await self._assemble_final_code(page_name) # Saves the page's files in one trip to the save zone
+            return {'action': 'wait', 'reason': f'saving_{page_name}'}
+        if not page_components_info.get('files_saved'): return {'action': 'wait', 'reason': f'saving_{page_name}'}
+
+        if self._advance_to_next_page(context): self.task_context[task_id] = context; return {'action': 'wait', 'reason': 'next_page'}
+        if len(ordered_page_names) < self._expected_page_count() and not self.wait_expired(context.setdefault('wait_start_time_for_more_specs', time.time()), DEFAULT_DEPENDENCY_TIMEOUT):
+            return {'action': 'wait', 'reason': 'waiting_for_more_specs'}
+        if self.get_state('current_zone') != CODER_DESK_ZONE_NAME: return {'action': 'move_to_zone', 'zone_name': CODER_DESK_ZONE_NAME}
+        first_page_info = context['page_components'].get(ordered_page_names[0], {})
+        await self._notify_qa(task_id, ordered_page_names[0], first_page_info.get('html_filename_rel'))
+        context['step'] = 'qa_notified'; self.task_context[task_id] = context
+        return {'action': 'wait', 'reason': 'qa_notified'}
+
+    def _expected_page_count(self) -> int:
+        """Pages the site will have: one per specifications prerequisite of the task (reused specs arrive with the task)."""
+        dependencies = (self.current_task or {}).get('dependencies') or {}
+        return max(1, sum(1 for dep_name in dependencies if dep_name.split(':')[0] == 'specifications'))
+
+    def _advance_to_next_page(self, context: Dict[str, Any]) -> bool:
+        """Moves specs that arrived while a page was being built into the page order and steps to the next page, if any."""
+        ordered_page_names = context['ordered_page_names']
+        for page_info in context.get('pending_pages', []):
+            if page_info.get('page_name') in ordered_page_names: continue
+            ordered_page_names.append(page_info.get('page_name'))
+            context['page_specs'][page_info.get('page_name')] = {'filename': page_info.get('filename'), 'received': True, 'read': False}
+        context['pending_pages'] = []
+        if context.get('current_page_index', 0) + 1 >= len(ordered_page_names): return False
+        context['current_page_index'] = context.get('current_page_index', 0) + 1; context.pop('wait_start_time_for_more_specs', None)
+        logger.info(f"{self.agent_id}: Moving on to page '{ordered_page_names[context['current_page_index']]}' (index {context['current_page_index']}).")
+        return True
+
     # --- Core Logic Rewrites ---
 
     async def assign_task(self, task: Dict[str, Any]):
@@ -153,7 +300,8 @@ class CoderAgent(Agent):
                 old_task_id = self.current_task.get('task_id')
                 if old_task_id and old_task_id != task_id and old_task_id in self.task_context:
                     logger.info(f"Cleaning up context for overwritten task {old_task_id}")
-                    del self.task_context[old_task_id]
+                    old_origin = self.task_context.pop(old_task_id).get('details', {}).get('originating_task_id')
+                    if old_origin and self._task_ids_by_origin.get(old_origin) == old_task_id: del self._task_ids_by_origin[old_origin]
 
         self.current_task = task
         logger.info(f"Agent {self.agent_id} assigned Task: {task_id} - {task.get('description','No Description')}")
@@ -162,7 +310,7 @@ class CoderAgent(Agent):
         context = self.task_context.setdefault(task_id, {})
         context['step'] = 'start'
         context['page_specs'] = {}           # Stores {'page_name': {'filename': str, 'received': bool, 'read': bool, 'content': str}}
-        context['page_components'] = {}      # Stores {'page_name': {'delegated': bool, 'delegation_time': float, 'received_components': {comp_key: code}, 'assembled': bool, 'saved': bool, 'files_to_save_map': {rel_path: content}, 'saved_files_map': {rel_path: bool}}}
+        context['page_components'] = {}      # Stores {'page_name': {'delegated': bool, 'delegation_time': float, 'received_components': {comp_key: code handle}, 'assembled': bool, 'saved': bool, 'files_to_save_map': {rel_path: content handle}, 'saved_files_map': {rel_path: bool}}}
         context['ordered_page_names'] = []   # Stores page names in the order they should be built
         context['current_page_index'] = 0    # Index for ordered_page_names
         context['pending_pages'] = []        # Queue for specs arriving out of order
@@ -173,8 +321,10 @@ class CoderAgent(Agent):
         # Store details from the task assignment itself
         task_details = task.get('details', {})
         context['details'] = task_details
+        context['description'] = task.get('description') # For reopening the task on QA feedback
         context['original_request'] = task_details.get('original_request') # Ensure this is captured early
         context['project_name'] = task_details.get('project_name', f"Proj_{task_id[:4]}") # Generate project name if missing
+        if task_details.get('originating_task_id'): self._task_ids_by_origin[task_details['originating_task_id']] = task_id
         if not context['project_name']: context['project_name'] = f"Proj_{task_id[:4]}" # Ensure not empty
 
         logger.info(f"Task {task_id} context for Agent {self.agent_id} INITIALIZED. Keys: {list(context.keys())}")
@@ -189,201 +339,248 @@ class CoderAgent(Agent):
 
     async def _handle_agent_specific_message(self, sender_id: str, message_data: Any):
         """Handles specs ready, QA feedback, or component ready/updated messages."""
-        logger.info(f"DEBUG CODER HANDLER: Received from {sender_id}. Message Data: {message_data}")
-
         if not isinstance(message_data, dict):
             logger.warning(f"{self.agent_id} received non-dict message from {sender_id}")
             return
-
-        # Look for the actual message data if it's wrapped (common pattern)
-        inner_message_data = message_data
-        if message_data.get('type') == 'agent_message' and 'message_data' in message_data:
-             inner_message_data = message_data.get('message_data', {})
-             if not isinstance(inner_message_data, dict): # Handle potential nesting issues
-                 logger.error(f"Could not extract inner message_data dict from {sender_id}. Data: {message_data}")
-                 return
-        msg_type = inner_message_data.get('type')
+        msg_type = message_data.get('type')
         logger.info(f"{self.agent_id}: Processing message type '{msg_type}' from {sender_id}.")
+        handler = self._agent_message_handlers.get(msg_type)
+        if handler: await handler(sender_id, msg_type, message_data)
+        else: logger.warning(f"{self.agent_id} received unhandled agent msg type '{msg_type}' from {sender_id}")
+
+    async def _on_dependency_ready(self, sender_id: str, msg_type: str, inner_message_data: Dict[str, Any]):
+        """Registers a page's specifications notification from the PM."""
+        if inner_message_data.get('dependency_type') != 'specifications':
+            logger.warning(f"{self.agent_id}: Ignoring dependency notification of type '{inner_message_data.get('dependency_type')}' from {sender_id}.")
+            return
+        saved_filename = inner_message_data.get('saved_filename')
+        pm_details = inner_message_data.get('details', {})
+        originating_ceo_task_id_from_pm = pm_details.get('originating_task_id')
+        page_name = pm_details.get('page_name', 'main_page') # Default if PM doesn't specify
+        original_request = pm_details.get('original_request')
+
+        logger.info(f"{self.agent_id}: Received specs notification from {sender_id} for page '{page_name}' (File: {saved_filename}, OrigCEO: {originating_ceo_task_id_from_pm})")
+
+        # Find the Coder's task context associated with this originating CEO task
+        target_coder_task_id = None
+        if originating_ceo_task_id_from_pm:
+            # Match based on the CEO's originating task ID stored in the Coder's task details
+            target_coder_task_id = self._task_ids_by_origin.get(originating_ceo_task_id_from_pm)
+            if target_coder_task_id not in self.task_context: target_coder_task_id = None # Stale entry (context reset)
+            else: logger.info(f"{self.agent_id}: Found matching Coder task '{target_coder_task_id}' for specs notification.")
+        else:
+            logger.warning(f"{self.agent_id}: Specs notification from PM did not contain originating CEO task ID.")
+            # Try to use the *current* task if it's active and waiting for specs
+            if self.current_task and self.task_context.get(self.current_task['task_id'], {}).get('step') == 'wait_for_first_spec':
+                target_coder_task_id = self.current_task.get('task_id')
+                logger.warning(f"{self.agent_id}: Using current task '{target_coder_task_id}' as target for specs notification.")
+
+        if not target_coder_task_id:
+            logger.warning(f"{self.agent_id}: Could not determine a target task context for specs notification. Ignoring.")
+            return
+
+        context = self.task_context.setdefault(target_coder_task_id, {})
+        context.setdefault('page_specs', {})
+        context.setdefault('ordered_page_names', [])
+        context.setdefault('pending_pages', [])
+
+        # Store the original request if it's not already set in the main context
+        if original_request and not context.get('original_request'):
+            context['original_request'] = original_request
+            logger.info(f"{self.agent_id}: Stored original request in context for task {target_coder_task_id}.")
+
+        # Check if this page's specs are already being processed or are queued
+        current_page_index = context.get('current_page_index', 0)
+        ordered_page_names = context.get('ordered_page_names', [])
+        is_current_page = current_page_index < len(ordered_page_names) and \
+                          ordered_page_names[current_page_index] == page_name
+        is_already_ordered = page_name in context['ordered_page_names']
+        is_pending = any(p.get('page_name') == page_name for p in context['pending_pages'])
+
+        if is_already_ordered and context['page_specs'].get(page_name, {}).get('received'):
+            logger.warning(f"{self.agent_id}: Received duplicate specs notification for page '{page_name}' in task {target_coder_task_id}. Ignoring.")
+            return
 
-        if msg_type == 'task_dependency_ready' and inner_message_data.get('dependency_type') == 'specifications':
-            saved_filename = inner_message_data.get('saved_filename')
-            pm_details = inner_message_data.get('details', {})
-            originating_ceo_task_id_from_pm = pm_details.get('originating_task_id')
-            page_name = pm_details.get('page_name', 'main_page') # Default if PM doesn't specify
-            original_request = pm_details.get('original_request')
-
-            logger.info(f"{self.agent_id}: Received specs notification from {sender_id} for page '{page_name}' (File: {saved_filename}, OrigCEO: {originating_ceo_task_id_from_pm})")
-
-            # Find the Coder's task context associated with this originating CEO task
-            target_coder_task_id = None
-            if originating_ceo_task_id_from_pm:
-                for tid, ctx in self.task_context.items():
-                    # Match based on the CEO's originating task ID stored in the Coder's task details
-                    if isinstance(ctx, dict) and ctx.get('details', {}).get('originating_task_id') == originating_ceo_task_id_from_pm:
-                        target_coder_task_id = tid
-                        logger.info(f"{self.agent_id}: Found matching Coder task '{target_coder_task_id}' for specs notification.")
-                        break
-            else:
-                logger.warning(f"{self.agent_id}: Specs notification from PM did not contain originating CEO task ID.")
-                # Try to use the *current* task if it's active and waiting for specs
-                if self.current_task and self.task_context.get(self.current_task['task_id'], {}).get('step') == 'wait_for_first_spec':
-                    target_coder_task_id = self.current_task.get('task_id')
-                    logger.warning(f"{self.agent_id}: Using current task '{target_coder_task_id}' as target for specs notification.")
-
-            if not target_coder_task_id:
-                logger.warning(f"{self.agent_id}: Could not determine a target task context for specs notification. Ignoring.")
-                return
-
-            context = self.task_context.setdefault(target_coder_task_id, {})
-            context.setdefault('page_specs', {})
-            context.setdefault('ordered_page_names', [])
-            context.setdefault('pending_pages', [])
-
-            # Store the original request if it's not already set in the main context
-            if original_request and not context.get('original_request'):
-                context['original_request'] = original_request
-                logger.info(f"{self.agent_id}: Stored original request in context for task {target_coder_task_id}.")
-
-            # Check if this page's specs are already being processed or are queued
-            current_page_index = context.get('current_page_index', 0)
-            ordered_page_names = context.get('ordered_page_names', [])
-            is_current_page = current_page_index < len(ordered_page_names) and \
-                              ordered_page_names[current_page_index] == page_name
-            is_already_ordered = page_name in context['ordered_page_names']
-            is_pending = any(p.get('page_name') == page_name for p in context['pending_pages'])
-
-            if is_already_ordered and context['page_specs'].get(page_name, {}).get('received'):
-                logger.warning(f"{self.agent_id}: Received duplicate specs notification for page '{page_name}' in task {target_coder_task_id}. Ignoring.")
-                return
-
-            # Determine if this page should be processed now or queued
-            # Process now if queue is empty and agent is idle/starting OR if it's the next expected page
-            should_process_now = (not ordered_page_names and current_page_index == 0) or \
-                                 (len(ordered_page_names) == current_page_index) # Add if no pages ordered yet or if we're at the end awaiting the next
-
-
-            if should_process_now and not is_already_ordered:
-                context['ordered_page_names'].append(page_name)
-                context['page_specs'][page_name] = {'filename': saved_filename, 'received': True, 'read': False}
-                context.pop('wait_start_time_for_any_specs', None) # Clear wait timer
-                logger.info(f"{self.agent_id}: Added page '{page_name}' directly to ordered list (index {len(ordered_page_names)-1}) for task {target_coder_task_id}. Specs marked as received.")
-                # Trigger state update if waiting
-                if self.current_task and self.current_task.get('task_id') == target_coder_task_id and self.get_state('current_action') == 'waiting':
-                     self.update_state({'current_action': 'processing_dependency', 'current_thoughts': f"Received specs for page {page_name}."})
-
-            elif not is_already_ordered and not is_pending: # Queue it if working on a different page
-                context['pending_pages'].append({'page_name': page_name, 'filename': saved_filename, 'original_request': original_request})
-                logger.info(f"{self.agent_id}: Queued specs for page '{page_name}' as pending for task {target_coder_task_id}.")
-
-            elif is_pending:
-                # Specs arrived for a page already in the pending queue (rare, but possible)
-                logger.warning(f"{self.agent_id}: Received specs for page '{page_name}' which was already pending. Updating info.")
-                for p in context['pending_pages']:
-                    if p['page_name'] == page_name:
-                        p['filename'] = saved_filename
-                        break
-            elif is_already_ordered and not context['page_specs'].get(page_name, {}).get('received'):
-                # Specs arrived for a page that is ordered but wasn't marked received yet
-                context['page_specs'].setdefault(page_name, {})['filename'] = saved_filename
-                context['page_specs'][page_name]['received'] = True
-                logger.info(f"{self.agent_id}: Marked existing ordered page '{page_name}' specs as received for task {target_coder_task_id}.")
-                if self.current_task and self.current_task.get('task_id') == target_coder_task_id and self.get_state('current_action') == 'waiting':
-                     self.update_state({'current_action': 'processing_dependency', 'current_thoughts': f"Received specs for page {page_name}."})
-
-
-            self.task_context[target_coder_task_id] = context # Save updated context
-
-        elif msg_type in ['html_component_ready', 'css_styles_ready', 'js_logic_ready',
-                          'updated_html_component_ready', 'updated_css_styles_ready', 'updated_js_logic_ready']:
-            original_coder_task_id_from_msg = inner_message_data.get('original_coder_task_id')
-            source_agent = inner_message_data.get('source_agent_id', 'Unknown Specialist')
-
-            if not original_coder_task_id_from_msg:
-                logger.error(f"{self.agent_id}: Received component message from {source_agent} without 'original_coder_task_id'. Discarding.")
-                return
-
-            # Ensure the message is for the Coder's *current* active task
-            if not self.current_task or self.current_task.get('task_id') != original_coder_task_id_from_msg:
-                logger.warning(f"{self.agent_id}: Received component message from {source_agent} for non-active task '{original_coder_task_id_from_msg}'. Current task is '{self.current_task.get('task_id') if self.current_task else None}'. Ignoring message.")
-                return
-
-            task_id = original_coder_task_id_from_msg
-            context = self.task_context.setdefault(task_id, {})
-            current_page_index = context.get('current_page_index', 0)
-            ordered_page_names = context.get('ordered_page_names', [])
-
-            if not (0 <= current_page_index < len(ordered_page_names)):
-                 logger.error(f"{self.agent_id}: Cannot process component message for task {task_id}. Invalid page index {current_page_index} for ordered pages {ordered_page_names}.")
-                 return
-
-            page_name = ordered_page_names[current_page_index]
-            page_components_info = context.setdefault('page_components', {}).setdefault(page_name, {})
-            received_components = page_components_info.setdefault('received_components', {})
-
-            type_map = {
-                'html_component_ready': ('html_structure', 'html_code', False),
-                'css_styles_ready': ('css_styles', 'css_code', False),
-                'js_logic_ready': ('js_logic', 'js_code', False),
-                'updated_html_component_ready': ('html_structure', 'fixed_code', True),
-                'updated_css_styles_ready': ('css_styles', 'fixed_code', True),
-                'updated_js_logic_ready': ('js_logic', 'fixed_code', True)
-            }
-
-            if msg_type in type_map:
-                component_key, code_key, is_update = type_map[msg_type]
-                received_code = inner_message_data.get(code_key, "")
-
-                # Store the received code
-                received_components[component_key] = received_code
-                log_prefix = "updated" if is_update else "initial"
-                logger.info(f"{self.agent_id}: Received and stored {log_prefix} '{component_key}' for page '{page_name}' from {source_agent} for task {task_id}. Length: {len(received_code)}")
-
-                # Update delegation status
-                delegated_components = page_components_info.setdefault('delegated_components', {})
-                if component_key in delegated_components:
-                    delegated_components[component_key]['status'] = 'fix_received' if is_update else 'received'
-
-                # Forward HTML immediately if it's the initial one
-                if not is_update and component_key == 'html_structure':
-                    # Use task_id and page_name from *this* context
-                    await self._forward_html_to_dependents(task_id, page_name, received_code)
-
-                # Check if ALL components for *this page* are now received
-                all_initial_received = all(comp in received_components for comp in REQUIRED_COMPONENTS)
-                logger.info(f"Component status for page '{page_name}': Received={list(received_components.keys())}. All initial received={all_initial_received}.")
-
-                # If waiting for components and all are now present, update step
-                if context.get('step') == f'waiting_for_components_{page_name}' and all_initial_received:
-                    logger.info(f"{self.agent_id}: All initial components received for page '{page_name}'. Setting step to ready_to_assemble.")
-                    context['step'] = 'ready_to_assemble' # Generic step for decision logic
-                    page_components_info['needs_assembly_at_desk'] = True # Flag for decision logic
-                    # Trigger state update if agent was waiting
-                    if self.get_state('current_action') == 'waiting':
-                         self.update_state({'current_action': f'received_all_components_{page_name}'})
-
-                self.task_context[task_id] = context # Save context
-
-            else:
-                logger.warning(f"{self.agent_id}: Could not map message type '{msg_type}' to a component key.")
-
-        elif msg_type == 'qa_feedback':
-            logger.info(f"{self.agent_id}: Received QA feedback from {sender_id}")
-            original_code_task_id = inner_message_data.get('original_code_task_id')
-            if original_code_task_id and original_code_task_id in self.task_context:
-                 fix_context = self.task_context[original_code_task_id]
-                 fix_context['qa_feedback_details'] = inner_message_data.get('feedback')
-                 fix_context['file_to_fix'] = inner_message_data.get('failed_code_filename') # File needing fix
-                 fix_context['specifications_filename'] = inner_message_data.get('specifications_filename') # Specs for context
-                 fix_context['step'] = 'needs_fix_delegation' # Trigger fix flow
-                 self.task_context[original_code_task_id] = fix_context # Update original task context
-                 logger.info(f"{self.agent_id}: Marked task {original_code_task_id} as needing fix delegation based on QA feedback.")
-                 if self.current_task and self.current_task.get('task_id') == original_code_task_id:
-                      self.update_state({'current_action': 'processing_qa_feedback'})
-            else:
-                logger.error(f"{self.agent_id}: Received QA feedback but couldn't find original task context for {original_code_task_id}")
+        # Determine if this page should be processed now or queued
+        # Process now if queue is empty and agent is idle/starting OR if it's the next expected page
+        should_process_now = (not ordered_page_names and current_page_index == 0) or \
+                             (len(ordered_page_names) == current_page_index) # Add if no pages ordered yet or if we're at the end awaiting the next
+
+
+        if should_process_now and not is_already_ordered:
+            context['ordered_page_names'].append(page_name)
+            context['page_specs'][page_name] = {'filename': saved_filename, 'received': True, 'read': False}
+            context.pop('wait_start_time_for_any_specs', None) # Clear wait timer
+            logger.info(f"{self.agent_id}: Added page '{page_name}' directly to ordered list (index {len(ordered_page_names)-1}) for task {target_coder_task_id}. Specs marked as received.")
+            # Trigger state update if waiting
+            if self.current_task and self.current_task.get('task_id') == target_coder_task_id and self.get_state('current_action') == 'waiting':
+                 self.update_state({'current_action': 'processing_dependency', 'current_thoughts': f"Received specs for page {page_name}."})
+
+        elif not is_already_ordered and not is_pending: # Queue it if working on a different page
+            context['pending_pages'].append({'page_name': page_name, 'filename': saved_filename, 'original_request': original_request})
+            logger.info(f"{self.agent_id}: Queued specs for page '{page_name}' as pending for task {target_coder_task_id}.")
+
+        elif is_pending:
+            # Specs arrived for a page already in the pending queue (rare, but possible)
+            logger.warning(f"{self.agent_id}: Received specs for page '{page_name}' which was already pending. Updating info.")
+            for p in context['pending_pages']:
+                if p['page_name'] == page_name:
+                    p['filename'] = saved_filename
+                    break
+        elif is_already_ordered and not context['page_specs'].get(page_name, {}).get('received'):
+            # Specs arrived for a page that is ordered but wasn't marked received yet
+            context['page_specs'].setdefault(page_name, {})['filename'] = saved_filename
+            context['page_specs'][page_name]['received'] = True
+            logger.info(f"{self.agent_id}: Marked existing ordered page '{page_name}' specs as received for task {target_coder_task_id}.")
+            if self.current_task and self.current_task.get('task_id') == target_coder_task_id and self.get_state('current_action') == 'waiting':
+                 self.update_state({'current_action': 'processing_dependency', 'current_thoughts': f"Received specs for page {page_name}."})
+
+
+        self.task_context[target_coder_task_id] = context # Save updated context
+
+    async def _on_component_message(self, sender_id: str, msg_type: str, inner_message_data: Dict[str, Any]):
+        """Stores an initial or updated component from a specialist for the current page."""
+        original_coder_task_id_from_msg = inner_message_data.get('original_coder_task_id')
+        source_agent = inner_message_data.get('source_agent_id', 'Unknown Specialist')
+
+        if not original_coder_task_id_from_msg:
+            logger.error(f"{self.agent_id}: Received component message from {source_agent} without 'original_coder_task_id'. Discarding.")
+            return
+
+        # Ensure the message is for the Coder's *current* active task
+        if not self.current_task or self.current_task.get('task_id') != original_coder_task_id_from_msg:
+            logger.warning(f"{self.agent_id}: Received component message from {source_agent} for non-active task '{original_coder_task_id_from_msg}'. Current task is '{self.current_task.get('task_id') if self.current_task else None}'. Ignoring message.")
+            return
+
+        task_id = original_coder_task_id_from_msg
+        context = self.task_context.setdefault(task_id, {})
+        current_page_index = context.get('current_page_index', 0)
+        ordered_page_names = context.get('ordered_page_names', [])
+        component_key, _, is_update = COMPONENT_MESSAGE_TYPES.get(msg_type, (None, None, False))
+        fix_page_name = self._page_awaiting_fix(context, component_key) if is_update else None # Fixes belong to the page they were requested for
+
+        if fix_page_name is None and not (0 <= current_page_index < len(ordered_page_names)):
+             logger.error(f"{self.agent_id}: Cannot process component message for task {task_id}. Invalid page index {current_page_index} for ordered pages {ordered_page_names}.")
+             return
+
+        page_name = fix_page_name or ordered_page_names[current_page_index]
+        page_components_info = context.setdefault('page_components', {}).setdefault(page_name, {})
+        received_components = page_components_info.setdefault('received_components', {})
+
+        if msg_type in COMPONENT_MESSAGE_TYPES:
+            component_key, code_key, is_update = COMPONENT_MESSAGE_TYPES[msg_type]
+            received_code = inner_message_data.get(code_key, "") # Artifact handle (or inline code from older senders)
+            if is_update and inner_message_data.get('fix_mode') == FIX_MODE_PATCH:
+                received_code = await self._apply_component_patch(task_id, page_name, component_key, inner_message_data)
+                if received_code is None: self.task_context[task_id] = context; return # Full regeneration requested instead
+
+            # Store the received code
+            received_components[component_key] = received_code
+            log_prefix = "updated" if is_update else "initial"
+            logger.info(f"{self.agent_id}: Received and stored {log_prefix} '{component_key}' for page '{page_name}' from {source_agent} for task {task_id}: {describe_artifact(received_code)}")
+
+            # Update delegation status
+            delegated_components = page_components_info.setdefault('delegated_components', {})
+            if component_key in delegated_components:
+                delegated_components[component_key]['status'] = 'fix_received' if is_update else 'received'
+            if is_update: await self._finish_fix_round_if_complete(task_id); return
+
+            # Forward HTML immediately if it's the initial one
+            if not is_update and component_key == 'html_structure':
+                # Use task_id and page_name from *this* context
+                await self._forward_html_to_dependents(task_id, page_name, received_code)
+
+            # Check if ALL components for *this page* are now received
+            all_initial_received = all(comp in received_components for comp in REQUIRED_COMPONENTS)
+            logger.info(f"Component status for page '{page_name}': Received={list(received_components.keys())}. All initial received={all_initial_received}.")
+
+            # If waiting for components and all are now present, update step
+            if context.get('step') == f'waiting_for_components_{page_name}' and all_initial_received:
+                logger.info(f"{self.agent_id}: All initial components received for page '{page_name}'. Setting step to ready_to_assemble.")
+                context['step'] = 'ready_to_assemble' # Generic step for decision logic
+                page_components_info['needs_assembly_at_desk'] = True # Flag for decision logic
+                # Trigger state update if agent was waiting
+                if self.get_state('current_action') == 'waiting':
+                     self.update_state({'current_action': f'received_all_components_{page_name}'})
+
+            self.task_context[task_id] = context # Save context
 
         else:
-            logger.warning(f"{self.agent_id} received unhandled agent msg type '{msg_type}' from {sender_id}")
+            logger.warning(f"{self.agent_id}: Could not map message type '{msg_type}' to a component key.")
+
+    async def _on_qa_feedback(self, sender_id: str, msg_type: str, inner_message_data: Dict[str, Any]):
+        """Marks the reviewed task as needing fix delegation."""
+        logger.info(f"{self.agent_id}: Received QA feedback from {sender_id}")
+        original_code_task_id = inner_message_data.get('original_code_task_id')
+        if original_code_task_id and self.recall_task_context(original_code_task_id) is not None: # Feedback may arrive after the context was archived
+             if self.current_task and self.current_task.get('task_id') != original_code_task_id:
+                  logger.error(f"{self.agent_id}: QA feedback for task {original_code_task_id} arrived while working on {self.current_task.get('task_id')}; not fixing."); return
+             fix_context = self.task_context[original_code_task_id]
+             fix_context['qa_feedback_details'] = inner_message_data.get('feedback')
+             fix_context['file_to_fix'] = inner_message_data.get('failed_code_filename') # File needing fix
+             fix_context['specifications_filename'] = inner_message_data.get('specifications_filename') # Specs for context
+             fix_context['step'] = 'needs_fix_delegation' # Trigger fix flow
+             self.task_context[original_code_task_id] = fix_context # Update original task context
+             logger.info(f"{self.agent_id}: Marked task {original_code_task_id} as needing fix delegation based on QA feedback.")
+             if not self.current_task: await self._reopen_task(original_code_task_id, fix_context)
+             self.update_state({'current_action': 'processing_qa_feedback'})
+             await self._delegate_qa_fixes(original_code_task_id)
+        else:
+            logger.error(f"{self.agent_id}: Received QA feedback but couldn't find original task context for {original_code_task_id}")
+
+    async def _reopen_task(self, task_id: str, context: Dict[str, Any]):
+        """Takes the completed write_code task up again for a fix round; it completes again once QA has the fixed page."""
+        self.current_task = {'task_id': task_id, 'task_type': 'write_code', 'description': context.get('description') or f"Fix QA findings for task {task_id}", 'details': context.get('details', {})}
+        await self._send_message_to_manager({'type': 'task_completion_update', 'task_id': task_id, 'status': STATUS_IN_PROGRESS, 'result': 'Reopened for QA fixes.'})
+        self.update_state({'status': STATUS_WORKING, 'progress': 0.5, 'last_error': None, 'current_action': 'reopened_for_fixes', 'current_idle_sub_state': None})
+        logger.info(f"{self.agent_id}: Reopened task {task_id} for a QA fix round.")
+
+    async def _delegate_qa_fixes(self, task_id: str):
+        """Sends the QA findings to the specialists of the components they concern; each answers with a patch (see request_component_fix)."""
+        context = self.task_context[task_id]; ordered_page_names = context.get('ordered_page_names', [])
+        if context.get('step') != 'needs_fix_delegation': return
+        if not ordered_page_names: logger.error(f"{self.agent_id}: Cannot delegate QA fixes for task {task_id}: no pages were built."); return
+        feedback = context.get('qa_feedback_details'); feedback_text = await self.resolve_artifact_async(feedback, '')
+        page_name = next((name for name in ordered_page_names if context.get('page_components', {}).get(name, {}).get('html_filename_rel') == context.get('file_to_fix')), ordered_page_names[0])
+        components = [key for key, pattern in FIX_COMPONENT_KEYWORDS.items() if pattern.search(feedback_text)] or list(REQUIRED_COMPONENTS)
+        context['step'] = 'waiting_for_fixes'; context['fix_page'] = page_name; context['fix_round'] = context.get('fix_round', 0) + 1; context['fix_requested_at'] = time.time()
+        logger.info(f"{self.agent_id}: QA fix round {context['fix_round']} for page '{page_name}' (Task: {task_id}): {components}.")
+        for component_key in components: # CSS/JS are shared by the site and kept with the first page
+            await self.request_component_fix(task_id, page_name if component_key == 'html_structure' else ordered_page_names[0], component_key, feedback)
+        self.task_context[task_id] = context
+        self.update_state({'current_action': f'delegated_fixes_{page_name}'})
+
+    def _page_awaiting_fix(self, context: Dict[str, Any], component_key: Optional[str]) -> Optional[str]:
+        for page_name, page_components_info in context.get('page_components', {}).items():
+            if page_components_info.get('delegated_components', {}).get(component_key, {}).get('status') == 'fix_pending': return page_name
+        return None
+
+    async def _on_component_fix_failed(self, sender_id: str, msg_type: str, inner_message_data: Dict[str, Any]):
+        """A specialist could not produce a fix: the component stays as it was and the fix round goes on without it."""
+        task_id = inner_message_data.get('original_coder_task_id'); context = self.task_context.get(task_id) if task_id else None
+        component_key = FIX_FAILED_MESSAGE_TYPES[msg_type]; page_name = self._page_awaiting_fix(context or {}, component_key)
+        if not context or not page_name: logger.warning(f"{self.agent_id}: Ignoring '{msg_type}' from {sender_id} (no pending fix for task {task_id})."); return
+        logger.warning(f"{self.agent_id}: Fix of '{component_key}' for page '{page_name}' failed ({inner_message_data.get('error_message')}); keeping the current code.")
+        context['page_components'][page_name]['delegated_components'][component_key]['status'] = 'fix_failed'
+        await self._finish_fix_round_if_complete(task_id)
+
+    async def _handle_fix_timeout(self, task_id: str):
+        """Fixes that never came back count as failed: their components stay as they were."""
+        context = self.task_context[task_id]
+        for page_name, page_components_info in context.get('page_components', {}).items():
+            for component_key, fix_info in page_components_info.get('delegated_components', {}).items():
+                if fix_info.get('status') == 'fix_pending': fix_info['status'] = 'fix_failed'; logger.warning(f"{self.agent_id}: Timeout waiting for the fix of '{component_key}' for page '{page_name}'; keeping the current code.")
+        await self._finish_fix_round_if_complete(task_id)
+
+    async def _finish_fix_round_if_complete(self, task_id: str):
+        """Once every requested fix came back (or failed), re-assembles and saves the page; QA is notified when the files are written."""
+        context = self.task_context.get(task_id)
+        if not context or context.get('step') != 'waiting_for_fixes' or any(self._page_awaiting_fix(context, key) for key in REQUIRED_COMPONENTS): return
+        page_name = context.get('fix_page'); first_page_name = context.get('ordered_page_names', [page_name])[0]
+        shared_fixed = any(context['page_components'].get(first_page_name, {}).get('delegated_components', {}).get(key, {}).get('status') == 'fix_received' for key in ('css_styles', 'js_logic'))
+        context['step'] = 'saving_fixes'; self.task_context[task_id] = context
+        logger.info(f"{self.agent_id}: All fixes of round {context.get('fix_round')} are back; re-assembling page '{page_name}' (Task: {task_id}).")
+        await self._assemble_final_code(page_name, include_shared=shared_fixed)
 
     async def _forward_html_to_dependents(self, task_id: str, page_name: str, html_code: str):
         """Forwards the initial HTML structure to CSS and JS agents for the specified page."""
@@ -526,8 +723,8 @@ class CoderAgent(Agent):
         self.task_context[task_id] = context
         self.update_state({'current_action': f'coordinating_{page_name}'})
 
-    async def _assemble_final_code(self, page_name: str):
-        """Assembles components into final files for a specific page."""
+    async def _assemble_final_code(self, page_name: str, include_shared: Optional[bool] = None):
+        """Assembles components into final files for a specific page (plus the shared CSS/JS for the first page, or when include_shared)."""
         if not self.current_task or not self.current_task.get('task_id'): return
         task_id = self.current_task['task_id']; context = self.task_context.get(task_id)
         if not context: return
@@ -540,7 +737,8 @@ class CoderAgent(Agent):
         components = page_components_info.get('received_components', {})
         details = context.get('details', {}) # Use context details
 
-        html_code = components.get('html_structure', f"")
+        # Only the page body is needed as text; shared CSS/JS stay as handles until they are written
+        html_code = await self.resolve_artifact_async(components.get('html_structure'), "")
         # Assume shared CSS/JS, get from the first page's context if available
         first_page_name = context.get('ordered_page_names', [page_name])[0]
         css_code = context.get('page_components', {}).get(first_page_name, {}).get('received_components', {}).get('css_styles', '/* CSS styles missing */')
@@ -577,11 +775,10 @@ class CoderAgent(Agent):
 </html>
 """
         # Store files to save *for this page*
+        if include_shared is None: include_shared = context.get('current_page_index', 0) == 0 # Only the *first* page being assembled writes CSS/JS
         page_components_info['files_to_save_map'] = {
-            html_filename_rel: assembled_html,
-            # Only include CSS/JS if this is the *first* page being assembled
-            **( {css_filename_rel: css_code} if context.get('current_page_index', 0) == 0 else {} ),
-            **( {js_filename_rel: js_code} if context.get('current_page_index', 0) == 0 else {} ),
+            html_filename_rel: self.store_artifact(assembled_html, kind='html_page'),
+            **( {css_filename_rel: css_code, js_filename_rel: js_code} if include_shared else {} ),
         }
         page_components_info['html_filename_rel'] = html_filename_rel # Store for QA notification
         page_components_info['assembled'] = True
@@ -590,7 +787,66 @@ class CoderAgent(Agent):
 
         logger.info(f"{self.agent_id}: Prepared files for page '{page_name}' (Task: {task_id}): {list(page_components_info['files_to_save_map'].keys())}")
         self.task_context[task_id] = context
+        await self._save_page_files(task_id, page_name)
+
+    async def _save_page_files(self, task_id: str, page_name: str) -> bool:
+        """Queues every unsaved file of an assembled page and writes them all in a single SAVE_ZONE visit."""
+        page_components_info = self.task_context.get(task_id, {}).get('page_components', {}).get(page_name)
+        if not page_components_info or not page_components_info.get('assembled'): return False
+        saved_files = page_components_info.setdefault('saved_files_map', {}); save_attempts = page_components_info.setdefault('save_attempts', {})
+        queued = 0
+        for filename, content in page_components_info.get('files_to_save_map', {}).items():
+            if filename in saved_files: continue
+            save_attempts[filename] = save_attempts.get(filename, 0) + 1
+            if self.queue_tool_op('file_write', {'filename': filename, 'content': content}): queued += 1
+        if not queued: return False
+        page_components_info['saving'] = True
+        logger.info(f"{self.agent_id}: Saving {queued} file(s) for page '{page_name}' (Task: {task_id}) in one visit.")
+        return await self.flush_tool_ops(self.required_tool_zones.get('file_write'))
+
+    async def _process_tool_batch_result(self, results: List[Dict[str, Any]]):
+        for result in results: await self._process_tool_result(result.get('tool_name'), result)
+        self.update_state({'current_action': 'processed_tool_batch_result'})
+
+    async def _process_tool_result(self, tool_name: str, result: Any):
+        """Stores read page specs and marks written page files as saved; other tool results are not used by the Coder."""
+        if tool_name not in ('file_read', 'file_write') or not isinstance(result, dict):
+            logger.warning(f"{self.agent_id}: Ignoring '{tool_name}' tool result."); return
+        task_id = result.get('task_id') or (self.current_task.get('task_id') if self.current_task else None)
+        context = self.task_context.get(task_id) if task_id else None
+        requested_filename = (result.get('request') or {}).get('filename') or result.get('filename')
+        if not context or not requested_filename: logger.warning(f"{self.agent_id}: Cannot match {tool_name} result for task {task_id}: {result.get('result')}"); return
+        if tool_name == 'file_read': self._on_specs_read(task_id, context, requested_filename, result); return
+        for page_name, page_components_info in context.get('page_components', {}).items():
+            if requested_filename not in page_components_info.get('files_to_save_map', {}): continue
+            if result.get('status') != 'success':
+                page_components_info.setdefault('save_errors', {})[requested_filename] = result.get('result')
+                logger.error(f"{self.agent_id}: Failed to save '{requested_filename}' for page '{page_name}': {result.get('result')}"); return
+            page_components_info.setdefault('saved_files_map', {})[requested_filename] = result.get('filename', requested_filename)
+            if all(filename in page_components_info['saved_files_map'] for filename in page_components_info['files_to_save_map']):
+                page_components_info['saving'] = False; page_components_info['files_saved'] = True
+                logger.info(f"{self.agent_id}: All files saved for page '{page_name}' (Task: {task_id}).")
+                self.update_state({'current_action': f'files_saved_{page_name}'})
+                if context.get('step') == 'saving_fixes' and page_name == context.get('fix_page'): # Fixed page is back on disk: QA re-reviews it
+                    context['step'] = 'fixes_submitted'; self.task_context[task_id] = context
+                    await self._notify_qa(task_id, page_name, page_components_info['html_filename_rel']); return
+            self.task_context[task_id] = context
+            return
+        logger.warning(f"{self.agent_id}: file_write result for '{requested_filename}' does not belong to any page of task {task_id}.")
+
 
+    def _on_specs_read(self, task_id: str, context: Dict[str, Any], requested_filename: str, result: Dict[str, Any]):
+        """Stores a page's specs; a failed read fails the task."""
+        page_name = next((name for name, info in context.get('page_specs', {}).items() if info.get('filename') == requested_filename), None)
+        if page_name is None: logger.warning(f"{self.agent_id}: file_read result for '{requested_filename}' is not the specs of any page of task {task_id}."); return
+        page_specs_info = context['page_specs'][page_name]; page_specs_info['reading'] = False
+        if result.get('status') == 'success':
+            page_specs_info['content'] = result.get('content', ''); page_specs_info['read'] = True; context['step'] = f'specs_read_{page_name}'
+            logger.info(f"{self.agent_id}: Read specs for page '{page_name}' ({requested_filename}).")
+        else:
+            context['step'] = 'error'; context['error_details'] = f"Could not read specifications '{requested_filename}' for page '{page_name}': {result.get('result')}"
+        self.task_context[task_id] = context
+        self.update_state({'current_action': f'read_specs_{page_name}'})
 
     async def _notify_qa(self, task_id: str, page_name: str, final_html_filename: str):
         """Sends notification to QA agent that a page is ready for review."""
@@ -612,7 +868,9 @@ class CoderAgent(Agent):
             'source_task_id': task_id,
             'project_name': context.get('project_name', 'Unknown Project'),
             'saved_filename': final_html_filename, # Main HTML file
-            'specifications_filename': specs_filename
+            'specifications_filename': specs_filename,
+            # Every assembled page of the site, so QA can review each one (in its own section)
+            'page_filenames': [info['html_filename_rel'] for info in (context.get('page_components', {}).get(name, {}) for name in context.get('ordered_page_names', [])) if info.get('html_filename_rel')]
         }
         await self._send_message_to_agent(self.qa_agent_id, {'type': 'agent_message', 'message_data': qa_message_data})
         context['notification_sent'] = True # Mark notification sent
@@ -7,7 +7,9 @@ import time
 from typing import Optional, Dict, Any, Callable, Awaitable, Tuple
 import uuid
 # --- CORRECTED IMPORT ---
-from ..agent_base import Agent, STATUS_IDLE, STATUS_WORKING # Import base and statuses
+from ..agent_base import Agent, STATUS_IDLE, STATUS_WORKING, HTML_WAIT_TIMEOUT_S, FIX_CONTEXT_WAIT_S, DEFAULT_LLM_CALL_TIMEOUT_S # Import base and statuses
+from ..simulation.code_patch import FIX_MODE_PATCH, PATCH_FORMAT_INSTRUCTIONS, wants_patch, patch_from_response, patch_message_fields
+from ..simulation.message_bus import TASK_MESSAGE_TYPES
 
 logger = logging.getLogger(__name__)
 
@@ -23,7 +25,7 @@ class CSSAgent(Agent):
         """Generates the prompt for the LLM based on task type (generate or fix)."""
         task_type = task_details.get('task_type')
         specs = context.get('specifications_content', 'No specifications provided.')
-        html_structure = context.get('html_structure', '')  # Wait for HTML
+        html_structure = self.resolve_artifact(context.get('html_structure'), '')  # Wait for HTML
         # Get Page Context
         page_context_name = task_details.get('target_page_context', 'the webpage')
         logger.info(f"{self.agent_id}: Generating CSS prompt for page context '{page_context_name}'")
@@ -55,8 +57,9 @@ class CSSAgent(Agent):
 
         elif task_type == 'fix_css_styles':
             # Similar safe retrieval for fix prompts
-            qa_feedback = context.get('qa_feedback', 'No specific feedback provided.')
-            current_css = context.get('current_code', '/* Current CSS not provided */')
+            qa_feedback = self.resolve_artifact(context.get('qa_feedback'), 'No specific feedback provided.')
+            current_css = self.resolve_artifact(context.get('current_code'), '/* Current CSS not provided */')
+            response_rules = PATCH_FORMAT_INSTRUCTIONS if wants_patch(context) else "Generate ONLY the corrected CSS code addressing the QA feedback. Do not include HTML, JavaScript, or extraneous comments."
             prompt = f"""You are an expert CSS Specialist agent fixing the styles for a web application, with a focus on the "{page_context_name}" section.
     The overall topic is "{topic}".
     You previously generated CSS which now requires adjustments based on QA feedback.
@@ -78,7 +81,7 @@ class CSSAgent(Agent):
     {html_structure if html_structure else ""}
     --- HTML STRUCTURE END ---
 
-    Generate ONLY the corrected CSS code addressing the QA feedback. Do not include HTML, JavaScript, or extraneous comments.
+    {response_rules}
     """
             return prompt.strip()
 
@@ -114,7 +117,7 @@ class CSSAgent(Agent):
                      logger.info(f"{self.agent_id}: Waiting for HTML structure context for task {task_id}")
                 else:
                     elapsed = time.time() - wait_start
-                    if elapsed > 120: # Timeout
+                    if self.wait_expired(wait_start, HTML_WAIT_TIMEOUT_S): # Timeout (early once the run's budget is critical)
                         logger.warning(f"{self.agent_id}: Timed out waiting for HTML after {elapsed:.1f}s")
                         context['html_structure'] = "/* Fallback - HTML structure not received */"; logger.info(f"{self.agent_id}: Using fallback HTML to proceed")
                     elif not context.get('last_wait_log') or time.time() - context.get('last_wait_log') > 30:
@@ -135,13 +138,13 @@ class CSSAgent(Agent):
              # Context (specs, feedback, current code) should be provided by Coder at task creation
             if not context.get('llm_called'):
                  # Verify necessary context exists
-                 if not context.get('specifications_content') or not context.get('qa_feedback') or not context.get('current_css_code'):
+                 if not context.get('specifications_content') or not context.get('qa_feedback') or not context.get('current_code'):
                       # If context is missing, wait briefly in case it arrives late, then fail
                       if not context.get('fix_context_wait_start'):
                            context['fix_context_wait_start'] = time.time()
                            logger.warning(f"{self.agent_id}: Waiting for missing context for fix task {task_id}.")
                            return {'action': 'wait'}
-                      elif time.time() - context.get('fix_context_wait_start', time.time()) > 15: # 15 sec wait
+                      elif self.wait_expired(context.get('fix_context_wait_start', time.time()), FIX_CONTEXT_WAIT_S):
                            logger.error(f"{self.agent_id}: Failed fix task {task_id} due to missing context after wait.")
                            return {'action': 'fail_task', 'error': 'Missing context (specs, feedback, or current code) for CSS fix.'}
                       else:
@@ -162,7 +165,7 @@ class CSSAgent(Agent):
         if context.get('llm_call_time') and not (context.get('code_generated') or context.get('fix_generated')):
             # [ Existing LLM timeout logic - remains useful ]
             elapsed = time.time() - context.get('llm_call_time')
-            if elapsed > 120: logger.warning(f"{self.agent_id}: LLM call timed out for task {task_id}"); return {'action': 'fail_task', 'error': 'LLM call timed out'}
+            if elapsed > DEFAULT_LLM_CALL_TIMEOUT_S: logger.warning(f"{self.agent_id}: LLM call timed out for task {task_id}"); return {'action': 'fail_task', 'error': 'LLM call timed out'}
             if not context.get('last_wait_log') or time.time() - context.get('last_wait_log') > 30:
                 logger.info(f"{self.agent_id}: Waiting for LLM response for {elapsed:.1f}s (task {task_id})"); context['last_wait_log'] = time.time()
 
@@ -203,7 +206,10 @@ class CSSAgent(Agent):
             context['error_details'] = llm_response; self.task_context[task_id] = context
             return
 
-        processed_code = self._cleanup_llm_code_output(llm_response)
+        # Patch-mode fixes go back as edit blocks; the Coder applies them to the code the fix was based on
+        patch_text = patch_from_response(llm_response, context, f"{self.agent_id} (task {task_id})") if is_fix_task else None
+
+        processed_code = self._cleanup_llm_code_output(llm_response) if patch_text is None else ''
 
         # Handle specific cases (e.g., no JS needed)
         if agent_type == 'js' and processed_code.strip() == "// No JavaScript required.":
@@ -214,9 +220,12 @@ class CSSAgent(Agent):
              processed_code = fallback_map.get(agent_type, '// Error')
              context['used_fallback'] = True
 
+        # Messages and context carry a handle; the text is resolved only when a prompt needs it
+        code_ref = self.store_artifact(processed_code, kind=agent_type) if patch_text is None else None
+
         # Store result and mark completion step
-        if is_fix_task: context[f'fixed_{agent_type}'] = processed_code; context['fix_generated'] = True
-        else: context[f'generated_{agent_type}'] = processed_code; context['code_generated'] = True
+        if is_fix_task: context[f'fixed_{agent_type}'] = code_ref if patch_text is None else patch_text; context['fix_generated'] = True
+        else: context[f'generated_{agent_type}'] = code_ref; context['code_generated'] = True
 
         # Prepare message to Coder
         message_data = {
@@ -228,13 +237,14 @@ class CSSAgent(Agent):
         if is_fix_task:
              message_data['type'] = f'updated_{agent_type}{"_styles" if agent_type == "css" else ("_logic" if agent_type == "js" else "_component")}_ready'
              message_data['component_type'] = f'{agent_type}{"_styles" if agent_type == "css" else ("_logic" if agent_type == "js" else "_structure")}'
-             message_data['fixed_code'] = processed_code
+             if patch_text is None: message_data['fixed_code'] = code_ref
+             else: message_data.update(patch_message_fields(patch_text, context))
              logger.info(f"{self.agent_id}: Sending updated {agent_type} back to {self.coder_lead_id}.")
         else: # Initial generation
              message_data['type'] = f'{agent_type}{"_styles" if agent_type == "css" else ("_logic" if agent_type == "js" else "_component")}_ready'
              message_data['component_name'] = context.get('component_name', 'unknown')
              # Use agent_type determined above for the code key
-             message_data[f'{agent_type}_code'] = processed_code
+             message_data[f'{agent_type}_code'] = code_ref
              logger.info(f"{self.agent_id}: Sending initial {agent_type} back to {self.coder_lead_id}.")
 
         await self._send_message_to_agent(self.coder_lead_id, {'type': 'agent_message', 'message_data': message_data})
@@ -250,14 +260,7 @@ class CSSAgent(Agent):
         # ... (previous checks and type determination) ...
         if not isinstance(message_data, dict): logger.warning(f"{self.agent_id} received non-dict message from {sender_id}"); return
         msg_type = message_data.get('type'); logger.info(f"{self.agent_id}: Processing message type '{msg_type}' from {sender_id}")
-        task_type_str = None; task_prefix = None
-        # ...(task type mapping logic)...
-        if msg_type == 'create_html_structure': task_type_str, task_prefix = 'generate_html', 'html_task'
-        elif msg_type == 'create_css_styles': task_type_str, task_prefix = 'generate_css', 'css_task'
-        elif msg_type == 'create_js_logic': task_type_str, task_prefix = 'generate_js', 'js_task'
-        elif msg_type == 'fix_html_component': task_type_str, task_prefix = 'fix_html_component', 'html_fix'
-        elif msg_type == 'fix_css_styles': task_type_str, task_prefix = 'fix_css_styles', 'css_fix'
-        elif msg_type == 'fix_js_logic': task_type_str, task_prefix = 'fix_js_logic', 'js_fix'
+        task_type_str, task_prefix = TASK_MESSAGE_TYPES.get(msg_type, (None, None))
 
 
         if task_type_str: # Handle Create or Fix Task
@@ -293,6 +296,7 @@ class CSSAgent(Agent):
             if 'fix_' in task_type_str:
                  context['qa_feedback'] = inner_message_data.get('qa_feedback', 'No feedback provided.') # Get from inner_message_data
                  context['current_code'] = inner_message_data.get('current_code', '') # Get from inner_message_data
+                 context['fix_mode'] = inner_message_data.get('fix_mode', FIX_MODE_PATCH) # Coder asks for a full regeneration when a patch failed to apply
 
             if task_type_str in ['generate_css', 'generate_js']: context['status'] = 'waiting_for_html'
             logger.info(f"{self.agent_id}: Context CREATED for task {new_task_id}. Keys: {list(context.keys())}")
@@ -38,7 +38,8 @@ class MarketerAgent(Agent):
             target_desk_position=target_desk_position,
             available_tools=kwargs.get('available_tools'),
             required_tool_zones=kwargs.get('required_tool_zones'),
-            zone_coordinates_map=kwargs.get('zone_coordinates_map')
+            zone_coordinates_map=kwargs.get('zone_coordinates_map'),
+            artifact_store=kwargs.get('artifact_store'), context_archive=kwargs.get('context_archive')
         ) #[cite: uploaded:SoftwareSim3d/src/agent_base.py]
         #logger.info(f"MarketerAgent {self.agent_id} initialized.")
         
@@ -60,9 +61,9 @@ class MarketerAgent(Agent):
         if task_type == 'develop_strategy':
             context_section = ""
             if search_results:
-                 context_section = f"\n\n--- INTERNET RESEARCH FINDINGS ---\n{search_results}\n--- END FINDINGS ---"
+                 context_section = f"\n\n--- RESEARCH FINDINGS (past reports, specifications and reference documents) ---\n{search_results}\n--- END FINDINGS ---\nUse these findings where they are relevant to this request; ignore the ones that are not."
             elif search_failed:
-                 context_section = "\n\nNOTE: Internet research was attempted but failed. Proceed using general knowledge."
+                 context_section = "\n\nNOTE: Research found no relevant material. Proceed using general knowledge."
 
             # --- MODIFIED: Use original_request in the prompt ---
             # Optional: Add logging to verify the request is present
@@ -122,7 +123,7 @@ Respond ONLY with the structured strategy in Markdown."""
                     return {'action': 'move_to_zone', 'zone_name': internet_zone}
                 elif current_zone == internet_zone or not internet_zone:
                     original_request_for_query = task_details.get('original_request', '[Original request not available]')
-                    query = f"Marketing strategy ideas for {original_request_for_query}"
+                    query = original_request_for_query # The request's own terms; shared marketing vocabulary would match every past report
                     context['search_in_progress'] = True
                     self.task_context[task_id] = context
                     return {'action': 'use_tool', 'tool_name': 'internet_search', 'params': {'query': query}}
@@ -166,7 +167,7 @@ Respond ONLY with the structured strategy in Markdown."""
                 elif current_zone == required_zone_fw or not required_zone_fw:
                     if self.get_state('current_action') not in [f'ready_to_use_file_write', 'executing_tool']:
                         report_filename = f"{project_name}/Marketer/strategy_{task_id[:8]}.md"
-                        return {'action': 'use_tool', 'tool_name': 'file_write', 'params': {'filename': report_filename, 'content': strategy_content}}
+                        return {'action': 'use_tool', 'tool_name': 'file_write', 'params': {'filename': report_filename, 'content': self.store_artifact(strategy_content, kind='marketing_strategy')}}
                     else:
                         return {'action': 'wait'}
                 else:
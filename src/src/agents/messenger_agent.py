@@ -6,6 +6,7 @@ from typing import Optional, Dict, Any, Callable, Awaitable, Tuple, Set
 
 # Import base class and constants
 from ..agent_base import Agent, STATUS_IDLE, STATUS_WORKING, STATUS_FAILED #[cite: uploaded:SoftwareSim3d/src/agent_base.py]
+from ..simulation.message_bus import Message, MANAGER_ID, unwrap_agent_message
 
 # Type hinting imports
 from typing import TYPE_CHECKING
@@ -14,6 +15,14 @@ if TYPE_CHECKING:
 
 logger = logging.getLogger(__name__)
 
+# UI message types relayed to the CEO
+UI_TO_CEO_TYPES = frozenset(['user_request', 'user_clarification_response'])
+# CEO message type -> (manager message type, fields copied across)
+CEO_TO_UI_RELAY = {
+    'request_user_input': ('ui_request_user_input', ('question', 'originating_task_id')),
+    'simulation_end': ('ui_simulation_end', ('success', 'message')),
+}
+
 class MessengerAgent(Agent):
     """
     Relays messages between the User Interface (via WorkflowManager) and the CEO.
@@ -76,7 +85,7 @@ class MessengerAgent(Agent):
 
     # --- Core Message Handling ---
 
-    async def _handle_message(self, message: Dict[str, Any]):
+    async def _handle_message(self, message: Message):
         sender_id = message.get('sender_id', 'Unknown')
         content = message.get('content', {})
         message_type = content.get('type', 'unknown')
@@ -85,41 +94,28 @@ class MessengerAgent(Agent):
 
         try:
             # Message from UI/WorkflowManager (relay to CEO)
-            if sender_id == 'workflow_manager' or sender_id == 'user_interface':
-                if message_type in ['user_request', 'user_clarification_response']:
-                    if self.ceo_agent_id:
-                        logger.info(f"Messenger relaying '{message_type}' to CEO ({self.ceo_agent_id})")
-                        # Wrap content for CEO's specific handler
-                        ceo_message_payload = {'type': 'agent_message', 'message_data': content}
-                        await self._safe_send_to_agent(self.ceo_agent_id, ceo_message_payload) #[cite: uploaded:SoftwareSim3d/src/agent_base.py]
-                    else:
-                        logger.error(f"Messenger cannot relay '{message_type}': CEO ID unknown")
-                        self.update_state({'last_error': "Cannot relay message: CEO ID unknown."}) #[cite: uploaded:SoftwareSim3d/src/agent_base.py]
+            if sender_id in (MANAGER_ID, 'user_interface') and message_type in UI_TO_CEO_TYPES:
+                if self.ceo_agent_id:
+                    logger.info(f"Messenger relaying '{message_type}' to CEO ({self.ceo_agent_id})")
+                    # Wrap content for CEO's specific handler (passed by reference, not copied)
+                    await self._safe_send_to_agent(self.ceo_agent_id, {'type': 'agent_message', 'message_data': content}) #[cite: uploaded:SoftwareSim3d/src/agent_base.py]
                 else:
-                     logger.warning(f"Messenger received unhandled message type '{message_type}' from {sender_id}")
+                    logger.error(f"Messenger cannot relay '{message_type}': CEO ID unknown")
+                    self.update_state({'last_error': "Cannot relay message: CEO ID unknown."}) #[cite: uploaded:SoftwareSim3d/src/agent_base.py]
 
             # Message FROM the CEO (relay to UI via WorkflowManager)
-            elif sender_id == self.ceo_agent_id and message_type == 'agent_message':
-                 inner_content = content.get('message_data', {})
-                 inner_type = inner_content.get('type')
-                 if inner_type == 'request_user_input':
-                      logger.info("Messenger relaying CEO 'request_user_input' to WorkflowManager.")
-                      manager_message = {
-                           'type': 'ui_request_user_input',
-                           'question': inner_content.get('question'),
-                           'originating_task_id': inner_content.get('originating_task_id')
-                      }
-                      await self._safe_send_to_manager(manager_message) #[cite: uploaded:SoftwareSim3d/src/agent_base.py]
-                 elif inner_type == 'simulation_end':
-                      logger.info("Messenger relaying CEO 'simulation_end' to WorkflowManager.")
-                      manager_message = {
-                           'type': 'ui_simulation_end',
-                           'success': inner_content.get('success'),
-                           'message': inner_content.get('message')
-                      }
-                      await self._safe_send_to_manager(manager_message) #[cite: uploaded:SoftwareSim3d/src/agent_base.py]
-                 else:
-                      logger.warning(f"Messenger received unhandled inner message type '{inner_type}' from CEO.")
+            elif sender_id == self.ceo_agent_id:
+                inner_content = unwrap_agent_message(content)
+                inner_type = inner_content.get('type') if isinstance(inner_content, dict) else None
+                relay = CEO_TO_UI_RELAY.get(inner_type)
+                if relay:
+                    manager_type, fields = relay
+                    logger.info(f"Messenger relaying CEO '{inner_type}' to WorkflowManager as '{manager_type}'.")
+                    manager_message = {'type': manager_type}
+                    for field in fields: manager_message[field] = inner_content.get(field)
+                    await self._safe_send_to_manager(manager_message) #[cite: uploaded:SoftwareSim3d/src/agent_base.py]
+                else:
+                    logger.warning(f"Messenger received unhandled inner message type '{inner_type}' from CEO.")
 
             # Other messages (e.g., stop_agent) handled by base class
             else:
@@ -6,6 +6,7 @@ from typing import Optional, Dict, Any, Callable, Awaitable, Tuple, Set, List #
 import os
 import time
 from ..agent_base import Agent, STATUS_IDLE, STATUS_WORKING, STATUS_MOVING_TO_ZONE, STATUS_USING_TOOL_IN_ZONE, STATUS_WAITING_RESPONSE, STATUS_FAILED, DEFAULT_DEPENDENCY_TIMEOUT
+from ..simulation.artifact_store import describe_artifact
 from typing import TYPE_CHECKING
 if TYPE_CHECKING:
     from ..llm_integration.api_clients import LLMService
@@ -35,13 +36,27 @@ class ProductManagerAgent(Agent):
             target_desk_position=target_desk_position,
             available_tools=kwargs.get('available_tools'),
             required_tool_zones=kwargs.get('required_tool_zones'),
-            zone_coordinates_map=kwargs.get('zone_coordinates_map')
+            zone_coordinates_map=kwargs.get('zone_coordinates_map'),
+            artifact_store=kwargs.get('artifact_store'), context_archive=kwargs.get('context_archive'),
+            overlap_llm=kwargs.get('overlap_llm', True)
         )
         # --- ADDED: Internal Task Queue ---
         self.task_queue: List[Dict[str, Any]] = []
         # --- END ADDED ---
         logger.info(f"ProductManagerAgent {self.agent_id} initialized.")
 
+    def can_reclaim(self) -> bool:
+        return not self.task_queue and super().can_reclaim()
+
+    def reset_for_run(self):
+        super().reset_for_run(); self.task_queue = []
+
+    def checkpoint_state(self) -> Dict[str, Any]:
+        return {**super().checkpoint_state(), 'task_queue': self.task_queue}
+
+    def restore_checkpoint(self, snapshot: Dict[str, Any]):
+        super().restore_checkpoint(snapshot); self.task_queue = list(snapshot.get('task_queue') or [])
+
     # --- MODIFIED: assign_task adds to queue ---
     async def assign_task(self, task: Dict[str, Any]):
         """
@@ -88,7 +103,7 @@ class ProductManagerAgent(Agent):
         original_request = context.get('original_request', '[Original request not provided]')
 
         project_name = details.get('project_name', '[Unknown Project]')
-        marketing_report = context.get('marketing_report_content', 'Marketing report not available.')
+        marketing_report = self.resolve_artifact(context.get('marketing_report_content'), 'Marketing report not available.')
 
         if task_type == 'define_specifications':
             logger.debug(f"ProductManagerAgent {self.agent_id} using original_request: {original_request}")
@@ -171,7 +186,7 @@ Respond ONLY with the structured webpage specifications in Markdown format. Do n
                 self.task_context[task_id] = context
                 logger.info(f"PM {self.agent_id} waiting for marketing report for task {task_id} (Project: {project_name}). Starting timer.")
                 self.update_state({'current_action': 'waiting_dependency'})
-            elif time.time() - wait_start > DEFAULT_DEPENDENCY_TIMEOUT:
+            elif self.wait_expired(wait_start, DEFAULT_DEPENDENCY_TIMEOUT):
                 error_msg = f"Dependency timeout waiting for marketing report for task {task_id} (Project: {project_name})."
                 logger.error(f"PM {self.agent_id}: {error_msg}")
                 await self._fail_current_task(error_msg)
@@ -218,7 +233,7 @@ Respond ONLY with the structured webpage specifications in Markdown format. Do n
                 logger.info(f"PM {self.agent_id} ready to generate specifications for task {task_id}.")
                 prompt = self.get_prompt(self.current_task, context)
                 if prompt:
-                    if self.get_state('current_action') == 'executing_llm':
+                    if self.get_state('current_action') == 'executing_llm' or self.background_llm_pending(task_id):
                         logger.debug(f"PM {self.agent_id} waiting for LLM response for task {task_id}.")
                         return {'action': 'wait'}
                     logger.info(f"PM {self.agent_id} initiating LLM call for task {task_id}.")
@@ -253,7 +268,7 @@ Respond ONLY with the structured webpage specifications in Markdown format. Do n
                     logger.info(f"PM {self.agent_id} deciding to save specifications for task {task_id}.")
                     page_context_name = task_details.get('page_name', task_details.get('description', f"task_{task_id[:8]}"))
                     specifications_filename = f"{project_name}/ProductManager/specs_{self._sanitize_filename(page_context_name)}.md"
-                    return {'action': 'use_tool', 'tool_name': 'file_write', 'params': {'filename': specifications_filename, 'content': specs_content}}
+                    return {'action': 'use_tool', 'tool_name': 'file_write', 'params': {'filename': specifications_filename, 'content': self.store_artifact(specs_content, kind='specifications')}}
                 else:
                     logger.debug(f"PM {self.agent_id} already processing file_write for task {task_id}, waiting.")
                     return {'action': 'wait'}
@@ -363,9 +378,10 @@ Respond ONLY with the structured webpage specifications in Markdown format. Do n
                 self.task_context[task_id]['read_successful'] = True
                 move_back_to_desk = True
                 logger.info(f"Marketing report read: {read_filename}")
-                logger.info(f"PM {self.agent_id} marketing report content: {self.task_context[task_id]['marketing_report_content']}")
+                logger.info(f"PM {self.agent_id} marketing report content: {describe_artifact(self.task_context[task_id]['marketing_report_content'])}")
                 thought = 'Report read. Returning to Desk.'
                 success = True
+                if self.start_background_llm(self.get_prompt(self.current_task, self.task_context[task_id])): thought = 'Report read. Drafting specifications while returning to Desk.'
             else:
                 error_msg = f"File read failed: {result.get('result') if isinstance(result,dict) else result}"
                 logger.error(f"PM {self.agent_id}: {error_msg}")
@@ -405,10 +421,6 @@ Respond ONLY with the structured webpage specifications in Markdown format. Do n
 
     async def _handle_agent_specific_message(self, sender_id: str, message_data: Any):
         """Handles messages specifically relevant to the PM agent."""
-        # Check if the message is wrapped in an outer 'agent_message'
-        if isinstance(message_data, dict) and 'message_data' in message_data:
-            message_data = message_data['message_data']
-            logger.info(f"PM {self.agent_id} received wrapped message from {sender_id}: {message_data}")
         if not isinstance(message_data, dict):
             logger.error(f"PM {self.agent_id} received invalid message format from {sender_id}: {message_data}")
             await super()._handle_agent_specific_message(sender_id, message_data)
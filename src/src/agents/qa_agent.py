@@ -1,14 +1,19 @@
 # SoftwareSim3d/src/agents/qa_agent.py
 
 import asyncio
+import difflib
+import hashlib
 import logging
 import json
 import re
-from typing import Optional, Dict, Any, Callable, Awaitable, Tuple, Set
+from typing import Optional, Dict, Any, Callable, Awaitable, Tuple, Set, List, Union
 import os
 
 # Import base class and constants/types
 from ..agent_base import Agent  # Base Agent class
+from ..simulation.artifact_store import is_artifact_handle, HANDLE_KEY
+from ..simulation.deadline import LEVEL_TIGHT, LEVEL_CRITICAL
+from ..simulation.static_checks import StaticCheckReport, check_page, linked_asset_paths, page_selectors
 from ..simulation.task import Task  # Task class if used
 
 logger = logging.getLogger(__name__)
@@ -17,6 +22,20 @@ logger = logging.getLogger(__name__)
 SAVE_ZONE_NAME = "SAVE_ZONE"
 QA_DESK_ZONE_NAME = "QA_DESK"  # Assuming QA has its own desk
 
+SECTIONED_REVIEW_MIN_CHARS = 12000 # Pages (HTML + CSS + JS) at least this large are reviewed in concurrent sections; so are multi-page sites
+SECTION_TITLES = {'structure': 'Structure and content', 'styling': 'Styling vs. specifications', 'behaviour': 'JavaScript behaviour'} # Plus 'page:<file>' per extra page
+INCREMENTAL_MAX_CHANGE_RATIO = 0.5 # A re-review sends diffs only while at most this share of the changed files' lines changed
+DIFF_CONTEXT_LINES = 3
+SECTION_RETRIES = 1 # Immediate retries of section calls that failed; still-missing sections are requested again by the decision loop
+REVIEW_RESPONSE_FORMAT = """**Your response MUST be in this exact JSON format:**
+{
+  "requires_fix": boolean,
+  "feedback": "Detailed explanation of issues found or confirmation that the code meets all requirements"
+}"""
+
+def section_title(section: str) -> str:
+    return SECTION_TITLES.get(section) or f"Page {section.split(':', 1)[-1]}"
+
 class QAAgent(Agent):
     """
     The QA agent reviews code produced by the Coder agent,
@@ -46,7 +65,9 @@ class QAAgent(Agent):
             llm_model_name=kwargs.get('llm_model_name'),
             available_tools=kwargs.get('available_tools'),
             required_tool_zones=kwargs.get('required_tool_zones'),
-            zone_coordinates_map=kwargs.get('zone_coordinates_map')
+            zone_coordinates_map=kwargs.get('zone_coordinates_map'),
+            artifact_store=kwargs.get('artifact_store'), context_archive=kwargs.get('context_archive'),
+            overlap_llm=kwargs.get('overlap_llm', True)
         )
         
         # Store any QA-specific attributes
@@ -72,8 +93,20 @@ class QAAgent(Agent):
         if not self.ceo_agent_id:
             logger.warning(f"{self.agent_id}: Initialized without ceo_agent_id! Approval notification will fail.")
             
+        # Last LLM review per reviewed page, for re-reviews after a fix: {page: {'files': {path: content handle}, 'digests': {path: sha256}, 'requires_fix', 'feedback', 'section_reviews'}}
+        self.review_history: Dict[str, Dict[str, Any]] = {}
+
         logger.info(f"QAAgent {self.agent_id} initialized. Reporting to Coder: {self.coder_lead_id}, Notifying CEO: {self.ceo_agent_id}")
     
+    def reset_for_run(self):
+        super().reset_for_run(); self.review_history = {}
+
+    def checkpoint_state(self) -> Dict[str, Any]:
+        return {**super().checkpoint_state(), 'review_history': self.review_history}
+
+    def restore_checkpoint(self, snapshot: Dict[str, Any]):
+        super().restore_checkpoint(snapshot); self.review_history = snapshot.get('review_history') or {}
+
     # --- Implement abstract method from base Agent class ---
     def get_prompt(self, task_details: Dict[str, Any], context: Dict[str, Any]) -> Optional[str]:
         """Generates the LLM prompt for the QA task."""
@@ -81,12 +114,25 @@ class QAAgent(Agent):
         details = task_details.get('details', {})
         description = task_details.get('description', '')
         project_name = details.get('project_name', '[Unknown Project]')
-        code_to_review = context.get('code_to_review', 'No code content available.')
-        specifications = context.get('specifications_content', None)
+        # File contents arrive as artifact handles; resolve them only here, when the prompt is built
+        code_to_review = self.resolve_artifact(context.get('code_to_review'), 'No code content available.')
+        specifications = self.resolve_artifact(context.get('specifications_content'), None)
+        static_checks = context.get('static_checks')
 
         # Check if this is a code review task
         if task_type == 'review_code' or "review code" in description.lower() or "qa check" in description.lower():
             spec_section = f"\n\n--- SPECIFICATIONS ---\n{specifications}\n--- END SPECIFICATIONS ---" if specifications else "\n\n--- NOTE: Specs not provided or read yet. ---"
+            if static_checks: # The parser-level checks already ran: hand over their results instead of asking for them again
+                structure_section = f"""1. **Structural Completeness:** covered by the automated checks below; do not repeat them.
+
+--- AUTOMATED CHECKS ---
+{StaticCheckReport.from_dict(static_checks).prompt_section()}
+--- END AUTOMATED CHECKS ---"""
+            else:
+                structure_section = """1. **Structural Completeness:**
+   - Verify all required HTML tags are present and properly closed
+   - Check if the document has proper structure (DOCTYPE, html, head, body)
+   - Identify any abrupt endings or truncated sections"""
 
             # Enhanced prompt for more thorough review
             prompt = f"""You are a QA Engineer reviewing code for project '{project_name}'. Your job is to thoroughly analyze the following code against the provided specifications.
@@ -100,10 +146,7 @@ Filename: {details.get('code_filename_to_review', 'N/A')}
 
 Please conduct a comprehensive review checking for:
 
-1. **Structural Completeness:**
-   - Verify all required HTML tags are present and properly closed
-   - Check if the document has proper structure (DOCTYPE, html, head, body)
-   - Identify any abrupt endings or truncated sections
+{structure_section}
 
 2. **Specification Compliance:**
    - Compare the code against ALL requirements in the specifications
@@ -121,11 +164,7 @@ Please conduct a comprehensive review checking for:
    - Verify responsive design implementation
    - Assess accessibility features
 
-**Your response MUST be in this exact JSON format:**
-{{
-  "requires_fix": boolean,
-  "feedback": "Detailed explanation of issues found or confirmation that the code meets all requirements"
-}}
+{REVIEW_RESPONSE_FORMAT}
 
 Set "requires_fix" to true if ANY of these conditions are met:
 - The code is incomplete (missing closing tags, abrupt endings)
@@ -171,7 +210,9 @@ Be extremely thorough and detail-oriented in your assessment. Your feedback will
                 logger.info(f"{self.agent_id}: Need to read specs file: {file_to_read}")
             
             # Trigger file read if needed
-            if file_to_read:
+            if not file_to_read and self._unread_page_files(context):
+                await self._read_page_files(context)
+            elif file_to_read:
                 logger.info(f"{self.agent_id}: Arrived at {SAVE_ZONE_NAME}, initiating read for {file_to_read}.")
                 # Use execute_action to trigger tool use
                 await self.execute_action({
@@ -182,10 +223,7 @@ Be extremely thorough and detail-oriented in your assessment. Your feedback will
             else:
                 logger.debug(f"{self.agent_id}: Arrived at {SAVE_ZONE_NAME}, but no immediate file read needed.")
                 # Check if we should return to desk
-                has_code = 'code_to_review' in context
-                has_specs = 'specifications_content' in context or not specs_filename_rel
-                
-                if has_code and has_specs:
+                if self._files_read(context, details):
                     logger.info(f"{self.agent_id}: All files read. Moving back to desk to process.")
                     # Move back to desk to process files
                     await self.execute_action({
@@ -196,20 +234,19 @@ Be extremely thorough and detail-oriented in your assessment. Your feedback will
         # Handle arrival at QA_DESK
         elif zone == QA_DESK_ZONE_NAME:
             # Check if we need to call LLM for review
-            has_code = 'code_to_review' in context
-            has_specs = 'specifications_content' in context or not details.get('specifications_filename')
+            files_read = self._files_read(context, details)
             llm_review_complete = 'qa_feedback' in context
             
-            if has_code and has_specs and not llm_review_complete:
+            if files_read and not llm_review_complete and self.background_llm_pending(task_id):
+                logger.info(f"{self.agent_id}: At desk; LLM review started at {SAVE_ZONE_NAME} is still running.")
+            elif files_read and not llm_review_complete:
                 logger.info(f"{self.agent_id}: At desk with all files read. Initiating LLM review.")
-                prompt = self.get_prompt(self.current_task, context)
-                if prompt:
+                await self._prefetch_review_inputs(context, details)
+                review_action = self._review_action(context)
+                if review_action:
                     context['step'] = 'calling_llm'
                     self.task_context[task_id] = context
-                    await self.execute_action({
-                        'action': 'use_llm', 
-                        'prompt': prompt
-                    })
+                    await self.execute_action(review_action)
             elif llm_review_complete and not context.get('notification_sent'):
                 logger.info(f"{self.agent_id}: At desk with review complete. Ready to send notification.")
                 # _decide_next_action will handle sending the notification
@@ -254,7 +291,7 @@ Be extremely thorough and detail-oriented in your assessment. Your feedback will
         # --- State Checks ---
         has_code_content = 'code_to_review' in context
         has_specs_content = 'specifications_content' in context or not specs_filename_rel  # True if specs read or not needed
-        read_files_complete = has_code_content and has_specs_content
+        read_files_complete = self._files_read(context, details)
         llm_review_complete = 'qa_feedback' in context
         notification_sent = context.get('notification_sent', False)  # Check if notification was sent
 
@@ -277,22 +314,34 @@ Be extremely thorough and detail-oriented in your assessment. Your feedback will
                     context['step'] = 'reading_files'
                     self.task_context[task_id] = context
                     return {'action': 'use_tool', 'tool_name': 'file_read', 'params': {'filename': file_to_read}}
+                if self._unread_page_files(context):
+                    await self._read_page_files(context)
+                    return {'action': 'wait', 'reason': 'waiting_for_page_file_reads'}
                 
                 return {'action': 'wait', 'reason': 'waiting_for_file_read_trigger'}
 
-        # 2. Call LLM if files are ready and review not done
+        # 2. Call LLM if files are ready and review not done (static check errors are the review result on their own)
+        if read_files_complete and not llm_review_complete: await self._prefetch_review_inputs(context, details) # Checks and prompts resolve from the cache
+        if read_files_complete and 'static_checks' not in context:
+            llm_review_complete = not self._pre_review(context, details)
+        if read_files_complete and not llm_review_complete and not self.background_llm_pending(task_id) and self.deadline_at_least(LEVEL_CRITICAL):
+            logger.warning(f"{self.agent_id}: Run deadline is critical, skipping the LLM review of task {task_id}.")
+            context['qa_feedback'] = "Review skipped: the run's deadline was nearly reached."; context['requires_fix'] = False
+            context['step'] = 'llm_review_processed'; llm_review_complete = True
         if read_files_complete and not llm_review_complete:
+            if self.background_llm_pending(task_id):
+                return {'action': 'wait', 'reason': 'waiting_for_background_llm_review'}
             # Need to be at desk to do LLM review
             if current_zone != QA_DESK_ZONE_NAME:
                 logger.info(f"{self.agent_id}: Files read complete, moving to {QA_DESK_ZONE_NAME} for review.")
                 return {'action': 'move_to_zone', 'zone_name': QA_DESK_ZONE_NAME}
             else:
                 # At desk, call LLM
-                prompt = self.get_prompt(self.current_task, context)
-                if prompt:
+                review_action = self._review_action(context)
+                if review_action:
                     context['step'] = 'calling_llm'
                     self.task_context[task_id] = context
-                    return {'action': 'use_llm', 'prompt': prompt}
+                    return review_action
                 else:
                     return {'action': 'fail_task', 'error': 'Could not generate LLM prompt for QA review.'}
 
@@ -305,6 +354,10 @@ Be extremely thorough and detail-oriented in your assessment. Your feedback will
 
             # At Desk, prepare notification
             requires_fix = context.get('requires_fix', True)  # Default true if key missing
+            if requires_fix and self.deadline_at_least(LEVEL_TIGHT): # No time for another fix/review round: ship with the findings noted
+                logger.warning(f"{self.agent_id}: Run deadline is tight, accepting task {task_id} without a fix round.")
+                requires_fix = False; context['requires_fix'] = False
+                context['qa_feedback'] = f"Accepted without fixes (run deadline). Open findings: {context.get('qa_feedback', '')}"
             feedback = context.get('qa_feedback', 'Feedback unavailable.')
             reviewed_code_filename = details.get('code_filename_to_review')
             original_code_task_id = details.get('original_code_task_id')
@@ -322,7 +375,7 @@ Be extremely thorough and detail-oriented in your assessment. Your feedback will
                     'source_task_id': task_id,
                     'original_code_task_id': original_code_task_id,
                     'requires_fix': True,
-                    'feedback': feedback,
+                    'feedback': self.store_artifact(feedback, kind='qa_feedback'),
                     'failed_code_filename': reviewed_code_filename,
                     'specifications_filename': specs_filename,
                     'project_name': details.get('project_name', 'Unknown Project')
@@ -354,8 +407,8 @@ Be extremely thorough and detail-oriented in your assessment. Your feedback will
             return {'action': 'send_message_to_agent', 'target_agent_id': target_agent_id, 'message_data': wrapped_message_data}
 
         # --- STEP 4: Complete Task if notification was successfully sent ---
-        # Rely ONLY on the 'current_action' state updated by the base class after send succeeds
-        if self.get_state('current_action') == 'message_sent':
+        # The send marks notification_sent; a later arrival or tool result may already have replaced current_action
+        if notification_sent or self.get_state('current_action') == 'message_sent':
             # Check context again to ensure we were indeed trying to send
             if context.get('step') == 'sending_notification':
                  logger.info(f"{self.agent_id}: Detected message was sent successfully. Completing task {task_id}.")
@@ -386,6 +439,18 @@ Be extremely thorough and detail-oriented in your assessment. Your feedback will
         context = self.task_context[task_id]
         logger.info(f"{self.agent_id}: Processing LLM review response for task {task_id}.")
 
+        requires_fix, feedback, error_msg = self._parse_review(llm_response)
+        context['qa_feedback'] = feedback
+        context['requires_fix'] = requires_fix
+        context['step'] = 'llm_review_processed'  # Update step (also after a parse error, which counts as a failed review)
+        if error_msg: context['error_details'] = error_msg  # Store error detail
+        else: logger.info(f"{self.agent_id}: QA Review Parsed for task {task_id}: Requires Fix = {requires_fix}"); self._record_review(context)
+
+        self.task_context[task_id] = context
+        self.update_state({'current_action': 'processed_llm_response', 'current_thoughts': 'LLM review processed.'})
+
+    def _parse_review(self, llm_response: str) -> Tuple[bool, str, Optional[str]]:
+        """(requires_fix, feedback, parse error or None) of a review response."""
         try:
             # Enhanced regex to find JSON block, even with leading/trailing text
             json_match = re.search(r'\{[\s\S]*\}', llm_response)
@@ -405,29 +470,17 @@ Be extremely thorough and detail-oriented in your assessment. Your feedback will
                 if requires_fix is None:
                     requires_fix = any(word in feedback.lower() for word in ["fail", "bug", "error", "incomplete", "fix", "issue"])
                 logger.warning(f"{self.agent_id}: Fallback extraction: requires_fix={requires_fix}")
-                # Ensure requires_fix is boolean
-                requires_fix = bool(requires_fix)
 
             # Explicitly check for incompleteness hints from LLM
             if isinstance(feedback, str) and ("incomplete" in feedback.lower() or "cut off" in feedback.lower() or "missing closing tag" in feedback.lower()):
-                logger.warning(f"{self.agent_id}: LLM feedback explicitly mentions incompleteness for task {task_id}. Forcing requires_fix=True.")
+                logger.warning(f"{self.agent_id}: LLM feedback explicitly mentions incompleteness. Forcing requires_fix=True.")
                 requires_fix = True
-
-            context['qa_feedback'] = feedback
-            context['requires_fix'] = bool(requires_fix)  # Ensure boolean
-            context['step'] = 'llm_review_processed'  # Update step
-            logger.info(f"{self.agent_id}: QA Review Parsed for task {task_id}: Requires Fix = {context['requires_fix']}")
+            return bool(requires_fix), feedback, None  # Ensure boolean
 
         except (json.JSONDecodeError, ValueError) as e:
             error_msg = f"Failed to parse QA LLM JSON: {e}. Response: {llm_response[:300]}..."
             logger.error(f"{self.agent_id}: {error_msg}")
-            context['qa_feedback'] = f"Error: LLM response parsing failed ({e}). Treating as failed review.\nRaw: {llm_response}"
-            context['requires_fix'] = True  # Default fix on error
-            context['step'] = 'llm_review_processed'  # Still processed, but with error state noted implicitly
-            context['error_details'] = error_msg  # Store error detail
-
-        self.task_context[task_id] = context
-        self.update_state({'current_action': 'processed_llm_response', 'current_thoughts': 'LLM review processed.'})
+            return True, f"Error: LLM response parsing failed ({e}). Treating as failed review.\nRaw: {llm_response}", error_msg  # Default fix on error
 
     async def _process_tool_result(self, tool_name: str, result: Any):
         """Processes the result from a tool execution."""
@@ -442,12 +495,22 @@ Be extremely thorough and detail-oriented in your assessment. Your feedback will
             
         context = self.task_context[task_id]
         details = self.current_task.get('details', {})
+        if tool_name == 'file_read' and 'static_checks' in context: # A late duplicate read; the review already started on the files read first
+            logger.debug(f"{self.agent_id}: Ignoring late file_read result for task {task_id}."); return
 
         logger.info(f"{self.agent_id}: Processing result for tool '{tool_name}'. Task: {task_id}.")
         success = False
         error_details = None
 
-        if tool_name == 'file_read':
+        requested_filename = ((result.get('request') or {}).get('filename') or result.get('filename')) if isinstance(result, dict) else None
+        page_files = next((files for files in (context.get('linked_assets', {}), context.get('site_pages', {})) if requested_filename in files), None)
+        if tool_name == 'file_read' and page_files is not None:
+            # A linked stylesheet/script or page that cannot be read is a finding of the static checks, not a failed task
+            if result.get('status') == 'success': page_files[requested_filename] = result.get('content', '')
+            else: page_files[requested_filename] = False; logger.warning(f"{self.agent_id}: '{requested_filename}' could not be read: {result.get('result')}")
+            success = True
+            if self._files_read(context, details): await self._prefetch_review_inputs(context, details); self._on_files_read(task_id, context, details)
+        elif tool_name == 'file_read':
             code_filename_rel = details.get('code_filename_to_review')
             specs_filename_rel = details.get('specifications_filename')
 
@@ -457,6 +520,9 @@ Be extremely thorough and detail-oriented in your assessment. Your feedback will
 
                 if read_filename == code_filename_rel:
                     context['code_to_review'] = content
+                    if 'linked_assets' not in context: # A duplicate read of the page keeps the assets and pages already read
+                        context['linked_assets'] = {path: None for path in linked_asset_paths(await self.resolve_artifact_async(content, ''), code_filename_rel)} # Read next, for the static checks
+                        context['site_pages'] = {path: None for path in details.get('site_page_filenames', []) if path != code_filename_rel} # The site's other pages
                     logger.debug(f"{self.agent_id}: Stored code content for {read_filename}.")
                 elif read_filename == specs_filename_rel:
                     context['specifications_content'] = content
@@ -468,19 +534,11 @@ Be extremely thorough and detail-oriented in your assessment. Your feedback will
                 has_code = 'code_to_review' in context
                 has_specs = 'specifications_content' in context or not specs_filename_rel  # Specs are ready if read or not required
 
-                if has_code and has_specs:
-                    context['step'] = 'files_read_complete'
-                    logger.info(f"{self.agent_id}: All required files read for task {task_id}.")
-                    
-                    # Trigger move back to desk now that files are read
-                    current_zone = self.get_state('current_zone')
-                    if current_zone == SAVE_ZONE_NAME:
-                        logger.info(f"{self.agent_id}: All files read, scheduling move back to desk.")
-                        # Schedule a move back to desk to continue processing
-                        self.loop.create_task(self.execute_action({
-                            'action': 'move_to_zone', 
-                            'zone_name': QA_DESK_ZONE_NAME
-                        }))
+                if self._files_read(context, details):
+                    await self._prefetch_review_inputs(context, details); self._on_files_read(task_id, context, details)
+                elif has_code and has_specs: # Only the linked stylesheets/scripts and other pages are left
+                    if self.get_state('current_zone') == SAVE_ZONE_NAME: context['step'] = 'reading_page_files'; self.spawn_task(self._read_page_files(context))
+                    else: context['step'] = 'files_read_partially'
                 else:
                     context['step'] = 'files_read_partially'  # Still need more files
                     logger.info(f"{self.agent_id}: Read {read_filename}, still waiting for other files for task {task_id}.")
@@ -499,7 +557,7 @@ Be extremely thorough and detail-oriented in your assessment. Your feedback will
                     if more_to_read and file_to_read and self.get_state('current_zone') == SAVE_ZONE_NAME:
                         logger.info(f"{self.agent_id}: Immediately reading next required file: {file_to_read}")
                         # Schedule immediate read of next file
-                        self.loop.create_task(self.execute_action({
+                        self.spawn_task(self.execute_action({
                             'action': 'use_tool',
                             'tool_name': 'file_read',
                             'params': {'filename': file_to_read}
@@ -525,6 +583,272 @@ Be extremely thorough and detail-oriented in your assessment. Your feedback will
             'current_thoughts': f"Tool {tool_name} processed ({'Success' if success else 'Failure'})."
         })
 
+    # --- Static checks ---
+    def _unread_page_files(self, context: Dict[str, Any]) -> List[str]:
+        return [path for files in (context.get('linked_assets', {}), context.get('site_pages', {})) for path, content in files.items() if content is None]
+
+    def _files_read(self, context: Dict[str, Any], details: Dict[str, Any]) -> bool:
+        """Code, specs (if any), the page's linked stylesheets/scripts and the site's other pages have all been read (or found missing)."""
+        has_specs = 'specifications_content' in context or not details.get('specifications_filename')
+        return 'code_to_review' in context and has_specs and not self._unread_page_files(context)
+
+    async def _read_page_files(self, context: Dict[str, Any]):
+        """Reads every linked stylesheet/script and other page still unread, and not already requested, in one batch at the save zone."""
+        requested = context.setdefault('page_reads_requested', [])
+        unread = [path for path in self._unread_page_files(context) if path not in requested]
+        context['step'] = 'reading_page_files'
+        if not unread: return
+        requested.extend(unread)
+        for path in unread: self.queue_tool_op('file_read', {'filename': path})
+        logger.info(f"{self.agent_id}: Reading {len(unread)} linked file(s)/page(s): {unread}")
+        await self.flush_tool_ops(self.required_tool_zones.get('file_read', SAVE_ZONE_NAME))
+
+    def _run_static_checks(self, context: Dict[str, Any], details: Dict[str, Any]) -> StaticCheckReport:
+        """Checks the page locally before the LLM review. Errors become the review result, without an LLM call."""
+        assets = {path: None if content is False else self.resolve_artifact(content, '') for path, content in context.get('linked_assets', {}).items()}
+        report = check_page(self.resolve_artifact(context.get('code_to_review'), ''), details.get('code_filename_to_review') or '', assets)
+        for path, content in context.get('site_pages', {}).items(): # The shared CSS/JS were checked with the main page
+            if content is False: report.errors.append(f"Page '{path}' does not exist."); continue
+            report.errors.extend(f"{path}: {error}" for error in check_page(self.resolve_artifact(content, ''), path).errors)
+        context['static_checks'] = report.to_dict()
+        if not report.ok:
+            logger.info(f"{self.agent_id}: Static checks found {len(report.errors)} error(s); sending them back without an LLM review.")
+            context['qa_feedback'] = report.feedback(); context['requires_fix'] = True; context['step'] = 'llm_review_processed'
+        return report
+
+    async def _prefetch_review_inputs(self, context: Dict[str, Any], details: Dict[str, Any]):
+        """Caches what the checks and review prompts resolve (the page, its assets and pages, the last review's files) off the loop."""
+        previous = self.review_history.get(details.get('code_filename_to_review')) or {}
+        await self.prefetch_artifacts(list(self._review_inputs(context, details).values()) + list(previous.get('files', {}).values()))
+
+    def _on_files_read(self, task_id: str, context: Dict[str, Any], details: Dict[str, Any]):
+        """All inputs are in: run the static checks, start the LLM review if still needed, and head back to the desk."""
+        context['step'] = 'files_read_complete'
+        logger.info(f"{self.agent_id}: All required files read for task {task_id}.")
+        # The review only depends on the files: start it now and let the walk back to the desk overlap it
+        if self._pre_review(context, details) and self.start_background_llm(self._review_request(context)): context['step'] = 'calling_llm'
+        if self.get_state('current_zone') == SAVE_ZONE_NAME:
+            logger.info(f"{self.agent_id}: All files read, scheduling move back to desk.")
+            self.spawn_task(self.execute_action({'action': 'move_to_zone', 'zone_name': QA_DESK_ZONE_NAME}))
+
+    def _pre_review(self, context: Dict[str, Any], details: Dict[str, Any]) -> bool:
+        """Static checks, then the unchanged-page shortcut. True while an LLM review is still needed."""
+        return self._run_static_checks(context, details).ok and not self._reuse_unchanged_review(context, details)
+
+    # --- Incremental re-review ---
+    def _review_inputs(self, context: Dict[str, Any], details: Dict[str, Any]) -> Dict[str, Any]:
+        """Every file the review covers: path -> content (handle or text)."""
+        inputs = {details.get('code_filename_to_review'): context.get('code_to_review'), details.get('specifications_filename'): context.get('specifications_content')}
+        for files in (context.get('linked_assets', {}), context.get('site_pages', {})): inputs.update({path: content for path, content in files.items() if content})
+        return {path: content for path, content in inputs.items() if path and content is not None}
+
+    @staticmethod
+    def _digest(content: Any) -> str:
+        if is_artifact_handle(content): return content[HANDLE_KEY] # Handles are content addressed already
+        return hashlib.sha256(str(content).encode('utf-8')).hexdigest()
+
+    def _previous_review(self, context: Dict[str, Any], details: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+        """Last review of this page, if its specifications are unchanged (new requirements need a full review)."""
+        previous = self.review_history.get(details.get('code_filename_to_review'))
+        specs_filename = details.get('specifications_filename')
+        if not previous or (specs_filename and previous['digests'].get(specs_filename) != self._digest(context.get('specifications_content'))): return None
+        return previous
+
+    def _changed_paths(self, previous: Dict[str, Any], inputs: Dict[str, Any], paths: Optional[List[str]] = None) -> List[str]:
+        return [path for path in (inputs if paths is None else paths) if path in inputs and previous['digests'].get(path) != self._digest(inputs[path])]
+
+    def _reuse_unchanged_review(self, context: Dict[str, Any], details: Dict[str, Any]) -> bool:
+        """
+        Nothing the review covers changed since the last review of this page: its result stands, no LLM call. A sectioned
+        review only counts if it covered every section this review has; otherwise the missing ones are reviewed.
+        """
+        previous = self._previous_review(context, details); inputs = self._review_inputs(context, details)
+        if not previous or set(previous['digests']) != set(inputs) or self._changed_paths(previous, inputs): return False
+        if previous.get('section_reviews') and not set(self._section_plan(context, details)[0]) <= set(previous['section_reviews']): return False
+        logger.info(f"{self.agent_id}: {details.get('code_filename_to_review')} is unchanged since its last review; reusing the result (Requires Fix = {previous['requires_fix']}).")
+        context['qa_feedback'] = f"Unchanged since the last review; its findings still apply.\n\n{previous['feedback']}" if previous['requires_fix'] else previous['feedback']
+        context['requires_fix'] = previous['requires_fix']; context['section_reviews'] = dict(previous.get('section_reviews') or {})
+        context['review_mode'] = 'unchanged'; context['step'] = 'llm_review_processed'
+        return True
+
+    def _diffs_since(self, previous: Dict[str, Any], inputs: Dict[str, Any], paths: List[str]) -> Optional[str]:
+        """Unified diffs of paths against the last review, or None when too much changed for a diff-only review."""
+        diffs = []; changed_lines = 0; total_lines = 0
+        for path in paths:
+            old_lines = self.resolve_artifact(previous['files'].get(path), '').splitlines()
+            new_lines = self.resolve_artifact(inputs[path], '').splitlines()
+            diff = list(difflib.unified_diff(old_lines, new_lines, f"{path} (last review)", f"{path} (now)", n=DIFF_CONTEXT_LINES, lineterm=''))
+            changed_lines += sum(1 for line in diff[2:] if line[:1] in '+-'); total_lines += max(len(old_lines), len(new_lines), 1)
+            diffs.append("\n".join(diff))
+        if changed_lines > INCREMENTAL_MAX_CHANGE_RATIO * total_lines: return None
+        return "\n\n".join(diffs)
+
+    def _re_review_prompt(self, scope: str, previous_feedback: str, diffs: str, unchanged: List[str]) -> str:
+        project_name = (self.current_task or {}).get('details', {}).get('project_name', '[Unknown Project]')
+        unchanged_note = f" These files are unchanged and need no new review: {', '.join(unchanged)}." if unchanged else ""
+        return f"""You are a QA Engineer re-reviewing {scope} of project '{project_name}' after a fix round. You reviewed it before; below are your previous findings and the changes made since.{unchanged_note}
+
+--- PREVIOUS FINDINGS ---
+{previous_feedback or 'No issues were reported.'}
+--- END PREVIOUS FINDINGS ---
+
+--- CHANGES SINCE THE LAST REVIEW (unified diff) ---
+{diffs}
+--- END CHANGES ---
+
+Check only:
+1. Which previously reported issues these changes fix, and which remain.
+2. Whether the changes introduce new problems (broken structure, bugs, regressions).
+
+{REVIEW_RESPONSE_FORMAT}
+
+Set "requires_fix" to true if any previously reported issue remains or the changes introduce a new problem; list those in "feedback"."""
+
+    def _incremental_prompt(self, context: Dict[str, Any]) -> Optional[str]:
+        """Diff-only re-review prompt for a page reviewed before in one piece; None when a full review is needed."""
+        details = (self.current_task or {}).get('details', {})
+        previous = self._previous_review(context, details)
+        if not previous or previous.get('section_reviews'): return None
+        inputs = self._review_inputs(context, details); changed = self._changed_paths(previous, inputs)
+        diffs = self._diffs_since(previous, inputs, changed) if changed else None
+        if not diffs: return None
+        context['review_mode'] = 'incremental'
+        logger.info(f"{self.agent_id}: Re-reviewing only the changes to {changed}.")
+        return self._re_review_prompt("the code", previous['feedback'], diffs, [path for path in inputs if path not in changed])
+
+    def _record_review(self, context: Dict[str, Any]):
+        details = (self.current_task or {}).get('details', {}); page = details.get('code_filename_to_review')
+        if not page: return
+        inputs = self._review_inputs(context, details)
+        self.review_history[page] = {'files': inputs, 'digests': {path: self._digest(content) for path, content in inputs.items()},
+                                     'requires_fix': bool(context.get('requires_fix')), 'feedback': context.get('qa_feedback', ''),
+                                     'section_reviews': dict(context.get('section_reviews') or {})}
+
+    # --- Sectioned review ---
+    def _review_request(self, context: Dict[str, Any]) -> Union[str, Dict[str, str], None]:
+        """Section prompts, a diff-only re-review prompt or the full review prompt, in that order of preference."""
+        sections = self._review_sections(context)
+        if sections: context['section_prompts'] = sections; return sections # Kept for retries of failed sections
+        return self._incremental_prompt(context) or self.get_prompt(self.current_task, context)
+
+    def _review_action(self, context: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+        review = self._review_request(context)
+        if isinstance(review, dict): return {'action': 'use_llm_sections', 'prompts': review}
+        return {'action': 'use_llm', 'prompt': review} if review else None
+
+    def _review_sections(self, context: Dict[str, Any]) -> Dict[str, str]:
+        """
+        Independent review prompts (structure, styling, JS behaviour, one per extra page) for a large page or a multi-page
+        site; they run as concurrent LLM calls. Empty when the page is small enough for the single review prompt.
+        """
+        details = (self.current_task or {}).get('details', {})
+        sections, section_files = self._section_plan(context, details)
+        if not sections: return {}
+        sections = self._incremental_sections(context, details, sections, section_files)
+        answered = context.get('answered_sections') or {} # Answered by an earlier, incomplete attempt of this review
+        return {section: prompt for section, prompt in sections.items() if section not in answered} or sections
+
+    def _section_plan(self, context: Dict[str, Any], details: Dict[str, Any]) -> Tuple[Dict[str, str], Dict[str, List[str]]]:
+        """Full prompt per section and the files each section covers; ({}, {}) for a single-prompt review."""
+        html = self.resolve_artifact(context.get('code_to_review'), '')
+        assets = {path: self.resolve_artifact(content, '') for path, content in context.get('linked_assets', {}).items() if content}
+        pages = {path: self.resolve_artifact(content, '') for path, content in context.get('site_pages', {}).items() if content}
+        if not pages and len(html) + sum(len(content) for content in assets.values()) < SECTIONED_REVIEW_MIN_CHARS: return {}, {}
+        css = "\n\n".join(f"/* {path} */\n{content}" for path, content in assets.items() if path.endswith('.css'))
+        js = "\n\n".join(f"// {path}\n{content}" for path, content in assets.items() if not path.endswith('.css'))
+        ids, classes = set(), set()
+        for page_html in [html] + list(pages.values()):
+            page_ids, page_classes = page_selectors(page_html); ids.update(page_ids); classes.update(page_classes)
+        selectors = f"Element ids in the pages: {', '.join(sorted(ids)) or 'none'}\nClasses in the pages: {', '.join(sorted(classes)) or 'none'}"
+        static_checks = context.get('static_checks')
+        checks = f"\n\n--- AUTOMATED CHECKS ---\n{StaticCheckReport.from_dict(static_checks).prompt_section()}\n--- END AUTOMATED CHECKS ---" if static_checks else ""
+        section_files = {'structure': [details.get('code_filename_to_review')], 'styling': [path for path in assets if path.endswith('.css')],
+                         'behaviour': [path for path in assets if not path.endswith('.css')], **{f"page:{path}": [path] for path in pages}}
+        sections = {'structure': self._section_prompt(context, 'structure', f"Filename: {details.get('code_filename_to_review', 'N/A')}\n{html}{checks}",
+                        "HTML structure and semantics, that every section and piece of content the specifications ask for is present, navigation, accessibility.")}
+        if css: sections['styling'] = self._section_prompt(context, 'styling', f"{css}\n\n{selectors}",
+                    "Colors, typography, layout and responsiveness against the specifications; rules whose selectors match nothing in the pages.")
+        if js: sections['behaviour'] = self._section_prompt(context, 'behaviour', f"{js}\n\n{selectors}",
+                    "That all JavaScript functionality in the specifications is implemented, event handling and DOM access, logic errors and runtime errors.")
+        for path, page_html in pages.items():
+            sections[f"page:{path}"] = self._section_prompt(context, f"page:{path}", f"Filename: {path}\n{page_html}",
+                "This page's structure and content against the specifications, and its links to the other pages.")
+        return sections, section_files
+
+    def _incremental_sections(self, context: Dict[str, Any], details: Dict[str, Any], sections: Dict[str, str], section_files: Dict[str, List[str]]) -> Dict[str, str]:
+        """After a sectioned review: sections whose files are unchanged keep their last result, changed ones get diff-only prompts."""
+        previous = self._previous_review(context, details)
+        if not previous or not previous.get('section_reviews'): return sections
+        inputs = self._review_inputs(context, details); reused: Dict[str, Dict[str, Any]] = {}; remaining: Dict[str, str] = {}
+        for section, prompt in sections.items():
+            last = previous['section_reviews'].get(section); changed = self._changed_paths(previous, inputs, section_files.get(section, []))
+            if last and not changed: reused[section] = last; continue
+            diffs = self._diffs_since(previous, inputs, changed) if last and all(path in previous['files'] for path in changed) else None
+            title = section_title(section)
+            remaining[section] = self._re_review_prompt(f"one part ({title})", last['feedback'], diffs, []) if diffs else prompt
+        if not remaining: return sections # Some input outside every section changed: review everything again
+        context['reused_sections'] = reused; context['review_mode'] = 'incremental'
+        logger.info(f"{self.agent_id}: Re-review: {len(remaining)} section(s) changed, {len(reused)} unchanged section(s) keep their last result.")
+        return remaining
+
+    def _section_prompt(self, context: Dict[str, Any], section: str, code: str, focus: str) -> str:
+        project_name = (self.current_task or {}).get('details', {}).get('project_name', '[Unknown Project]')
+        specifications = self.resolve_artifact(context.get('specifications_content'), None)
+        spec_section = f"--- SPECIFICATIONS ---\n{specifications}\n--- END SPECIFICATIONS ---" if specifications else "--- NOTE: Specs not provided. ---"
+        title = section_title(section)
+        return f"""You are a QA Engineer reviewing one part of project '{project_name}': **{title}**. Other reviewers cover the other parts at the same time, so report only issues within yours.
+
+{spec_section}
+
+--- CODE TO REVIEW ---
+{code}
+--- END CODE ---
+
+Review focus: {focus}
+
+{REVIEW_RESPONSE_FORMAT}
+
+Set "requires_fix" to true only for issues in your part that must be fixed: missing or incorrectly implemented requirements, bugs that break functionality, or incomplete code."""
+
+    async def _process_llm_sections(self, responses: Dict[str, Optional[str]]):
+        """
+        Merges the section reviews into one verdict (fix needed if any section needs one) and one feedback document.
+        A section whose call failed is retried; if it still fails the review stays incomplete (nothing is approved
+        unreviewed) and the decision loop requests the missing sections again, keeping the answered ones.
+        """
+        if not self.current_task or self.current_task.get('task_id') not in self.task_context:
+            logger.error(f"{self.agent_id}: Cannot process section reviews, no active task context."); return
+        task_id = self.current_task['task_id']; context = self.task_context[task_id]
+        answered: Dict[str, Dict[str, Any]] = context.setdefault('answered_sections', {}); prompts = context.get('section_prompts') or {}
+        for attempt in range(SECTION_RETRIES + 1):
+            for section, response in responses.items():
+                if response is None: continue
+                requires_fix, feedback, _ = self._parse_review(response)
+                answered[section] = {'requires_fix': requires_fix, 'feedback': feedback}
+            failed = {section: prompts[section] for section, response in responses.items() if response is None and section in prompts}
+            if not failed or attempt == SECTION_RETRIES: break
+            logger.warning(f"{self.agent_id}: Retrying {len(failed)} failed review section(s) of task {task_id}: {list(failed)}.")
+            responses = await self._execute_llm_sections(failed, track_action=False)
+        missing = [section for section, response in responses.items() if response is None]
+        if missing:
+            logger.warning(f"{self.agent_id}: Review of task {task_id} is incomplete, {missing} could not be reviewed; they will be requested again.")
+            self.update_state({'current_action': 'processed_llm_response', 'current_thoughts': 'Some review sections failed; retrying later.'}); return
+        reviews: Dict[str, Dict[str, Any]] = {}; parts = []
+        for section, review in context.pop('reused_sections', {}).items():
+            reviews[section] = review
+            parts.append(f"## {section_title(section)} ({'FIX REQUIRED' if review['requires_fix'] else 'OK'}, unchanged since the last review)\n{review['feedback']}")
+        for section, review in context.pop('answered_sections').items():
+            reviews[section] = review
+            parts.append(f"## {section_title(section)} ({'FIX REQUIRED' if review['requires_fix'] else 'OK'})\n{review['feedback']}")
+        context.pop('section_prompts', None)
+        context['section_reviews'] = reviews
+        context['qa_feedback'] = "\n\n".join(parts)
+        context['requires_fix'] = any(review['requires_fix'] for review in reviews.values())
+        context['step'] = 'llm_review_processed'
+        logger.info(f"{self.agent_id}: Sectioned QA review merged for task {task_id}: {len(reviews)} section(s), Requires Fix = {context['requires_fix']}")
+        self._record_review(context)
+        self.update_state({'current_action': 'processed_llm_response', 'current_thoughts': 'Section reviews merged.'})
+
     # --- Override the execute_action method to better handle message sending ---
     async def execute_action(self, action: Optional[Dict[str, Any]]):
         """Override base class execute_action to handle message sending completion better"""
@@ -618,17 +942,18 @@ Be extremely thorough and detail-oriented in your assessment. Your feedback will
                         'project_name': project_name,
                         'code_filename_to_review': saved_filename,
                         'specifications_filename': specs_filename,
+                        'site_page_filenames': message_data.get('page_filenames') or [],
                         'original_code_task_id': source_task_id
                     },
                     'task_id': f"qa_task_{source_task_id[-8:]}"
                 }
-                
+                self.task_context.pop(task_details['task_id'], None) # A re-review after a fix round starts fresh; review_history keeps the last review
                 await self.assign_task(task_details)
                 logger.info(f"{self.agent_id}: Created new QA task {task_details['task_id']} based on coder notification.")
                 
                 # Immediately schedule a move to SAVE_ZONE to start reading files
                 # This helps reduce delay in starting the file read process
-                self.loop.create_task(self.execute_action({
+                self.spawn_task(self.execute_action({
                     'action': 'move_to_zone', 
                     'zone_name': SAVE_ZONE_NAME
                 }))
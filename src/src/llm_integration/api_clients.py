@@ -2,13 +2,21 @@
 
 import os
 import asyncio
+import importlib
 import logging
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, Any, Optional, List, Tuple, Set
 from dotenv import load_dotenv
 
-# Import specific clients - assuming standard installations
-import google.generativeai as genai
-from openai import AsyncOpenAI, OpenAIError
-from anthropic import AsyncAnthropic, AnthropicError
+from .llm_scheduler import LLMScheduler, DEFAULT_MAX_CONCURRENCY, DEFAULT_LLM_PRIORITY
+
+# Provider SDKs are imported on first use (google.generativeai alone pulls in grpc/protobuf)
+PROVIDER_MODULES = {'gemini': 'google.generativeai', 'openai': 'openai', 'anthropic': 'anthropic'}
+PROVIDER_KEY_ENV = {'gemini': 'GOOGLE_API_KEY', 'openai': 'OPENAI_API_KEY', 'anthropic': 'ANTHROPIC_API_KEY'}
+DEFAULT_PREFLIGHT_TIMEOUT_S = 8.0
+_sdk_import_lock = threading.Lock()
 
 # --- Basic Logging Setup ---
 # Configure logging for better traceability of API calls and errors
@@ -18,6 +26,14 @@ from anthropic import AsyncAnthropic, AnthropicError
 logger = logging.getLogger(__name__) # Use the standard Python logger
 # --- ---
 
+def import_provider_sdk(provider: str) -> Any:
+    """Imports (once) and returns the SDK module of a provider. Raises ImportError if it is not installed."""
+    with _sdk_import_lock: # Concurrent first imports of the same package are not safe
+        started = time.perf_counter(); module = importlib.import_module(PROVIDER_MODULES[provider])
+    elapsed = time.perf_counter() - started
+    if elapsed > 0.01: logger.info(f"Imported {PROVIDER_MODULES[provider]} SDK in {elapsed:.2f}s.")
+    return module
+
 class LLMService:
     """
     Handles interaction with Google Gemini, OpenAI, and Anthropic models.
@@ -36,15 +52,117 @@ class LLMService:
         self.openai_api_key = os.getenv("OPENAI_API_KEY")
         self.anthropic_api_key = os.getenv("ANTHROPIC_API_KEY")
 
-        # --- Configure Clients ---
-        self.google_client = self._configure_google_client()
-        self.openai_client = self._configure_openai_client()
-        self.anthropic_client = self._configure_anthropic_client()
-
-        if not any([self.google_client, self.openai_client, self.anthropic_client]):
-            logger.error("LLMService initialized, but NO API clients could be configured. Check API keys.")
+        # --- Clients are built (and their SDKs imported) on first use, or ahead of time by warm_up()/preflight() ---
+        self._clients: Dict[str, Any] = {}
+        self._client_lock = threading.Lock()
+        self._configurers = {'gemini': self._configure_google_client, 'openai': self._configure_openai_client, 'anthropic': self._configure_anthropic_client}
+        self.preflight_results: Dict[str, Dict[str, Any]] = {}
+        self._inflight: Set[asyncio.Task] = set() # Tasks currently inside generate(), for cancel_inflight()
+        # Provider concurrency slots, handed out by priority (critical-path calls first) when they run short
+        default_limit = int(os.getenv('LLM_MAX_CONCURRENCY', DEFAULT_MAX_CONCURRENCY)) # <= 0: unlimited
+        self.scheduler = LLMScheduler({provider: int(os.environ[f'LLM_MAX_CONCURRENCY_{provider.upper()}']) for provider in PROVIDER_KEY_ENV
+                                       if os.getenv(f'LLM_MAX_CONCURRENCY_{provider.upper()}')}, default_limit)
+
+        for provider in PROVIDER_KEY_ENV:
+            if not self.has_provider(provider): logger.warning(f"{PROVIDER_KEY_ENV[provider]} not found in .env file. {provider} API will be unavailable.")
+        if not self.configured_providers():
+            logger.error("LLMService initialized, but NO API keys are configured. Check API keys.")
         else:
-            logger.info("LLMService initialized successfully.")
+            logger.info(f"LLMService initialized with providers {self.configured_providers()} (clients built on first use).")
+
+    # --- Lazy clients ---
+    def has_provider(self, provider: str) -> bool:
+        """True if the provider's API key is set (its SDK may not be imported yet)."""
+        return bool({'gemini': self.google_api_key, 'openai': self.openai_api_key, 'anthropic': self.anthropic_api_key}.get(provider))
+
+    def configured_providers(self) -> List[str]:
+        return [provider for provider in PROVIDER_KEY_ENV if self.has_provider(provider)]
+
+    def get_client(self, provider: str) -> Any:
+        """The provider's client, importing its SDK and building it on first call (blocking; None if unavailable)."""
+        if provider in self._clients: return self._clients[provider]
+        with self._client_lock:
+            if provider not in self._clients:
+                configure = self._configurers.get(provider)
+                self._clients[provider] = configure() if configure and self.has_provider(provider) else None
+        return self._clients[provider]
+
+    async def ensure_client(self, provider: str) -> Any:
+        """get_client() off the event loop, so a first-use SDK import does not stall the simulation."""
+        if provider in self._clients: return self._clients[provider]
+        return await asyncio.get_running_loop().run_in_executor(None, self.get_client, provider)
+
+    @property
+    def google_client(self) -> Any: return self.get_client('gemini')
+    @property
+    def openai_client(self) -> Any: return self.get_client('openai')
+    @property
+    def anthropic_client(self) -> Any: return self.get_client('anthropic')
+
+    def _transient_error_types(self) -> Tuple[type, ...]:
+        """SDK error base classes of the providers imported so far."""
+        types = []
+        for provider, attribute in (('openai', 'OpenAIError'), ('anthropic', 'AnthropicError')):
+            if provider in self._clients and self._clients[provider] is not None:
+                error_type = getattr(import_provider_sdk(provider), attribute, None)
+                if error_type: types.append(error_type)
+        return tuple(types)
+
+    # --- Cancellation ---
+    def cancel_inflight(self, loop: Optional[asyncio.AbstractEventLoop] = None) -> int:
+        """
+        Cancels every generate() call in flight (only those on `loop` if given; call from that loop's thread).
+        Cancelling the awaiting task aborts the provider's HTTP request or gRPC call, so nothing keeps running or billing.
+        """
+        tasks = [task for task in list(self._inflight) if not task.done() and (loop is None or task.get_loop() is loop)]
+        for task in tasks: task.cancel()
+        if tasks: logger.info(f"LLMService: cancelled {len(tasks)} in-flight LLM request(s).")
+        return len(tasks)
+
+    # --- Warm-up / preflight ---
+    def warm_up(self, timeout_s: float = DEFAULT_PREFLIGHT_TIMEOUT_S) -> Dict[str, float]:
+        """Imports SDKs and builds clients for all configured providers in parallel threads; returns seconds per provider."""
+        providers = [provider for provider in self.configured_providers() if provider not in self._clients]
+        if not providers: return {}
+        def build(provider: str) -> float:
+            started = time.perf_counter(); self.get_client(provider); return time.perf_counter() - started
+        timings: Dict[str, float] = {}
+        executor = ThreadPoolExecutor(max_workers=len(providers), thread_name_prefix='llm-warmup')
+        futures = {provider: executor.submit(build, provider) for provider in providers}
+        deadline = time.monotonic() + timeout_s
+        for provider, future in futures.items():
+            try: timings[provider] = round(future.result(timeout=max(0.0, deadline - time.monotonic())), 3)
+            except Exception as e: logger.warning(f"LLM warm-up for {provider} did not finish: {e!r}")
+        executor.shutdown(wait=False)
+        logger.info(f"LLM warm-up: {timings}")
+        return timings
+
+    async def preflight(self, timeout_s: float = DEFAULT_PREFLIGHT_TIMEOUT_S) -> Dict[str, Dict[str, Any]]:
+        """
+        Concurrently, per configured provider: builds the client and makes one cheap authenticated call (lists models),
+        which checks the key and opens connections on the calling loop. Time-boxed; never raises.
+        """
+        async def check(provider: str) -> Dict[str, Any]:
+            started = time.perf_counter()
+            try:
+                ok = await asyncio.wait_for(self._preflight_call(provider), timeout_s)
+                return {'ok': ok, 'elapsed_s': round(time.perf_counter() - started, 3)}
+            except asyncio.TimeoutError: return {'ok': False, 'elapsed_s': round(time.perf_counter() - started, 3), 'error': f'timed out after {timeout_s}s'}
+            except Exception as e: return {'ok': False, 'elapsed_s': round(time.perf_counter() - started, 3), 'error': str(e)[:200]}
+        providers = self.configured_providers()
+        results = await asyncio.gather(*(check(provider) for provider in providers))
+        self.preflight_results = dict(zip(providers, results))
+        for provider, result in self.preflight_results.items():
+            if result['ok']: logger.info(f"LLM preflight: {provider} ok in {result['elapsed_s']}s.")
+            else: logger.warning(f"LLM preflight: {provider} failed after {result['elapsed_s']}s: {result.get('error', 'client unavailable')}")
+        return self.preflight_results
+
+    async def _preflight_call(self, provider: str) -> bool:
+        client = await self.ensure_client(provider)
+        if client is None: return False
+        if provider == 'gemini': await asyncio.get_running_loop().run_in_executor(None, lambda: next(iter(client.list_models()), None))
+        else: await client.models.list()
+        return True
 
     def _configure_google_client(self):
         """Configures and returns the Google GenAI client."""
@@ -52,6 +170,7 @@ class LLMService:
             logger.warning("GOOGLE_API_KEY not found in .env file. Google Gemini API will be unavailable.")
             return None
         try:
+            genai = import_provider_sdk('gemini')
             genai.configure(api_key=self.google_api_key)
             logger.info("Google GenAI client configured.")
             return genai # Return the configured module itself
@@ -65,10 +184,10 @@ class LLMService:
             logger.warning("OPENAI_API_KEY not found in .env file. OpenAI API will be unavailable.")
             return None
         try:
-            client = AsyncOpenAI(api_key=self.openai_api_key)
+            client = import_provider_sdk('openai').AsyncOpenAI(api_key=self.openai_api_key)
             logger.info("OpenAI client configured.")
             return client
-        except OpenAIError as e:
+        except ImportError as e:
             logger.error(f"Failed to configure OpenAI client: {e}")
             return None
         except Exception as e:
@@ -81,10 +200,10 @@ class LLMService:
             logger.warning("ANTHROPIC_API_KEY not found in .env file. Anthropic API will be unavailable.")
             return None
         try:
-            client = AsyncAnthropic(api_key=self.anthropic_api_key)
+            client = import_provider_sdk('anthropic').AsyncAnthropic(api_key=self.anthropic_api_key)
             logger.info("Anthropic client configured.")
             return client
-        except AnthropicError as e:
+        except ImportError as e:
             logger.error(f"Failed to configure Anthropic client: {e}")
             return None
         except Exception as e:
@@ -92,9 +211,12 @@ class LLMService:
             return None
 
     # --- START DEBUG --- Enhanced generate method with more detailed logging
-    async def generate(self, llm_type: str, prompt: str, model_name: str = None, max_retries: int = 3, initial_delay: int = 1) -> str:
+    async def generate(self, llm_type: str, prompt: str, model_name: str = None, max_retries: int = 3, initial_delay: int = 1,
+                       priority: float = DEFAULT_LLM_PRIORITY, timeout_s: Optional[float] = None) -> str:
         """
         Enhanced generate method with more detailed logging for debugging.
+        priority: place of the calling task on the critical path (llm_scheduler.llm_priority); decides who gets
+        the next provider slot when all are busy. timeout_s bounds the whole call, retries included (run deadline).
         """
         # --- Start Debug Logging ---
         logger.info(f"LLM DEBUG: generate called with '{llm_type}' (model: {model_name or 'default'})")
@@ -102,20 +224,29 @@ class LLMService:
         logger.info(f"LLM DEBUG: prompt preview: {prompt[:100]}...")
         # --- End Debug Logging ---
 
+        current = asyncio.current_task()
+        if current is not None:
+            self._inflight.add(current)
+            try: return await self._generate_within(timeout_s, llm_type, prompt, model_name, max_retries, initial_delay, priority)
+            finally: self._inflight.discard(current)
+        return await self._generate_within(timeout_s, llm_type, prompt, model_name, max_retries, initial_delay, priority)
+
+    async def _generate_within(self, timeout_s: Optional[float], *args: Any) -> str:
+        if not timeout_s: return await self._generate(*args)
+        try: return await asyncio.wait_for(self._generate(*args), timeout_s) # Cancels (and aborts) the provider call on expiry
+        except asyncio.TimeoutError:
+            logger.warning(f"LLM call to {args[0]} timed out after {timeout_s:.1f}s.")
+            return f"Error: LLM call timed out after {timeout_s:.1f}s."
+
+    async def _generate(self, llm_type: str, prompt: str, model_name: Optional[str], max_retries: int, initial_delay: int, priority: float) -> str:
         attempt = 0
         delay = initial_delay
 
         # Before entering the retry loop, verify the client exists
         client_exists = False
         client_available_msg = "available"
-        if llm_type == 'gemini':
-            if self.google_client: client_exists = True
-            else: client_available_msg = "not configured or API key missing"
-        elif llm_type == 'openai':
-            if self.openai_client: client_exists = True
-            else: client_available_msg = "not configured or API key missing"
-        elif llm_type == 'anthropic':
-            if self.anthropic_client: client_exists = True
+        if llm_type in PROVIDER_MODULES:
+            if await self.ensure_client(llm_type): client_exists = True
             else: client_available_msg = "not configured or API key missing"
         else:
              client_available_msg = f"type '{llm_type}' is not supported"
@@ -140,7 +271,7 @@ class LLMService:
                     # --- Start Debug Logging ---
                     logger.info(f"LLM DEBUG: Calling gemini: {model_to_use}")
                     # --- End Debug Logging ---
-                    result = await self._call_gemini(prompt, model_to_use)
+                    async with self.scheduler.slot(llm_type, priority): result = await self._call_gemini(prompt, model_to_use) # Held for the call only, not the retry backoff
                     # --- Start Debug Logging ---
                     logger.info(f"LLM DEBUG: gemini call completed (attempt {attempt+1}), result length: {len(result)}")
                     # --- End Debug Logging ---
@@ -151,7 +282,7 @@ class LLMService:
                     # --- Start Debug Logging ---
                     logger.info(f"LLM DEBUG: Calling openai: {model_to_use}")
                     # --- End Debug Logging ---
-                    result = await self._call_openai(prompt, model_to_use)
+                    async with self.scheduler.slot(llm_type, priority): result = await self._call_openai(prompt, model_to_use)
                     # --- Start Debug Logging ---
                     logger.info(f"LLM DEBUG: openai call completed (attempt {attempt+1}), result length: {len(result)}")
                     # --- End Debug Logging ---
@@ -162,7 +293,7 @@ class LLMService:
                     # --- Start Debug Logging ---
                     logger.info(f"LLM DEBUG: Calling anthropic: {model_to_use}")
                     # --- End Debug Logging ---
-                    result = await self._call_anthropic(prompt, model_to_use)
+                    async with self.scheduler.slot(llm_type, priority): result = await self._call_anthropic(prompt, model_to_use)
                     # --- Start Debug Logging ---
                     logger.info(f"LLM DEBUG: anthropic call completed (attempt {attempt+1}), result length: {len(result)}")
                     # --- End Debug Logging ---
@@ -173,7 +304,7 @@ class LLMService:
                     logger.error(f"LLM DEBUG: {error_msg}")
                     return f"Error: {error_msg}"
 
-            except (OpenAIError, AnthropicError, Exception) as e:
+            except Exception as e:
                 error_details = str(e)
                  # --- Start Debug Logging ---
                 logger.error(f"LLM DEBUG: Exception during attempt {attempt+1}: {error_details}", exc_info=True)
@@ -181,7 +312,7 @@ class LLMService:
 
                 # Check if the error is likely transient
                 # Refine this based on specific API error codes if possible
-                is_transient = isinstance(e, (OpenAIError, AnthropicError)) or "rate_limit" in error_details.lower() or "server error" in error_details.lower()
+                is_transient = isinstance(e, self._transient_error_types()) or "rate_limit" in error_details.lower() or "server error" in error_details.lower()
                 # --- Start Debug Logging ---
                 logger.info(f"LLM DEBUG: Error classified as transient: {is_transient}")
                 # --- End Debug Logging ---
@@ -221,11 +352,13 @@ class LLMService:
              logger.info("LLM DEBUG: Google model instance created")
              # --- End Debug Logging ---
 
-             loop = asyncio.get_running_loop()
-             # --- Start Debug Logging ---
-             logger.info("LLM DEBUG: About to call Google API via executor")
-             # --- End Debug Logging ---
-             response = await loop.run_in_executor(None, model.generate_content, prompt)
+             if hasattr(model, 'generate_content_async'): # Native async call: cancelling the task aborts the RPC
+                 response = await model.generate_content_async(prompt)
+             else:
+                 # --- Start Debug Logging ---
+                 logger.info("LLM DEBUG: About to call Google API via executor")
+                 # --- End Debug Logging ---
+                 response = await asyncio.get_running_loop().run_in_executor(None, model.generate_content, prompt) # Old SDKs: the thread cannot be cancelled
              # --- Start Debug Logging ---
              logger.info(f"LLM DEBUG: Google API call completed")
              # --- End Debug Logging ---
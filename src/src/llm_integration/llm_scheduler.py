@@ -0,0 +1,102 @@
+# SoftwareSim3d/src/llm_integration/llm_scheduler.py
+
+import asyncio
+import heapq
+import itertools
+import logging
+import time
+from typing import Dict, Any, Optional, List, Tuple
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_MAX_CONCURRENCY = 4 # Per provider; <= 0 means unlimited (no queueing)
+DEFAULT_LLM_PRIORITY = 35.0 # Calls without a task (or of an unknown task type)
+DEPENDENT_WEIGHT = 100.0 # Each task blocked on this one outranks any stage difference
+AGING_PER_S = 2.0 # Priority gained per second of waiting, so low-priority calls are delayed, never starved
+
+# Stage ranks along the website pipeline: upstream stages unblock everything after them
+STAGE_PRIORITY = {
+    'decompose_request': 90.0, 'define_specifications': 80.0, 'develop_strategy': 70.0,
+    'generate_html': 60.0, 'generate_js': 50.0, 'generate_css': 50.0,
+    'fix_html_component': 45.0, 'fix_js_logic': 40.0, 'fix_css_styles': 40.0,
+    'review_code': 30.0, 'notify_completion': 20.0,
+}
+
+def llm_priority(task_type: Optional[str], blocking_dependents: int = 0) -> float:
+    """Priority of an LLM call made for a task: tasks waiting on it first, then its pipeline stage."""
+    return blocking_dependents * DEPENDENT_WEIGHT + STAGE_PRIORITY.get(task_type or '', DEFAULT_LLM_PRIORITY)
+
+class _ProviderLane:
+    """Concurrency slots of one provider and the calls waiting for one."""
+    __slots__ = ('limit', 'active', 'waiters', 'granted', 'queued', 'waited', 'wait_s', 'max_wait_s', 'overtakes')
+
+    def __init__(self, limit: int):
+        self.limit = limit
+        self.active = 0
+        self.waiters: List[Tuple[float, int, float, float, asyncio.Future]] = [] # (key, seq, priority, enqueued, future)
+        self.granted = 0; self.queued = 0; self.waited = 0; self.wait_s = 0.0; self.max_wait_s = 0.0
+        self.overtakes = 0 # Grants that went to a call queued after another still waiting
+
+class LLMScheduler:
+    """
+    Priority-aware admission for LLM calls. Each provider has a fixed number of concurrent slots; when they are
+    all taken, callers queue and a freed slot goes to the highest priority waiter (ties: first come). Waiting
+    raises a call's priority by AGING_PER_S per second. Use as `async with scheduler.slot(provider, priority):`.
+    Not thread-safe: all callers must run on the same event loop at a time.
+    """
+    def __init__(self, limits: Optional[Dict[str, int]] = None, default_limit: int = DEFAULT_MAX_CONCURRENCY):
+        self.default_limit = default_limit
+        self._limits = dict(limits or {})
+        self._lanes: Dict[str, _ProviderLane] = {}
+        self._sequence = itertools.count()
+
+    def _lane(self, provider: str) -> _ProviderLane:
+        lane = self._lanes.get(provider)
+        if lane is None: lane = self._lanes[provider] = _ProviderLane(self._limits.get(provider, self.default_limit))
+        return lane
+
+    def slot(self, provider: str, priority: float = DEFAULT_LLM_PRIORITY) -> '_Slot':
+        return _Slot(self, provider, priority)
+
+    async def acquire(self, provider: str, priority: float = DEFAULT_LLM_PRIORITY):
+        lane = self._lane(provider)
+        if lane.limit <= 0 or (lane.active < lane.limit and not lane.waiters):
+            lane.active += 1; lane.granted += 1; return
+        enqueued = time.monotonic(); seq = next(self._sequence)
+        future = asyncio.get_running_loop().create_future()
+        heapq.heappush(lane.waiters, (AGING_PER_S * enqueued - priority, seq, priority, enqueued, future)) # Aging is the same for everyone, so the key is static
+        lane.queued += 1
+        try: await future
+        except asyncio.CancelledError:
+            if future.done() and not future.cancelled(): self.release(provider) # Slot was handed over just as we were cancelled
+            raise
+        waited = time.monotonic() - enqueued
+        lane.waited += 1; lane.wait_s += waited; lane.max_wait_s = max(lane.max_wait_s, waited)
+        if waited > 1.0: logger.debug(f"LLMScheduler: {provider} call (priority {priority:.0f}) waited {waited:.2f}s for a slot.")
+
+    def release(self, provider: str):
+        lane = self._lane(provider)
+        while lane.waiters:
+            _, seq, _, _, future = heapq.heappop(lane.waiters)
+            if future.done(): continue # Cancelled while waiting
+            if any(other[1] < seq and not other[4].done() for other in lane.waiters): lane.overtakes += 1
+            lane.granted += 1; future.set_result(None); return # The slot passes straight to the waiter
+        lane.active = max(0, lane.active - 1)
+
+    def stats_snapshot(self) -> Dict[str, Dict[str, Any]]:
+        return {provider: {'limit': lane.limit, 'active': lane.active, 'waiting': sum(1 for waiter in lane.waiters if not waiter[4].done()),
+                           'granted': lane.granted, 'queued': lane.queued, 'overtakes': lane.overtakes,
+                           'avg_wait_s': round(lane.wait_s / lane.waited, 3) if lane.waited else 0.0, 'max_wait_s': round(lane.max_wait_s, 3)}
+                for provider, lane in self._lanes.items()}
+
+class _Slot:
+    __slots__ = ('scheduler', 'provider', 'priority')
+
+    def __init__(self, scheduler: LLMScheduler, provider: str, priority: float):
+        self.scheduler = scheduler; self.provider = provider; self.priority = priority
+
+    async def __aenter__(self):
+        await self.scheduler.acquire(self.provider, self.priority)
+
+    async def __aexit__(self, *exc_info):
+        self.scheduler.release(self.provider)
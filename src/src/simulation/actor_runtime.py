@@ -0,0 +1,201 @@
+# SoftwareSim3d/src/simulation/actor_runtime.py
+
+import asyncio
+import logging
+import threading
+import time
+from typing import Dict, Any, Optional, List, Iterable
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_STEP_DELAY_S = 0.1 # Used when a turn fails or an actor does not say when it wants its next turn
+DEFAULT_JOIN_TIMEOUT_S = 7.0
+
+class ActorSlot:
+    """Scheduling state the runtime keeps per actor. The actor object itself stays a passive state machine."""
+    __slots__ = ('actor', 'active', 'running', 'turn', 'timer', 'last_turn', 'turns', 'busy_s')
+
+    def __init__(self, actor: Any):
+        self.actor = actor
+        self.active = False # Accepting turns (between start_actor and stop_actor)
+        self.running = False # A turn is in progress
+        self.turn: Optional[asyncio.Task] = None
+        self.timer: Optional[asyncio.TimerHandle] = None
+        self.last_turn = 0.0
+        self.turns = 0; self.busy_s = 0.0
+
+class ActorRuntime:
+    """
+    Runs many agents on one event loop without a coroutine or polling loop per agent. An actor exposes
+    `async step(delta_time) -> Optional[float]` (one turn; returns the delay until its next turn is due). The
+    runtime keeps at most one turn per actor in flight, drives turns from the loop's timer heap, and starts an
+    extra turn right away when the actor is woken (a message was delivered or its state changed).
+    Turns belong to the runtime: stop_actor() cancels an actor's turn, shutdown() cancels and awaits all of them.
+    """
+    def __init__(self, loop: asyncio.AbstractEventLoop):
+        self.loop = loop
+        self._slots: Dict[str, ActorSlot] = {}
+        self._loop_thread_id: Optional[int] = None
+        self.turns = 0; self.wakeups = 0; self.failed_turns = 0
+
+    # --- Registration ---
+    def attach(self, actor: Any) -> ActorSlot:
+        """Registers an actor (by actor.agent_id) and gives it a back reference as actor.runtime."""
+        slot = self._slots.get(actor.agent_id)
+        if slot is None: slot = self._slots[actor.agent_id] = ActorSlot(actor)
+        actor.runtime = self
+        return slot
+
+    def detach(self, actor_id: str):
+        self.stop_actor(actor_id); self._slots.pop(actor_id, None)
+
+    def __contains__(self, actor_id: Any) -> bool: return actor_id in self._slots
+
+    # --- Lifecycle (thread-safe entry points) ---
+    def start_actor(self, actor_id: str):
+        if not self._on_loop_thread(): self.loop.call_soon_threadsafe(self.start_actor, actor_id); return
+        slot = self._slots.get(actor_id)
+        if slot is None: logger.warning(f"ActorRuntime: cannot start unknown actor '{actor_id}'."); return
+        if slot.active: return
+        slot.active = True; slot.last_turn = self.loop.time()
+        if not slot.running: self._schedule(slot, 0.0)
+
+    def stop_actor(self, actor_id: str):
+        """Stops scheduling turns for the actor and cancels the turn in flight, if any."""
+        if not self._on_loop_thread(): self.loop.call_soon_threadsafe(self.stop_actor, actor_id); return
+        slot = self._slots.get(actor_id)
+        if slot is None: return
+        slot.active = False
+        if slot.timer is not None: slot.timer.cancel(); slot.timer = None
+        if slot.turn is not None and not slot.turn.done() and slot.turn is not asyncio.current_task(): slot.turn.cancel()
+
+    def wake(self, actor_id: str):
+        """Makes an idle actor take its next turn now. Ignored while a turn is running: that turn reschedules itself."""
+        if not self._on_loop_thread(): self.loop.call_soon_threadsafe(self.wake, actor_id); return
+        slot = self._slots.get(actor_id)
+        if slot is None or not slot.active or slot.running: return
+        if slot.timer is not None and slot.timer.when() <= self.loop.time(): return # Already due
+        self.wakeups += 1
+        self._schedule(slot, 0.0)
+
+    async def join_actor(self, actor_id: str, timeout: float = DEFAULT_JOIN_TIMEOUT_S) -> bool:
+        """Waits for the actor's turn in flight (usually just cancelled by stop_actor) to finish."""
+        slot = self._slots.get(actor_id)
+        turn = slot.turn if slot else None
+        if turn is None or turn.done() or turn is asyncio.current_task(): return True
+        done, _ = await asyncio.wait({turn}, timeout=timeout)
+        if not done: logger.warning(f"ActorRuntime: turn of '{actor_id}' did not finish within {timeout}s.")
+        return bool(done)
+
+    async def shutdown(self, timeout: float = DEFAULT_JOIN_TIMEOUT_S):
+        """Stops every actor and waits (bounded) for all cancelled turns to unwind."""
+        for actor_id in list(self._slots): self.stop_actor(actor_id)
+        turns = [slot.turn for slot in self._slots.values() if slot.turn is not None and not slot.turn.done()]
+        if turns:
+            _, pending = await asyncio.wait(turns, timeout=timeout)
+            if pending: logger.warning(f"ActorRuntime: {len(pending)} turn(s) still running after shutdown timeout.")
+        logger.info(f"ActorRuntime shut down: {self.stats_snapshot()}")
+
+    # --- Scheduling ---
+    def _on_loop_thread(self) -> bool:
+        if self._loop_thread_id is None: # Bound lazily: the runtime may be built before its loop starts running
+            try: running_loop = asyncio.get_running_loop()
+            except RuntimeError: return False
+            if running_loop is not self.loop: return False
+            self._loop_thread_id = threading.get_ident()
+        return threading.get_ident() == self._loop_thread_id
+
+    def _schedule(self, slot: ActorSlot, delay: float):
+        if slot.timer is not None: slot.timer.cancel()
+        slot.timer = self.loop.call_at(self.loop.time() + max(0.0, delay), self._dispatch, slot)
+
+    def _dispatch(self, slot: ActorSlot):
+        slot.timer = None
+        if not slot.active or slot.running: return
+        slot.running = True
+        slot.turn = self.loop.create_task(self._run_turn(slot))
+
+    async def _run_turn(self, slot: ActorSlot):
+        now = self.loop.time(); delta_time = now - slot.last_turn; slot.last_turn = now
+        started = time.perf_counter(); delay: Optional[float] = DEFAULT_STEP_DELAY_S; cancelled = False
+        try: delay = await slot.actor.step(delta_time)
+        except asyncio.CancelledError: cancelled = True
+        except Exception as e:
+            self.failed_turns += 1
+            logger.error(f"ActorRuntime: turn of '{slot.actor.agent_id}' failed: {e}", exc_info=True)
+        slot.running = False; slot.turn = None
+        slot.turns += 1; self.turns += 1; slot.busy_s += time.perf_counter() - started
+        if slot.active: self._schedule(slot, DEFAULT_STEP_DELAY_S if delay is None else delay) # Also restarts an actor started again while its turn was unwinding
+        if cancelled: raise asyncio.CancelledError()
+
+    # --- Reporting ---
+    def stats_snapshot(self) -> Dict[str, Any]:
+        return {'actors': len(self._slots), 'active': sum(1 for slot in self._slots.values() if slot.active),
+                'running': sum(1 for slot in self._slots.values() if slot.running), 'turns': self.turns,
+                'wakeups': self.wakeups, 'failed_turns': self.failed_turns,
+                'busy_s': round(sum(slot.busy_s for slot in self._slots.values()), 4)}
+
+# --- Benchmark: python -m src.simulation.actor_runtime [counts...] (run from SoftwareSim3d/src) ---
+def benchmark(counts: Iterable[int] = (10, 100, 1000), duration_s: float = 3.0, pings_per_agent_s: float = 1.0, legacy: bool = False) -> List[Dict[str, Any]]:
+    """
+    Starts N idle agents, pings each one pings_per_agent_s times per second through the MessageBus and reports CPU
+    time, memory and ping latency per agent. With legacy=True agents run their own polling loop (Agent.start
+    without a runtime) for comparison.
+    """
+    import tracemalloc
+    from .message_bus import MessageBus
+    from ..agent_base import Agent
+
+    class BenchAgent(Agent):
+        def get_prompt(self, task_details, context): return None
+        async def _decide_next_action(self): return {'action': 'wait'}
+        async def _process_llm_response(self, llm_response): pass
+        async def _process_tool_result(self, tool_name, result): pass
+        async def _perform_idle_action(self): pass
+
+    latencies: List[float] = []
+    async def on_ping(content: Dict[str, Any]):
+        latencies.append(time.perf_counter() - content['sent'])
+
+    async def run_one(n: int) -> Dict[str, Any]:
+        loop = asyncio.get_running_loop(); bus = MessageBus(loop); runtime = None if legacy else ActorRuntime(loop)
+        if runtime: bus.set_delivery_listener(runtime.wake)
+        async def broadcast(message): await bus.publish(message)
+        tracemalloc.start(); before = tracemalloc.get_traced_memory()[0]
+        agents = []
+        for i in range(n):
+            agent = BenchAgent(f'bench-{i}', 'Bench', None, None, None, bus.register_agent(f'bench-{i}'), broadcast, loop, (0, 0, 0), (0, 0, 0))
+            agent._system_message_handlers['ping'] = on_ping
+            if runtime: runtime.attach(agent)
+            agent.start(); agents.append(agent)
+        await asyncio.sleep(0.2) # Let every agent take its first turn
+        memory_bytes = tracemalloc.get_traced_memory()[0] - before; tracemalloc.stop()
+        latencies.clear(); interval = 1.0 / pings_per_agent_s if pings_per_agent_s > 0 else duration_s
+        cpu_start = time.process_time(); wall_start = time.perf_counter(); wall_end = wall_start + duration_s; next_round = wall_start; pings = 0
+        while time.perf_counter() < wall_end:
+            if pings_per_agent_s > 0:
+                for agent in agents:
+                    await bus.publish({'sender_id': 'workflow_manager', 'recipient_id': agent.agent_id, 'content': {'type': 'ping', 'sent': time.perf_counter()}}); pings += 1
+            next_round += interval; await asyncio.sleep(max(0.0, min(next_round, wall_end) - time.perf_counter()))
+        await asyncio.sleep(0.3) # Deliver the last round
+        cpu_s = time.process_time() - cpu_start; wall_s = time.perf_counter() - wall_start
+        turns = runtime.turns if runtime else None
+        for agent in agents: agent.stop()
+        if runtime: await runtime.shutdown()
+        else: await asyncio.sleep(0.2)
+        ordered = sorted(latencies) or [0.0]
+        return {'agents': n, 'mode': 'legacy' if legacy else 'runtime', 'cpu_ms_per_agent_s': round(cpu_s * 1000.0 / n / wall_s, 4),
+                'kib_per_agent': round(memory_bytes / 1024.0 / n, 2), 'turns': turns, 'pings': pings, 'delivered': len(latencies),
+                'p50_ms': round(ordered[len(ordered) // 2] * 1000.0, 3), 'p99_ms': round(ordered[min(len(ordered) - 1, int(len(ordered) * 0.99))] * 1000.0, 3)}
+
+    results = []
+    for n in counts:
+        result = asyncio.run(run_one(n)); results.append(result)
+        print(result, flush=True)
+    return results
+
+if __name__ == '__main__':
+    import sys
+    logging.basicConfig(level=logging.WARNING)
+    args = [arg for arg in sys.argv[1:] if arg != '--legacy']
+    benchmark([int(arg) for arg in args] or (10, 100, 1000), legacy='--legacy' in sys.argv[1:])
@@ -0,0 +1,153 @@
+# SoftwareSim3d/src/simulation/artifact_store.py
+
+import asyncio
+import hashlib
+import logging
+import os
+import tempfile
+import threading
+from collections import OrderedDict
+from typing import Dict, Any, Optional, Union, Callable, Iterable, Set
+
+logger = logging.getLogger(__name__)
+
+ARTIFACTS_DIR_NAME = '.artifacts'
+DEFAULT_CACHE_MAX_BYTES = 32 * 1024 * 1024 # In-memory LRU budget; blobs beyond it are re-read from disk
+HANDLE_KEY = 'artifact'
+
+ArtifactHandle = Dict[str, Any] # {'artifact': sha256 hex, 'size': chars, 'kind': optional label}
+BlobWriter = Callable[..., Any] # submit(fn, *args) -> Future, e.g. AsyncFileIO.submit
+
+def is_artifact_handle(value: Any) -> bool:
+    return isinstance(value, dict) and isinstance(value.get(HANDLE_KEY), str)
+
+def describe_artifact(value: Any) -> str:
+    """Short log-friendly description of a handle or inline string (never the content itself)."""
+    if is_artifact_handle(value): return f"artifact {value[HANDLE_KEY][:12]} ({value.get('size', '?')} chars)"
+    if isinstance(value, str): return f"inline ({len(value)} chars)"
+    return repr(type(value))
+
+class ArtifactStore:
+    """
+    Content-addressed store for generated code and documents. Blobs are immutable and keyed by the
+    SHA-256 of their UTF-8 content, so messages and tasks can carry small handles instead of the text.
+    Backed by the output directory, with an in-memory LRU cache in front. With a writer, blobs are
+    persisted off the calling thread and held in memory until the write lands.
+    """
+    def __init__(self, root_dir: str, cache_max_bytes: int = DEFAULT_CACHE_MAX_BYTES, writer: Optional[BlobWriter] = None):
+        self.root_dir = root_dir
+        self.cache_max_bytes = cache_max_bytes
+        self.writer = writer
+        self._cache: 'OrderedDict[str, str]' = OrderedDict()
+        self._pending: Dict[str, str] = {} # digest -> content not yet on disk
+        self._unknown: Set[str] = set() # Digests with no blob on disk, so prefetch() does not retry them
+        self._cache_bytes = 0
+        self._lock = threading.Lock()
+        self.hits = 0; self.misses = 0; self.puts = 0; self.dedup_puts = 0
+        os.makedirs(self.root_dir, exist_ok=True)
+
+    def _blob_path(self, digest: str) -> str:
+        return os.path.join(self.root_dir, digest[:2], digest[2:])
+
+    def _cache_insert(self, digest: str, content: str):
+        if digest in self._cache: self._cache.move_to_end(digest); return
+        self._cache[digest] = content; self._cache_bytes += len(content)
+        while self._cache_bytes > self.cache_max_bytes and len(self._cache) > 1:
+            _, evicted = self._cache.popitem(last=False); self._cache_bytes -= len(evicted)
+
+    # --- Write ---
+    def put(self, content: str, kind: Optional[str] = None) -> ArtifactHandle:
+        """Stores content (no-op if already present) and returns its handle."""
+        data = content.encode('utf-8')
+        digest = hashlib.sha256(data).hexdigest()
+        handle: ArtifactHandle = {HANDLE_KEY: digest, 'size': len(content)}
+        if kind: handle['kind'] = kind
+        with self._lock:
+            self.puts += 1; self._unknown.discard(digest)
+            if digest in self._cache or digest in self._pending: self.dedup_puts += 1; self._cache_insert(digest, content); return handle
+            self._cache_insert(digest, content)
+            if self.writer is not None: self._pending[digest] = content
+        if self.writer is None: self._write_blob(digest, data)
+        else: self.writer(self._write_blob, digest, data).add_done_callback(lambda future: self._on_blob_written(digest, future))
+        return handle
+
+    def _write_blob(self, digest: str, data: bytes):
+        path = self._blob_path(digest)
+        if os.path.exists(path): return
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        # Write-then-rename so a concurrent reader never sees a partial blob
+        fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path), prefix='.tmp_')
+        try:
+            with os.fdopen(fd, 'wb') as f: f.write(data)
+            os.replace(tmp_path, path)
+        except Exception:
+            if os.path.exists(tmp_path): os.remove(tmp_path)
+            raise
+
+    def _on_blob_written(self, digest: str, future: Any):
+        error = future.exception()
+        if error is not None: logger.error(f"ArtifactStore: failed to persist artifact {digest[:12]}: {error}"); return # Kept in memory
+        with self._lock: self._pending.pop(digest, None)
+
+    # --- Read ---
+    def _cached(self, digest: str) -> Optional[str]:
+        with self._lock:
+            content = self._cache.get(digest)
+            if content is None: content = self._pending.get(digest)
+            if content is not None: self._cache_insert(digest, content); self.hits += 1; return content
+            self.misses += 1
+        return None
+
+    def _read_blob(self, digest: str) -> Optional[str]:
+        path = self._blob_path(digest)
+        if not os.path.isfile(path):
+            logger.warning(f"ArtifactStore: unknown artifact {digest[:12]}.")
+            with self._lock: self._unknown.add(digest)
+            return None
+        with open(path, 'rb') as f: content = f.read().decode('utf-8')
+        with self._lock: self._cache_insert(digest, content)
+        return content
+
+    def get(self, handle_or_digest: Union[ArtifactHandle, str]) -> Optional[str]:
+        """Returns the content for a handle/digest, or None if the blob is unknown. A cache miss reads the disk on this thread."""
+        digest = handle_or_digest.get(HANDLE_KEY) if isinstance(handle_or_digest, dict) else handle_or_digest
+        if not digest: return None
+        content = self._cached(digest)
+        return content if content is not None else self._read_blob(digest)
+
+    async def get_async(self, handle_or_digest: Union[ArtifactHandle, str]) -> Optional[str]:
+        """get() for the event loop: a cache miss is read on the writer's I/O pool."""
+        digest = handle_or_digest.get(HANDLE_KEY) if isinstance(handle_or_digest, dict) else handle_or_digest
+        if not digest: return None
+        content = self._cached(digest)
+        if content is not None: return content
+        if self.writer is None: return self._read_blob(digest) # No pool: writes are synchronous too
+        return await asyncio.wrap_future(self.writer(self._read_blob, digest))
+
+    def resolve(self, value: Any, default: Any = None) -> Any:
+        """Content for a handle; any other value is returned unchanged (inline strings, fallbacks)."""
+        if not is_artifact_handle(value): return value if value is not None else default
+        content = self.get(value)
+        return content if content is not None else default
+
+    async def resolve_async(self, value: Any, default: Any = None) -> Any:
+        """resolve() for the event loop (see get_async)."""
+        if not is_artifact_handle(value): return value if value is not None else default
+        content = await self.get_async(value)
+        return content if content is not None else default
+
+    async def prefetch(self, values: Iterable[Any]):
+        """Loads the blobs of the handles among values into the cache off the loop, so synchronous resolves that follow hit it."""
+        digests = {value[HANDLE_KEY] for value in values if is_artifact_handle(value)}
+        with self._lock: digests = [digest for digest in digests if digest not in self._cache and digest not in self._pending and digest not in self._unknown]
+        if digests: await asyncio.gather(*(self.get_async(digest) for digest in digests))
+
+    def trim_cache(self, max_bytes: int = 0):
+        """Evicts least recently used blobs down to max_bytes (pending writes stay in memory until on disk)."""
+        with self._lock:
+            while self._cache and self._cache_bytes > max_bytes:
+                _, evicted = self._cache.popitem(last=False); self._cache_bytes -= len(evicted)
+
+    def stats_snapshot(self) -> Dict[str, Any]:
+        with self._lock:
+            return {'cached_blobs': len(self._cache), 'cached_bytes': self._cache_bytes, 'pending_writes': len(self._pending), 'hits': self.hits, 'misses': self.misses, 'puts': self.puts, 'dedup_puts': self.dedup_puts}
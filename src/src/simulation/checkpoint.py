@@ -0,0 +1,124 @@
+# SoftwareSim3d/src/simulation/checkpoint.py
+
+import hashlib
+import json
+import logging
+import os
+import re
+import threading
+import time
+import uuid
+from typing import Dict, Any, Optional, List, Tuple, Callable
+
+from .file_io import atomic_write_text
+
+logger = logging.getLogger(__name__)
+
+CHECKPOINTS_DIR_NAME = '.checkpoints'
+MANIFEST_NAME = 'manifest.json'
+SECTIONS_DIR_NAME = 'sections'
+DEFAULT_CHECKPOINT_INTERVAL_S = 15.0
+
+Submit = Callable[..., Any] # submit(fn, *args) -> Future, e.g. AsyncFileIO.submit
+
+def new_run_id() -> str:
+    return f"run_{time.strftime('%Y%m%d_%H%M%S')}_{uuid.uuid4().hex[:6]}"
+
+def _json_default(value: Any) -> Any:
+    if isinstance(value, (set, frozenset)): return sorted(value, key=str)
+    return str(value) # Last resort; checkpoints must never fail on an odd context value
+
+def _section_filename(name: str, digest: str) -> str:
+    return f"{re.sub(r'[^A-Za-z0-9_.-]+', '_', name)}-{digest}.json"
+
+class CheckpointWriter:
+    """
+    Incremental checkpoints for one run. Each capture serialises every section on the caller's thread
+    (so the snapshot is consistent), writes only sections whose content changed, and writes the manifest
+    last, so the manifest on disk always points at a complete set of sections.
+    """
+    def __init__(self, root_dir: str, run_id: str, submit: Submit):
+        self.run_id = run_id
+        self.run_dir = os.path.join(root_dir, run_id)
+        self.sections_dir = os.path.join(self.run_dir, SECTIONS_DIR_NAME)
+        self.submit = submit
+        self.sequence = 0
+        self._written_digests: Dict[str, str] = {} # section -> digest known to be on disk (or queued)
+        self._in_flight: Optional[Any] = None
+        self._lock = threading.Lock()
+        self.sections_written = 0
+
+    def capture(self, sections: Dict[str, Any], meta: Dict[str, Any], force: bool = False) -> bool:
+        """Snapshots sections and persists the changed ones on the I/O pool. Returns False if skipped."""
+        if self._in_flight is not None and not self._in_flight.done():
+            if not force: logger.debug(f"Checkpoint for {self.run_id} still being written; skipping this capture."); return False
+            self.wait() # Final checkpoint must not be dropped
+        digests: Dict[str, str] = {}; changed: Dict[str, Tuple[str, str]] = {}
+        with self._lock: written = dict(self._written_digests)
+        for name, data in sections.items():
+            text = json.dumps(data, default=_json_default, separators=(',', ':'))
+            digest = hashlib.sha256(text.encode('utf-8')).hexdigest()[:32]
+            digests[name] = digest
+            if written.get(name) != digest: changed[name] = (digest, text)
+        if not force and not changed and self.sequence > 0 and set(digests) == set(written): return False
+        self.sequence += 1
+        manifest = {'run_id': self.run_id, 'sequence': self.sequence, 'created_at': time.time(), 'meta': meta, 'sections': digests}
+        manifest_text = json.dumps(manifest, default=_json_default, indent=1)
+        with self._lock: self._written_digests = digests
+        self._in_flight = self.submit(self._persist, changed, manifest_text, digests)
+        self._in_flight.add_done_callback(self._on_persisted)
+        return True
+
+    def _persist(self, changed: Dict[str, Tuple[str, str]], manifest_text: str, digests: Dict[str, str]):
+        for name, (digest, text) in changed.items():
+            path = os.path.join(self.sections_dir, _section_filename(name, digest))
+            if not os.path.exists(path): atomic_write_text(path, text)
+        atomic_write_text(os.path.join(self.run_dir, MANIFEST_NAME), manifest_text) # Commit point
+        self.sections_written += len(changed)
+        # Drop section versions the new manifest no longer references
+        keep = {_section_filename(name, digest) for name, digest in digests.items()}
+        for filename in (os.listdir(self.sections_dir) if os.path.isdir(self.sections_dir) else []):
+            if filename.endswith('.json') and filename not in keep:
+                try: os.remove(os.path.join(self.sections_dir, filename))
+                except OSError: pass
+
+    def _on_persisted(self, future: Any):
+        error = future.exception()
+        if error is None: return
+        logger.error(f"Checkpoint {self.sequence} for {self.run_id} failed to persist: {error}")
+        with self._lock: self._written_digests = {} # Rewrite every section next time
+
+    def wait(self, timeout: Optional[float] = None):
+        """Blocks until the last capture has been written (call from a worker thread or at shutdown)."""
+        if self._in_flight is not None:
+            try: self._in_flight.result(timeout=timeout)
+            except Exception as e: logger.error(f"Waiting for checkpoint of {self.run_id} failed: {e}")
+
+def load_checkpoint(root_dir: str, run_id: str) -> Optional[Dict[str, Any]]:
+    """Returns {'manifest': ..., 'meta': ..., 'sections': {name: data}} for the last consistent checkpoint."""
+    run_dir = os.path.join(root_dir, run_id)
+    manifest_path = os.path.join(run_dir, MANIFEST_NAME)
+    if not os.path.isfile(manifest_path): logger.error(f"No checkpoint manifest found for run '{run_id}'."); return None
+    with open(manifest_path, 'r', encoding='utf-8') as f: manifest = json.load(f)
+    sections: Dict[str, Any] = {}
+    for name, digest in manifest.get('sections', {}).items():
+        path = os.path.join(run_dir, SECTIONS_DIR_NAME, _section_filename(name, digest))
+        if not os.path.isfile(path): logger.error(f"Checkpoint for run '{run_id}' is missing section '{name}'."); return None
+        with open(path, 'r', encoding='utf-8') as f: sections[name] = json.load(f)
+    logger.info(f"Loaded checkpoint {manifest.get('sequence')} of run '{run_id}' ({len(sections)} sections).")
+    return {'manifest': manifest, 'meta': manifest.get('meta', {}), 'sections': sections}
+
+def list_checkpoints(root_dir: str) -> List[Dict[str, Any]]:
+    """Summaries of resumable runs, newest first."""
+    if not os.path.isdir(root_dir): return []
+    runs = []
+    for run_id in os.listdir(root_dir):
+        manifest_path = os.path.join(root_dir, run_id, MANIFEST_NAME)
+        if not os.path.isfile(manifest_path): continue
+        try:
+            with open(manifest_path, 'r', encoding='utf-8') as f: manifest = json.load(f)
+        except (OSError, ValueError) as e: logger.warning(f"Skipping unreadable checkpoint manifest {manifest_path}: {e}"); continue
+        meta = manifest.get('meta', {})
+        runs.append({'run_id': run_id, 'sequence': manifest.get('sequence'), 'created_at': manifest.get('created_at'),
+                     'project_name': meta.get('project_name'), 'user_request': meta.get('user_request'), 'simulation_complete': meta.get('simulation_complete')})
+    return sorted(runs, key=lambda run: run.get('created_at') or 0, reverse=True)
@@ -0,0 +1,104 @@
+# SoftwareSim3d/src/simulation/code_patch.py
+
+import logging
+import re
+from typing import Dict, Any, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+FIX_MODE_PATCH = 'patch' # Specialists answer fixes with edit blocks / unified diffs
+FIX_MODE_FULL = 'full'   # Specialists regenerate the whole component (fallback)
+
+# Appended to specialists' fix prompts in patch mode
+PATCH_FORMAT_INSTRUCTIONS = """Respond ONLY with edit blocks that change the current code. Each edit block has this exact form:
+<<<<<<< SEARCH
+(lines copied exactly from the current code, including indentation; enough lines to be unique)
+=======
+(the replacement lines)
+>>>>>>> REPLACE
+Use one block per separate change and keep each SEARCH section as short as uniqueness allows. To delete code, leave the replacement empty.
+Do not repeat unchanged code outside the blocks and do not add any other text. If no changes are needed, respond with NO_CHANGES."""
+NO_CHANGES_MARKER = 'NO_CHANGES'
+
+_EDIT_BLOCK_RE = re.compile(r'^<{5,9} ?SEARCH[^\n]*\n(.*?)^={5,9}[ \t]*\n(.*?)^>{5,9} ?REPLACE[^\n]*$', re.MULTILINE | re.DOTALL)
+_HUNK_HEADER_RE = re.compile(r'^@@ -\d+(?:,\d+)? \+\d+(?:,\d+)? @@')
+
+Edit = Tuple[str, str] # (search text, replacement text)
+
+class PatchError(ValueError):
+    """A patch could not be parsed or does not apply cleanly to the code it targets."""
+
+def looks_like_patch(text: str) -> bool:
+    stripped = text.strip()
+    return stripped == NO_CHANGES_MARKER or bool(_EDIT_BLOCK_RE.search(text)) or any(_HUNK_HEADER_RE.match(line) for line in text.splitlines())
+
+def _strip_fences(text: str) -> str:
+    text = re.sub(r'^```[\w-]*[ \t]*\n', '', text.strip()); return re.sub(r'\n```[ \t]*$', '', text)
+
+def _parse_unified_diff(text: str) -> List[Edit]:
+    """Turns each @@ hunk into a (context + removed lines -> context + added lines) edit; line numbers are ignored."""
+    edits: List[Edit] = []; old: List[str] = []; new: List[str] = []; in_hunk = False
+    for line in text.splitlines():
+        if _HUNK_HEADER_RE.match(line):
+            if in_hunk: edits.append(('\n'.join(old), '\n'.join(new)))
+            old, new, in_hunk = [], [], True
+        elif not in_hunk or line.startswith(('--- ', '+++ ')): continue
+        elif line.startswith('\\'): continue # "\ No newline at end of file"
+        elif line.startswith('-'): old.append(line[1:])
+        elif line.startswith('+'): new.append(line[1:])
+        else: old.append(line[1:] if line.startswith(' ') else line); new.append(line[1:] if line.startswith(' ') else line)
+    if in_hunk: edits.append(('\n'.join(old), '\n'.join(new)))
+    return edits
+
+def parse_patch(text: str) -> List[Edit]:
+    """Parses SEARCH/REPLACE edit blocks or a unified diff. An explicit NO_CHANGES yields no edits."""
+    text = _strip_fences(text)
+    if text.strip() == NO_CHANGES_MARKER: return []
+    edits = [(search.rstrip('\n'), replace.rstrip('\n')) for search, replace in _EDIT_BLOCK_RE.findall(text)]
+    if not edits: edits = _parse_unified_diff(text)
+    if not edits: raise PatchError('response contains no edit blocks or diff hunks')
+    return edits
+
+def _locate(code: str, search: str) -> Tuple[int, int]:
+    """Span of the single occurrence of search in code; falls back to a trailing-whitespace-insensitive line match."""
+    count = code.count(search)
+    if count == 1: start = code.index(search); return start, start + len(search)
+    if count > 1: raise PatchError(f"search text matches {count} places: {search[:60]!r}")
+    lines = code.split('\n'); wanted = [line.rstrip() for line in search.split('\n')]; matches = []
+    for i in range(len(lines) - len(wanted) + 1):
+        if all(lines[i + j].rstrip() == wanted[j] for j in range(len(wanted))): matches.append(i)
+    if len(matches) != 1: raise PatchError(f"search text {'not found' if not matches else f'matches {len(matches)} places'}: {search[:60]!r}")
+    start = sum(len(line) + 1 for line in lines[:matches[0]])
+    end = start + sum(len(line) + 1 for line in lines[matches[0]:matches[0] + len(wanted)]) - 1
+    return start, end
+
+def apply_edits(code: str, edits: List[Edit]) -> str:
+    """Applies edits in order; each search text must match exactly one place in the (already edited) code."""
+    for search, replace in edits:
+        if not search.strip():
+            if code.strip(): raise PatchError('empty search text on non-empty code')
+            code = replace; continue
+        start, end = _locate(code, search)
+        code = code[:start] + replace + code[end:]
+    return code
+
+def apply_patch(code: str, patch_text: str) -> Tuple[str, int]:
+    """Parses and applies a patch; returns (patched code, number of edits). Raises PatchError."""
+    edits = parse_patch(patch_text)
+    return apply_edits(code, edits), len(edits)
+
+# --- Specialist side of patch-mode fixes ---
+def wants_patch(context: Dict[str, Any]) -> bool:
+    """Fixes are requested as edit blocks unless the Coder asked for full regeneration or there is no code to patch."""
+    return context.get('fix_mode', FIX_MODE_PATCH) == FIX_MODE_PATCH and bool(context.get('current_code'))
+
+def patch_from_response(llm_response: str, context: Dict[str, Any], label: str = 'fix') -> Optional[str]:
+    """The patch text of a fix response in patch mode, or None when the response is (treated as) the full component."""
+    if not wants_patch(context): return None
+    if looks_like_patch(llm_response): return llm_response.strip()
+    logger.warning(f"{label}: fix response is not a patch; treating it as the full component.")
+    return None
+
+def patch_message_fields(patch_text: str, context: Dict[str, Any]) -> Dict[str, Any]:
+    """Fields of an updated-component message carrying a patch; the Coder applies it to the code the fix was based on."""
+    return {'fix_mode': FIX_MODE_PATCH, 'patch': patch_text, 'base_code': context.get('current_code')}
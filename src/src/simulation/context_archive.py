@@ -0,0 +1,104 @@
+# SoftwareSim3d/src/simulation/context_archive.py
+
+import json
+import logging
+import os
+import re
+import time
+from collections import OrderedDict
+from typing import Dict, Any, Optional, Tuple, Callable
+
+from .file_io import atomic_write_text, read_text_if_file
+
+logger = logging.getLogger(__name__)
+
+CONTEXT_ARCHIVE_DIR_NAME = '.context_archive'
+DEFAULT_CONTEXT_TTL_S = 300.0 # Finished task contexts stay in memory this long (late QA feedback, fixes)
+DEFAULT_MAX_FINISHED_CONTEXTS = 50 # ...and at most this many across all agents
+DEFAULT_RUN_MEMORY_CAP_BYTES = 256 * 1024 * 1024
+
+Submit = Callable[..., Any] # submit(fn, *args) -> Future, e.g. AsyncFileIO.submit
+
+def _safe_name(name: str) -> str:
+    return re.sub(r'[^A-Za-z0-9_.-]+', '_', name) or '_'
+
+def estimate_size(value: Any) -> int:
+    """Rough in-memory footprint in bytes: string lengths plus a flat per-object overhead."""
+    total = 0; stack = [value]
+    while stack:
+        item = stack.pop()
+        if isinstance(item, str): total += 49 + len(item)
+        elif isinstance(item, (bytes, bytearray)): total += 33 + len(item)
+        elif isinstance(item, dict): total += 64 + 16 * len(item); stack.extend(item.keys()); stack.extend(item.values())
+        elif isinstance(item, (list, tuple, set, frozenset)): total += 56 + 8 * len(item); stack.extend(item)
+        else: total += 28
+    return total
+
+class ContextArchive:
+    """
+    Lifecycle for finished task contexts. The manager reports finished (agent, task) pairs; sweep()
+    writes their contexts to disk and drops them from agent.task_context once they are older than
+    the TTL, beyond the count limit, or when forced by the memory cap. recall() brings one back.
+    """
+    def __init__(self, root_dir: str, submit: Submit, ttl_s: float = DEFAULT_CONTEXT_TTL_S,
+                 max_finished_contexts: int = DEFAULT_MAX_FINISHED_CONTEXTS):
+        self.root_dir = root_dir
+        self.submit = submit
+        self.ttl_s = ttl_s
+        self.max_finished_contexts = max(0, max_finished_contexts)
+        self.run_id: Optional[str] = None
+        self._finished: 'OrderedDict[Tuple[str, str], float]' = OrderedDict() # (agent_id, task_id) -> finish time
+        self._unwritten: Dict[str, str] = {} # path -> JSON still queued for disk
+        self.archived = 0; self.recalled = 0
+
+    def reset(self, run_id: str):
+        """Starts tracking a new (or resumed) run; archives of earlier runs stay on disk."""
+        self.run_id = run_id; self._finished.clear()
+
+    def _path(self, agent_id: str, task_id: str) -> str:
+        return os.path.join(self.root_dir, _safe_name(self.run_id or 'no_run'), _safe_name(agent_id), f"{_safe_name(task_id)}.json")
+
+    def note_finished(self, agent_id: str, task_id: str):
+        key = (agent_id, task_id)
+        self._finished.pop(key, None); self._finished[key] = time.monotonic()
+
+    def pending_count(self) -> int:
+        return len(self._finished)
+
+    def sweep(self, agents: Dict[str, Any], force: bool = False) -> int:
+        """Archives and evicts due contexts (all finished ones if force). Returns the number evicted."""
+        now = time.monotonic(); evicted = 0; deferred = []
+        while self._finished:
+            (agent_id, task_id), finished_at = next(iter(self._finished.items()))
+            due = force or len(self._finished) > self.max_finished_contexts or now - finished_at >= self.ttl_s
+            if not due: break
+            self._finished.popitem(last=False)
+            agent = agents.get(agent_id)
+            if agent is None or task_id not in agent.task_context: continue
+            if agent.current_task and agent.current_task.get('task_id') == task_id: deferred.append(((agent_id, task_id), finished_at)); continue # Re-assigned; still live
+            context = agent.task_context.pop(task_id)
+            try: text = json.dumps(context, default=str)
+            except (TypeError, ValueError) as e: logger.warning(f"ContextArchive: context {agent_id}/{task_id} not serialisable ({e}); dropping it."); continue
+            path = self._path(agent_id, task_id); self._unwritten[path] = text
+            self.submit(atomic_write_text, path, text).add_done_callback(lambda future, path=path: self._on_archived(path, future))
+            evicted += 1
+        for key, finished_at in deferred: self._finished[key] = finished_at
+        if evicted: self.archived += evicted; logger.debug(f"ContextArchive: evicted {evicted} finished task context(s).")
+        return evicted
+
+    def _on_archived(self, path: str, future: Any):
+        error = future.exception() # Runs on the I/O thread; dict pop is atomic
+        if error is not None: logger.error(f"ContextArchive: failed to archive {path}: {error}"); return # Kept in memory for recall
+        self._unwritten.pop(path, None)
+
+    def recall(self, agent_id: str, task_id: str) -> Optional[Dict[str, Any]]:
+        """Loads an archived context (blocking, small file), or None."""
+        path = self._path(agent_id, task_id)
+        text = self._unwritten.get(path)
+        if text is None: text = read_text_if_file(path)
+        if text is None: return None
+        self.recalled += 1
+        return json.loads(text)
+
+    def stats_snapshot(self) -> Dict[str, Any]:
+        return {'finished_in_memory': len(self._finished), 'archived': self.archived, 'recalled': self.recalled}
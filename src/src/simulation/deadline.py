@@ -0,0 +1,69 @@
+# SoftwareSim3d/src/simulation/deadline.py
+
+import logging
+import math
+import time
+from typing import Dict, Any, Optional
+
+logger = logging.getLogger(__name__)
+
+# Budget levels, from plenty of time to none
+LEVEL_NORMAL = 'normal'
+LEVEL_TIGHT = 'tight'       # Cheaper strategies: faster models, no optional QA fix rounds
+LEVEL_CRITICAL = 'critical' # Finish with what exists: skip reviews, component fallbacks, short waits
+LEVEL_EXPIRED = 'expired'   # The manager ends the run with the outputs saved so far
+LEVEL_ORDER = {LEVEL_NORMAL: 0, LEVEL_TIGHT: 1, LEVEL_CRITICAL: 2, LEVEL_EXPIRED: 3}
+
+TIGHT_FRACTION = 0.35 # Share of the SLA left when the run turns tight
+CRITICAL_FRACTION = 0.12
+CRITICAL_MIN_S = 30.0 # Never later than this before the deadline
+MIN_WAIT_S = 2.0 # Smallest timeout cap() hands out, so a call near the deadline can still complete
+CRITICAL_WAIT_S = 10.0 # Longest an agent waits on another agent once the budget is critical
+DEFAULT_LLM_CALL_TIMEOUT_S = 120.0
+
+# Cheaper/faster model per provider, used once the run is tight
+FAST_MODELS = {'openai': 'gpt-4o-mini', 'gemini': 'gemini-2.0-flash', 'anthropic': 'claude-3-5-haiku-20241022'}
+
+class RunDeadline:
+    """
+    Wall-clock budget of one run (the user's SLA). Shared by the manager and every agent of the run: timeouts
+    are capped by the time left, and level() tells callers when to switch to cheaper strategies.
+    A deadline without an SLA never tightens and caps nothing.
+    """
+    __slots__ = ('sla_s', 'started_at', 'deadline_at', '_level')
+
+    def __init__(self, sla_s: Optional[float] = None, now: Optional[float] = None):
+        self.sla_s = sla_s if sla_s and sla_s > 0 else None
+        self.started_at = time.time() if now is None else now
+        self.deadline_at = self.started_at + self.sla_s if self.sla_s else math.inf
+        self._level = LEVEL_NORMAL
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {'sla_s': self.sla_s, 'started_at': self.started_at, 'deadline_at': None if math.isinf(self.deadline_at) else self.deadline_at}
+
+    @property
+    def enabled(self) -> bool: return self.sla_s is not None
+
+    def remaining(self) -> float:
+        return self.deadline_at - time.time()
+
+    def level(self) -> str:
+        """Current budget level; logged once per change."""
+        if not self.sla_s: return LEVEL_NORMAL
+        remaining = self.remaining()
+        if remaining <= 0: level = LEVEL_EXPIRED
+        elif remaining <= max(CRITICAL_MIN_S, self.sla_s * CRITICAL_FRACTION): level = LEVEL_CRITICAL
+        elif remaining <= self.sla_s * TIGHT_FRACTION: level = LEVEL_TIGHT
+        else: level = LEVEL_NORMAL
+        if level != self._level:
+            logger.warning(f"Run deadline: budget is now '{level}' ({max(0.0, remaining):.0f}s of {self.sla_s:.0f}s left).")
+            self._level = level
+        return level
+
+    def at_least(self, level: str) -> bool:
+        return LEVEL_ORDER[self.level()] >= LEVEL_ORDER[level]
+
+    def cap(self, timeout: float) -> float:
+        """timeout, shortened to the time left before the deadline (but not below MIN_WAIT_S)."""
+        if not self.sla_s: return timeout
+        return max(MIN_WAIT_S, min(timeout, self.remaining()))
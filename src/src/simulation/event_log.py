@@ -0,0 +1,150 @@
+# SoftwareSim3d/src/simulation/event_log.py
+
+import json
+import logging
+import os
+import queue
+import re
+import threading
+import time
+from typing import Dict, Any, Optional, List, Iterator, Callable
+
+logger = logging.getLogger(__name__)
+
+EVENT_LOGS_DIR_NAME = '.event_logs'
+SEGMENT_PREFIX = 'segment-'
+SEGMENT_SUFFIX = '.jsonl'
+DEFAULT_SEGMENT_MAX_BYTES = 8 * 1024 * 1024
+EVENT_LOG_VERSION = 1
+MAX_REPLAY_GAP_S = 5.0 # Idle gaps (e.g. between a crash and its resume) are compressed to this on replay
+
+# Record kinds. Each line is a compact JSON array: [ms since segment base, kind, *fields]
+KIND_MESSAGE = 'm'      # sender_id, recipient_id, content
+KIND_AGENT = 'a'        # agent_id, changed state keys
+KIND_TASK = 't'         # task_id, task summary
+KIND_LLM = 'l'          # agent_id, task_id, duration_ms, ok (logged at the call's end; start = t - duration)
+KIND_FINAL = 'f'        # output, success
+
+def _json_default(value: Any) -> Any:
+    if isinstance(value, (set, frozenset)): return sorted(value, key=str)
+    return str(value)
+
+def _segment_name(index: int) -> str:
+    return f"{SEGMENT_PREFIX}{index:06d}{SEGMENT_SUFFIX}"
+
+def _segment_indexes(run_dir: str) -> List[int]:
+    if not os.path.isdir(run_dir): return []
+    indexes = []
+    for filename in os.listdir(run_dir):
+        match = re.fullmatch(rf"{SEGMENT_PREFIX}(\d+){re.escape(SEGMENT_SUFFIX)}", filename)
+        if match: indexes.append(int(match.group(1)))
+    return sorted(indexes)
+
+class EventLog:
+    """
+    Append-only, segmented log of everything the UI saw during a run. append() encodes one line and
+    enqueues it; a writer thread appends lines, rotating to a new segment past segment_max_bytes. A resumed run
+    appends new segments to the same directory, each starting with its own header and time base.
+    """
+    def __init__(self, root_dir: str, run_id: str, segment_max_bytes: int = DEFAULT_SEGMENT_MAX_BYTES):
+        self.run_id = run_id
+        self.run_dir = os.path.join(root_dir, run_id)
+        self.segment_max_bytes = segment_max_bytes
+        self._queue: 'queue.Queue[Optional[str]]' = queue.Queue()
+        self._file = None; self._segment_bytes = 0
+        self._segment_index = (_segment_indexes(self.run_dir) or [0])[-1]
+        self._base = time.time()
+        self.records = 0; self.segments_opened = 0
+        self._writer = threading.Thread(target=self._write_loop, name=f'event-log-{run_id}', daemon=True)
+        self._writer.start()
+
+    def append(self, kind: str, *fields: Any):
+        """Encodes now (payloads are live dicts that may change later) and queues the line for the writer."""
+        try: self._queue.put(json.dumps([int((time.time() - self._base) * 1000), kind, *fields], default=_json_default, separators=(',', ':')) + '\n')
+        except (TypeError, ValueError) as e: logger.warning(f"EventLog {self.run_id}: could not encode '{kind}' record: {e}")
+
+    def close(self, timeout: Optional[float] = 10.0):
+        """Writes everything queued so far and closes the current segment (blocking; call off the event loop)."""
+        self._queue.put(None); self._writer.join(timeout)
+
+    def _open_segment(self):
+        if self._file is not None: self._file.close()
+        os.makedirs(self.run_dir, exist_ok=True)
+        self._segment_index += 1; self.segments_opened += 1
+        self._file = open(os.path.join(self.run_dir, _segment_name(self._segment_index)), 'a', encoding='utf-8')
+        header = json.dumps({'v': EVENT_LOG_VERSION, 'run_id': self.run_id, 'segment': self._segment_index, 'base': self._base}, separators=(',', ':')) + '\n'
+        self._file.write(header); self._segment_bytes = len(header)
+
+    def _write_loop(self):
+        while True:
+            record = self._queue.get(); batch = [record]
+            while record is not None:
+                try: record = self._queue.get_nowait(); batch.append(record)
+                except queue.Empty: break
+            try:
+                for line in batch:
+                    if line is None: continue
+                    if self._file is None or self._segment_bytes + len(line) > self.segment_max_bytes: self._open_segment()
+                    self._file.write(line); self._segment_bytes += len(line); self.records += 1
+                if self._file is not None: self._file.flush()
+            except (OSError, ValueError) as e: logger.error(f"EventLog {self.run_id}: failed to append {len(batch)} record(s): {e}")
+            if batch[-1] is None:
+                if self._file is not None: self._file.close(); self._file = None
+                logger.info(f"EventLog {self.run_id}: closed after {self.records} records in {self.segments_opened} new segment(s).")
+                return
+
+def read_events(root_dir: str, run_id: str) -> Iterator[List[Any]]:
+    """Yields [absolute_time, kind, *fields] for every record of a run, segment by segment."""
+    run_dir = os.path.join(root_dir, run_id)
+    for index in _segment_indexes(run_dir):
+        with open(os.path.join(run_dir, _segment_name(index)), 'r', encoding='utf-8') as f:
+            header_line = f.readline()
+            try: base = json.loads(header_line)['base']
+            except (ValueError, KeyError, TypeError): logger.warning(f"EventLog: segment {index} of '{run_id}' has no header; skipping."); continue
+            for line in f:
+                try: record = json.loads(line)
+                except ValueError: logger.warning(f"EventLog: truncated record in segment {index} of '{run_id}'; stopping segment."); break
+                record[0] = base + record[0] / 1000.0
+                yield record
+
+def list_event_logs(root_dir: str) -> List[str]:
+    if not os.path.isdir(root_dir): return []
+    return sorted((run_id for run_id in os.listdir(root_dir) if _segment_indexes(os.path.join(root_dir, run_id))), reverse=True)
+
+class ReplayEngine:
+    """
+    Streams a recorded run back through the same UI callbacks the live simulation uses, at a speed
+    multiplier (speed <= 0 means as fast as possible). No agents or LLM calls are involved.
+    """
+    def __init__(self, root_dir: str, run_id: str, emit_agent_update: Callable[[str, Dict[str, Any]], None],
+                 emit_task_update: Callable[[str, Dict[str, Any]], None], emit_final_output: Callable[[str, bool], None]):
+        self.root_dir = root_dir
+        self.run_id = run_id
+        self.emit_agent_update = emit_agent_update
+        self.emit_task_update = emit_task_update
+        self.emit_final_output = emit_final_output
+        self._stop = threading.Event()
+
+    def stop(self):
+        self._stop.set()
+
+    def run(self, speed: float = 1.0) -> Dict[str, Any]:
+        """Blocks until the replay ends or stop() is called; returns replay statistics."""
+        counts: Dict[str, int] = {}; started = time.monotonic(); replay_clock = 0.0; previous_time = None
+        for record in read_events(self.root_dir, self.run_id):
+            if self._stop.is_set(): break
+            event_time, kind = record[0], record[1]
+            if previous_time is not None: replay_clock += min(max(0.0, event_time - previous_time), MAX_REPLAY_GAP_S)
+            previous_time = event_time
+            if speed > 0:
+                delay = replay_clock / speed - (time.monotonic() - started)
+                if delay > 0 and self._stop.wait(delay): break
+            if kind == KIND_AGENT: self.emit_agent_update(record[2], record[3])
+            elif kind == KIND_TASK: self.emit_task_update(record[2], record[3])
+            elif kind == KIND_FINAL: self.emit_final_output(record[2], bool(record[3]))
+            counts[kind] = counts.get(kind, 0) + 1 # Messages and LLM boundaries are counted, not rendered
+        elapsed = time.monotonic() - started
+        stats = {'run_id': self.run_id, 'speed': speed, 'events': sum(counts.values()), 'by_kind': counts, 'recorded_s': round(replay_clock, 3),
+                 'elapsed_s': round(elapsed, 3), 'stopped': self._stop.is_set()}
+        logger.info(f"Replay finished: {stats}")
+        return stats
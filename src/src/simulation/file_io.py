@@ -0,0 +1,93 @@
+# SoftwareSim3d/src/simulation/file_io.py
+
+import asyncio
+import concurrent.futures
+import logging
+import os
+import tempfile
+import threading
+from collections import OrderedDict
+from typing import Dict, Any, Optional, Callable
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_FILE_IO_WORKERS = 4 # Bounded pool; disk work never runs on the simulation loop
+DEFAULT_FILE_CACHE_MAX_BYTES = 16 * 1024 * 1024
+
+def atomic_write_text(path: str, content: str, encoding: str = 'utf-8'):
+    """Writes to a temp file in the target directory, then renames it over the target."""
+    directory = os.path.dirname(path)
+    os.makedirs(directory, exist_ok=True)
+    fd, tmp_path = tempfile.mkstemp(dir=directory, prefix='.tmp_')
+    try:
+        with os.fdopen(fd, 'w', encoding=encoding) as f: f.write(content)
+        os.replace(tmp_path, path)
+    except Exception:
+        if os.path.exists(tmp_path): os.remove(tmp_path)
+        raise
+
+def read_text_if_file(path: str, encoding: str = 'utf-8') -> Optional[str]:
+    if not os.path.isfile(path): return None
+    with open(path, 'r', encoding=encoding) as f: return f.read()
+
+class AsyncFileIO:
+    """
+    Async file access for the backend tools: blocking calls run on a bounded thread pool, writes are
+    atomic, and a write-through cache serves reads of files written (or already read) in this run.
+    """
+    def __init__(self, loop: asyncio.AbstractEventLoop, max_workers: int = DEFAULT_FILE_IO_WORKERS,
+                 cache_max_bytes: int = DEFAULT_FILE_CACHE_MAX_BYTES):
+        self.loop = loop
+        self.max_workers = max(1, max_workers)
+        self.cache_max_bytes = cache_max_bytes
+        self._executor: Optional[concurrent.futures.ThreadPoolExecutor] = None
+        self._executor_lock = threading.Lock()
+        self._cache: 'OrderedDict[str, str]' = OrderedDict() # abs path -> content (loop thread only)
+        self._cache_bytes = 0
+        self._path_locks: Dict[str, asyncio.Lock] = {} # Serialises writes to the same path
+        self.cache_hits = 0; self.disk_reads = 0; self.disk_writes = 0
+
+    def _get_executor(self) -> concurrent.futures.ThreadPoolExecutor:
+        with self._executor_lock:
+            if self._executor is None: self._executor = concurrent.futures.ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix='file-io')
+            return self._executor
+
+    def submit(self, fn: Callable[..., Any], *args: Any) -> concurrent.futures.Future:
+        """Runs fn on the I/O pool from any thread (used for fire-and-forget writes)."""
+        return self._get_executor().submit(fn, *args)
+
+    # --- Cache ---
+    def _cache_put(self, path: str, content: str):
+        previous = self._cache.pop(path, None)
+        if previous is not None: self._cache_bytes -= len(previous)
+        self._cache[path] = content; self._cache_bytes += len(content)
+        while self._cache_bytes > self.cache_max_bytes and len(self._cache) > 1:
+            _, evicted = self._cache.popitem(last=False); self._cache_bytes -= len(evicted)
+
+    def clear_cache(self):
+        self._cache.clear(); self._cache_bytes = 0
+
+    # --- Async API ---
+    async def write_text(self, path: str, content: str):
+        lock = self._path_locks.get(path)
+        if lock is None: lock = self._path_locks[path] = asyncio.Lock()
+        async with lock:
+            await self.loop.run_in_executor(self._get_executor(), atomic_write_text, path, content)
+            self._cache_put(path, content); self.disk_writes += 1
+
+    async def read_text(self, path: str) -> Optional[str]:
+        """Returns the file content, or None if it does not exist."""
+        content = self._cache.get(path)
+        if content is not None: self._cache.move_to_end(path); self.cache_hits += 1; return content
+        content = await self.loop.run_in_executor(self._get_executor(), read_text_if_file, path)
+        self.disk_reads += 1
+        if content is not None: self._cache_put(path, content)
+        return content
+
+    async def close(self):
+        """Waits for queued I/O and releases the pool (recreated on next use)."""
+        with self._executor_lock: executor, self._executor = self._executor, None
+        if executor is not None: await self.loop.run_in_executor(None, executor.shutdown, True)
+
+    def stats_snapshot(self) -> Dict[str, Any]:
+        return {'cached_files': len(self._cache), 'cached_bytes': self._cache_bytes, 'cache_hits': self.cache_hits, 'disk_reads': self.disk_reads, 'disk_writes': self.disk_writes}
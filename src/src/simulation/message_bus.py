@@ -0,0 +1,207 @@
+# SoftwareSim3d/src/simulation/message_bus.py
+
+import asyncio
+import contextvars
+import logging
+import time
+from collections import deque
+from typing import Dict, Any, Optional, Callable, Awaitable, Union, List
+
+logger = logging.getLogger(__name__)
+
+MANAGER_ID = 'workflow_manager'
+DEFAULT_AGENT_QUEUE_SIZE = 64 # Per-agent inbox bound; agent senders wait when it is full (backpressure), the manager never does
+DEFAULT_MANAGER_QUEUE_SIZE = 256
+DEFAULT_MANAGER_WORKERS = 4 # Fixed pool instead of one task per manager-bound message
+
+# Set inside manager workers (and inherited by the tasks they spawn): their sends to a full agent queue are buffered, not awaited
+_manager_side: contextvars.ContextVar[bool] = contextvars.ContextVar('message_bus_manager_side', default=False)
+
+# Message types the Coder sends to its HTML/CSS/JS specialists -> (task type, task id prefix)
+TASK_MESSAGE_TYPES = {
+    'create_html_structure': ('generate_html', 'html_task'), 'create_css_styles': ('generate_css', 'css_task'),
+    'create_js_logic': ('generate_js', 'js_task'), 'fix_html_component': ('fix_html_component', 'html_fix'),
+    'fix_css_styles': ('fix_css_styles', 'css_fix'), 'fix_js_logic': ('fix_js_logic', 'js_fix'),
+}
+
+class Message:
+    """Routed envelope. The content dict is held by reference and never copied."""
+    __slots__ = ('sender_id', 'recipient_id', 'content', 'msg_type', 'sent_at')
+
+    def __init__(self, sender_id: str, recipient_id: str, content: Dict[str, Any]):
+        self.sender_id = sender_id
+        self.recipient_id = recipient_id
+        self.content = content if content is not None else {}
+        self.msg_type = self.content.get('type', 'unknown') if isinstance(self.content, dict) else 'unknown'
+        self.sent_at = time.perf_counter()
+
+    @classmethod
+    def coerce(cls, message: Union['Message', Dict[str, Any]]) -> 'Message':
+        """Accepts legacy dict envelopes so older call sites keep working."""
+        if isinstance(message, Message): return message
+        return cls(message.get('sender_id'), message.get('recipient_id'), message.get('content', {}))
+
+    # Mapping-style access for handlers written against the old dict envelopes
+    def get(self, key: str, default: Any = None) -> Any:
+        return getattr(self, key, default) if key in Message.__slots__ else default
+
+    def __getitem__(self, key: str) -> Any:
+        if key not in Message.__slots__: raise KeyError(key)
+        return getattr(self, key)
+
+    def __repr__(self) -> str:
+        return f"Message({self.sender_id} -> {self.recipient_id}, type={self.msg_type})"
+
+def unwrap_agent_message(content: Any) -> Any:
+    """Returns the inner payload of an {'type': 'agent_message', 'message_data': {...}} wrapper (or content unchanged)."""
+    while isinstance(content, dict) and content.get('type') == 'agent_message' and isinstance(content.get('message_data'), dict):
+        content = content['message_data']
+    return content
+
+class RouteStats:
+    """Per message-type routing cost counters."""
+    __slots__ = ('count', 'total_ns', 'max_ns', 'backpressure_waits', 'overflowed', 'total_delivery_s')
+
+    def __init__(self):
+        self.count = 0; self.total_ns = 0; self.max_ns = 0; self.backpressure_waits = 0; self.overflowed = 0; self.total_delivery_s = 0.0
+
+    def to_dict(self) -> Dict[str, Any]:
+        avg_us = (self.total_ns / self.count / 1000.0) if self.count else 0.0
+        return {'count': self.count, 'avg_route_us': round(avg_us, 2), 'max_route_us': round(self.max_ns / 1000.0, 2), 'backpressure_waits': self.backpressure_waits,
+                'overflowed': self.overflowed, 'total_delivery_s': round(self.total_delivery_s, 4)}
+
+ManagerHandler = Callable[[Message], Awaitable[None]]
+
+class MessageBus:
+    """Routes messages between agents and the WorkflowManager through bounded queues."""
+
+    def __init__(self, loop: asyncio.AbstractEventLoop, queue_maxsize: int = DEFAULT_AGENT_QUEUE_SIZE,
+                 manager_queue_maxsize: int = DEFAULT_MANAGER_QUEUE_SIZE, manager_workers: int = DEFAULT_MANAGER_WORKERS):
+        self.loop = loop
+        self.queue_maxsize = queue_maxsize
+        self.manager_workers = max(1, manager_workers)
+        self._queues: Dict[str, asyncio.Queue] = {}
+        self._manager_queue: asyncio.Queue = asyncio.Queue(maxsize=manager_queue_maxsize)
+        self._manager_handler: Optional[ManagerHandler] = None
+        self._delivery_listener: Optional[Callable[[str], None]] = None # Called with the recipient id after each agent delivery
+        self._worker_tasks: List[asyncio.Task] = []
+        self._overflow: Dict[str, deque] = {} # agent id -> manager-side messages waiting for room in its queue
+        self._overflow_tasks: Dict[str, asyncio.Task] = {}
+        self.stats: Dict[str, RouteStats] = {}
+
+    # --- Registration ---
+    def register_agent(self, agent_id: str) -> asyncio.Queue:
+        queue = self._queues.get(agent_id)
+        if queue is None: queue = asyncio.Queue(maxsize=self.queue_maxsize); self._queues[agent_id] = queue
+        return queue
+
+    def unregister_agent(self, agent_id: str):
+        self._queues.pop(agent_id, None); self._overflow.pop(agent_id, None)
+        task = self._overflow_tasks.pop(agent_id, None)
+        if task: task.cancel()
+
+    def has_recipient(self, recipient_id: str) -> bool:
+        return recipient_id == MANAGER_ID or recipient_id in self._queues
+
+    def set_manager_handler(self, handler: ManagerHandler):
+        self._manager_handler = handler
+
+    def set_delivery_listener(self, listener: Optional[Callable[[str], None]]):
+        self._delivery_listener = listener
+
+    # --- Routing ---
+    async def publish(self, message: Union[Message, Dict[str, Any]]):
+        """
+        Enqueues a message for its recipient. Agent senders wait while the recipient's queue is full; the manager side
+        (its workers and their tasks) never does, since the recipient may itself be waiting on the manager: those messages
+        go to a per-recipient overflow buffer that a delivery task moves into the queue in order.
+        """
+        if asyncio.get_running_loop() is not self.loop:
+            asyncio.run_coroutine_threadsafe(self.publish(message), self.loop); return
+        start_ns = time.perf_counter_ns()
+        msg = Message.coerce(message)
+        queue = self._manager_queue if msg.recipient_id == MANAGER_ID else self._queues.get(msg.recipient_id)
+        if queue is None: logger.warning(f"Cannot route message: Unknown recipient_id '{msg.recipient_id}' from sender '{msg.sender_id}'"); return
+        stats = self.stats.get(msg.msg_type)
+        if stats is None: stats = self.stats[msg.msg_type] = RouteStats()
+        if queue is not self._manager_queue and (msg.recipient_id in self._overflow or ((_manager_side.get() or msg.sender_id == MANAGER_ID) and queue.full())):
+            stats.overflowed += 1; self._buffer(msg)
+        else:
+            if queue.full():
+                stats.backpressure_waits += 1
+                logger.debug(f"Queue for {msg.recipient_id} full ({queue.qsize()}); {msg.sender_id} waiting to deliver '{msg.msg_type}'.")
+            await queue.put(msg)
+            if self._delivery_listener and queue is not self._manager_queue: self._delivery_listener(msg.recipient_id)
+        elapsed_ns = time.perf_counter_ns() - start_ns
+        stats.count += 1; stats.total_ns += elapsed_ns
+        if elapsed_ns > stats.max_ns: stats.max_ns = elapsed_ns
+
+    def _buffer(self, msg: Message):
+        """Parks an agent-bound message behind any already buffered for that agent and ensures a task is delivering them."""
+        pending = self._overflow.get(msg.recipient_id)
+        if pending is None: pending = self._overflow[msg.recipient_id] = deque()
+        pending.append(msg)
+        logger.debug(f"Queue for {msg.recipient_id} full; buffered '{msg.msg_type}' from {msg.sender_id} ({len(pending)} waiting).")
+        task = self._overflow_tasks.get(msg.recipient_id)
+        if task is None or task.done(): self._overflow_tasks[msg.recipient_id] = self.loop.create_task(self._deliver_overflow(msg.recipient_id))
+
+    async def _deliver_overflow(self, agent_id: str):
+        try:
+            while True:
+                pending = self._overflow.get(agent_id); queue = self._queues.get(agent_id)
+                if not pending or queue is None: break
+                await queue.put(pending[0]); pending.popleft()
+                if self._delivery_listener: self._delivery_listener(agent_id)
+        finally:
+            if not self._overflow.get(agent_id): self._overflow.pop(agent_id, None)
+            if self._overflow_tasks.get(agent_id) is asyncio.current_task(): self._overflow_tasks.pop(agent_id, None)
+
+    def record_delivery(self, msg: Message):
+        """Records queue latency once a consumer dequeues the message."""
+        stats = self.stats.get(msg.msg_type)
+        if stats is not None: stats.total_delivery_s += time.perf_counter() - msg.sent_at
+
+    # --- Manager dispatch workers ---
+    def start(self):
+        """Starts the manager worker pool. Must be called from within the bus loop."""
+        if any(not t.done() for t in self._worker_tasks): return
+        self._worker_tasks = [self.loop.create_task(self._manager_worker(i)) for i in range(self.manager_workers)]
+        logger.info(f"MessageBus started {self.manager_workers} manager workers.")
+
+    async def stop(self):
+        tasks = self._worker_tasks + list(self._overflow_tasks.values())
+        for task in tasks: task.cancel()
+        if tasks: await asyncio.gather(*tasks, return_exceptions=True)
+        self._worker_tasks = []; self._overflow_tasks.clear()
+
+    async def _manager_worker(self, worker_index: int):
+        _manager_side.set(True)
+        while True:
+            msg = await self._manager_queue.get()
+            try:
+                self.record_delivery(msg)
+                if self._manager_handler: await self._manager_handler(msg)
+                else: logger.warning(f"MessageBus dropped '{msg.msg_type}' from {msg.sender_id}: no manager handler registered.")
+            except asyncio.CancelledError: raise
+            except Exception as e: logger.error(f"Manager worker {worker_index} failed handling '{msg.msg_type}' from {msg.sender_id}: {e}", exc_info=True)
+            finally: self._manager_queue.task_done()
+
+    def drain(self):
+        """Discards undelivered messages (used when a run is reset)."""
+        for task in self._overflow_tasks.values(): task.cancel()
+        self._overflow_tasks.clear(); self._overflow.clear()
+        for queue in list(self._queues.values()) + [self._manager_queue]:
+            while not queue.empty():
+                try: queue.get_nowait(); queue.task_done()
+                except asyncio.QueueEmpty: break
+
+    # --- Reporting ---
+    def stats_snapshot(self) -> Dict[str, Dict[str, Any]]:
+        return {msg_type: stats.to_dict() for msg_type, stats in self.stats.items()}
+
+    def log_stats(self):
+        if not self.stats: return
+        total = sum(s.count for s in self.stats.values()); total_ns = sum(s.total_ns for s in self.stats.values())
+        busiest = sorted(self.stats.items(), key=lambda kv: kv[1].total_ns, reverse=True)[:5]
+        summary = ", ".join(f"{t}: n={s.count} avg={s.total_ns / max(1, s.count) / 1000.0:.1f}us bp={s.backpressure_waits}" for t, s in busiest)
+        logger.info(f"MessageBus routed {total} messages (avg {total_ns / max(1, total) / 1000.0:.1f}us). Top: {summary}")
@@ -0,0 +1,100 @@
+# SoftwareSim3d/src/simulation/org_chart.py
+
+import json
+import logging
+import os
+from typing import Dict, Any, Optional, List, Tuple, Iterable
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_ORG_CHART_PATH = os.path.join(os.path.dirname(__file__), 'org_chart.json')
+SPAWN_EAGER = 'eager' # Built with the manager (entry points such as the CEO and Messenger)
+SPAWN_LAZY = 'lazy'   # Built when the first message (usually a delegated task) is routed to it
+ORG_CHART_VERSION = 1
+
+class OrgChartError(ValueError):
+    """The org chart file is missing, malformed or inconsistent."""
+
+class RoleSpec:
+    """One role of the org chart. Agent ids are '<id_prefix>-NN' for NN in 1..count."""
+    __slots__ = ('role', 'agent_class', 'id_prefix', 'count', 'spawn', 'start_zone', 'desk_zone', 'tools', 'reports_to', 'wiring', 'llm_config_role')
+
+    def __init__(self, data: Dict[str, Any]):
+        try: self.role = data['role']; self.agent_class = data['class']; self.id_prefix = data['id_prefix']
+        except KeyError as e: raise OrgChartError(f"role entry {data!r} is missing {e}") from None
+        self.count = int(data.get('count', 1))
+        self.spawn = data.get('spawn', SPAWN_LAZY)
+        self.start_zone = data.get('start_zone'); self.desk_zone = data.get('desk_zone') or self.start_zone
+        self.tools = set(data.get('tools') or [])
+        self.reports_to: Optional[str] = data.get('reports_to')
+        self.wiring: Dict[str, Any] = dict(data.get('wiring') or {}) # init kwarg -> role name (one id) or list of role names ({role: id})
+        self.llm_config_role: str = data.get('llm_config_role') or self.role # Whose LLM settings from the UI apply
+        if self.count < 1: raise OrgChartError(f"role '{self.role}' has count {self.count}")
+        if self.spawn not in (SPAWN_EAGER, SPAWN_LAZY): raise OrgChartError(f"role '{self.role}' has unknown spawn mode '{self.spawn}'")
+
+    @property
+    def agent_ids(self) -> List[str]:
+        return [f"{self.id_prefix}-{index:02d}" for index in range(1, self.count + 1)]
+
+class OrgChart:
+    """Declarative org: roles, head counts, tools, zones, reporting lines and the agent-id wiring each role needs."""
+    def __init__(self, roles: Iterable[RoleSpec], tool_zones: Optional[Dict[str, str]] = None):
+        self.roles: Dict[str, RoleSpec] = {}
+        self.tool_zones: Dict[str, str] = dict(tool_zones or {})
+        self._role_by_agent: Dict[str, str] = {}
+        for spec in roles:
+            if spec.role in self.roles: raise OrgChartError(f"role '{spec.role}' is defined twice")
+            self.roles[spec.role] = spec
+            for agent_id in spec.agent_ids:
+                if agent_id in self._role_by_agent: raise OrgChartError(f"agent id '{agent_id}' is used by '{self._role_by_agent[agent_id]}' and '{spec.role}'")
+                self._role_by_agent[agent_id] = spec.role
+        self._validate()
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> 'OrgChart':
+        if not isinstance(data, dict) or not isinstance(data.get('roles'), list): raise OrgChartError("org chart needs a 'roles' list")
+        if data.get('version', ORG_CHART_VERSION) != ORG_CHART_VERSION: raise OrgChartError(f"unsupported org chart version {data.get('version')}")
+        return cls([RoleSpec(entry) for entry in data['roles']], data.get('tool_zones'))
+
+    @classmethod
+    def load(cls, path: str = DEFAULT_ORG_CHART_PATH) -> 'OrgChart':
+        try:
+            with open(path, 'r', encoding='utf-8') as f: data = json.load(f)
+        except (OSError, ValueError) as e: raise OrgChartError(f"cannot read org chart {path}: {e}") from e
+        chart = cls.from_dict(data)
+        logger.info(f"Org chart loaded from {path}: {len(chart.roles)} roles, {len(chart._role_by_agent)} planned agents.")
+        return chart
+
+    def _validate(self):
+        for spec in self.roles.values():
+            if spec.reports_to is not None and spec.reports_to not in self.roles: raise OrgChartError(f"role '{spec.role}' reports to unknown role '{spec.reports_to}'")
+            if spec.llm_config_role not in self.roles: raise OrgChartError(f"role '{spec.role}' takes LLM settings from unknown role '{spec.llm_config_role}'")
+            for kwarg, target in spec.wiring.items():
+                for role in (target if isinstance(target, list) else [target]):
+                    if role not in self.roles: raise OrgChartError(f"role '{spec.role}' wires '{kwarg}' to unknown role '{role}'")
+            self.reporting_chain(spec.role) # Raises on cycles
+
+    # --- Queries ---
+    def planned_agents(self) -> List[Tuple[str, RoleSpec]]:
+        return [(agent_id, spec) for spec in self.roles.values() for agent_id in spec.agent_ids]
+
+    def spec_for_agent(self, agent_id: Optional[str]) -> Optional[RoleSpec]:
+        role = self._role_by_agent.get(agent_id) if agent_id else None
+        return self.roles[role] if role else None
+
+    def primary_id(self, role: str) -> Optional[str]:
+        spec = self.roles.get(role)
+        return spec.agent_ids[0] if spec else None
+
+    def resolve_wiring(self, spec: RoleSpec) -> Dict[str, Any]:
+        """Init kwargs for an agent of this role: a role name becomes that role's first agent id, a list becomes {role: id}."""
+        return {kwarg: ({role: self.primary_id(role) for role in target} if isinstance(target, list) else self.primary_id(target))
+                for kwarg, target in spec.wiring.items()}
+
+    def reporting_chain(self, role: str) -> List[str]:
+        """Roles above this one, nearest first."""
+        chain: List[str] = []; current = self.roles[role].reports_to
+        while current is not None:
+            if current in chain or current == role: raise OrgChartError(f"reporting cycle through '{role}'")
+            chain.append(current); current = self.roles[current].reports_to
+        return chain
@@ -0,0 +1,137 @@
+# SoftwareSim3d/src/simulation/reuse_index.py
+
+import json
+import logging
+import re
+import time
+from difflib import SequenceMatcher
+from typing import Dict, Any, Optional, Set, Callable, List, Tuple
+
+from .file_io import atomic_write_text, read_text_if_file
+
+logger = logging.getLogger(__name__)
+
+REUSE_INDEX_FILENAME = '.reuse_index.json'
+DEFAULT_REUSE_SKIP_CONFIDENCE = 0.92 # Reuse the specs too: Marketer and PM are skipped, the Coder starts right away
+DEFAULT_REUSE_SEED_CONFIDENCE = 0.75 # Reuse the decomposition and marketing strategy: only the PM runs upstream
+MAX_REUSE_ENTRIES = 200
+REUSE_INDEX_VERSION = 1
+FUZZY_TOKEN_RATIO = 0.8 # Content words this similar count as the same word (typos, plurals)
+
+# Wording shared by most requests; matching on it would make "history of Rome" look like "history of Greece"
+TEMPLATE_WORDS = frozenset('''a an the my our your for of in on at with and or to that which who i we me us is are be should it its this some new
+    please need want would like can could create build make design develop generate write simple basic modern nice
+    website websites web site sites page pages landing homepage app application'''.split())
+
+Submit = Callable[..., Any] # submit(fn, *args) -> Future, e.g. AsyncFileIO.submit
+
+def normalize_request(request: str) -> str:
+    return ' '.join(re.sub(r'[^a-z0-9]+', ' ', (request or '').lower()).split())
+
+def content_tokens(normalized: str) -> List[str]:
+    """The words of a normalized request that say what it is about (template wording removed)."""
+    return list(dict.fromkeys(token for token in normalized.split() if token not in TEMPLATE_WORDS)) or normalized.split()
+
+def _trigrams(normalized: str) -> Set[str]:
+    padded = f"  {normalized} "
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+def _token_overlap(tokens: List[str], other_tokens: List[str]) -> float:
+    """Jaccard similarity of two content word sets, with near-identical words counted as shared."""
+    if not tokens or not other_tokens: return 0.0
+    matched = sum(1 for token in tokens if any(token == other or SequenceMatcher(None, token, other).ratio() >= FUZZY_TOKEN_RATIO for other in other_tokens))
+    return matched / (len(tokens) + len(other_tokens) - matched)
+
+def _similarity(features: Tuple[Set[str], List[str]], other_features: Tuple[Set[str], List[str]]) -> float:
+    """Trigram similarity of the content words, capped by their word overlap: a differing topic word cannot be outweighed by spelling."""
+    grams, tokens = features; other_grams, other_tokens = other_features
+    return min(len(grams & other_grams) / len(grams | other_grams), _token_overlap(tokens, other_tokens))
+
+def _features(key: str) -> Tuple[Set[str], List[str]]:
+    tokens = content_tokens(key)
+    return _trigrams(' '.join(tokens)), tokens
+
+class ReuseIndex:
+    """
+    Upstream artifacts of past successful runs (CEO decomposition, marketing strategy file, per-page spec
+    files) keyed by normalized request. The manager records artifacts as a run produces them and commits the
+    entry when the run succeeds; lookup() returns the best exact or fuzzy match of the requests' content words
+    (template wording such as 'create a website for' is ignored) with its confidence.
+    """
+    def __init__(self, path: str, submit: Submit, max_entries: int = MAX_REUSE_ENTRIES):
+        self.path = path
+        self.submit = submit
+        self.max_entries = max_entries
+        self._entries: Dict[str, Dict[str, Any]] = {} # normalized request -> entry (oldest first)
+        self._pending: Dict[str, Dict[str, Any]] = {} # run_id -> entry being recorded
+        self._features: Dict[str, Tuple[Set[str], List[str]]] = {} # key -> (content trigrams, content words)
+        self.hits = 0; self.misses = 0
+        text = read_text_if_file(path)
+        if text:
+            try: self._entries = {entry['key']: entry for entry in json.loads(text).get('entries', [])}
+            except (ValueError, KeyError, TypeError, AttributeError) as e: logger.warning(f"ReuseIndex: ignoring unreadable index {path}: {e}")
+        self._features = {key: _features(key) for key in self._entries}
+
+    # --- Recording ---
+    def begin(self, run_id: str, request: str, artifacts: Optional[Dict[str, Any]] = None):
+        """Starts recording a run; a resumed run passes the artifacts it had recorded (see pending_artifacts)."""
+        self._pending[run_id] = {'key': normalize_request(request), 'request': request, 'run_id': run_id, 'artifacts': dict(artifacts or {})}
+
+    def pending_artifacts(self, run_id: Optional[str]) -> Dict[str, Any]:
+        entry = self._pending.get(run_id)
+        return entry['artifacts'] if entry else {}
+
+    def record(self, run_id: str, artifact: str, value: Any, page_name: Optional[str] = None):
+        """Records an upstream artifact ('decomposition', 'marketing_strategy', or 'specifications' per page)."""
+        entry = self._pending.get(run_id)
+        if entry is None: return
+        if page_name is None: entry['artifacts'][artifact] = value
+        else: entry['artifacts'].setdefault(artifact, {})[page_name] = value
+
+    def commit(self, run_id: str):
+        """Makes a successful run's artifacts reusable and persists the index in the background."""
+        entry = self._pending.pop(run_id, None)
+        if not entry or not entry['key'] or not entry['artifacts'].get('decomposition'): return
+        entry['created'] = time.time()
+        self._entries.pop(entry['key'], None); self._entries[entry['key']] = entry; self._features[entry['key']] = _features(entry['key'])
+        while len(self._entries) > self.max_entries:
+            oldest = next(iter(self._entries)); del self._entries[oldest]; self._features.pop(oldest, None)
+        text = json.dumps({'v': REUSE_INDEX_VERSION, 'entries': list(self._entries.values())})
+        self.submit(atomic_write_text, self.path, text).add_done_callback(self._on_saved)
+        logger.info(f"ReuseIndex: stored artifacts of run {run_id} ({sorted(entry['artifacts'])}) for '{entry['request'][:50]}'.")
+
+    def discard(self, run_id: str):
+        self._pending.pop(run_id, None)
+
+    def _on_saved(self, future: Any):
+        error = future.exception()
+        if error is not None: logger.error(f"ReuseIndex: failed to save {self.path}: {error}")
+
+    # --- Lookup ---
+    def lookup(self, request: str, file_exists: Callable[[str], bool], min_confidence: float = DEFAULT_REUSE_SEED_CONFIDENCE) -> Optional[Dict[str, Any]]:
+        """
+        Best entry at or above min_confidence whose files still exist, as {'confidence', 'exact', 'request',
+        'run_id', 'decomposition', 'marketing_strategy', 'specifications'}. A spec set with a missing page is dropped whole.
+        """
+        key = normalize_request(request)
+        if not key: return None
+        candidates: List[Tuple[float, Dict[str, Any]]] = []
+        if key in self._entries: candidates.append((1.0, self._entries[key]))
+        features = _features(key)
+        for other_key, other_features in self._features.items():
+            if other_key == key: continue
+            confidence = _similarity(features, other_features)
+            if confidence >= min_confidence: candidates.append((confidence, self._entries[other_key]))
+        if not candidates: self.misses += 1; return None
+        confidence, entry = max(candidates, key=lambda item: item[0])
+        artifacts = entry['artifacts']
+        strategy = artifacts.get('marketing_strategy')
+        specs = artifacts.get('specifications') or {}
+        if strategy and not file_exists(strategy): strategy = None
+        if specs and not all(file_exists(filename) for filename in specs.values()): specs = {}
+        self.hits += 1
+        return {'confidence': round(confidence, 3), 'exact': confidence == 1.0, 'request': entry['request'], 'run_id': entry['run_id'],
+                'decomposition': artifacts.get('decomposition'), 'marketing_strategy': strategy, 'specifications': specs}
+
+    def stats_snapshot(self) -> Dict[str, Any]:
+        return {'entries': len(self._entries), 'recording': len(self._pending), 'hits': self.hits, 'misses': self.misses}
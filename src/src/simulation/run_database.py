@@ -0,0 +1,209 @@
+# SoftwareSim3d/src/simulation/run_database.py
+
+import json
+import logging
+import queue
+import sqlite3
+import threading
+import time
+from typing import Dict, Any, Optional, List, Tuple
+
+logger = logging.getLogger(__name__)
+
+RUN_DATABASE_NAME = 'runs.sqlite3'
+DEFAULT_BATCH_SIZE = 200 # Rows per transaction
+DEFAULT_FLUSH_INTERVAL_S = 1.0 # Max time a row waits in the queue
+MAX_QUEUED_ROWS = 50000 # Beyond this, rows are dropped (and counted) rather than growing memory
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS runs (
+    run_id TEXT PRIMARY KEY, project_name TEXT, user_request TEXT, llm_configs TEXT,
+    started_at REAL, ended_at REAL, success INTEGER, final_output TEXT, iterations INTEGER, resumes INTEGER DEFAULT 0
+);
+CREATE TABLE IF NOT EXISTS task_events (
+    run_id TEXT, task_id TEXT, task_type TEXT, role TEXT, parent_task_id TEXT, old_status TEXT, new_status TEXT, ts REAL
+);
+CREATE TABLE IF NOT EXISTS agent_events (
+    run_id TEXT, agent_id TEXT, role TEXT, status TEXT, action TEXT, ts REAL
+);
+CREATE TABLE IF NOT EXISTS tool_calls (
+    run_id TEXT, agent_id TEXT, task_id TEXT, tool_name TEXT, status TEXT, ts REAL, duration_s REAL
+);
+CREATE TABLE IF NOT EXISTS llm_calls (
+    run_id TEXT, agent_id TEXT, role TEXT, task_id TEXT, purpose TEXT, llm_type TEXT, model TEXT,
+    ts REAL, duration_s REAL, prompt_chars INTEGER, response_chars INTEGER, ok INTEGER
+);
+CREATE TABLE IF NOT EXISTS run_events (
+    run_id TEXT, kind TEXT, agent_id TEXT, task_id TEXT, detail TEXT, ts REAL
+);
+CREATE INDEX IF NOT EXISTS idx_task_events_run ON task_events (run_id, ts);
+CREATE INDEX IF NOT EXISTS idx_task_events_task ON task_events (task_id, ts);
+CREATE INDEX IF NOT EXISTS idx_agent_events_run ON agent_events (run_id, agent_id, ts);
+CREATE INDEX IF NOT EXISTS idx_tool_calls_run ON tool_calls (run_id, ts);
+CREATE INDEX IF NOT EXISTS idx_tool_calls_agent ON tool_calls (agent_id, ts);
+CREATE INDEX IF NOT EXISTS idx_llm_calls_run ON llm_calls (run_id, ts);
+CREATE INDEX IF NOT EXISTS idx_llm_calls_agent ON llm_calls (agent_id, ts);
+CREATE INDEX IF NOT EXISTS idx_run_events_run ON run_events (run_id, kind, ts);
+CREATE INDEX IF NOT EXISTS idx_runs_started ON runs (started_at);
+"""
+
+INSERTS = {
+    'task_event': "INSERT INTO task_events VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+    'agent_event': "INSERT INTO agent_events VALUES (?, ?, ?, ?, ?, ?)",
+    'tool_call': "INSERT INTO tool_calls VALUES (?, ?, ?, ?, ?, ?, ?)",
+    'llm_call': "INSERT INTO llm_calls VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+    'run_event': "INSERT INTO run_events VALUES (?, ?, ?, ?, ?, ?)",
+    'run_start': ("INSERT INTO runs (run_id, project_name, user_request, llm_configs, started_at) VALUES (?, ?, ?, ?, ?) "
+                  "ON CONFLICT(run_id) DO UPDATE SET resumes = resumes + 1, ended_at = NULL, success = NULL"),
+    'run_end': "UPDATE runs SET ended_at = ?, success = ?, final_output = ?, iterations = ? WHERE run_id = ?",
+}
+
+_FLUSH = object() # Queue marker: write everything queued so far, then signal the waiting caller
+
+class RunDatabase:
+    """
+    Local SQLite record of runs, task transitions, agent status changes, tool calls and LLM calls.
+    record_* only enqueue a tuple; one writer thread inserts them in batched transactions, so the
+    simulation loop never touches the database. Queries open their own read connection (WAL mode).
+    """
+    def __init__(self, path: str, batch_size: int = DEFAULT_BATCH_SIZE, flush_interval_s: float = DEFAULT_FLUSH_INTERVAL_S):
+        self.path = path
+        self.batch_size = batch_size
+        self.flush_interval_s = flush_interval_s
+        self._queue: 'queue.Queue[Any]' = queue.Queue()
+        self._writer: Optional[threading.Thread] = None
+        self._writer_lock = threading.Lock()
+        self._disabled = False # Set if the database cannot be opened
+        self.rows_written = 0; self.rows_dropped = 0; self.batches = 0
+
+    # --- Recording (any thread, non-blocking) ---
+    def _enqueue(self, kind: str, row: Tuple[Any, ...]):
+        if self._disabled or self._queue.qsize() >= MAX_QUEUED_ROWS: self.rows_dropped += 1; return
+        self._ensure_writer(); self._queue.put((kind, row))
+
+    def record_run_start(self, run_id: str, project_name: Optional[str], user_request: Optional[str], llm_configs: Optional[Dict[str, Any]] = None):
+        self._enqueue('run_start', (run_id, project_name, user_request, json.dumps(llm_configs or {}), time.time()))
+
+    def record_run_end(self, run_id: str, success: Optional[bool], final_output: Optional[str], iterations: int):
+        self._enqueue('run_end', (time.time(), None if success is None else int(bool(success)), final_output, iterations, run_id))
+
+    def record_task_event(self, run_id: str, task_id: str, task_type: str, role: Optional[str], parent_task_id: Optional[str], old_status: Optional[str], new_status: str):
+        self._enqueue('task_event', (run_id, task_id, task_type, role, parent_task_id, old_status, new_status, time.time()))
+
+    def record_agent_event(self, run_id: str, agent_id: str, role: str, status: Optional[str], action: Optional[str]):
+        self._enqueue('agent_event', (run_id, agent_id, role, status, action, time.time()))
+
+    def record_tool_call(self, run_id: str, agent_id: str, task_id: Optional[str], tool_name: str, status: str, started_at: float, duration_s: float):
+        self._enqueue('tool_call', (run_id, agent_id, task_id, tool_name, status, started_at, duration_s))
+
+    def record_llm_call(self, run_id: str, call: Dict[str, Any]):
+        self._enqueue('llm_call', (run_id, call.get('agent_id'), call.get('role'), call.get('task_id'), call.get('purpose'), call.get('llm_type'), call.get('model'),
+                                   call.get('started_at'), call.get('duration_s'), call.get('prompt_chars'), call.get('response_chars'), int(bool(call.get('ok')))))
+
+    def record_event(self, run_id: str, kind: str, agent_id: Optional[str] = None, task_id: Optional[str] = None, detail: Optional[str] = None):
+        self._enqueue('run_event', (run_id, kind, agent_id, task_id, detail, time.time()))
+
+    def flush(self, timeout: Optional[float] = 10.0) -> bool:
+        """Blocks until everything queued before the call is committed (call off the event loop)."""
+        if self._writer is None or self._disabled: return True
+        done = threading.Event(); self._queue.put((_FLUSH, done))
+        return done.wait(timeout)
+
+    # --- Writer thread ---
+    def _ensure_writer(self):
+        if self._writer is not None: return
+        with self._writer_lock:
+            if self._writer is None:
+                self._writer = threading.Thread(target=self._write_loop, name='run-db-writer', daemon=True); self._writer.start()
+
+    def _connect(self) -> sqlite3.Connection:
+        connection = sqlite3.connect(self.path, timeout=30)
+        connection.execute("PRAGMA journal_mode=WAL"); connection.execute("PRAGMA synchronous=NORMAL")
+        return connection
+
+    def _write_loop(self):
+        try:
+            connection = self._connect(); connection.executescript(SCHEMA)
+        except sqlite3.Error as e:
+            logger.error(f"RunDatabase: cannot open {self.path}: {e}; run history disabled."); self._disabled = True; return
+        logger.info(f"RunDatabase writing to {self.path}")
+        while True:
+            item = self._queue.get(); batch = [item]; deadline = time.monotonic() + self.flush_interval_s
+            while len(batch) < self.batch_size and item[0] is not _FLUSH:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0: break
+                try: item = self._queue.get(timeout=remaining); batch.append(item)
+                except queue.Empty: break
+            self._write_batch(connection, batch)
+
+    def _write_batch(self, connection: sqlite3.Connection, batch: List[Tuple[Any, Any]]):
+        grouped: Dict[str, List[Tuple[Any, ...]]] = {}; flush_events = []
+        for kind, payload in batch:
+            if kind is _FLUSH: flush_events.append(payload)
+            else: grouped.setdefault(kind, []).append(payload)
+        try:
+            with connection: # One transaction per batch
+                for kind in ('run_start', 'task_event', 'agent_event', 'tool_call', 'llm_call', 'run_event', 'run_end'): # run_start before run_end
+                    if kind in grouped: connection.executemany(INSERTS[kind], grouped[kind])
+            self.rows_written += sum(len(rows) for rows in grouped.values()); self.batches += 1
+        except sqlite3.Error as e: logger.error(f"RunDatabase: dropped a batch of {len(batch)} rows: {e}")
+        for event in flush_events: event.set()
+
+    # --- Queries ---
+    def query(self, sql: str, params: Tuple[Any, ...] = ()) -> List[Dict[str, Any]]:
+        """Runs a read-only query on a fresh connection and returns rows as dicts."""
+        connection = self._connect(); connection.row_factory = sqlite3.Row
+        try:
+            connection.executescript(SCHEMA) # Queries work before the first run has been recorded
+            return [dict(row) for row in connection.execute(sql, params).fetchall()]
+        finally: connection.close()
+
+    def recent_runs(self, limit: int = 20) -> List[Dict[str, Any]]:
+        return self.query("SELECT run_id, project_name, started_at, ended_at, ended_at - started_at AS duration_s, success, iterations, resumes "
+                          "FROM runs ORDER BY started_at DESC LIMIT ?", (limit,))
+
+    def slowest_task_types(self, limit: int = 10, run_id: Optional[str] = None) -> List[Dict[str, Any]]:
+        """Average time from a task's first recorded event to its completion, by task type."""
+        return self.query(
+            "SELECT task_type, COUNT(*) AS tasks, AVG(done_ts - first_ts) AS avg_s, MAX(done_ts - first_ts) AS max_s FROM ("
+            " SELECT task_type, MIN(ts) AS first_ts, MAX(CASE WHEN new_status = 'completed' THEN ts END) AS done_ts"
+            " FROM task_events WHERE (? IS NULL OR run_id = ?) GROUP BY run_id, task_id, task_type"
+            ") WHERE done_ts IS NOT NULL GROUP BY task_type ORDER BY avg_s DESC LIMIT ?", (run_id, run_id, limit))
+
+    def fix_rounds_per_run(self, limit: int = 20) -> List[Dict[str, Any]]:
+        """QA feedback rounds (each sends code back for fixes) per run, newest runs first."""
+        return self.query(
+            "SELECT r.run_id, r.project_name, r.success, COUNT(e.kind) AS fix_rounds FROM runs r"
+            " LEFT JOIN run_events e ON e.run_id = r.run_id AND e.kind = 'qa_feedback'"
+            " GROUP BY r.run_id ORDER BY r.started_at DESC LIMIT ?", (limit,))
+
+    def avg_dependency_wait(self, run_id: Optional[str] = None) -> List[Dict[str, Any]]:
+        """Average and total time agents spent in the 'waiting' action (blocked on other agents), by role."""
+        return self.query(
+            "SELECT role, COUNT(*) AS waits, AVG(next_ts - ts) AS avg_wait_s, SUM(next_ts - ts) AS total_wait_s FROM ("
+            " SELECT role, action, ts, LEAD(ts) OVER (PARTITION BY run_id, agent_id ORDER BY ts) AS next_ts"
+            " FROM agent_events WHERE (? IS NULL OR run_id = ?)"
+            ") WHERE action = 'waiting' AND next_ts IS NOT NULL GROUP BY role ORDER BY total_wait_s DESC", (run_id, run_id))
+
+    def llm_time_by_role(self, run_id: Optional[str] = None) -> List[Dict[str, Any]]:
+        return self.query(
+            "SELECT role, llm_type, model, COUNT(*) AS calls, AVG(duration_s) AS avg_s, SUM(duration_s) AS total_s, SUM(1 - ok) AS failures"
+            " FROM llm_calls WHERE (? IS NULL OR run_id = ?) GROUP BY role, llm_type, model ORDER BY total_s DESC", (run_id, run_id))
+
+    def tool_time_by_name(self, run_id: Optional[str] = None) -> List[Dict[str, Any]]:
+        return self.query(
+            "SELECT tool_name, COUNT(*) AS calls, AVG(duration_s) AS avg_s, MAX(duration_s) AS max_s, SUM(status != 'success') AS errors"
+            " FROM tool_calls WHERE (? IS NULL OR run_id = ?) GROUP BY tool_name ORDER BY avg_s DESC", (run_id, run_id))
+
+    def stats_snapshot(self) -> Dict[str, Any]:
+        return {'queued': self._queue.qsize(), 'rows_written': self.rows_written, 'rows_dropped': self.rows_dropped, 'batches': self.batches}
+
+_databases: Dict[str, RunDatabase] = {}
+_databases_lock = threading.Lock()
+
+def get_run_database(path: str) -> RunDatabase:
+    """One RunDatabase (and writer thread) per file for the whole process, shared by successive runs."""
+    with _databases_lock:
+        database = _databases.get(path)
+        if database is None: database = _databases[path] = RunDatabase(path)
+        return database
@@ -0,0 +1,218 @@
+# SoftwareSim3d/src/simulation/search_index.py
+
+import json
+import logging
+import math
+import os
+import re
+import threading
+import time
+from collections import OrderedDict
+from typing import Dict, Any, Optional, List, Iterable, Callable
+
+from .file_io import atomic_write_text, read_text_if_file
+
+logger = logging.getLogger(__name__)
+
+SEARCH_INDEX_FILENAME = '.search_index.json'
+SEARCH_INDEX_VERSION = 1
+DEFAULT_SEARCH_EXTENSIONS = ('.md', '.txt', '.rst') # Reports, specs and reference notes; generated code is not indexed
+DEFAULT_TOP_K = 5
+DEFAULT_QUERY_CACHE_SIZE = 256
+MAX_DOCUMENT_BYTES = 2 * 1024 * 1024
+SNIPPET_CHARS = 400
+BM25_K1 = 1.5
+BM25_B = 0.75
+MIN_SCORE = 0.2 # BM25 score a document must reach on the query's non-boilerplate terms to count as a match
+
+_TOKEN_RE = re.compile(r'[a-z0-9]+')
+_STOPWORDS = frozenset('a an and are as at be but by for from has have in into is it its of on or that the their this to was were will with you your'.split())
+# Words (as tokenized) shared by every request, report and spec in the library: they rank matches but never make one
+BOILERPLATE_TERMS = frozenset(('app application audience brand build business channel company create customer design develop make marketing '
+                               'message messaging my need our page plan product report service simple site spec specification strategy target '
+                               'user want web website').split())
+
+Submit = Callable[..., Any] # submit(fn, *args) -> Future, e.g. AsyncFileIO.submit
+
+def tokenize(text: str) -> List[str]:
+    """Lowercase word tokens without stopwords, with plurals folded ('strategies' -> 'strategy')."""
+    tokens = []
+    for token in _TOKEN_RE.findall((text or '').lower()):
+        if len(token) < 2 or token in _STOPWORDS: continue
+        if len(token) > 4 and token.endswith('ies'): token = token[:-3] + 'y'
+        elif len(token) > 3 and token.endswith('s') and not token.endswith('ss'): token = token[:-1]
+        tokens.append(token)
+    return tokens
+
+def _term_counts(tokens: Iterable[str]) -> Dict[str, int]:
+    counts: Dict[str, int] = {}
+    for token in tokens: counts[token] = counts.get(token, 0) + 1
+    return counts
+
+def _title_of(path: str, text: str) -> str:
+    for line in text.splitlines():
+        line = line.strip()
+        if line: return line.lstrip('#').strip()[:120] or os.path.basename(path)
+    return os.path.basename(path)
+
+class SearchIndex:
+    """
+    Offline search over local documents (past marketing reports and specs in the output directory, plus any
+    reference folders): a BM25 inverted index kept up to date incrementally (changed files by mtime/size, files
+    written by the tools as they are written) and persisted to disk, with an LRU cache of query results.
+    Thread-safe: refresh() and search() touch the disk and belong on the I/O pool.
+    """
+    def __init__(self, path: str, submit: Submit, roots: Iterable[str], extensions: Iterable[str] = DEFAULT_SEARCH_EXTENSIONS,
+                 cache_size: int = DEFAULT_QUERY_CACHE_SIZE):
+        self.path = path
+        self.submit = submit
+        self.roots = [os.path.abspath(root) for root in roots if root]
+        self.extensions = tuple(extension.lower() for extension in extensions)
+        self.cache_size = cache_size
+        self._docs: Dict[str, Dict[str, Any]] = {} # abs path -> {'mtime', 'size', 'length', 'title', 'terms': {term: tf}}
+        self._postings: Dict[str, Dict[str, int]] = {} # term -> {abs path: tf}
+        self._total_length = 0
+        self._cache: 'OrderedDict[tuple, List[Dict[str, Any]]]' = OrderedDict()
+        self._lock = threading.RLock()
+        self._dirty = False
+        self.refreshed_at: Optional[float] = None
+        self.queries = 0; self.cache_hits = 0; self.indexed = 0; self.removed = 0
+        text = read_text_if_file(path)
+        if text:
+            try:
+                data = json.loads(text)
+                if data.get('v') == SEARCH_INDEX_VERSION:
+                    for doc_path, doc in data.get('docs', {}).items(): self._insert(doc_path, doc)
+            except (ValueError, KeyError, TypeError, AttributeError) as e: logger.warning(f"SearchIndex: ignoring unreadable index {path}: {e}")
+
+    # --- Indexing ---
+    def _insert(self, doc_path: str, doc: Dict[str, Any]):
+        self._remove(doc_path)
+        self._docs[doc_path] = doc; self._total_length += doc['length']
+        for term, count in doc['terms'].items(): self._postings.setdefault(term, {})[doc_path] = count
+
+    def _remove(self, doc_path: str) -> bool:
+        doc = self._docs.pop(doc_path, None)
+        if doc is None: return False
+        self._total_length -= doc['length']
+        for term in doc['terms']:
+            postings = self._postings.get(term)
+            if postings is None: continue
+            postings.pop(doc_path, None)
+            if not postings: del self._postings[term]
+        return True
+
+    def _changed(self):
+        self._cache.clear(); self._dirty = True
+
+    def indexable(self, path: str) -> bool:
+        path = os.path.abspath(path)
+        return path.lower().endswith(self.extensions) and any(path.startswith(root + os.sep) for root in self.roots) \
+            and not any(part.startswith('.') for part in os.path.relpath(path, self._root_of(path)).split(os.sep))
+
+    def _root_of(self, path: str) -> str:
+        return max((root for root in self.roots if path.startswith(root + os.sep)), key=len, default=os.path.dirname(path))
+
+    def add_document(self, path: str, text: str, mtime: Optional[float] = None) -> bool:
+        """Indexes (or re-indexes) a document from its text, e.g. right after a tool wrote it. Ignores non-indexable paths."""
+        path = os.path.abspath(path)
+        if not self.indexable(path) or len(text) > MAX_DOCUMENT_BYTES: return False
+        tokens = tokenize(text)
+        doc = {'mtime': mtime if mtime is not None else time.time(), 'size': len(text.encode('utf-8')), 'length': len(tokens),
+               'title': _title_of(path, text), 'terms': _term_counts(tokens)}
+        with self._lock: self._insert(path, doc); self.indexed += 1; self._changed()
+        return True
+
+    def refresh(self) -> Dict[str, int]:
+        """Walks the roots: indexes new or modified files, drops deleted ones, and persists the index if anything changed."""
+        seen = set(); added = 0; removed = 0
+        for root in self.roots:
+            for directory, subdirs, files in os.walk(root):
+                subdirs[:] = [name for name in subdirs if not name.startswith('.') and name != '__pycache__']
+                for name in files:
+                    if not name.lower().endswith(self.extensions) or name.startswith('.'): continue
+                    path = os.path.join(directory, name); seen.add(path)
+                    try: stat = os.stat(path)
+                    except OSError: continue
+                    doc = self._docs.get(path)
+                    if doc is not None and doc['mtime'] >= stat.st_mtime and doc['size'] == stat.st_size: continue # Unchanged (or indexed when a tool wrote it)
+                    if stat.st_size > MAX_DOCUMENT_BYTES: continue
+                    try: text = read_text_if_file(path)
+                    except (OSError, UnicodeDecodeError) as e: logger.debug(f"SearchIndex: skipping {path}: {e}"); continue
+                    if text is not None and self.add_document(path, text, mtime=stat.st_mtime): added += 1
+        with self._lock:
+            for path in [path for path in self._docs if path not in seen]:
+                if self._remove(path): removed += 1
+            if removed: self.removed += removed; self._changed()
+            self.refreshed_at = time.time()
+        if added or removed: logger.info(f"SearchIndex: {added} document(s) indexed, {removed} removed; {len(self._docs)} in the index.")
+        self.save()
+        return {'added': added, 'removed': removed, 'documents': len(self._docs)}
+
+    def save(self):
+        """Persists the index in the background if it changed since the last save."""
+        with self._lock:
+            if not self._dirty: return
+            text = json.dumps({'v': SEARCH_INDEX_VERSION, 'docs': self._docs}); self._dirty = False
+        self.submit(atomic_write_text, self.path, text).add_done_callback(self._on_saved)
+
+    def _on_saved(self, future: Any):
+        error = future.exception()
+        if error is not None: logger.error(f"SearchIndex: failed to save {self.path}: {error}")
+
+    # --- Search ---
+    def search(self, query: str, top_k: int = DEFAULT_TOP_K) -> List[Dict[str, Any]]:
+        """Top documents for query by BM25 as [{'path', 'title', 'score', 'snippet'}]; cached until the index changes."""
+        terms = list(dict.fromkeys(tokenize(query)))
+        key = (tuple(terms), top_k)
+        with self._lock:
+            self.queries += 1
+            if key in self._cache: self.cache_hits += 1; self._cache.move_to_end(key); return self._cache[key]
+            ranked = self._rank(terms)[:top_k]
+            titles = {path: self._docs[path]['title'] for path, _ in ranked}
+        results = [{'path': self._display_path(path), 'title': titles[path], 'score': round(score, 3), 'snippet': self._snippet(path, terms)} for path, score in ranked]
+        with self._lock:
+            self._cache[key] = results
+            while len(self._cache) > self.cache_size: self._cache.popitem(last=False)
+        return results
+
+    def _rank(self, terms: List[str]) -> List[tuple]:
+        """(path, score) by BM25, best first; only documents scoring MIN_SCORE on the non-boilerplate query terms."""
+        count = len(self._docs)
+        if not count or not terms: return []
+        average_length = max(1.0, self._total_length / count); scores: Dict[str, float] = {}; content_scores: Dict[str, float] = {}
+        for term in terms:
+            postings = self._postings.get(term)
+            if not postings: continue
+            idf = math.log(1.0 + (count - len(postings) + 0.5) / (len(postings) + 0.5))
+            for path, tf in postings.items():
+                norm = BM25_K1 * (1.0 - BM25_B + BM25_B * self._docs[path]['length'] / average_length)
+                score = idf * tf * (BM25_K1 + 1.0) / (tf + norm); scores[path] = scores.get(path, 0.0) + score
+                if term not in BOILERPLATE_TERMS: content_scores[path] = content_scores.get(path, 0.0) + score
+        return sorted(((path, score) for path, score in scores.items() if content_scores.get(path, 0.0) >= MIN_SCORE), key=lambda item: (-item[1], item[0]))
+
+    def _display_path(self, path: str) -> str:
+        root = self._root_of(path)
+        return os.path.relpath(path, root).replace(os.sep, '/') if root == self.roots[0] else f"{os.path.basename(root)}/{os.path.relpath(path, root).replace(os.sep, '/')}"
+
+    def _snippet(self, path: str, terms: List[str]) -> str:
+        """The paragraph with the most query terms, shortened to SNIPPET_CHARS."""
+        try: text = read_text_if_file(path) or ''
+        except (OSError, UnicodeDecodeError): return ''
+        wanted = set(terms); best = ''; best_hits = -1
+        for paragraph in re.split(r'\n\s*\n', text):
+            paragraph = paragraph.strip()
+            if not paragraph: continue
+            hits = sum(1 for token in tokenize(paragraph) if token in wanted)
+            if hits > best_hits: best, best_hits = paragraph, hits
+        best = ' '.join(best.split())
+        return best if len(best) <= SNIPPET_CHARS else best[:SNIPPET_CHARS].rsplit(' ', 1)[0] + ' ...'
+
+    def stats_snapshot(self) -> Dict[str, Any]:
+        with self._lock:
+            return {'documents': len(self._docs), 'terms': len(self._postings), 'queries': self.queries, 'cache_hits': self.cache_hits,
+                    'indexed': self.indexed, 'removed': self.removed, 'roots': list(self.roots)}
+
+def format_results(results: List[Dict[str, Any]]) -> str:
+    """Search results as grounding text for a prompt."""
+    return "\n\n".join(f"[{index}] {result['title']} ({result['path']})\n{result['snippet']}" for index, result in enumerate(results, 1))
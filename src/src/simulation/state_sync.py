@@ -0,0 +1,107 @@
+# SoftwareSim3d/src/simulation/state_sync.py
+
+import logging
+import threading
+import time
+from typing import Dict, Any, Optional, Callable
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_SYNC_HZ = 30.0
+MIN_SYNC_HZ = 1.0
+MAX_SYNC_HZ = 60.0
+
+EmitBatchCallback = Callable[[Dict[str, Any]], None]
+SleepFunction = Callable[[float], None]
+
+class StateSync:
+    """
+    Coalesces agent/task state changes pushed from the simulation thread and flushes them
+    as one batched emit per frame. Pushing never blocks on socket I/O; only the flush loop emits.
+    """
+    def __init__(self, emit_batch: EmitBatchCallback, tick_hz: float = DEFAULT_SYNC_HZ):
+        self.emit_batch = emit_batch
+        self.tick_interval = 1.0 / min(MAX_SYNC_HZ, max(MIN_SYNC_HZ, tick_hz))
+        self._lock = threading.Lock()
+        self._pending_agents: Dict[str, Dict[str, Any]] = {} # agent_id -> changed keys since last flush
+        self._pending_tasks: Dict[str, Dict[str, Any]] = {}  # task_id -> changed fields since last flush
+        self._agent_snapshot: Dict[str, Dict[str, Any]] = {} # Full last-known state, for clients joining mid-run
+        self._task_snapshot: Dict[str, Dict[str, Any]] = {}
+        self._sequence = 0
+        self._running = False
+        # Counters for the periodic log line
+        self.pushes = 0
+        self.flushes = 0
+
+    # --- Producer side (simulation thread) ---
+    def push_agent(self, agent_id: str, changes: Dict[str, Any]):
+        """Merges changed keys for an agent into the pending frame (latest value wins)."""
+        if not changes: return
+        with self._lock:
+            pending = self._pending_agents.get(agent_id)
+            if pending is None: self._pending_agents[agent_id] = dict(changes)
+            else: pending.update(changes)
+            self._agent_snapshot.setdefault(agent_id, {}).update(changes)
+            self.pushes += 1
+
+    def push_task(self, task_id: str, task_data: Dict[str, Any]):
+        """Queues only the task fields that differ from the last pushed state."""
+        if not task_id: return
+        with self._lock:
+            known = self._task_snapshot.get(task_id)
+            if known is None: changes = dict(task_data); self._task_snapshot[task_id] = dict(task_data)
+            else:
+                changes = {key: value for key, value in task_data.items() if key not in known or known[key] != value}
+                if not changes: return
+                known.update(changes)
+            pending = self._pending_tasks.get(task_id)
+            if pending is None: self._pending_tasks[task_id] = changes
+            else: pending.update(changes)
+            self.pushes += 1
+
+    def remove_agent(self, agent_id: str):
+        with self._lock:
+            self._pending_agents.pop(agent_id, None); self._agent_snapshot.pop(agent_id, None)
+
+    def reset(self):
+        """Forgets all state (new run)."""
+        with self._lock:
+            self._pending_agents = {}; self._pending_tasks = {}; self._agent_snapshot = {}; self._task_snapshot = {}
+
+    # --- Consumer side (flush loop) ---
+    def drain(self) -> Optional[Dict[str, Any]]:
+        """Swaps out the pending frame. Returns None if nothing changed."""
+        with self._lock:
+            if not self._pending_agents and not self._pending_tasks: return None
+            agents, self._pending_agents = self._pending_agents, {}
+            tasks, self._pending_tasks = self._pending_tasks, {}
+            self._sequence += 1
+            return {'seq': self._sequence, 'agents': agents, 'tasks': tasks}
+
+    def snapshot(self) -> Dict[str, Any]:
+        """Full state for a newly connected client."""
+        with self._lock:
+            return {'seq': self._sequence, 'full': True,
+                    'agents': {agent_id: dict(state) for agent_id, state in self._agent_snapshot.items()},
+                    'tasks': {task_id: dict(fields) for task_id, fields in self._task_snapshot.items()}}
+
+    def flush(self) -> bool:
+        batch = self.drain()
+        if batch is None: return False
+        try: self.emit_batch(batch); self.flushes += 1
+        except Exception as e: logger.error(f"StateSync failed to emit batch {batch.get('seq')}: {e}", exc_info=True)
+        return True
+
+    def run(self, sleep: SleepFunction = time.sleep):
+        """Flush loop. Run it in a background task/thread owned by the web server."""
+        self._running = True
+        logger.info(f"StateSync flush loop started ({1.0 / self.tick_interval:.0f} Hz).")
+        while self._running:
+            started = time.monotonic()
+            self.flush()
+            sleep(max(0.0, self.tick_interval - (time.monotonic() - started)))
+        self.flush() # Deliver whatever was pending at shutdown
+        logger.info(f"StateSync flush loop stopped after {self.flushes} batches ({self.pushes} pushes coalesced).")
+
+    def stop(self):
+        self._running = False
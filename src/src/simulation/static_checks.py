@@ -0,0 +1,352 @@
+# SoftwareSim3d/src/simulation/static_checks.py
+
+import logging
+import posixpath
+import re
+from html.parser import HTMLParser
+from typing import Dict, Any, Optional, List, Tuple, Set
+
+try:
+    import esprima # Optional: full JS syntax parse instead of the bracket/string scan
+except ImportError:
+    esprima = None
+try:
+    import tinycss2 # Optional: full CSS parse instead of the brace/comment scan
+except ImportError:
+    tinycss2 = None
+
+logger = logging.getLogger(__name__)
+
+MAX_FINDINGS_PER_CHECK = 8 # Keep feedback and prompts short; the first errors are the useful ones
+
+VOID_ELEMENTS = {'area', 'base', 'br', 'col', 'embed', 'hr', 'img', 'input', 'link', 'meta', 'param', 'source', 'track', 'wbr'}
+# End tags HTML lets authors leave out; a missing one is not an error
+OPTIONAL_END_TAGS = {'p', 'li', 'dt', 'dd', 'tr', 'td', 'th', 'thead', 'tbody', 'tfoot', 'option', 'optgroup', 'rb', 'rt', 'rp', 'colgroup', 'caption'}
+# Tokens after which a '/' starts a regex literal rather than a division
+_REGEX_PRECEDERS = set('(,=:[!&|?{};+-*%<>~^') | {'++', 'return', 'typeof', 'case', 'do', 'else', 'in', 'of', 'new', 'delete', 'void', 'throw', 'instanceof', 'yield', 'await'}
+_CLOSERS = {')': '(', ']': '[', '}': '{'}
+
+_ID_LOOKUP_RE = re.compile(r'getElementById\(\s*([\'"`])([^\'"`$]+)\1\s*\)')
+_CLASS_LOOKUP_RE = re.compile(r'getElementsByClassName\(\s*([\'"`])([^\'"`$]+)\1\s*\)')
+_SELECTOR_LOOKUP_RE = re.compile(r'querySelector(?:All)?\(\s*([\'"`])([^\'"`$]+)\1\s*\)')
+_SELECTOR_ID_RE = re.compile(r'#(-?[A-Za-z_][\w-]*)')
+_SELECTOR_CLASS_RE = re.compile(r'\.(-?[A-Za-z_][\w-]*)')
+_SELECTOR_STRING_RE = re.compile(r'([\'"])(?:\\.|(?!\1).)*\1|\[[^\]]*\]') # Quoted parts and [attr] blocks hold no ids/classes
+
+# What each check establishes when it ran without findings; the scans only cover brackets, strings and comments
+CHECK_CLAIMS = {
+    'html': "the HTML is well-formed, tags are balanced and DOCTYPE/html/head/body are present",
+    'css-parse': "the CSS parses",
+    'css-scan': "the CSS has balanced braces and closed strings and comments (a scan, not a full parse)",
+    'js-parse': "the JavaScript parses",
+    'js-scan': "the JavaScript has balanced brackets and closed strings, comments and regular expressions (a scan, not a full parse)",
+    'links': "the linked stylesheets and scripts exist",
+    'js-ids': "the element ids the JavaScript looks up exist in the HTML",
+    'js-classes': "the classes the JavaScript selects exist in the HTML",
+}
+CSS_CHECK = 'css-parse' if tinycss2 is not None else 'css-scan'
+JS_CHECK = 'js-parse' if esprima is not None else 'js-scan'
+
+class StaticCheckReport:
+    """Findings of the pre-review checks of one page. Errors are deterministic defects; warnings may be false alarms."""
+    __slots__ = ('errors', 'warnings', 'checks', 'failed')
+
+    def __init__(self):
+        self.errors: List[str] = []
+        self.warnings: List[str] = []
+        self.checks: List[str] = [] # Names of the checks that ran (keys of CHECK_CLAIMS)
+        self.failed: List[str] = [] # ...and of those that reported an error or warning
+
+    @property
+    def ok(self) -> bool: return not self.errors
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {'errors': list(self.errors), 'warnings': list(self.warnings), 'checks': list(self.checks), 'failed': list(self.failed)}
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> 'StaticCheckReport':
+        report = cls(); report.errors = list(data.get('errors') or []); report.warnings = list(data.get('warnings') or [])
+        report.checks = list(data.get('checks') or []); report.failed = list(data.get('failed') or [])
+        return report
+
+    def ran(self, check: str, errors: Optional[List[str]] = None):
+        """Records that check ran, adding its errors; a check with errors counts as failed."""
+        if check not in self.checks: self.checks.append(check)
+        if errors: self.errors.extend(errors); self.fail(check)
+
+    def fail(self, check: str):
+        if check not in self.failed: self.failed.append(check)
+
+    def passed(self) -> List[str]:
+        return [check for check in self.checks if check not in self.failed]
+
+    def feedback(self) -> str:
+        """Fix request for the Coder, sent instead of an LLM review when there are errors."""
+        lines = ["Automated static checks found defects that must be fixed (no LLM review was run):"]
+        lines += [f"- {error}" for error in self.errors]
+        if self.warnings: lines += ["Also check:"] + [f"- {warning}" for warning in self.warnings]
+        return "\n".join(lines)
+
+    def prompt_section(self) -> str:
+        """Results for the LLM reviewer, so it can skip what the checks already covered: only checks that ran without findings are claimed."""
+        claims = [CHECK_CLAIMS[check] for check in self.passed() if check in CHECK_CLAIMS]
+        lines = [f"Already verified by automated checks: {'; '.join(claims)}."] if claims else ["No automated check fully passed; review everything."]
+        if self.warnings: lines += ["Possible issues the checks could not decide (confirm or dismiss them):"] + [f"- {warning}" for warning in self.warnings]
+        return "\n".join(lines)
+
+def _add(findings: List[str], message: str):
+    if len(findings) < MAX_FINDINGS_PER_CHECK: findings.append(message)
+
+# --- HTML ---
+class _PageParser(HTMLParser):
+    """Tag balance, document skeleton, linked assets, ids/classes and inline script/style blocks of an HTML page."""
+    def __init__(self):
+        super().__init__(convert_charrefs=True)
+        self.errors: List[str] = []
+        self.stack: List[Tuple[str, int]] = [] # (tag, line)
+        self.seen_tags: Set[str] = set()
+        self.has_doctype = False
+        self.ids: Set[str] = set(); self.classes: Set[str] = set()
+        self.stylesheets: List[str] = []; self.scripts: List[str] = []
+        self.inline_css: List[Tuple[int, str]] = []; self.inline_js: List[Tuple[int, str]] = []
+        self._raw_block: Optional[Tuple[str, int, bool]] = None # (tag, line, checked) of the open <script>/<style>
+
+    def handle_decl(self, decl: str):
+        if decl.lower().startswith('doctype'): self.has_doctype = True
+
+    def _attributes(self, tag: str, attrs: List[Tuple[str, Optional[str]]]) -> Dict[str, str]:
+        values = {name.lower(): (value or '') for name, value in attrs}
+        if values.get('id'):
+            if values['id'] in self.ids: _add(self.errors, f"HTML: duplicate id '{values['id']}' (line {self.getpos()[0]}).")
+            self.ids.add(values['id'])
+        self.classes.update(values.get('class', '').split())
+        if tag == 'link' and 'stylesheet' in values.get('rel', '').lower().split() and values.get('href'): self.stylesheets.append(values['href'])
+        if tag == 'script' and values.get('src'): self.scripts.append(values['src'])
+        return values
+
+    def handle_starttag(self, tag: str, attrs):
+        self.seen_tags.add(tag); values = self._attributes(tag, attrs)
+        if tag in VOID_ELEMENTS: return
+        if tag in ('script', 'style'):
+            script_type = values.get('type', '').lower()
+            checked = tag == 'style' or not values.get('src') and script_type in ('', 'module', 'text/javascript', 'application/javascript')
+            self._raw_block = (tag, self.getpos()[0], checked)
+        self.stack.append((tag, self.getpos()[0]))
+
+    def handle_startendtag(self, tag: str, attrs):
+        self.seen_tags.add(tag); self._attributes(tag, attrs) # <div/> is treated as empty, as authors mean it
+
+    def handle_data(self, data: str):
+        if self._raw_block and self._raw_block[2] and data.strip():
+            (self.inline_js if self._raw_block[0] == 'script' else self.inline_css).append((self._raw_block[1], data))
+
+    def handle_endtag(self, tag: str):
+        self._raw_block = None
+        if tag in VOID_ELEMENTS: return
+        line = self.getpos()[0]
+        if not any(open_tag == tag for open_tag, _ in self.stack):
+            _add(self.errors, f"HTML: stray closing tag </{tag}> at line {line} has no matching <{tag}>."); return
+        while self.stack:
+            open_tag, open_line = self.stack.pop()
+            if open_tag == tag: return
+            if open_tag not in OPTIONAL_END_TAGS: _add(self.errors, f"HTML: <{open_tag}> opened at line {open_line} is not closed before </{tag}> at line {line}.")
+
+    def finish(self) -> List[str]:
+        """Errors for elements still open at the end of the document."""
+        unclosed = [(tag, line) for tag, line in self.stack if tag not in OPTIONAL_END_TAGS]
+        if any(tag in ('html', 'body') for tag, _ in unclosed):
+            _add(self.errors, "HTML: the document ends before </body></html>; it looks truncated.")
+        for tag, line in unclosed:
+            if tag not in ('html', 'body', 'head'): _add(self.errors, f"HTML: <{tag}> opened at line {line} is never closed.")
+        return self.errors
+
+def _check_html(html: str, report: StaticCheckReport) -> _PageParser:
+    parser = _PageParser()
+    try: parser.feed(html); parser.close()
+    except Exception as e: _add(parser.errors, f"HTML: parser stopped: {e}.")
+    parser.finish()
+    if not parser.has_doctype: _add(parser.errors, "HTML: missing <!DOCTYPE html> declaration.")
+    for tag in ('html', 'head', 'body'):
+        if tag not in parser.seen_tags: _add(parser.errors, f"HTML: missing <{tag}> element.")
+    if html.rstrip() and not html.rstrip().endswith('>'): _add(parser.errors, "HTML: the file does not end with a tag; it looks truncated.")
+    report.ran('html', parser.errors)
+    return parser
+
+# --- CSS ---
+def _css_errors(css: str, label: str) -> List[str]:
+    errors: List[str] = []
+    if tinycss2 is not None:
+        for node in tinycss2.parse_stylesheet(css, skip_comments=True, skip_whitespace=True):
+            if node.type == 'error': _add(errors, f"{label}: parse error at line {node.source_line}: {node.message}.")
+    depth = 0; index = 0; line = 1; open_lines: List[int] = []
+    while index < len(css):
+        char = css[index]
+        if char == '\n': line += 1
+        elif css.startswith('/*', index):
+            end = css.find('*/', index + 2)
+            if end < 0: _add(errors, f"{label}: comment opened at line {line} is never closed."); break
+            line += css.count('\n', index, end); index = end + 2; continue
+        elif char in '"\'':
+            end = index + 1
+            while end < len(css) and css[end] != char and css[end] != '\n': end += 2 if css[end] == '\\' else 1
+            if end >= len(css) or css[end] == '\n': _add(errors, f"{label}: string opened at line {line} is never closed.")
+            index = end + 1 if end < len(css) and css[end] == char else end; continue
+        elif char == '{': depth += 1; open_lines.append(line)
+        elif char == '}':
+            if depth == 0: _add(errors, f"{label}: unexpected '}}' at line {line}.")
+            else: depth -= 1; open_lines.pop()
+        index += 1
+    if depth: _add(errors, f"{label}: {depth} block(s) not closed (first opened at line {open_lines[0]}).")
+    return errors
+
+# --- JavaScript ---
+def _js_scan_errors(js: str, label: str) -> List[str]:
+    """Bracket balance and unterminated strings, template literals, comments and regex literals."""
+    errors: List[str] = []
+    stack: List[Tuple[str, int]] = [] # (opener, line); '`' marks a '${' inside a template literal
+    index = 0; line = 1; previous = '' # Last significant token, to tell regex literals from divisions
+    length = len(js)
+
+    def read_template(start: int, start_line: int) -> Tuple[int, int, bool]:
+        """Scans template text from start; returns (index, line, entered_substitution)."""
+        position = start; current_line = start_line
+        while position < length:
+            char = js[position]
+            if char == '\\': position += 2; continue
+            if char == '\n': current_line += 1
+            if char == '`': return position + 1, current_line, False
+            if js.startswith('${', position): return position + 2, current_line, True
+            position += 1
+        _add(errors, f"{label}: template literal opened at line {start_line} is never closed.")
+        return length, current_line, False
+
+    while index < length:
+        char = js[index]
+        if char == '\n': line += 1; index += 1; continue
+        if char.isspace(): index += 1; continue
+        if js.startswith('//', index):
+            end = js.find('\n', index); index = length if end < 0 else end; continue
+        if js.startswith('/*', index):
+            end = js.find('*/', index + 2)
+            if end < 0: _add(errors, f"{label}: comment opened at line {line} is never closed."); break
+            line += js.count('\n', index, end); index = end + 2; continue
+        if char in '"\'':
+            end = index + 1
+            while end < length and js[end] != char and js[end] != '\n': end += 2 if js[end] == '\\' else 1
+            if end >= length or js[end] != char: _add(errors, f"{label}: string opened at line {line} is never closed.")
+            index = end + 1; previous = 'str'; continue
+        if char == '`':
+            index, line, entered = read_template(index + 1, line)
+            if entered: stack.append(('`', line))
+            previous = 'str'; continue
+        if char == '/' and (previous in _REGEX_PRECEDERS or previous == ''):
+            end = index + 1; in_class = False
+            while end < length and js[end] != '\n' and (js[end] != '/' or in_class):
+                if js[end] == '\\': end += 1
+                elif js[end] == '[': in_class = True
+                elif js[end] == ']': in_class = False
+                end += 1
+            if end >= length or js[end] != '/': _add(errors, f"{label}: regular expression at line {line} is never closed."); index = end; continue
+            index = end + 1
+            while index < length and js[index].isalpha(): index += 1
+            previous = 'regex'; continue
+        if js.startswith('++', index) or js.startswith('--', index): # Postfix (a-- / b) ends an operand; prefix (--a) does not
+            previous = '++' if previous in _REGEX_PRECEDERS or previous == '' else 'postfix'; index += 2; continue
+        if char in '([{': stack.append((char, line)); previous = char; index += 1; continue
+        if char in ')]}':
+            if char == '}' and stack and stack[-1][0] == '`': # End of a ${...} substitution: back into the template text
+                stack.pop(); index, line, entered = read_template(index + 1, line)
+                if entered: stack.append(('`', line))
+                previous = 'str'; continue
+            if not stack: _add(errors, f"{label}: unexpected '{char}' at line {line}.")
+            elif stack[-1][0] != _CLOSERS[char]: _add(errors, f"{label}: '{char}' at line {line} does not match '{stack[-1][0]}' opened at line {stack[-1][1]}."); stack.pop()
+            else: stack.pop()
+            previous = char; index += 1; continue
+        if char.isalnum() or char in '_$':
+            end = index + 1
+            while end < length and (js[end].isalnum() or js[end] in '_$'): end += 1
+            previous = js[index:end]; index = end; continue
+        previous = char; index += 1
+    for opener, open_line in stack[:MAX_FINDINGS_PER_CHECK]:
+        _add(errors, f"{label}: '{'${' if opener == '`' else opener}' opened at line {open_line} is never closed.")
+    return errors
+
+def _js_errors(js: str, label: str) -> List[str]:
+    if esprima is not None:
+        try: esprima.parseScript(js, {'tolerant': False}); return []
+        except Exception as e:
+            try: esprima.parseModule(js); return []
+            except Exception: return [f"{label}: syntax error: {e}."]
+    return _js_scan_errors(js, label)
+
+def _check_js_references(js: str, label: str, parser: _PageParser, report: StaticCheckReport):
+    """
+    IDs and classes the script looks up should exist in the page. A missing id whose lookup result is used
+    directly (getElementById('x').foo) throws on load and is an error; guarded or script-created ones are warnings.
+    """
+    def created_by_script(name: str, attribute: str) -> bool:
+        quoted = re.escape(name)
+        return bool(re.search(rf'\b{attribute}(?:Name)?\s*[=:]\s*\\?[\'"`][^\'"`]*\b{quoted}\b', js) or re.search(rf'setAttribute\(\s*[\'"]{attribute}[\'"]\s*,\s*[\'"`]{quoted}', js)
+                    or (attribute == 'class' and re.search(rf'classList\.(?:add|toggle|replace)\([^)]*[\'"`]{quoted}[\'"`]', js)))
+
+    ids: Dict[str, bool] = {}; classes: Set[str] = set() # id -> result used without a null check
+    def note_id(name: str, match: re.Match):
+        ids[name] = ids.get(name, False) or bool(re.match(r'\s*\.(?!\.)', js[match.end():match.end() + 20]))
+    for match in _ID_LOOKUP_RE.finditer(js): note_id(match.group(2).strip(), match)
+    for match in _CLASS_LOOKUP_RE.finditer(js): classes.update(match.group(2).split())
+    for match in _SELECTOR_LOOKUP_RE.finditer(js):
+        selector = _SELECTOR_STRING_RE.sub('', match.group(2))
+        for name in _SELECTOR_ID_RE.findall(selector): note_id(name, match)
+        classes.update(_SELECTOR_CLASS_RE.findall(selector))
+    report.ran('js-ids'); report.ran('js-classes')
+    for name, dereferenced in ids.items():
+        if name in parser.ids: continue
+        report.fail('js-ids')
+        if dereferenced and not created_by_script(name, 'id'): _add(report.errors, f"{label}: uses element id '{name}' without a null check, but the HTML has no element with that id.")
+        else: _add(report.warnings, f"{label}: looks up element id '{name}', which is not in the HTML (guarded or created by the script).")
+    for name in sorted(classes):
+        if name not in parser.classes and not created_by_script(name, 'class'): report.fail('js-classes'); _add(report.warnings, f"{label}: selects class '{name}', which no HTML element has.")
+
+# --- Page ---
+def linked_asset_paths(html: str, html_filename: str) -> List[str]:
+    """Project-relative paths of the local stylesheets and scripts an HTML page links to."""
+    parser = _PageParser()
+    try: parser.feed(html); parser.close()
+    except Exception: pass
+    return [path for path in (_resolve_link(html_filename, href) for href in parser.stylesheets + parser.scripts) if path]
+
+def page_selectors(html: str) -> Tuple[List[str], List[str]]:
+    """Sorted ids and classes used in an HTML page, so CSS/JS can be reviewed against the page without its full markup."""
+    parser = _PageParser()
+    try: parser.feed(html); parser.close()
+    except Exception: pass
+    return sorted(parser.ids), sorted(parser.classes)
+
+def _resolve_link(html_filename: str, href: str) -> Optional[str]:
+    href = href.split('#', 1)[0].split('?', 1)[0].strip()
+    if not href or re.match(r'^(?:[a-z][a-z0-9+.-]*:|//)', href, re.IGNORECASE): return None # Remote or data: URL
+    path = posixpath.normpath(posixpath.join(posixpath.dirname(html_filename.replace('\\', '/')), href.lstrip('/')))
+    return None if path.startswith('..') else path
+
+def check_page(html: str, html_filename: str, assets: Optional[Dict[str, Optional[str]]] = None) -> StaticCheckReport:
+    """
+    Runs the static checks of an assembled page. assets maps the project-relative paths of the page's linked
+    files (see linked_asset_paths) to their content, or None when the file could not be read.
+    """
+    report = StaticCheckReport(); assets = assets or {}
+    parser = _check_html(html, report)
+    for line, css in parser.inline_css: report.ran(CSS_CHECK, _css_errors(css, f"Inline <style> (line {line})"))
+    for line, js in parser.inline_js: report.ran(JS_CHECK, _js_errors(js, f"Inline <script> (line {line})"))
+    stylesheet_paths = {_resolve_link(html_filename, href) for href in parser.stylesheets}
+    for href in parser.stylesheets + parser.scripts:
+        path = _resolve_link(html_filename, href)
+        if path and path in assets: report.ran('links', [f"Linked file '{href}' ({path}) does not exist."] if assets[path] is None else None)
+    for path, content in assets.items():
+        if content is None: continue
+        if path in stylesheet_paths:
+            report.ran(CSS_CHECK, _css_errors(content, f"CSS {path}"))
+        else:
+            report.ran(JS_CHECK, _js_errors(content, f"JS {path}")); _check_js_references(content, f"JS {path}", parser, report)
+    for line, js in parser.inline_js: _check_js_references(js, f"Inline <script> (line {line})", parser, report)
+    if report.errors: logger.info(f"Static checks of {html_filename}: {len(report.errors)} error(s), {len(report.warnings)} warning(s).")
+    return report
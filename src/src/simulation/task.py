@@ -1,6 +1,6 @@
 import uuid
 import logging
-from typing import Dict, Optional, Any
+from typing import Dict, Optional, Any, Callable
 
 # Define standardized task statuses
 STATUS_PENDING = 'pending'
@@ -30,10 +30,11 @@ class Task:
         self.assigned_to_role = assigned_to_role
         self.originating_task_id = originating_task_id
         self.status = STATUS_PENDING
-        self.result: Optional[str] = None
+        self.result: Optional[Any] = None # Short text, or an artifact handle for long results
         self.child_tasks: Dict[str, str] = {}  # Mapping of subtask_id -> status
         self.dependencies: Dict[str, Dict[str, Any]] = {}  # Track inputs needed (e.g., {"marketing_strategy": {...}})
         self.last_update_time: Optional[float] = None  # Could be set externally to throttle task rechecks
+        self._status_listener: Optional[Callable[['Task', str, str], None]] = None  # Set by the owning TaskGraph
 
         logger.debug(f"Task created: {self.task_id} [{self.task_type}] - Assigned to: {assigned_to_role}")
 
@@ -52,10 +53,37 @@ class Task:
             "dependencies": self.dependencies
         }
 
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> 'Task':
+        """Rebuilds a task from to_dict() output (checkpoint restore)."""
+        task = cls(task_type=data.get('task_type', 'generic'), description=data.get('description', ''), details=data.get('details'),
+                   assigned_to_role=data.get('assigned_to_role'), originating_task_id=data.get('originating_task_id'), task_id=data.get('task_id'))
+        task.status = data.get('status', STATUS_PENDING)
+        task.result = data.get('result')
+        task.child_tasks = data.get('child_tasks') or {}
+        task.dependencies = data.get('dependencies') or {}
+        return task
+
+    def to_summary(self) -> Dict[str, Any]:
+        """Small dict for UI telemetry (no details/result payloads)."""
+        return {
+            "task_id": self.task_id,
+            "task_type": self.task_type,
+            "description": self.description,
+            "assigned_to_role": self.assigned_to_role,
+            "originating_task_id": self.originating_task_id,
+            "status": self.status,
+            "has_result": self.result is not None
+        }
+
     def update_status(self, new_status: str):
         """Update task status with optional logging."""
         logger.info(f"Task {self.task_id} status changed: {self.status} -> {new_status}")
-        self.status = new_status
+        old_status = self.status; self.status = new_status
+        if self._status_listener: self._status_listener(self, old_status, new_status)
+
+    def set_status_listener(self, listener: Optional[Callable[['Task', str, str], None]]):
+        self._status_listener = listener
 
     def is_waiting_for_dependencies(self) -> bool:
         """Returns True if the task is still waiting for required inputs from other agents."""
@@ -0,0 +1,165 @@
+# SoftwareSim3d/src/simulation/task_graph.py
+
+import logging
+from typing import Dict, Any, Optional, List, Set, Iterator, Iterable, Tuple, Callable
+
+from .task import Task, STATUS_COMPLETED, STATUS_FAILED
+
+logger = logging.getLogger(__name__)
+
+TERMINAL_STATUSES = (STATUS_COMPLETED, STATUS_FAILED)
+
+ReadyListener = Callable[[Task], None] # Called when a task's last task dependency completes
+StatusListener = Callable[[Task, Optional[str], str], None] # (task, old status or None when added, new status)
+
+class TaskGraph:
+    """
+    Task registry with parent/child edges (via originating_task_id), per-status and per-role
+    indexes, and task-to-task dependencies. Reads like a dict of task_id -> Task. Indexes follow
+    Task.update_status through the task's status listener, so callers never rescan the graph.
+    """
+    def __init__(self):
+        self._tasks: Dict[str, Task] = {} # Insertion ordered
+        self._by_status: Dict[str, Set[str]] = {}
+        self._by_role: Dict[Optional[str], Set[str]] = {}
+        self._children: Dict[str, List[str]] = {} # parent id -> child ids (parent may not be registered yet)
+        self._dependents: Dict[str, Set[Tuple[str, str]]] = {} # prerequisite id -> {(dependent id, dep name)}
+        self._ready_listeners: List[ReadyListener] = []
+        self._status_listeners: List[StatusListener] = []
+
+    # --- Dict-like access ---
+    def __contains__(self, task_id: Any) -> bool: return task_id in self._tasks
+    def __getitem__(self, task_id: str) -> Task: return self._tasks[task_id]
+    def __len__(self) -> int: return len(self._tasks)
+    def __iter__(self) -> Iterator[str]: return iter(self._tasks)
+    def get(self, task_id: Optional[str], default: Optional[Task] = None) -> Optional[Task]: return self._tasks.get(task_id, default) if task_id else default
+    def values(self) -> Iterable[Task]: return self._tasks.values()
+    def items(self) -> Iterable[Tuple[str, Task]]: return self._tasks.items()
+
+    def first(self) -> Optional[Task]:
+        return next(iter(self._tasks.values()), None)
+
+    def clear(self):
+        for task in self._tasks.values(): task.set_status_listener(None)
+        self._tasks.clear(); self._by_status.clear(); self._by_role.clear(); self._children.clear(); self._dependents.clear()
+
+    # --- Mutation ---
+    def add(self, task: Task) -> Task:
+        if task.task_id in self._tasks: logger.warning(f"TaskGraph: replacing existing task {task.task_id}."); self.remove(task.task_id)
+        self._tasks[task.task_id] = task
+        self._by_status.setdefault(task.status, set()).add(task.task_id)
+        self._by_role.setdefault(task.assigned_to_role, set()).add(task.task_id)
+        parent_id = task.originating_task_id
+        if parent_id:
+            self._children.setdefault(parent_id, []).append(task.task_id)
+            parent = self._tasks.get(parent_id)
+            if parent: parent.child_tasks[task.task_id] = task.status
+        for child_id in self._children.get(task.task_id, []): # Children registered before their parent (e.g. on restore)
+            child = self._tasks.get(child_id)
+            if child: task.child_tasks[child_id] = child.status
+        for dep_name, dep in task.dependencies.items(): # Re-link dependencies of restored tasks
+            prerequisite_id = dep.get('task_id')
+            if prerequisite_id and not dep.get('ready'): self._dependents.setdefault(prerequisite_id, set()).add((task.task_id, dep_name))
+        task.set_status_listener(self._on_status_changed)
+        self._notify_status(task, None, task.status)
+        return task
+
+    def remove(self, task_id: str) -> Optional[Task]:
+        task = self._tasks.pop(task_id, None)
+        if task is None: return None
+        task.set_status_listener(None)
+        self._by_status.get(task.status, set()).discard(task_id)
+        self._by_role.get(task.assigned_to_role, set()).discard(task_id)
+        parent_id = task.originating_task_id
+        if parent_id in self._children: # The removed task's own child list stays: it points at live tasks
+            siblings = [child_id for child_id in self._children[parent_id] if child_id != task_id]
+            if siblings: self._children[parent_id] = siblings
+            else: del self._children[parent_id]
+            parent = self._tasks.get(parent_id)
+            if parent: parent.child_tasks.pop(task_id, None)
+        for dep in task.dependencies.values(): # Edges where it waits on another task
+            waiting = self._dependents.get(dep.get('task_id'))
+            if waiting is None: continue
+            waiting.difference_update([edge for edge in waiting if edge[0] == task_id])
+            if not waiting: del self._dependents[dep['task_id']]
+        orphaned = self._dependents.pop(task_id, None) # Edges where others wait on it: they can no longer resolve
+        if orphaned: logger.warning(f"TaskGraph: removed task {task_id} while {len(orphaned)} dependent task(s) waited on it.")
+        return task
+
+    def add_dependency(self, task_id: str, prerequisite_id: str, dep_name: Optional[str] = None):
+        """Makes task_id wait for prerequisite_id; its result becomes the dependency content on completion."""
+        task = self._tasks[task_id]; dep_name = dep_name or prerequisite_id
+        task.add_dependency(dep_name); task.dependencies[dep_name]['task_id'] = prerequisite_id
+        prerequisite = self._tasks.get(prerequisite_id)
+        if prerequisite and prerequisite.status == STATUS_COMPLETED: self._resolve_dependency(task, dep_name, prerequisite)
+        else: self._dependents.setdefault(prerequisite_id, set()).add((task_id, dep_name))
+
+    def add_ready_listener(self, listener: ReadyListener):
+        self._ready_listeners.append(listener)
+
+    def add_status_listener(self, listener: StatusListener):
+        self._status_listeners.append(listener)
+
+    # --- Indexed queries ---
+    def ids_with_status(self, *statuses: str) -> Set[str]:
+        if len(statuses) == 1: return set(self._by_status.get(statuses[0], ()))
+        return set().union(*(self._by_status.get(status, ()) for status in statuses))
+
+    def count(self, *statuses: str) -> int:
+        return sum(len(self._by_status.get(status, ())) for status in statuses)
+
+    def with_status(self, *statuses: str) -> List[Task]:
+        return [self._tasks[task_id] for task_id in self.ids_with_status(*statuses)]
+
+    def for_role(self, role: Optional[str]) -> List[Task]:
+        return [self._tasks[task_id] for task_id in self._by_role.get(role, ())]
+
+    def children_of(self, task_id: str) -> List[Task]:
+        return [self._tasks[child_id] for child_id in self._children.get(task_id, []) if child_id in self._tasks]
+
+    def parent_of(self, task_id: str) -> Optional[Task]:
+        task = self._tasks.get(task_id)
+        return self._tasks.get(task.originating_task_id) if task and task.originating_task_id else None
+
+    def terminal_ids(self) -> Set[str]:
+        return self.ids_with_status(*TERMINAL_STATUSES)
+
+    def blocking_dependents(self, task_id: str) -> int:
+        """Number of tasks (transitively) still waiting for task_id to complete: its weight on the critical path."""
+        seen: Set[str] = set(); stack = [task_id]
+        while stack:
+            for dependent_id, _ in self._dependents.get(stack.pop(), ()):
+                if dependent_id not in seen: seen.add(dependent_id); stack.append(dependent_id)
+        return len(seen)
+
+    # --- Index maintenance ---
+    def _on_status_changed(self, task: Task, old_status: str, new_status: str):
+        if old_status == new_status: return
+        self._by_status.get(old_status, set()).discard(task.task_id)
+        self._by_status.setdefault(new_status, set()).add(task.task_id)
+        parent = self._tasks.get(task.originating_task_id) if task.originating_task_id else None
+        if parent: parent.child_tasks[task.task_id] = new_status
+        self._notify_status(task, old_status, new_status)
+        if new_status == STATUS_COMPLETED:
+            for dependent_id, dep_name in self._dependents.pop(task.task_id, ()):
+                dependent = self._tasks.get(dependent_id)
+                if dependent: self._resolve_dependency(dependent, dep_name, task)
+        elif new_status == STATUS_FAILED and task.task_id in self._dependents:
+            logger.warning(f"TaskGraph: prerequisite {task.task_id} failed; {len(self._dependents[task.task_id])} dependent task(s) stay blocked.")
+
+    def _notify_status(self, task: Task, old_status: Optional[str], new_status: str):
+        for listener in self._status_listeners:
+            try: listener(task, old_status, new_status)
+            except Exception as e: logger.error(f"TaskGraph: status listener failed for task {task.task_id}: {e}", exc_info=True)
+
+    def _resolve_dependency(self, task: Task, dep_name: str, prerequisite: Task):
+        task.mark_dependency_ready(dep_name, prerequisite.result, {'task_id': prerequisite.task_id})
+        task.dependencies[dep_name]['task_id'] = prerequisite.task_id
+        if task.is_waiting_for_dependencies(): return
+        for listener in self._ready_listeners:
+            try: listener(task)
+            except Exception as e: logger.error(f"TaskGraph: ready listener failed for task {task.task_id}: {e}", exc_info=True)
+
+    def stats_snapshot(self) -> Dict[str, Any]:
+        return {'tasks': len(self._tasks), 'by_status': {status: len(ids) for status, ids in self._by_status.items() if ids},
+                'waiting_on': len(self._dependents)}
@@ -0,0 +1,138 @@
+# SoftwareSim3d/src/simulation/wire_protocol.py
+
+import json
+import logging
+import threading
+from typing import Dict, Any, Optional, List, Iterable
+
+try:
+    import msgpack # Optional: enables the binary protocol
+except ImportError:
+    msgpack = None
+
+from ..agent_base import (STATUS_IDLE, STATUS_WORKING, STATUS_MOVING_TO_ZONE, STATUS_USING_TOOL_IN_ZONE,
+                          STATUS_WAITING_RESPONSE, STATUS_MEETING, STATUS_FAILED,
+                          IDLE_AT_DESK, IDLE_AT_WATER_COOLER, IDLE_WANDERING)
+from .task import STATUS_PENDING, STATUS_IN_PROGRESS, STATUS_COMPLETED, STATUS_WAITING_DEPENDENCY
+
+logger = logging.getLogger(__name__)
+
+PROTOCOL_MSGPACK = 'msgpack-v1'      # Compact frames, msgpack encoded (binary event)
+PROTOCOL_COMPACT_JSON = 'compact-json-v1' # Same compact frames as JSON text (no msgpack installed)
+PROTOCOL_JSON = 'json-v1'            # Verbose legacy frames
+
+POSITION_SCALE = 10 # Positions are sent as integers in 0.1 world units
+MAX_THOUGHT_CHARS = 160
+MAX_TASK_DESCRIPTION_CHARS = 80
+
+# Agent state key -> wire key. Keys not listed are not rendered by the client and are not sent.
+AGENT_FIELDS = {
+    'role': 'r', 'status': 's', 'position': 'p', 'current_thoughts': 'th',
+    'current_idle_sub_state': 'i', 'current_zone': 'z', 'target_zone': 'tz', 'progress': 'g',
+}
+# Task summary key -> wire key
+TASK_FIELDS = {
+    'task_type': 'k', 'description': 'd', 'assigned_to_role': 'r', 'originating_task_id': 'o',
+    'status': 's', 'has_result': 'h',
+}
+# Wire key -> enum table, for fields sent as interned integers
+ENUM_FIELDS = {'r': 'role', 's': 'status', 'i': 'idle', 'z': 'zone', 'tz': 'zone', 'k': 'task_type'}
+
+DEFAULT_ENUM_VALUES = {
+    'role': ["CEO", "Product Manager", "Marketer", "Coder", "HTML Specialist", "CSS Specialist", "JavaScript Specialist", "QA", "Messenger"],
+    'status': [STATUS_IDLE, STATUS_WORKING, STATUS_MOVING_TO_ZONE, STATUS_USING_TOOL_IN_ZONE, STATUS_WAITING_RESPONSE, STATUS_MEETING, STATUS_FAILED,
+               STATUS_PENDING, STATUS_IN_PROGRESS, STATUS_COMPLETED, STATUS_WAITING_DEPENDENCY],
+    'idle': [IDLE_AT_DESK, IDLE_AT_WATER_COOLER, IDLE_WANDERING],
+    'zone': [],
+    'task_type': [],
+}
+
+def available_protocols() -> List[str]:
+    """Protocols this server can speak, best first."""
+    return ([PROTOCOL_MSGPACK] if msgpack is not None else []) + [PROTOCOL_COMPACT_JSON, PROTOCOL_JSON]
+
+def choose_protocol(accepted: Optional[Iterable[str]]) -> str:
+    accepted = list(accepted or [])
+    for protocol in available_protocols():
+        if protocol in accepted: return protocol
+    return PROTOCOL_JSON
+
+class EnumTable:
+    """String interning table. Unknown values are assigned new ids and announced in the next frame."""
+    __slots__ = ('values', 'index', 'announced')
+
+    def __init__(self, values: Iterable[str]):
+        self.values: List[str] = []; self.index: Dict[str, int] = {}; self.announced = 0
+        for value in values: self.intern(value)
+        self.announced = len(self.values)
+
+    def intern(self, value: str) -> int:
+        code = self.index.get(value)
+        if code is None: code = self.index[value] = len(self.values); self.values.append(value)
+        return code
+
+    def take_new(self) -> Optional[List[Any]]:
+        """Returns [first_id, [values...]] for values added since the last announcement."""
+        if self.announced == len(self.values): return None
+        first_id = self.announced; self.announced = len(self.values)
+        return [first_id, self.values[first_id:]]
+
+class CompactEncoder:
+    """Turns state-sync batches into compact frames shared by every client on a compact protocol."""
+
+    def __init__(self, extra_enum_values: Optional[Dict[str, Iterable[str]]] = None):
+        self._lock = threading.Lock()
+        self.tables: Dict[str, EnumTable] = {}
+        for name, values in DEFAULT_ENUM_VALUES.items():
+            self.tables[name] = EnumTable(list(values) + list((extra_enum_values or {}).get(name, [])))
+
+    def describe(self) -> Dict[str, Any]:
+        """Handshake payload: field maps, scale and the current enum tables."""
+        with self._lock:
+            return {'agent_fields': AGENT_FIELDS, 'task_fields': TASK_FIELDS, 'enum_fields': ENUM_FIELDS,
+                    'position_scale': POSITION_SCALE, 'enums': {name: list(table.values) for name, table in self.tables.items()}}
+
+    def _encode_value(self, wire_key: str, value: Any) -> Any:
+        table_name = ENUM_FIELDS.get(wire_key)
+        if table_name and isinstance(value, str): return self.tables[table_name].intern(value)
+        if wire_key == 'p' and isinstance(value, (list, tuple)) and len(value) == 3:
+            return [int(round(float(c) * POSITION_SCALE)) for c in value]
+        if wire_key == 'th' and isinstance(value, str) and len(value) > MAX_THOUGHT_CHARS: return value[:MAX_THOUGHT_CHARS - 3] + '...'
+        if wire_key == 'd' and isinstance(value, str) and len(value) > MAX_TASK_DESCRIPTION_CHARS: return value[:MAX_TASK_DESCRIPTION_CHARS - 3] + '...'
+        if wire_key == 'g' and isinstance(value, float): return int(round(value * 100)) # Percent
+        return value
+
+    def _encode_fields(self, state: Dict[str, Any], field_map: Dict[str, str]) -> Dict[str, Any]:
+        encoded = {}
+        for key, value in state.items():
+            wire_key = field_map.get(key)
+            if wire_key: encoded[wire_key] = self._encode_value(wire_key, value)
+        return encoded
+
+    def build_frame(self, batch: Dict[str, Any], announce: bool = True) -> Optional[Dict[str, Any]]:
+        """
+        Compact frame: {q: seq, f: full, a: {agent: fields}, t: {task: fields}, n: {table: [first_id, [values]]}}.
+        Pass announce=False for frames sent to a single client together with describe().
+        """
+        with self._lock:
+            agents = {}
+            for agent_id, state in batch.get('agents', {}).items():
+                fields = self._encode_fields(state, AGENT_FIELDS)
+                if fields: agents[agent_id] = fields
+            tasks = {}
+            for task_id, task_fields in batch.get('tasks', {}).items():
+                fields = self._encode_fields(task_fields, TASK_FIELDS)
+                if fields: tasks[task_id] = fields
+            if not agents and not tasks and not batch.get('full'): return None
+            frame: Dict[str, Any] = {'q': batch.get('seq', 0)}
+            if batch.get('full'): frame['f'] = 1
+            if agents: frame['a'] = agents
+            if tasks: frame['t'] = tasks
+            if announce:
+                new_values = {name: values for name, values in ((n, t.take_new()) for n, t in self.tables.items()) if values}
+                if new_values: frame['n'] = new_values # Client applies these before decoding the frame
+            return frame
+
+    def encode(self, frame: Dict[str, Any], protocol: str) -> Any:
+        if protocol == PROTOCOL_MSGPACK and msgpack is not None: return msgpack.packb(frame, use_bin_type=True)
+        return json.dumps(frame, separators=(',', ':'))
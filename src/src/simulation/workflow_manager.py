@@ -7,10 +7,23 @@ import os
 import re
 import time
 import math
-from typing import Dict, Any, Optional, List, Set, Callable, Awaitable, Tuple
-
-from .task import Task #
-from ..agent_base import Agent #
+from typing import Dict, Any, Optional, List, Callable, Awaitable, Tuple, Set
+
+from .task import Task, STATUS_PENDING, STATUS_WAITING_DEPENDENCY #
+from .message_bus import MessageBus, Message, MANAGER_ID, unwrap_agent_message
+from .artifact_store import ArtifactStore, ARTIFACTS_DIR_NAME
+from .file_io import AsyncFileIO
+from .task_graph import TaskGraph, TERMINAL_STATUSES
+from .run_database import get_run_database, RUN_DATABASE_NAME
+from .event_log import EventLog, EVENT_LOGS_DIR_NAME, KIND_MESSAGE, KIND_AGENT, KIND_TASK, KIND_LLM, KIND_FINAL
+from .context_archive import ContextArchive, CONTEXT_ARCHIVE_DIR_NAME, DEFAULT_CONTEXT_TTL_S, DEFAULT_MAX_FINISHED_CONTEXTS, DEFAULT_RUN_MEMORY_CAP_BYTES, estimate_size
+from .reuse_index import ReuseIndex, REUSE_INDEX_FILENAME, DEFAULT_REUSE_SKIP_CONFIDENCE, DEFAULT_REUSE_SEED_CONFIDENCE
+from .search_index import SearchIndex, SEARCH_INDEX_FILENAME, DEFAULT_TOP_K, format_results
+from .actor_runtime import ActorRuntime
+from .deadline import RunDeadline, LEVEL_EXPIRED
+from .org_chart import OrgChart, RoleSpec, DEFAULT_ORG_CHART_PATH, SPAWN_EAGER
+from .checkpoint import CheckpointWriter, CHECKPOINTS_DIR_NAME, DEFAULT_CHECKPOINT_INTERVAL_S, new_run_id, load_checkpoint
+from ..agent_base import Agent, AGENT_JOIN_TIMEOUT_S #
 from ..agents.ceo_agent import CEOAgent #
 from ..agents.product_manager_agent import ProductManagerAgent #
 from ..agents.coder_agent import CoderAgent # # Coordinator
@@ -21,15 +34,26 @@ from ..agents.marketer_agent import MarketerAgent #
 from ..agents.qa_agent import QAAgent #
 from ..agents.messenger_agent import MessengerAgent #
 from ..llm_integration.api_clients import LLMService #
+from ..llm_integration.llm_scheduler import llm_priority
 
 logger = logging.getLogger(__name__)
 
+AGENT_CLASSES = {cls.__name__: cls for cls in (CEOAgent, ProductManagerAgent, MarketerAgent, CoderAgent, HTMLAgent, CSSAgent, JSAgent, QAAgent, MessengerAgent)} # Org chart 'class' names
+
 EmitAgentUpdateCallback = Callable[[str, Dict[str, Any]], None]
 RequestUserInputCallback = Callable[[str, str], None]
 EmitTaskUpdateCallback = Callable[[str, Dict[str, Any]], None]
 EmitFinalOutputCallback = Callable[[str, bool], None]
 
 AGENT_SPEED = 5.0 # Units per second (adjust as needed)
+INLINE_RESULT_MAX_CHARS = 512 # Longer task results are kept in the artifact store
+RECORDED_MESSAGE_TYPES = ('qa_feedback',) # Agent-to-agent messages logged to the run database as run events
+PIPELINE_PREREQUISITES = {'define_specifications': ('develop_strategy', 'marketing_strategy'), 'write_code': ('define_specifications', 'specifications')} # task type -> (prerequisite task type, dependency name)
+COMPONENT_DEPENDENTS = {'generate_html': ('generate_css', 'generate_js')} # Specialist tasks (outside the task graph) that wait on this component of the page
+DEFAULT_AGENT_RECLAIM_IDLE_S = 120.0 # Lazily built agents idle this long (with no open task for their role) are dropped
+DEFAULT_OUTPUT_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..', 'output'))
+CHECKPOINT_ROOT_DIR = os.path.join(DEFAULT_OUTPUT_DIR, CHECKPOINTS_DIR_NAME)
+EVENT_LOG_ROOT_DIR = os.path.join(DEFAULT_OUTPUT_DIR, EVENT_LOGS_DIR_NAME)
 
 class WorkflowManager:
     # Define zone coordinates (ensure consistency with frontend if visualization used)
@@ -61,14 +85,36 @@ class WorkflowManager:
         self.loop = loop
         self.llm_agent_configs = llm_agent_configs if llm_agent_configs else {}
         self.agents: Dict[str, Agent] = {} #[cite: uploaded:SoftwareSim3d/src/agent_base.py]
+        self.message_bus = MessageBus(loop)
+        self.message_bus.set_manager_handler(self._dispatch_manager_message)
+        self.actor_runtime: Optional[ActorRuntime] = ActorRuntime(loop) if os.getenv('ACTOR_RUNTIME', '1') != '0' else None # One scheduler instead of a loop per agent
+        if self.actor_runtime: self.message_bus.set_delivery_listener(self.actor_runtime.wake)
         self.agent_message_queues: Dict[str, asyncio.Queue] = {}
-        self.tasks: Dict[str, Task] = {} #[cite: uploaded:SoftwareSim3d/src/simulation/task.py]
-        self.completed_task_ids: Set[str] = set() # Track completed tasks for dependency checks
+        # Dispatch table for manager-bound messages (keyed by content 'type')
+        self._manager_message_handlers: Dict[str, Callable[[str, str, Dict[str, Any]], Awaitable[None]]] = {
+            'request_tool_use': self._on_request_tool_use,
+            'request_tool_batch': self._on_request_tool_batch,
+            'task_completion_update': self._on_task_completion_update,
+            'delegate_sub_tasks': self._on_delegate_sub_tasks,
+            'request_user_input': self._on_request_user_input,
+            'ui_request_user_input': self._on_request_user_input, # Name used by agents/Messenger
+            'request_ceo_evaluation': self._on_request_ceo_evaluation,
+            'ui_simulation_end': self._on_simulation_end,
+        }
+        self.tasks = TaskGraph() # Indexed by status, role and parent; completed/failed ids via tasks.terminal_ids()
+        self.tasks.add_ready_listener(self._on_task_dependencies_ready)
+        self.agent_ids_by_role: Dict[str, str] = {}
         self.saved_outputs: Dict[str, str] = {} # task_id -> absolute output path
         self.simulation_complete: bool = False
         self.simulation_success: Optional[bool] = None
         self.final_output: Optional[str] = None
         self.project_name: Optional[str] = None
+        self.user_request: Optional[str] = None
+        self.run_id: Optional[str] = None
+        self.checkpoint_writer: Optional[CheckpointWriter] = None
+        self.checkpoint_interval_s = float(os.getenv('CHECKPOINT_INTERVAL_S', DEFAULT_CHECKPOINT_INTERVAL_S)) # <= 0 disables checkpoints
+        self.event_log: Optional[EventLog] = None
+        self.event_log_enabled = os.getenv('EVENT_LOG', '1') != '0'
         self.max_iterations: int = 2000 # Prevent infinite loops
         self.current_iteration: int = 0
         self.emit_agent_update: Optional[EmitAgentUpdateCallback] = None
@@ -76,116 +122,120 @@ class WorkflowManager:
         self.request_user_input: Optional[RequestUserInputCallback] = None
         self.emit_final_output: Optional[EmitFinalOutputCallback] = None
         # Determine base output dir relative to this file's location
-        self.base_output_dir = os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..', 'output'))
+        self.base_output_dir = DEFAULT_OUTPUT_DIR
         os.makedirs(self.base_output_dir, exist_ok=True)
-        self._initialize_agents() # Initialize agents upon creation
+        self.file_io = AsyncFileIO(loop) # File tools run on a bounded pool, off the simulation loop
+        self.artifact_store = ArtifactStore(os.path.join(self.base_output_dir, ARTIFACTS_DIR_NAME), writer=self.file_io.submit)
+        self.context_archive = ContextArchive(os.path.join(self.base_output_dir, CONTEXT_ARCHIVE_DIR_NAME), self.file_io.submit,
+                                              ttl_s=float(os.getenv('CONTEXT_TTL_S', DEFAULT_CONTEXT_TTL_S)),
+                                              max_finished_contexts=int(os.getenv('MAX_FINISHED_CONTEXTS', DEFAULT_MAX_FINISHED_CONTEXTS)))
+        self.reuse_index = ReuseIndex(os.path.join(self.base_output_dir, REUSE_INDEX_FILENAME), self.file_io.submit)
+        self.reuse_enabled = os.getenv('REUSE_ARTIFACTS', '1') != '0'
+        self.reuse_skip_confidence = float(os.getenv('REUSE_SKIP_CONFIDENCE', DEFAULT_REUSE_SKIP_CONFIDENCE))
+        self.reuse_seed_confidence = float(os.getenv('REUSE_SEED_CONFIDENCE', DEFAULT_REUSE_SEED_CONFIDENCE))
+        # Offline backend of the internet_search tool: past reports/specs in the output dir plus SEARCH_REFERENCE_DIRS (os.pathsep separated)
+        self.search_enabled = os.getenv('LOCAL_SEARCH', '1') != '0'
+        self.search_top_k = int(os.getenv('SEARCH_TOP_K', DEFAULT_TOP_K))
+        self.search_index = SearchIndex(os.path.join(self.base_output_dir, SEARCH_INDEX_FILENAME), self.file_io.submit,
+                                        [self.base_output_dir] + [path for path in os.getenv('SEARCH_REFERENCE_DIRS', '').split(os.pathsep) if path])
+        if self.search_enabled: self._refresh_search_index()
+        self.run_db = get_run_database(os.getenv('RUN_DATABASE_PATH') or os.path.join(self.base_output_dir, RUN_DATABASE_NAME))
+        self.tasks.add_status_listener(self._record_task_transition)
+        self.overlap_llm = os.getenv('OVERLAP_LLM', '1') != '0' # Agents start LLM calls while still walking back to their desk
+        self.run_memory_cap_bytes = int(float(os.getenv('RUN_MEMORY_CAP_MB', DEFAULT_RUN_MEMORY_CAP_BYTES / (1024 * 1024))) * 1024 * 1024)
+        self.org_chart = OrgChart.load(os.getenv('ORG_CHART_PATH') or DEFAULT_ORG_CHART_PATH)
+        self.lazy_agents = os.getenv('LAZY_AGENTS', '1') != '0'
+        self.llm_preflight = os.getenv('LLM_PREFLIGHT', '1') != '0' # Check keys and open provider connections on this loop while the run starts
+        self._preflight_task: Optional[asyncio.Task] = None
+        self._background_tasks: Set[asyncio.Task] = set() # Movement timers and other manager-side tasks; cancelled by stop_simulation
+        self.run_sla_s = float(os.getenv('RUN_SLA_S', 0)) # Default per-run deadline in seconds; <= 0 means none
+        self.deadline = RunDeadline(None)
+        self.agent_reclaim_idle_s = float(os.getenv('AGENT_RECLAIM_IDLE_S', DEFAULT_AGENT_RECLAIM_IDLE_S)) # <= 0 keeps built agents
+        self._agents_started = False # Agents built on demand during a run are started right away
+        self._idle_since: Dict[str, float] = {}
+        self._initialize_agents() # Builds the eager roles; the rest are built when first addressed
         logger.info(f"WorkflowManager initialized. Output dir: {self.base_output_dir}")
 
     def _initialize_agents(self):
+        """Plans every agent of the org chart; only eager roles (and all roles with LAZY_AGENTS=0) are built now."""
         logger.info("Initializing agents...")
-        agent_roles_classes = {
-            "CEO": CEOAgent,
-            "Product Manager": ProductManagerAgent,
-            "Marketer": MarketerAgent,
-            "Coder": CoderAgent, # Coordinator
-            "HTML Specialist": HTMLAgent, # New
-            "CSS Specialist": CSSAgent,   # New
-            "JavaScript Specialist": JSAgent, # New
-            "QA": QAAgent,
-            "Messenger": MessengerAgent
-        }
-        agent_ids = {
-            "CEO": "ceo-01", "Product Manager": "pm-01", "Marketer": "mkt-01",
-            "Coder": "coder-01", "HTML Specialist": "html-01", "CSS Specialist": "css-01",
-            "JavaScript Specialist": "js-01", "QA": "qa-01", "Messenger": "msgr-01"
-        }
-        # Updated specialist desks
-        agent_positions = {
-            "CEO": ("CEO_OFFICE", "CEO_OFFICE"), 
-            "Product Manager": ("MEETING_ROOM_CENTER", "PM_DESK"),
-            "Marketer": ("MEETING_ROOM_CENTER", "MKT_DESK"), 
-            "Coder": ("CODER_DESK", "CODER_DESK"),
-            "HTML Specialist": ("HTML_DESK", "HTML_DESK"), 
-            "CSS Specialist": ("CSS_DESK", "CSS_DESK"),
-            "JavaScript Specialist": ("JS_DESK", "JS_DESK"), 
-            "QA": ("QA_DESK", "QA_DESK"),
-            "Messenger": ("MESSENGER_STATION", "MESSENGER_STATION")
-        }
-        # Tools - Specialists likely don't need tools initially
-        role_tools = {
-            "CEO": set(), "Product Manager": {'file_read', 'file_write'},
-            "Marketer": {'internet_search', 'file_write'}, "Coder": {'file_read', 'file_write'}, # Coordinator still needs tools
-            "HTML Specialist": set(), "CSS Specialist": set(), "JavaScript Specialist": set(),
-            "QA": {'file_read'}, "Messenger": set()
-        }
-        tool_zones_map = { 'internet_search': 'INTERNET_ZONE', 'file_read': 'SAVE_ZONE', 'file_write': 'SAVE_ZONE' }
-
-        # --- Role Specific Dependencies ---
-        manager_ids = { "Product Manager": agent_ids["Product Manager"], "Marketer": agent_ids["Marketer"], "Coder": agent_ids["Coder"] }
-        ceo_id = agent_ids["CEO"]
-        messenger_id = agent_ids["Messenger"]
-        coder_lead_id = agent_ids["Coder"] # Coordinator ID
-        qa_id = agent_ids["QA"]
-        html_agent_id = agent_ids["HTML Specialist"]
-        css_agent_id = agent_ids["CSS Specialist"]
-        js_agent_id = agent_ids["JavaScript Specialist"]
-        # --- End Role Specific Dependencies ---
-
+        for agent_id, spec in self.org_chart.planned_agents():
+            self.agent_ids_by_role.setdefault(spec.role, agent_id)
+            if spec.spawn == SPAWN_EAGER or not self.lazy_agents: self._spawn_agent(agent_id, required=True)
+        logger.info(f"Agents built: {sorted(self.agents)}; on demand: {sorted(agent_id for agent_id, _ in self.org_chart.planned_agents() if agent_id not in self.agents)}.")
+
+    def _llm_settings_for(self, spec: RoleSpec) -> Tuple[Optional[str], Optional[str]]:
+        """(llm_type, model) for a role from the UI configs, falling back to the configured default provider."""
+        agent_config_from_input = self.llm_agent_configs.get(spec.role)
+        delegated_config = self.llm_agent_configs.get(spec.llm_config_role) # e.g. specialists use the Coder's provider
+        if spec.llm_config_role != spec.role and delegated_config and delegated_config.get("type"): agent_config_from_input = delegated_config
         default_llm_type, default_llm_model = self._get_default_llm_config()
-
-        for role, AgentClass in agent_roles_classes.items():
-            agent_id = agent_ids[role]
-            msg_queue = asyncio.Queue(); self.agent_message_queues[agent_id] = msg_queue
-            agent_config_from_input = self.llm_agent_configs.get(role)
-            
-            # MODIFIED: Use the same LLM provider for all agents
-            # For specialists, use the same LLM type as Coder instead of OpenAI
-            if role in ["HTML Specialist", "CSS Specialist", "JavaScript Specialist"]:
-                coder_config = self.llm_agent_configs.get("Coder")
-                if coder_config and coder_config.get("type"):
-                    agent_config_from_input = coder_config
-            
-            llm_type, llm_model_name = self._get_agent_llm_config(role, agent_config_from_input, default_llm_type, default_llm_model)
-            init_pos_key, desk_pos_key = agent_positions[role]
-            init_pos = self.ZONE_COORDINATES.get(init_pos_key, (0, 0.5, 0))
-            desk_pos = self.ZONE_COORDINATES.get(desk_pos_key, (0, 0.5, 0))
-
-            try:
-                agent_init_args = {
-                    'message_queue': msg_queue, 'broadcast_callback': self._route_message,
-                    'loop': self.loop, 'initial_position': init_pos, 'target_desk_position': desk_pos,
-                    'llm_service': self.llm_service, 'llm_type': llm_type, 'llm_model_name': llm_model_name,
-                    'available_tools': role_tools.get(role, set()), 'required_tool_zones': tool_zones_map,
-                    'zone_coordinates_map': self.ZONE_COORDINATES, # Pass the full map
-                }
-
-                # Add role-specific arguments
-                if role == "CEO": agent_init_args.update({'manager_ids': manager_ids, 'messenger_id': messenger_id})
-                elif role == "Messenger": agent_init_args['ceo_agent_id'] = ceo_id
-                elif role == "QA": agent_init_args.update({'coder_lead_id': coder_lead_id, 'ceo_agent_id': ceo_id})
-                # --- Pass Specialist IDs to Coder ---
-                elif role == "Coder":
-                    agent_init_args.update({
-                        'ceo_agent_id': ceo_id, 'qa_agent_id': qa_id,
-                        'html_agent_id': html_agent_id, 'css_agent_id': css_agent_id, 'js_agent_id': js_agent_id
-                    })
-                # --- Pass Coder Lead ID to Specialists ---
-                elif role in ["HTML Specialist", "CSS Specialist", "JavaScript Specialist"]:
-                    agent_init_args['coder_lead_id'] = coder_lead_id
-
-                agent = AgentClass(agent_id=agent_id, role=role, **agent_init_args)
-                self.agents[agent_id] = agent
-                logger.info(f"Initialized agent: {agent_id} ({role}) LLM: {llm_type or 'N/A'} ({llm_model_name or 'default'})")
-
-            except Exception as e:
-                logger.error(f"Failed to initialize agent {agent_id} ({role}): {e}", exc_info=True)
-                raise
+        return self._get_agent_llm_config(spec.role, agent_config_from_input, default_llm_type, default_llm_model)
+
+    def _spawn_agent(self, agent_id: str, required: bool = False) -> Optional[Agent]:
+        """Builds a planned agent from its org chart role, wires it into the bus/runtime/UI and starts it if a run is active."""
+        spec = self.org_chart.spec_for_agent(agent_id)
+        AgentClass = AGENT_CLASSES.get(spec.agent_class) if spec else None
+        if AgentClass is None: logger.error(f"Cannot build agent '{agent_id}': not in the org chart or unknown class."); return None
+        role = spec.role
+        llm_type, llm_model_name = self._llm_settings_for(spec)
+        msg_queue = self.message_bus.register_agent(agent_id); self.agent_message_queues[agent_id] = msg_queue
+        try:
+            agent_init_args = {
+                'message_queue': msg_queue, 'broadcast_callback': self._route_message, 'loop': self.loop,
+                'initial_position': self.ZONE_COORDINATES.get(spec.start_zone, (0, 0.5, 0)), 'target_desk_position': self.ZONE_COORDINATES.get(spec.desk_zone, (0, 0.5, 0)),
+                'llm_service': self.llm_service, 'llm_type': llm_type, 'llm_model_name': llm_model_name,
+                'available_tools': set(spec.tools), 'required_tool_zones': self.org_chart.tool_zones,
+                'zone_coordinates_map': self.ZONE_COORDINATES, # Pass the full map
+                'artifact_store': self.artifact_store, 'context_archive': self.context_archive,
+                'overlap_llm': self.overlap_llm, 'reuse_lookup': self._lookup_reuse, # Roles ignore services they do not use
+                **self.org_chart.resolve_wiring(spec), # Ids of the agents this role talks to (manager_ids, coder_lead_id, ...)
+            }
+            agent = AgentClass(agent_id=agent_id, role=role, **agent_init_args)
+        except Exception as e:
+            logger.error(f"Failed to initialize agent {agent_id} ({role}): {e}", exc_info=True)
+            self.message_bus.unregister_agent(agent_id); self.agent_message_queues.pop(agent_id, None)
+            if required: raise
+            return None
+        self.agents[agent_id] = agent
+        agent.register_llm_call_listener(self._record_llm_call)
+        agent.register_llm_priority_source(self._llm_priority_for_task)
+        agent.set_deadline(self.deadline)
+        if self.emit_agent_update: agent.register_state_update_callback(self._handle_agent_state_change)
+        if self.actor_runtime: self.actor_runtime.attach(agent)
+        logger.info(f"Initialized agent: {agent_id} ({role}) LLM: {llm_type or 'N/A'} ({llm_model_name or 'default'})")
+        if self._agents_started:
+            if self.emit_agent_update: self.emit_agent_update(agent_id, agent.get_public_state())
+            agent.start()
+        return agent
+
+    def _ensure_agent(self, agent_id: Optional[str]) -> Optional[Agent]:
+        """The live agent for agent_id, building it on first use if the org chart plans it."""
+        agent = self.agents.get(agent_id) if agent_id else None
+        if agent is None and agent_id and self.org_chart.spec_for_agent(agent_id):
+            logger.info(f"Building agent {agent_id} on demand."); agent = self._spawn_agent(agent_id)
+        return agent
+
+    def _reclaim_idle_agents(self):
+        """Drops lazily built agents that have been idle, with no open task for their role, for agent_reclaim_idle_s."""
+        if self.agent_reclaim_idle_s <= 0: return
+        now = time.monotonic(); open_roles = {task.assigned_to_role for task in self.tasks.values() if task.status not in TERMINAL_STATUSES}
+        for agent_id, agent in list(self.agents.items()):
+            spec = self.org_chart.spec_for_agent(agent_id)
+            if not spec or spec.spawn == SPAWN_EAGER or agent.role in open_roles or not agent.can_reclaim(): self._idle_since.pop(agent_id, None); continue
+            idle_since = self._idle_since.setdefault(agent_id, now)
+            if now - idle_since < self.agent_reclaim_idle_s: continue
+            agent.stop()
+            if self.actor_runtime: self.actor_runtime.detach(agent_id)
+            self.message_bus.unregister_agent(agent_id); self.agent_message_queues.pop(agent_id, None)
+            del self.agents[agent_id]; self._idle_since.pop(agent_id, None)
+            logger.info(f"Reclaimed idle agent {agent_id} ({agent.role}); it is rebuilt on its next message.")
 
     def _get_default_llm_config(self) -> Tuple[Optional[str], Optional[str]]:
          # Prioritize available clients
-         if self.llm_service.openai_client: return "openai", "gpt-4o" 
-         elif self.llm_service.google_client: return "gemini", "gemini-2.5-pro-preview-03-25" 
-         elif self.llm_service.anthropic_client: return "anthropic", "claude-3-7-sonnet-20250219" 
+         if self.llm_service.has_provider('openai'): return "openai", "gpt-4o" # Key checks only: clients are built lazily
+         elif self.llm_service.has_provider('gemini'): return "gemini", "gemini-2.5-pro-preview-03-25" 
+         elif self.llm_service.has_provider('anthropic'): return "anthropic", "claude-3-7-sonnet-20250219" 
          else: return None, None # No clients configured
 
     def _get_agent_llm_config(self, role: str, config: Optional[Dict[str, str]], default_type: Optional[str], default_model: Optional[str]) -> Tuple[Optional[str], Optional[str]]:
@@ -207,11 +257,45 @@ class WorkflowManager:
 
          return llm_type, llm_model
 
+    def get_agent_for_role(self, role: str) -> Optional[Agent]:
+        return self.agents.get(self.agent_ids_by_role.get(role))
+
+    # --- Run Database Hooks ---
+    def _record_task_transition(self, task: Task, old_status: Optional[str], new_status: str):
+        if self.run_id: self.run_db.record_task_event(self.run_id, task.task_id, task.task_type, task.assigned_to_role, task.originating_task_id, old_status, new_status)
+
+    def _record_llm_call(self, call: Dict[str, Any]):
+        if self.run_id: self.run_db.record_llm_call(self.run_id, call)
+        if self.event_log: self.event_log.append(KIND_LLM, call.get('agent_id'), call.get('task_id'), int(call.get('duration_s', 0) * 1000), call.get('ok'))
+
+    def _llm_priority_for_task(self, task: Dict[str, Any]) -> float:
+        """LLM scheduling priority of an agent's current task: tasks blocked on it, then its pipeline stage."""
+        task_id = task.get('task_id'); graph_task = self.tasks.get(task_id)
+        task_type = task.get('task_type') or (graph_task.task_type if graph_task else None)
+        blocked = self.tasks.blocking_dependents(task_id) if graph_task else len(COMPONENT_DEPENDENTS.get(task_type, ())) # Specialist tasks: CSS/JS wait on the HTML
+        return llm_priority(task_type, blocked)
+
+    def _on_task_dependencies_ready(self, task: Task):
+        """TaskGraph callback: a task's last prerequisite completed."""
+        logger.info(f"All dependencies of task {task.task_id} are ready.")
+        if task.status == STATUS_WAITING_DEPENDENCY: task.update_status(STATUS_PENDING)
+        if self.emit_task_update: self.emit_task_update(task.task_id, task.to_summary())
+
     def register_websocket_callbacks(self, emit_agent_update: EmitAgentUpdateCallback, emit_task_update: EmitTaskUpdateCallback, request_user_input: RequestUserInputCallback, emit_final_output: EmitFinalOutputCallback):
-        self.emit_agent_update = emit_agent_update
-        self.emit_task_update = emit_task_update
+        # UI emits are recorded to the run's event log on their way out
+        def emit_agent_update_logged(agent_id: str, state: Dict[str, Any]):
+            if self.event_log: self.event_log.append(KIND_AGENT, agent_id, state)
+            emit_agent_update(agent_id, state)
+        def emit_task_update_logged(task_id: str, task_data: Dict[str, Any]):
+            if self.event_log: self.event_log.append(KIND_TASK, task_id, task_data)
+            emit_task_update(task_id, task_data)
+        def emit_final_output_logged(output: str, success: bool):
+            if self.event_log: self.event_log.append(KIND_FINAL, output, success)
+            emit_final_output(output, success)
+        self.emit_agent_update = emit_agent_update_logged
+        self.emit_task_update = emit_task_update_logged
         self.request_user_input = request_user_input
-        self.emit_final_output = emit_final_output
+        self.emit_final_output = emit_final_output_logged
         # Register callback for all initialized agents
         for agent_id, agent in self.agents.items():
              if hasattr(agent, 'register_state_update_callback'):
@@ -221,23 +305,22 @@ class WorkflowManager:
                   logger.warning(f"Agent {agent_id} does not have 'register_state_update_callback' method.")
         logger.info("WebSocket callbacks registered.")
 
-    def _handle_agent_state_change(self, agent_id: str, state: Dict[str, Any]):
-        """Callback triggered when an agent's internal state changes."""
+    def _handle_agent_state_change(self, agent_id: str, changes: Dict[str, Any]):
+        """Callback triggered when an agent's internal state changes. Receives only the changed keys."""
         agent = self.agents.get(agent_id)
+        if agent and self.run_id and ('status' in changes or 'current_action' in changes):
+            self.run_db.record_agent_event(self.run_id, agent_id, agent.role, agent.get_state('status'), agent.get_state('current_action'))
         if not agent or not self.emit_agent_update:
              # Log if agent not found, maybe it failed initialization?
              if not agent: logger.warning(f"State change received for unknown agent_id: {agent_id}")
              return
 
-        # --- Send state update to frontend ---
-        state_with_pos = state.copy()
-        current_pos_backend = agent.get_state('position', agent.initial_position) 
-        state_with_pos['position'] = current_pos_backend
-        state_with_pos['role'] = agent.role 
-        self.emit_agent_update(agent_id, state_with_pos)
+        # --- Send state delta to the state-sync layer (non-blocking, coalesced per frame) ---
+        self.emit_agent_update(agent_id, changes)
 
         # --- Handle Movement Simulation ---
-        status = state.get('status')
+        current_pos_backend = agent.get_state('position', agent.initial_position)
+        status = agent.get_state('status')
         if status == 'moving_to_zone':
             current_target_pos = agent.get_state('target_position') 
             if not current_target_pos: # Should not happen if moving
@@ -248,7 +331,7 @@ class WorkflowManager:
             if agent.internal_state.get('_movement_in_progress_to') != current_target_pos:
                 distance = math.dist(current_pos_backend, current_target_pos)
                 travel_time = max(0.5, distance / AGENT_SPEED if AGENT_SPEED > 0 else 0.5) # Min 0.5 sec travel
-                target_zone_name = state.get('target_zone', 'Unknown Zone')
+                target_zone_name = agent.get_state('target_zone') or 'Unknown Zone'
                 logger.info(f"Agent {agent_id} started move to {target_zone_name} at {current_target_pos}. Est. Time: {travel_time:.2f}s")
                 agent.internal_state['_movement_in_progress_to'] = current_target_pos
 
@@ -263,107 +346,161 @@ class WorkflowManager:
                         await self._send_arrival_message(agent_id_to_notify, zone_to_arrive)
                     else: logger.debug(f"Agent {agent_id_to_notify}'s move to {zone_to_arrive} cancelled or agent removed.")
 
-                self.loop.create_task(delayed_arrival_sender(travel_time, agent_id, target_zone_name, current_target_pos))
+                self._spawn_background(delayed_arrival_sender(travel_time, agent_id, target_zone_name, current_target_pos))
 
     async def _send_arrival_message(self, agent_id: str, zone_name: str):
         """Sends an internal message to the agent confirming arrival."""
-        arrival_message = {'sender_id': 'workflow_manager', 'recipient_id': agent_id, 'content': {'type': 'arrived_at_zone', 'zone_name': zone_name}}
+        arrival_message = Message(MANAGER_ID, agent_id, {'type': 'arrived_at_zone', 'zone_name': zone_name})
         try: await self._route_message(arrival_message)
         except Exception as e: logger.error(f"Error routing arrival message for {agent_id} to {zone_name}: {e}", exc_info=True)
 
-    async def _route_message(self, message: Dict[str, Any]):
-        """Routes messages between agents or to the manager."""
-        recipient_id = message.get('recipient_id'); sender_id = message.get('sender_id')
-        content_type = message.get('content', {}).get('type', 'unknown'); logger.debug(f"Routing message from {sender_id} to {recipient_id}. Type: {content_type}")
-        if recipient_id == 'workflow_manager':
-             if self.loop == asyncio.get_running_loop(): self.loop.create_task(self._handle_manager_message(sender_id, message.get('content', {})))
-             else: asyncio.run_coroutine_threadsafe(self._handle_manager_message(sender_id, message.get('content', {})), self.loop)
-        elif recipient_id in self.agent_message_queues:
-             try: await self.agent_message_queues[recipient_id].put(message)
-             except Exception as e: logger.error(f"Error adding message to {recipient_id}'s queue: {e}", exc_info=True)
-        else: logger.warning(f"Cannot route message: Unknown recipient_id '{recipient_id}' from sender '{sender_id}'")
+    async def _route_message(self, message: Message):
+        """Routes messages between agents or to the manager via the message bus."""
+        if self.event_log: self.event_log.append(KIND_MESSAGE, message.sender_id, message.recipient_id, message.content)
+        inner = unwrap_agent_message(message.content)
+        if isinstance(inner, dict) and inner.get('type') in RECORDED_MESSAGE_TYPES and self.run_id:
+            self.run_db.record_event(self.run_id, inner['type'], message.sender_id, inner.get('source_task_id'), inner.get('original_code_task_id'))
+        if isinstance(inner, dict) and inner.get('type') == 'task_dependency_ready' and self.run_id: self._record_reusable_artifact(inner)
+        if message.recipient_id != MANAGER_ID and message.recipient_id not in self.agents: self._ensure_agent(message.recipient_id)
+        await self.message_bus.publish(message)
+
+    async def _dispatch_manager_message(self, message: Message):
+        """Bus callback for manager-bound messages (runs on the bus worker pool)."""
+        await self._handle_manager_message(message.sender_id, message.content)
 
     async def _handle_manager_message(self, sender_id: str, content: Dict[str, Any]):
         """Handles messages directed to the WorkflowManager."""
         msg_type = content.get('type'); logger.info(f"Manager handling message type '{msg_type}' from agent {sender_id}.")
         agent_instance = self.agents.get(sender_id); agent_role = agent_instance.role if agent_instance else "UnknownRole" 
-        try:
-            if msg_type == 'request_tool_use':
-                tool_name = content.get('tool_name'); params = content.get('parameters', {}); task_id = content.get('task_id')
-                tool_result = await self._execute_backend_tool(sender_id, agent_role, tool_name, params, task_id)
-                response_message = {'sender_id': 'workflow_manager', 'recipient_id': sender_id, 'content': { 'type': 'tool_result', 'tool_name': tool_name, **tool_result } }
-                await self._route_message(response_message)
-            elif msg_type == 'task_completion_update':
-                task_id = content.get('task_id'); status = content.get('status'); result = content.get('result')
-                if task_id and task_id in self.tasks:
-                    task = self.tasks[task_id]; task.update_status(status); task.result = result 
-                    logger.info(f"Task {task_id} ('{task.description[:30]}...') updated to status: {status} by agent {sender_id}.") 
-                    if status in ['completed', 'failed']: self.completed_task_ids.add(task_id)
-                    if self.emit_task_update: self.emit_task_update(task_id, task.to_dict()) 
-                else: logger.warning(f"Received completion update for unknown/missing task_id: {task_id}")
-            elif msg_type == 'delegate_sub_tasks': await self._delegate_tasks_from_ceo(content.get('tasks_to_delegate', []))
-            elif msg_type == 'request_user_input':
-                 if self.request_user_input:
-                     task_id = content.get('originating_task_id'); question = content.get('question')
-                     if task_id and task_id in self.tasks: self.tasks[task_id].update_status('waiting_user_input'); #[cite: uploaded:SoftwareSim3d/src/simulation/task.py]
-                     if self.emit_task_update: self.emit_task_update(task_id, self.tasks[task_id].to_dict()) #[cite: uploaded:SoftwareSim3d/src/simulation/task.py]
-                     self.request_user_input(task_id, question)
-                 else: logger.error("Cannot forward user input request: UI callback not registered.")
-            elif msg_type == 'request_ceo_evaluation': await self._create_ceo_evaluation_task(sender_id, content.get('triggering_task_id'), content.get('result_info'))
-            elif msg_type == 'ui_simulation_end':
-                 if self.emit_final_output:
-                      success = content.get('success', False); message = content.get('message', 'Simulation ended.')
-                      logger.info(f"Received simulation end signal from {sender_id}. Success: {success}. Message: {message}")
-                      self.simulation_complete = True; self.simulation_success = success; self.final_output = message
-                 else: logger.error("Cannot forward simulation end signal: UI callback not registered.")
-            else: logger.warning(f"WorkflowManager received unhandled message type '{msg_type}' from {sender_id}.")
+        handler = self._manager_message_handlers.get(msg_type)
+        if not handler: logger.warning(f"WorkflowManager received unhandled message type '{msg_type}' from {sender_id}."); return
+        try: await handler(sender_id, agent_role, content)
         except Exception as e: logger.error(f"Error handling manager message from {sender_id} (type {msg_type}): {e}", exc_info=True)
 
-    async def _delegate_tasks_from_ceo(self, delegation_list: List[Dict]):
+    async def _on_request_tool_use(self, sender_id: str, agent_role: str, content: Dict[str, Any]):
+        tool_name = content.get('tool_name'); params = content.get('parameters', {}); task_id = content.get('task_id')
+        tool_result = await self._execute_backend_tool(sender_id, agent_role, tool_name, params, task_id)
+        tool_result['type'] = 'tool_result'; tool_result['tool_name'] = tool_name # Reuse the result dict as message content
+        await self._route_message(Message(MANAGER_ID, sender_id, tool_result))
+
+    async def _on_request_tool_batch(self, sender_id: str, agent_role: str, content: Dict[str, Any]):
+        """Runs a zone visit's queued tool operations concurrently; one 'tool_batch_result' carries the results in request order."""
+        operations = [op for op in content.get('operations') or [] if isinstance(op, dict)]
+        results = await asyncio.gather(*(self._execute_backend_tool(sender_id, agent_role, op.get('tool_name'), op.get('parameters') or {}, op.get('task_id') or content.get('task_id'))
+                                         for op in operations))
+        for op, result in zip(operations, results): # Echo what was asked (minus content) so agents can match results to their operations
+            result.update({'tool_name': op.get('tool_name'), 'task_id': op.get('task_id'), 'request': {key: value for key, value in (op.get('parameters') or {}).items() if key != 'content'}})
+        logger.info(f"Tool batch for {sender_id}: {sum(result['status'] == 'success' for result in results)}/{len(results)} operation(s) succeeded.")
+        await self._route_message(Message(MANAGER_ID, sender_id, {'type': 'tool_batch_result', 'results': list(results), 'task_id': content.get('task_id')}))
+
+    async def _on_task_completion_update(self, sender_id: str, agent_role: str, content: Dict[str, Any]):
+        task_id = content.get('task_id'); status = content.get('status'); result = content.get('result')
+        if task_id and task_id in self.tasks:
+            if isinstance(result, str) and len(result) > INLINE_RESULT_MAX_CHARS: result = self.artifact_store.put(result, kind='task_result')
+            task = self.tasks[task_id]; task.result = result; task.update_status(status) # Result first: dependents receive it on completion
+            if status in ('completed', 'failed'): self.context_archive.note_finished(sender_id, task_id) # Context evicted after the TTL
+            logger.info(f"Task {task_id} ('{task.description[:30]}...') updated to status: {status} by agent {sender_id}.") 
+            if self.emit_task_update: self.emit_task_update(task_id, task.to_summary()) 
+        else: logger.warning(f"Received completion update for unknown/missing task_id: {task_id}")
+
+    async def _on_delegate_sub_tasks(self, sender_id: str, agent_role: str, content: Dict[str, Any]):
+        if content.get('decomposition') and self.run_id: self.reuse_index.record(self.run_id, 'decomposition', content['decomposition'])
+        await self._delegate_tasks_from_ceo(sender_id, content.get('tasks_to_delegate', []))
+
+    async def _on_request_user_input(self, sender_id: str, agent_role: str, content: Dict[str, Any]):
+        if not self.request_user_input: logger.error("Cannot forward user input request: UI callback not registered."); return
+        task_id = content.get('originating_task_id'); question = content.get('question')
+        if task_id and task_id in self.tasks:
+            self.tasks[task_id].update_status('waiting_user_input') #[cite: uploaded:SoftwareSim3d/src/simulation/task.py]
+            if self.emit_task_update: self.emit_task_update(task_id, self.tasks[task_id].to_summary()) #[cite: uploaded:SoftwareSim3d/src/simulation/task.py]
+        self.request_user_input(task_id, question)
+
+    async def _on_request_ceo_evaluation(self, sender_id: str, agent_role: str, content: Dict[str, Any]):
+        await self._create_ceo_evaluation_task(sender_id, content.get('triggering_task_id'), content.get('result_info'))
+
+    async def _on_simulation_end(self, sender_id: str, agent_role: str, content: Dict[str, Any]):
+        if not self.emit_final_output: logger.error("Cannot forward simulation end signal: UI callback not registered."); return
+        success = content.get('success', False); message = content.get('message', 'Simulation ended.')
+        logger.info(f"Received simulation end signal from {sender_id}. Success: {success}. Message: {message}")
+        self.simulation_complete = True; self.simulation_success = success; self.final_output = message
+        if self.run_id: (self.reuse_index.commit if success else self.reuse_index.discard)(self.run_id)
+
+    async def _delegate_tasks_from_ceo(self, sender_id: str, delegation_list: List[Dict]):
          """Creates and assigns tasks based on CEO's delegation request."""
          logger.info(f"Manager received request to delegate {len(delegation_list)} tasks from CEO.")
+         created = []
          for item in delegation_list:
               target_agent_id = item.get('target_agent_id'); task_data = item.get('task_data'); assigned_role = task_data.get('assigned_to_role')
-              if not target_agent_id or not task_data or target_agent_id not in self.agents or not assigned_role: logger.error(f"Skipping invalid delegation item: Target={target_agent_id}, Data={task_data is not None}, Role={assigned_role}"); continue
-              new_task = Task(description=task_data.get('description', '...'), task_type=task_data.get('task_type', 'generic'), details=task_data.get('details', {}), assigned_to_role=assigned_role, originating_task_id=task_data.get('details', {}).get('originating_task_id'))
-              self.tasks[new_task.task_id] = new_task; 
+              if not target_agent_id or not task_data or not self._ensure_agent(target_agent_id) or not assigned_role: logger.error(f"Skipping invalid delegation item: Target={target_agent_id}, Data={task_data is not None}, Role={assigned_role}"); continue
+              new_task = Task(description=task_data.get('description', '...'), task_type=task_data.get('task_type', 'generic'), details=self._with_deadline(task_data.get('details', {})), assigned_to_role=assigned_role, originating_task_id=task_data.get('details', {}).get('originating_task_id'))
+              self.tasks.add(new_task); created.append((item, target_agent_id, new_task))
               logger.info(f"Created new task {new_task.task_id} for {assigned_role} ({target_agent_id}): '{new_task.description[:40]}...'") 
-              task_message = {'sender_id': 'workflow_manager', 'recipient_id': target_agent_id, 'content': {'type': 'new_task', 'task_data': new_task.to_dict()}} 
+         self._link_pipeline_dependencies([task for _, _, task in created])
+         for item, target_agent_id, new_task in created:
+              task_message = Message(MANAGER_ID, target_agent_id, {'type': 'new_task', 'task_data': new_task.to_dict()})
               await self._route_message(task_message)
-              if self.emit_task_update: self.emit_task_update(new_task.task_id, new_task.to_dict()) 
+              for follow_up in item.get('follow_up_messages') or []: await self._route_message(Message(sender_id, target_agent_id, follow_up)) # Queued behind the task (e.g. reused specs)
+              if self.emit_task_update: self.emit_task_update(new_task.task_id, new_task.to_summary()) 
+
+    def _link_pipeline_dependencies(self, batch: List[Task]):
+        """Registers the pipeline's real prerequisite edges within one delegation (strategy -> specifications -> code)."""
+        for task in batch:
+            prerequisite_type, dep_name = PIPELINE_PREREQUISITES.get(task.task_type, (None, None))
+            prerequisites = [other for other in batch if other.task_type == prerequisite_type]
+            for prerequisite in prerequisites: # Skipped (reused) stages have no task and add no edge
+                self.tasks.add_dependency(task.task_id, prerequisite.task_id, dep_name if len(prerequisites) == 1 else f"{dep_name}:{prerequisite.task_id}")
+            if task.status == STATUS_PENDING and task.is_waiting_for_dependencies(): task.update_status(STATUS_WAITING_DEPENDENCY)
+
+    # --- Cross-run reuse ---
+    def _lookup_reuse(self, request: Optional[str]) -> Optional[Dict[str, Any]]:
+        """CEO hook: a past run's upstream artifacts for a similar request, with mode 'skip' (specs reusable) or 'seed'."""
+        if not self.reuse_enabled or not request: return None
+        match = self.reuse_index.lookup(request, lambda filename: os.path.isfile(os.path.join(self.base_output_dir, filename)), self.reuse_seed_confidence)
+        if not match: return None
+        match['mode'] = 'skip' if match['confidence'] >= self.reuse_skip_confidence and match['specifications'] else 'seed'
+        logger.info(f"Reuse match for '{request[:50]}': run {match['run_id']} ('{match['request'][:50]}'), confidence {match['confidence']}, mode '{match['mode']}'.")
+        return match
+
+    def _record_reusable_artifact(self, message_data: Dict[str, Any]):
+        dependency_type = message_data.get('dependency_type'); filename = message_data.get('saved_filename')
+        if not filename: return
+        if dependency_type == 'marketing_strategy': self.reuse_index.record(self.run_id, dependency_type, filename)
+        elif dependency_type == 'specifications': self.reuse_index.record(self.run_id, dependency_type, filename, page_name=(message_data.get('details') or {}).get('page_name', 'main_page'))
 
     async def _create_ceo_evaluation_task(self, triggering_agent_id: str, triggering_task_id: Optional[str], result_info: Optional[str]):
         """Creates a task for the CEO to evaluate progress."""
-        ceo_agent = next((a for a in self.agents.values() if isinstance(a, CEOAgent)), None) 
+        ceo_agent = self.get_agent_for_role("CEO")
         if not ceo_agent: logger.error("Cannot create evaluation task: CEO agent not found."); return
         project_saved_outputs = { tid: os.path.basename(path) for tid, path in self.saved_outputs.items() if tid in self.tasks }
         original_request = "[Original request unavailable]"
         if triggering_task_id and triggering_task_id in self.tasks: original_request = self.tasks[triggering_task_id].details.get('original_request', original_request) 
-        else: first_task = next(iter(self.tasks.values()), None); original_request = first_task.details.get('original_request', original_request) if first_task else original_request 
+        else: first_task = self.tasks.first(); original_request = first_task.details.get('original_request', original_request) if first_task else original_request 
         eval_details = {'user_request': original_request, 'project_name': self.project_name, 'saved_outputs': project_saved_outputs, 'triggering_agent_id': triggering_agent_id, 'triggering_task_id': triggering_task_id, 'last_output_info': result_info}
-        eval_task = Task(description=f"Evaluate project progress for '{self.project_name}' triggered by {triggering_agent_id}", task_type="evaluate_progress", details=eval_details, assigned_to_role="CEO") 
-        self.tasks[eval_task.task_id] = eval_task; 
+        eval_task = Task(description=f"Evaluate project progress for '{self.project_name}' triggered by {triggering_agent_id}", task_type="evaluate_progress", details=self._with_deadline(eval_details), assigned_to_role="CEO") 
+        self.tasks.add(eval_task)
         logger.info(f"Created CEO evaluation task {eval_task.task_id}") 
-        task_message = {'sender_id': 'workflow_manager', 'recipient_id': ceo_agent.agent_id, 'content': {'type': 'new_task', 'task_data': eval_task.to_dict()}} 
+        task_message = Message(MANAGER_ID, ceo_agent.agent_id, {'type': 'new_task', 'task_data': eval_task.to_dict()})
         await self._route_message(task_message)
-        if self.emit_task_update: self.emit_task_update(eval_task.task_id, eval_task.to_dict()) #[cite: uploaded:SoftwareSim3d/src/simulation/task.py]
+        if self.emit_task_update: self.emit_task_update(eval_task.task_id, eval_task.to_summary()) #[cite: uploaded:SoftwareSim3d/src/simulation/task.py]
 
     async def _execute_backend_tool(self, agent_id: str, agent_role: str, tool_name: str, params: Dict[str, Any], task_id: Optional[str]) -> Dict[str, Any]:
         """Executes backend tools like file I/O or simulated search."""
         logger.info(f"Executing tool '{tool_name}' for agent {agent_id} ({agent_role}). Task context: {task_id or 'N/A'}")
         result = {'status': 'error', 'result': f'Unknown tool: {tool_name}'}
+        started_at = time.time(); started = time.monotonic()
         try:
-            if tool_name == 'file_write': result = self._tool_file_write(agent_id, agent_role, params.get('filename'), params.get('content'), task_id)
-            elif tool_name == 'file_read': result = self._tool_file_read(agent_id, params.get('filename'))
+            if tool_name == 'file_write': result = await self._tool_file_write(agent_id, agent_role, params.get('filename'), self.artifact_store.resolve(params.get('content')), task_id)
+            elif tool_name == 'file_read': result = await self._tool_file_read(agent_id, params.get('filename'))
             elif tool_name == 'internet_search': result = await self._tool_internet_search(params.get('query'))
             else: logger.error(f"Agent {agent_id} requested unknown tool: {tool_name}")
         except SecurityException as se: logger.error(f"Security error executing tool '{tool_name}' for {agent_id}: {se}"); result = {'status': 'error', 'result': f"Security error: {se}"}
         except Exception as e: logger.error(f"Error executing tool '{tool_name}' for {agent_id}: {e}", exc_info=True); result = {'status': 'error', 'result': f"Tool exception: {e}"}
         if 'status' not in result: result['status'] = 'error'
         if 'result' not in result: result['result'] = "Unknown tool error."
+        if self.run_id: self.run_db.record_tool_call(self.run_id, agent_id, task_id, tool_name, result['status'], started_at, time.monotonic() - started)
         return result
 
-    def _tool_file_write(self, sender_id: str, sender_role: str, relative_filename: Optional[str], content: Optional[str], task_id: Optional[str]) -> Dict[str, Any]:
+    async def _tool_file_write(self, sender_id: str, sender_role: str, relative_filename: Optional[str], content: Optional[str], task_id: Optional[str]) -> Dict[str, Any]:
         """Handles the file_write tool execution with flexible path handling."""
         if not relative_filename or content is None:
             return {'status': 'error', 'result': 'Missing filename or content.'}
@@ -380,7 +517,6 @@ class WorkflowManager:
             # The agent is now responsible for providing the full desired relative path structure
             # e.g., "MyProject/about.html" or "MyProject/css/style.css"
             output_path = os.path.join(self.base_output_dir, *path_parts)
-            full_dir = os.path.dirname(output_path)
             safe_basename = os.path.basename(output_path) # Already sanitized as part of path_parts
 
             if not safe_basename:
@@ -393,15 +529,13 @@ class WorkflowManager:
                 raise SecurityException(f"Path traversal attempt detected: '{relative_filename}' resolved to '{abs_output_path}' which is outside base '{abs_base_output_dir}'")
             # --- End Security Check ---
 
-            # Create directories if they don't exist
-            os.makedirs(full_dir, exist_ok=True)
             logger.info(f"Writing file requested by {sender_id}: {abs_output_path}")
 
-            # Write the file content
-            with open(abs_output_path, 'w', encoding='utf-8') as f:
-                f.write(content)
+            # Directories are created and the file is written atomically on the I/O pool
+            await self.file_io.write_text(abs_output_path, content)
 
             logger.info(f"File written by {sender_id}: {abs_output_path}")
+            if self.search_enabled: self.search_index.add_document(abs_output_path, content) # Reports and specs are searchable right away
 
             # Store the absolute path if needed, keyed by task ID
             if task_id:
@@ -426,7 +560,7 @@ class WorkflowManager:
             return {'status': 'error', 'result': f"Write error: {e}"}
 
         
-    def _tool_file_read(self, agent_id: str, relative_filename: Optional[str]) -> Dict[str, Any]:
+    async def _tool_file_read(self, agent_id: str, relative_filename: Optional[str]) -> Dict[str, Any]:
         """Handles the file_read tool execution with robust path handling."""
         if not relative_filename: return {'status': 'error', 'result': 'Missing filename.'}
         try:
@@ -434,57 +568,85 @@ class WorkflowManager:
             if not path_parts: raise ValueError("Invalid relative filename.")
             input_path = os.path.join(self.base_output_dir, *path_parts)
             if not os.path.abspath(input_path).startswith(os.path.abspath(self.base_output_dir)): raise SecurityException(f"Path traversal attempt: {input_path}")
-            if not os.path.exists(input_path) or not os.path.isfile(input_path): logger.warning(f"File not found for read by {agent_id}: {input_path}"); return {'status': 'error', 'result': f'File not found: {relative_filename}'}
             logger.debug(f"Reading file: {input_path}")
-            with open(input_path, 'r', encoding='utf-8') as f: content = f.read()
+            content = await self.file_io.read_text(os.path.abspath(input_path)) # Served from cache if written this run
+            if content is None: logger.warning(f"File not found for read by {agent_id}: {input_path}"); return {'status': 'error', 'result': f'File not found: {relative_filename}'}
             logger.info(f"File read by {agent_id}: {input_path}")
-            return { 'status': 'success', 'result': 'File read.', 'content': content, 'filename': relative_filename }
+            # Reply with a handle; the reader resolves it when it builds its prompt
+            return { 'status': 'success', 'result': 'File read.', 'content': self.artifact_store.put(content, kind='file'), 'filename': relative_filename }
         except SecurityException as se: logger.error(f"Security error reading '{relative_filename}' for {agent_id}: {se}"); return {'status': 'error', 'result': f"Security error: {se}"}
         except Exception as e: logger.error(f"File read failed '{relative_filename}' for {agent_id}: {e}", exc_info=True); return {'status': 'error', 'result': f"Read error: {e}"}
 
     async def _tool_internet_search(self, query: Optional[str]) -> Dict[str, Any]:
-        """Handles the internet_search tool execution."""
+        """Handles the internet_search tool execution with the offline search index (no network access)."""
         if not query: return {'status': 'error', 'result': 'Missing query.'}
-        logger.warning("Simulating internet search failure for query: %s", query)
-        await asyncio.sleep(1.0)
-        return { 'status': 'error', 'result': 'Internet search feature currently unavailable.' }
+        if not self.search_enabled: return { 'status': 'error', 'result': 'Internet search feature currently unavailable.' }
+        started = time.perf_counter()
+        try: results = await asyncio.wrap_future(self.file_io.submit(self.search_index.search, query, self.search_top_k)) # Snippets are read from disk
+        except Exception as e: logger.error(f"Local search failed for '{query[:60]}': {e}", exc_info=True); return {'status': 'error', 'result': f"Search error: {e}"}
+        logger.info(f"Local search for '{query[:60]}': {len(results)} result(s) in {(time.perf_counter() - started) * 1000:.1f} ms.")
+        if not results: return {'status': 'error', 'result': f"No local documents match '{query[:60]}'."}
+        return {'status': 'success', 'result': f"{len(results)} result(s) from the local library.", 'content': format_results(results)}
+
+    def _refresh_search_index(self):
+        """Picks up new, changed and deleted documents on the I/O pool."""
+        def on_done(future):
+            if future.exception() is not None: logger.error(f"Search index refresh failed: {future.exception()}")
+        self.file_io.submit(self.search_index.refresh).add_done_callback(on_done)
 
     # --- Simulation Lifecycle ---
-    async def start_simulation(self, user_request: str):
-        """Starts the simulation workflow."""
+    async def start_simulation(self, user_request: str, sla_s: Optional[float] = None):
+        """Starts the simulation workflow. sla_s: the run's deadline in seconds (default RUN_SLA_S; <= 0 for none)."""
         logger.info(f"Starting simulation with request: '{user_request}'")
-        self.current_iteration = 0; self.simulation_complete = False; self.simulation_success = None; self.tasks = {}; self.completed_task_ids = set(); self.saved_outputs = {} #[cite: uploaded:SoftwareSim3d/src/simulation/task.py]
+        self._set_deadline(self.run_sla_s if sla_s is None else sla_s)
+        self.current_iteration = 0; self.simulation_complete = False; self.simulation_success = None; self.tasks.clear(); self.saved_outputs = {} #[cite: uploaded:SoftwareSim3d/src/simulation/task.py]
+        self.message_bus.drain(); self.message_bus.start(); self.file_io.clear_cache()
+        self.user_request = user_request; self._open_checkpoint_writer(new_run_id()); self.context_archive.reset(self.run_id); self._open_event_log(self.run_id)
+        self.reuse_index.begin(self.run_id, user_request)
+        if self.search_enabled: self._refresh_search_index() # Reference folders may have changed since the last run
         sanitized_req = self._sanitize_filename(user_request); self.project_name = "_".join(sanitized_req.split('_')[:5])[:40] if sanitized_req else "sim_project"; self.project_name = self.project_name or "sim_project"; logger.info(f"Derived project name: '{self.project_name}'")
+        self.run_db.record_run_start(self.run_id, self.project_name, user_request, self.llm_agent_configs)
+        self._start_llm_preflight()
 
-        # Reset and start all agents
+        # Reset and start all built agents (the others start when they are built)
+        self._agents_started = True
         for agent_id, agent in self.agents.items():
-            agent.current_task = None; agent.task_context = {}; #[cite: uploaded:SoftwareSim3d/src/agent_base.py] #[cite: uploaded:SoftwareSim3d/src/agent_base.py]
-            agent.update_state({'status': 'idle', 'position': agent.initial_position, 'target_position': agent.target_desk_position, 'current_zone': None, 'target_zone': None, 'current_action': None, 'current_idle_sub_state': None, 'last_error': None, 'progress': 0.0}, trigger_callback=False) #[cite: uploaded:SoftwareSim3d/src/agent_base.py]
-            if self.emit_agent_update: initial_state = agent.internal_state.copy(); initial_state['position'] = agent.initial_position; initial_state['role'] = agent.role; self.emit_agent_update(agent_id, initial_state) #[cite: uploaded:SoftwareSim3d/src/agent_base.py] #[cite: uploaded:SoftwareSim3d/src/agent_base.py] #[cite: uploaded:SoftwareSim3d/src/agent_base.py]
+            agent.reset_for_run() #[cite: uploaded:SoftwareSim3d/src/agent_base.py]
+            if self.emit_agent_update: self.emit_agent_update(agent_id, agent.get_public_state()) #[cite: uploaded:SoftwareSim3d/src/agent_base.py]
             agent.start() #[cite: uploaded:SoftwareSim3d/src/agent_base.py]
         await asyncio.sleep(0.1)
 
         # Send initial request to Messenger
-        messenger = next((a for a in self.agents.values() if isinstance(a, MessengerAgent)), None) #[cite: uploaded:SoftwareSim3d/src/agents/messenger_agent.py]
+        messenger = self.get_agent_for_role("Messenger")
         if messenger:
-            initial_message = {'sender_id': 'user_interface', 'recipient_id': messenger.agent_id, 'content': {'type': 'user_request', 'request': user_request, 'project_name': self.project_name}}
+            initial_message = Message('user_interface', messenger.agent_id, {'type': 'user_request', 'request': user_request, 'project_name': self.project_name})
             await self._route_message(initial_message); logger.info(f"Initial request sent to Messenger ({messenger.agent_id}).")
         else:
             logger.error("Cannot start simulation: Messenger agent not found."); self.simulation_complete = True; self.simulation_success = False; self.final_output = "Error: Messenger agent not found."
             if self.emit_final_output: self.emit_final_output(self.final_output, self.simulation_success); await self.stop_simulation(); return
 
-        # Main Simulation Loop
+        await self._run_until_complete()
+
+    async def _run_until_complete(self):
+        """Main simulation loop (shared by fresh runs and resumed runs)."""
         iteration_log_interval = 20
+        last_checkpoint_time = time.monotonic()
         while not self.simulation_complete and self.current_iteration < self.max_iterations:
             self.current_iteration += 1
+            if self.checkpoint_interval_s > 0 and time.monotonic() - last_checkpoint_time >= self.checkpoint_interval_s:
+                self._capture_checkpoint(); last_checkpoint_time = time.monotonic()
+            self.context_archive.sweep(self.agents)
+            if self.deadline.enabled and self.deadline.level() == LEVEL_EXPIRED: self._end_at_deadline(); break
             
             # Log agent and task status periodically
             if self.current_iteration % iteration_log_interval == 0:
                 logger.info(f"Sim Iteration: {self.current_iteration}/{self.max_iterations}")
                 
                 # Log active tasks
-                active_tasks = [t for t in self.tasks.values() if t.status not in ['completed', 'failed']]
-                logger.info(f"Active tasks: {len(active_tasks)}")
+                logger.info(f"Active tasks: {len(self.tasks) - len(self.tasks.terminal_ids())} ({self.tasks.stats_snapshot()['by_status']})")
+                self.message_bus.log_stats()
+                self._enforce_memory_cap()
+                self._reclaim_idle_agents()
                 
                 # Log agent statuses (helps debug stalls)
                 for agent_id, agent in self.agents.items():
@@ -499,28 +661,191 @@ class WorkflowManager:
         if not self.simulation_complete: logger.warning(f"Sim stopped: Max iterations ({self.max_iterations}) reached."); self.simulation_complete = True; self.simulation_success = False; self.final_output = f"Stopped after {self.max_iterations} iterations."
         if self.emit_final_output and self.final_output is not None: logger.info(f"Emitting final output. Success: {self.simulation_success}"); self.emit_final_output(self.final_output, self.simulation_success is True)
         logger.info(f"Simulation Logic Ended (Project: {self.project_name}). Cleaning up...")
+        self._capture_checkpoint(force=True)
+        self.run_db.record_run_end(self.run_id, self.simulation_success, self.final_output, self.current_iteration)
         await self.stop_simulation()
 
+    def _end_at_deadline(self):
+        """The SLA ran out: end the run now with whatever outputs were saved (agents degraded before this point)."""
+        saved = sorted(os.path.basename(path) for path in self.saved_outputs.values())
+        logger.warning(f"Run '{self.run_id}' reached its {self.deadline.sla_s:.0f}s deadline with {len(saved)} saved output(s).")
+        self.simulation_complete = True; self.simulation_success = False
+        self.final_output = f"Run deadline ({self.deadline.sla_s:.0f}s) reached. Saved outputs: {', '.join(saved) if saved else 'none'}."
+
+    # --- Checkpoint / Resume ---
+    def _open_checkpoint_writer(self, run_id: str):
+        self.run_id = run_id
+        self.checkpoint_writer = CheckpointWriter(CHECKPOINT_ROOT_DIR, run_id, self.file_io.submit) if self.checkpoint_interval_s > 0 else None
+        logger.info(f"Run id: {run_id} (checkpoints {'every ' + str(self.checkpoint_interval_s) + 's' if self.checkpoint_writer else 'disabled'}).")
+
+    def _open_event_log(self, run_id: str):
+        if self.event_log: self.event_log.close(timeout=2.0) # Previous run on this manager; normally already closed
+        self.event_log = EventLog(EVENT_LOG_ROOT_DIR, run_id) if self.event_log_enabled else None
+
+    def _capture_checkpoint(self, force: bool = False):
+        """Snapshots tasks, manager bookkeeping and every agent's task/context state. Runs on the loop, so the snapshot is consistent."""
+        if not self.checkpoint_writer: return
+        sections: Dict[str, Any] = {
+            'manager': {'saved_outputs': self.saved_outputs, 'final_output': self.final_output, 'simulation_success': self.simulation_success,
+                        'reuse_artifacts': self.reuse_index.pending_artifacts(self.run_id)},
+            'tasks': {task_id: task.to_dict() for task_id, task in self.tasks.items()},
+        }
+        for agent_id, agent in self.agents.items(): sections[f'agent:{agent_id}'] = agent.checkpoint_state()
+        meta = {'user_request': self.user_request, 'project_name': self.project_name, 'current_iteration': self.current_iteration,
+                'simulation_complete': self.simulation_complete, 'llm_agent_configs': self.llm_agent_configs, 'sla_s': self.deadline.sla_s}
+        try:
+            if self.checkpoint_writer.capture(sections, meta, force=force): logger.debug(f"Checkpoint {self.checkpoint_writer.sequence} captured for {self.run_id}.")
+        except Exception as e: logger.error(f"Failed to capture checkpoint for {self.run_id}: {e}", exc_info=True)
+
+    def _set_deadline(self, sla_s: Optional[float]):
+        """Starts the run's deadline clock and hands it to every agent (built later ones get it in _spawn_agent)."""
+        self.deadline = RunDeadline(sla_s)
+        for agent in self.agents.values(): agent.set_deadline(self.deadline)
+        if self.deadline.enabled: logger.info(f"Run deadline: {self.deadline.sla_s:.0f}s.")
+
+    def _with_deadline(self, details: Dict[str, Any]) -> Dict[str, Any]:
+        """Task details carrying the run's deadline, so every task knows how much time the run has."""
+        if self.deadline.enabled: details.setdefault('deadline_at', self.deadline.deadline_at)
+        return details
+
+    async def resume(self, run_id: str, sla_s: Optional[float] = None) -> bool:
+        """Rebuilds tasks and agent state from the last consistent checkpoint of run_id and continues the run (with a fresh deadline of the original SLA unless sla_s is given)."""
+        checkpoint = await self.loop.run_in_executor(None, load_checkpoint, CHECKPOINT_ROOT_DIR, run_id)
+        if not checkpoint:
+            if self.emit_final_output: self.emit_final_output(f"Cannot resume: no usable checkpoint for run '{run_id}'.", False)
+            return False
+        meta = checkpoint['meta']; sections = checkpoint['sections']; manager_state = sections.get('manager', {})
+        logger.info(f"Resuming run '{run_id}' (project '{meta.get('project_name')}', iteration {meta.get('current_iteration')}).")
+        self._set_deadline(meta.get('sla_s') if sla_s is None else sla_s)
+        self.user_request = meta.get('user_request'); self.project_name = meta.get('project_name')
+        self.current_iteration = meta.get('current_iteration', 0); self.simulation_complete = False; self.simulation_success = None; self.final_output = None
+        self.tasks.clear()
+        for data in sections.get('tasks', {}).values(): self.tasks.add(Task.from_dict(data))
+        self.saved_outputs = dict(manager_state.get('saved_outputs', {}))
+        self.message_bus.drain(); self.message_bus.start(); self.file_io.clear_cache()
+        self._open_checkpoint_writer(run_id); self.context_archive.reset(run_id); self._open_event_log(run_id)
+        self.reuse_index.begin(run_id, self.user_request or '', manager_state.get('reuse_artifacts')) # A resumed run that succeeds is reusable too
+        self.run_db.record_run_start(run_id, self.project_name, self.user_request, self.llm_agent_configs) # Counted as a resume
+        self._start_llm_preflight()
+        finished_task_ids = self.tasks.terminal_ids()
+        for agent_id, _ in self.org_chart.planned_agents(): # Agents that had state when the checkpoint was taken
+            if f'agent:{agent_id}' in sections: self._ensure_agent(agent_id)
+        self._agents_started = True
+        for agent_id, agent in list(self.agents.items()):
+            agent.update_state({'status': 'idle', 'position': agent.initial_position, 'target_position': agent.target_desk_position, 'current_zone': None, 'target_zone': None, 'current_action': None, 'current_idle_sub_state': None, 'last_error': None, 'progress': 0.0}, trigger_callback=False)
+            agent.current_task = None; agent.task_context = {}
+            snapshot = sections.get(f'agent:{agent_id}')
+            if snapshot: agent.restore_checkpoint(snapshot)
+            else: logger.warning(f"Checkpoint of run '{run_id}' has no state for agent {agent_id}; starting it idle.")
+            for task_id in finished_task_ids.intersection(agent.task_context): self.context_archive.note_finished(agent_id, task_id)
+            if self.emit_agent_update: self.emit_agent_update(agent_id, agent.get_public_state())
+            agent.start()
+        if self.emit_task_update:
+            for task_id, task in self.tasks.items(): self.emit_task_update(task_id, task.to_summary())
+        await self._run_until_complete()
+        return True
+
     async def handle_user_response(self, originating_task_id: str, user_response: str):
         """Handles clarification responses from the user."""
         logger.info(f"Received user response for task {originating_task_id}: '{user_response[:50]}...'")
-        messenger = next((a for a in self.agents.values() if isinstance(a, MessengerAgent)), None) #[cite: uploaded:SoftwareSim3d/src/agents/messenger_agent.py]
+        messenger = self.get_agent_for_role("Messenger")
         if messenger:
-             response_message = {'sender_id': 'user_interface', 'recipient_id': messenger.agent_id, 'content': {'type': 'user_clarification_response', 'originating_task_id': originating_task_id, 'response': user_response}}
+             response_message = Message('user_interface', messenger.agent_id, {'type': 'user_clarification_response', 'originating_task_id': originating_task_id, 'response': user_response})
              await self._route_message(response_message); logger.info(f"User response forwarded to Messenger ({messenger.agent_id}).")
              if originating_task_id and originating_task_id in self.tasks: task = self.tasks[originating_task_id]; task.update_status('in_progress'); logger.info(f"Task {originating_task_id} status updated to in_progress after user response."); #[cite: uploaded:SoftwareSim3d/src/simulation/task.py] #[cite: uploaded:SoftwareSim3d/src/simulation/task.py]
-             if self.emit_task_update and originating_task_id in self.tasks: self.emit_task_update(originating_task_id, self.tasks[originating_task_id].to_dict()) #[cite: uploaded:SoftwareSim3d/src/simulation/task.py]
+             if self.emit_task_update and originating_task_id in self.tasks: self.emit_task_update(originating_task_id, self.tasks[originating_task_id].to_summary()) #[cite: uploaded:SoftwareSim3d/src/simulation/task.py]
         else: logger.error("Cannot handle user response: Messenger agent not found.")
 
+    # --- Memory Lifecycle ---
+    def memory_report(self) -> Dict[str, Any]:
+        """Approximate per-run memory held by the manager and its agents (bytes are estimates)."""
+        live_contexts = sum(len(agent.task_context) for agent in self.agents.values())
+        context_bytes = sum(estimate_size(agent.task_context) for agent in self.agents.values())
+        artifact_bytes = self.artifact_store.stats_snapshot()['cached_bytes']; file_cache_bytes = self.file_io.stats_snapshot()['cached_bytes']
+        return {'tasks': len(self.tasks), 'task_bytes': estimate_size([task.to_dict() for task in self.tasks.values()]),
+                'live_contexts': live_contexts, 'context_bytes': context_bytes, 'artifact_cache_bytes': artifact_bytes,
+                'file_cache_bytes': file_cache_bytes, 'total_bytes': context_bytes + artifact_bytes + file_cache_bytes,
+                'cap_bytes': self.run_memory_cap_bytes, 'archive': self.context_archive.stats_snapshot()}
+
+    def _enforce_memory_cap(self):
+        """Over the per-run cap: archive every finished context now and drop the read caches."""
+        report = self.memory_report()
+        if report['total_bytes'] <= self.run_memory_cap_bytes: logger.debug(f"Memory report: {report}"); return
+        logger.warning(f"Run memory ~{report['total_bytes'] // 1024} KiB exceeds cap {self.run_memory_cap_bytes // 1024} KiB; evicting. Report: {report}")
+        evicted = self.context_archive.sweep(self.agents, force=True)
+        self.file_io.clear_cache(); self.artifact_store.trim_cache(self.run_memory_cap_bytes // 4)
+        logger.info(f"Memory cap enforcement archived {evicted} context(s); now ~{self.memory_report()['total_bytes'] // 1024} KiB.")
+
+    def dispose(self):
+        """Drops per-run state once the run is over so a finished manager does not pin memory (call after stop_simulation)."""
+        for agent in self.agents.values(): agent.current_task = None; agent.task_context = {}
+        self.tasks.clear(); self.saved_outputs = {}; self.final_output = None
+        self.file_io.clear_cache(); self.artifact_store.trim_cache(0); self.message_bus.drain()
+        logger.info(f"WorkflowManager for run '{self.run_id}' disposed.")
+
+    def reset_for_run(self, llm_agent_configs: Optional[Dict[str, Dict[str, str]]] = None):
+        """
+        Prepares a stopped manager for its next run (warm reuse): per-run state is dropped, built agents are kept
+        and take the new LLM settings. Bus, runtime, file pool, stores and clients stay as they are.
+        """
+        if self._agents_started: raise RuntimeError("reset_for_run() called while a run is active")
+        if llm_agent_configs is not None and llm_agent_configs != self.llm_agent_configs:
+            self.llm_agent_configs = llm_agent_configs
+            for agent_id, agent in self.agents.items():
+                spec = self.org_chart.spec_for_agent(agent_id)
+                if spec: agent.llm_type, agent.llm_model_name = self._llm_settings_for(spec)
+        self.dispose()
+        self.simulation_complete = False; self.simulation_success = None; self.current_iteration = 0
+        self.project_name = None; self.user_request = None; self._idle_since = {}
+        for agent in self.agents.values(): agent.reset_for_run()
+
+    def request_stop(self, reason: str = "Stopped by user."):
+        """Ends the current run at the next loop check; _run_until_complete then stops agents and flushes in the background."""
+        if self.simulation_complete: return
+        logger.info(f"Stop requested for run '{self.run_id}': {reason}")
+        self.simulation_complete = True; self.simulation_success = False; self.final_output = reason
+
+    def _start_llm_preflight(self):
+        """Runs LLMService.preflight() on this loop in the background: it overlaps the first agent walks and never raises."""
+        if not self.llm_preflight or (self._preflight_task is not None and not self._preflight_task.done()): return
+        self._preflight_task = self._spawn_background(self.llm_service.preflight())
+
+    def _spawn_background(self, coro: Awaitable[Any]) -> asyncio.Task:
+        """Manager-side fire-and-forget task, tracked so stop_simulation can cancel it."""
+        task = self.loop.create_task(coro)
+        self._background_tasks.add(task); task.add_done_callback(self._background_tasks.discard)
+        return task
+
     async def stop_simulation(self):
-        """Stops all agent tasks gracefully."""
+        """
+        Stops the run top-down: agent turns and their side tasks, in-flight LLM requests (the HTTP/gRPC calls are
+        aborted) and manager timers are cancelled, awaited (bounded), and only then are logs and files flushed.
+        """
         logger.info("Attempting to stop all agents...")
-        for agent in self.agents.values():
-             if hasattr(agent, 'stop'): agent.stop() #[cite: uploaded:SoftwareSim3d/src/agent_base.py]
-        await asyncio.sleep(0.5)
-        join_tasks = [agent.join() for agent_id, agent in self.agents.items() if hasattr(agent, 'join') and agent._main_task_handle] #[cite: uploaded:SoftwareSim3d/src/agent_base.py] #[cite: uploaded:SoftwareSim3d/src/agent_base.py]
-        if join_tasks: logger.info(f"Waiting for {len(join_tasks)} agent tasks to join..."); results = await asyncio.gather(*join_tasks, return_exceptions=True); logger.info("Agent join procedures complete."); # Log results/errors if needed
-        else: logger.info("No active agent tasks found to join.")
+        stop_started = time.perf_counter()
+        self._agents_started = False
+        for agent in self.agents.values(): agent.stop() #[cite: uploaded:SoftwareSim3d/src/agent_base.py]
+        cancelled_llm_calls = self.llm_service.cancel_inflight(self.loop) # Calls made outside agent turns
+        background = [task for task in self._background_tasks if not task.done()]
+        for task in background: task.cancel()
+        await asyncio.gather(*(agent.join() for agent in self.agents.values()), return_exceptions=True)
+        if background:
+            _, still_running = await asyncio.wait(background, timeout=AGENT_JOIN_TIMEOUT_S)
+            if still_running: logger.warning(f"{len(still_running)} manager background task(s) still running after cancellation.")
+        await self.message_bus.stop()
+        logger.info(f"Agents stopped in {(time.perf_counter() - stop_started) * 1000:.0f} ms ({cancelled_llm_calls} LLM request(s) and {len(background)} background task(s) cancelled).")
+        self.message_bus.log_stats()
+        if self.actor_runtime: logger.info(f"Actor runtime stats: {self.actor_runtime.stats_snapshot()}")
+        logger.info(f"LLM scheduler stats: {self.llm_service.scheduler.stats_snapshot()}")
+        logger.info(f"ArtifactStore stats: {self.artifact_store.stats_snapshot()}; file I/O stats: {self.file_io.stats_snapshot()}")
+        if self.search_enabled: self.search_index.save(); logger.info(f"Search index stats: {self.search_index.stats_snapshot()}")
+        logger.info(f"Memory report: {self.memory_report()}")
+        if not await self.loop.run_in_executor(None, self.run_db.flush): logger.warning("Run database flush timed out; remaining rows are written in the background.")
+        logger.info(f"Run database stats: {self.run_db.stats_snapshot()}")
+        if self.event_log: event_log, self.event_log = self.event_log, None; await self.loop.run_in_executor(None, event_log.close)
+        await self.file_io.close() # Flushes pending artifact and checkpoint writes
+        leftover = [task for task in asyncio.all_tasks(self.loop) if task is not asyncio.current_task() and not task.done()]
+        if leftover: logger.info(f"{len(leftover)} task(s) still on the simulation loop after stop: {[task.get_coro().__qualname__ for task in leftover][:10]}")
 
     def _sanitize_filename(self, name: str) -> str:
         """Removes or replaces characters unsafe for filenames/paths."""
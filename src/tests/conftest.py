@@ -0,0 +1,7 @@
+# SoftwareSim3d/tests/conftest.py
+
+import os
+import sys
+
+# The package is imported as `src` from the directory that holds it (see main.py)
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
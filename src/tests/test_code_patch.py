@@ -0,0 +1,73 @@
+# SoftwareSim3d/tests/test_code_patch.py
+
+import pytest
+
+from src.simulation.code_patch import (FIX_MODE_FULL, FIX_MODE_PATCH, NO_CHANGES_MARKER, PatchError, apply_patch, looks_like_patch,
+                                       parse_patch, patch_from_response, wants_patch)
+
+CSS = "body {\n  margin: 0;\n}\nh1 {\n  color: red;\n}\nh2 {\n  color: red;\n}\n"
+
+def block(search: str, replace: str) -> str:
+    return f"<<<<<<< SEARCH\n{search}\n=======\n{replace}\n>>>>>>> REPLACE"
+
+# --- Location ---
+def test_edit_replaces_the_single_match():
+    code, edits = apply_patch(CSS, block("h1 {\n  color: red;", "h1 {\n  color: blue;"))
+    assert edits == 1
+    assert code == CSS.replace("h1 {\n  color: red;", "h1 {\n  color: blue;")
+
+def test_ambiguous_search_is_rejected():
+    with pytest.raises(PatchError, match='matches 2 places'):
+        apply_patch(CSS, block("  color: red;", "  color: blue;"))
+
+def test_missing_search_is_rejected():
+    with pytest.raises(PatchError, match='not found'):
+        apply_patch(CSS, block("h3 {", "h4 {"))
+
+def test_trailing_whitespace_falls_back_to_a_line_match():
+    code, _ = apply_patch("a {   \n  color: red;\n}\n", block("a {\n  color: red;", "a {\n  color: blue;"))
+    assert code == "a {\n  color: blue;\n}\n"
+
+def test_edits_apply_in_order_to_the_edited_code():
+    patch = block("h1 {\n  color: red;", "h1 {\n  color: blue;") + "\n" + block("h2 {\n  color: red;", "h2 {\n  color: green;")
+    code, edits = apply_patch(CSS, patch)
+    assert edits == 2
+    assert "h1 {\n  color: blue;" in code and "h2 {\n  color: green;" in code and "red" not in code
+
+def test_an_edit_made_ambiguous_by_an_earlier_edit_is_rejected():
+    patch = block("h2 {\n  color: red;", "h2 {\n  color: blue;") + "\n" + block("  color: blue;", "  color: green;")
+    with pytest.raises(PatchError):
+        apply_patch(CSS.replace("h1 {\n  color: red;", "h1 {\n  color: blue;"), patch)
+
+def test_empty_search_only_replaces_empty_code():
+    assert apply_patch("", block("", "p {}"))[0] == "p {}"
+    with pytest.raises(PatchError):
+        apply_patch(CSS, block("", "p {}"))
+
+# --- Parsing ---
+def test_unified_diff_hunks_become_edits():
+    diff = "--- a/style.css\n+++ b/style.css\n@@ -4,3 +4,3 @@\n h1 {\n-  color: red;\n+  color: blue;\n }"
+    assert parse_patch(diff) == [("h1 {\n  color: red;\n}", "h1 {\n  color: blue;\n}")]
+    assert "h1 {\n  color: blue;" in apply_patch(CSS, diff)[0]
+
+def test_code_fences_are_ignored():
+    assert apply_patch(CSS, "```css\n" + block("h1 {", "h1.title {") + "\n```")[0].startswith("body {\n  margin: 0;\n}\nh1.title {")
+
+def test_no_changes_marker_is_an_empty_patch():
+    assert apply_patch(CSS, NO_CHANGES_MARKER) == (CSS, 0)
+
+def test_text_without_edits_is_not_a_patch():
+    assert not looks_like_patch("h1 { color: blue; }")
+    with pytest.raises(PatchError):
+        parse_patch("h1 { color: blue; }")
+
+# --- Specialist side ---
+def test_full_component_response_falls_back_to_full_mode():
+    context = {'fix_mode': FIX_MODE_PATCH, 'current_code': CSS}
+    assert wants_patch(context)
+    assert patch_from_response("h1 { color: blue; }", context) is None
+    assert patch_from_response(block("h1 {", "h1.x {"), context) == block("h1 {", "h1.x {")
+
+def test_full_mode_and_missing_code_do_not_want_a_patch():
+    assert not wants_patch({'fix_mode': FIX_MODE_FULL, 'current_code': CSS})
+    assert not wants_patch({'fix_mode': FIX_MODE_PATCH, 'current_code': ''})
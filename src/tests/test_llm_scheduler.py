@@ -0,0 +1,72 @@
+# SoftwareSim3d/tests/test_llm_scheduler.py
+
+import asyncio
+
+from src.llm_integration import llm_scheduler
+from src.llm_integration.llm_scheduler import AGING_PER_S, DEFAULT_LLM_PRIORITY, STAGE_PRIORITY, LLMScheduler, llm_priority
+
+def test_blocked_dependents_outrank_any_stage():
+    assert llm_priority('define_specifications') > llm_priority('generate_html') > llm_priority('review_code')
+    assert llm_priority('review_code', blocking_dependents=1) > llm_priority('decompose_request')
+    assert llm_priority(None) == llm_priority('unknown_type') == DEFAULT_LLM_PRIORITY
+
+async def _run_order(scheduler: LLMScheduler, priorities, clock=None):
+    """Holds the provider's only slot, queues one call per priority (advancing clock between them), then releases."""
+    order = []
+    async def call(name, priority):
+        async with scheduler.slot('p', priority): order.append(name); await asyncio.sleep(0)
+    await scheduler.acquire('p')
+    tasks = []
+    for name, priority in priorities:
+        tasks.append(asyncio.create_task(call(name, priority))); await asyncio.sleep(0)
+        if clock: clock[0] += 10.0
+    scheduler.release('p'); await asyncio.gather(*tasks)
+    return order
+
+def test_free_slot_goes_to_the_highest_priority_waiter():
+    scheduler = LLMScheduler(default_limit=1)
+    order = asyncio.run(_run_order(scheduler, [('review', 30.0), ('specs', 80.0), ('html', 60.0)]))
+    assert order == ['specs', 'html', 'review']
+    assert scheduler.stats_snapshot()['p']['overtakes'] == 2
+
+def test_equal_priorities_are_first_come_first_served():
+    assert asyncio.run(_run_order(LLMScheduler(default_limit=1), [('a', 50.0), ('b', 50.0), ('c', 50.0)])) == ['a', 'b', 'c']
+
+def test_waiting_raises_priority(monkeypatch):
+    clock = [1000.0]; monkeypatch.setattr(llm_scheduler.time, 'monotonic', lambda: clock[0])
+    gap = 10.0 * AGING_PER_S # Priority the first call gains while the second is queued 10s later
+    order = asyncio.run(_run_order(LLMScheduler(default_limit=1), [('old', 40.0), ('newer', 40.0 + gap - 1), ('newest', 40.0 + 2 * gap + 1)], clock))
+    assert order == ['newest', 'old', 'newer']
+
+def test_unlimited_lane_never_queues():
+    async def run():
+        scheduler = LLMScheduler(limits={'p': 0})
+        for _ in range(10): await scheduler.acquire('p')
+        return scheduler.stats_snapshot()['p']
+    stats = asyncio.run(run())
+    assert stats['granted'] == 10 and stats['queued'] == 0
+
+def test_cancelled_waiter_is_skipped():
+    async def run():
+        scheduler = LLMScheduler(default_limit=1); await scheduler.acquire('p')
+        first = asyncio.create_task(scheduler.acquire('p', 90.0)); second = asyncio.create_task(scheduler.acquire('p', 10.0))
+        await asyncio.sleep(0); first.cancel(); await asyncio.sleep(0)
+        scheduler.release('p'); await asyncio.wait_for(second, 1.0)
+        return first.cancelled(), scheduler.stats_snapshot()['p']
+    cancelled, stats = asyncio.run(run())
+    assert cancelled and stats['active'] == 1 and stats['waiting'] == 0
+
+def test_slot_handed_to_a_call_cancelled_at_that_moment_passes_on():
+    async def run():
+        scheduler = LLMScheduler(default_limit=1); await scheduler.acquire('p')
+        first = asyncio.create_task(scheduler.acquire('p', 90.0)); second = asyncio.create_task(scheduler.acquire('p', 10.0))
+        await asyncio.sleep(0)
+        scheduler.release('p'); first.cancel() # The slot was handed over before the cancelled call could run
+        await asyncio.sleep(0); await asyncio.wait_for(second, 1.0)
+        scheduler.release('p')
+        return first.cancelled(), scheduler.stats_snapshot()['p']
+    cancelled, stats = asyncio.run(run())
+    assert cancelled and stats['active'] == 0 and stats['waiting'] == 0
+
+def test_stage_table_covers_the_pipeline():
+    assert {'decompose_request', 'define_specifications', 'generate_html', 'generate_css', 'generate_js', 'review_code'} <= set(STAGE_PRIORITY)
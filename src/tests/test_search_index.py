@@ -0,0 +1,62 @@
+# SoftwareSim3d/tests/test_search_index.py
+
+import concurrent.futures
+import os
+
+import pytest
+
+from src.simulation.search_index import BOILERPLATE_TERMS, MIN_SCORE, SEARCH_INDEX_FILENAME, SearchIndex, tokenize
+
+DOCS = {
+    'bakery/report.md': "# Bakery marketing report\nSourdough bread and pastries for a neighbourhood bakery. Customers want fresh croissants.",
+    'gym/report.md': "# Gym marketing report\nMemberships, personal training and fitness classes for a local gym.",
+    'florist/report.md': "# Florist marketing report\nWedding bouquets and seasonal flowers, delivered the same day.",
+    'bakery/notes.txt': "Opening hours and a croissant recipe for the bakery.",
+}
+
+def submit_inline(fn, *args):
+    future = concurrent.futures.Future(); future.set_result(fn(*args)); return future
+
+@pytest.fixture
+def index(tmp_path):
+    for name, text in DOCS.items():
+        path = tmp_path / name; path.parent.mkdir(parents=True, exist_ok=True); path.write_text(text)
+    search_index = SearchIndex(str(tmp_path / SEARCH_INDEX_FILENAME), submit_inline, [str(tmp_path)])
+    search_index.refresh()
+    return search_index
+
+def test_tokenize_drops_stopwords_and_folds_plurals():
+    assert tokenize("The Strategies for our Pastries and the Reports") == ['strategy', 'our', 'pastry', 'report']
+
+def test_ranks_the_document_about_the_query_first(index):
+    results = index.search("croissants for a bakery")
+    assert [result['path'] for result in results] == ['bakery/notes.txt', 'bakery/report.md']
+    assert results[0]['score'] >= results[1]['score']
+    assert 'croissant' in results[0]['snippet']
+
+def test_boilerplate_terms_alone_never_make_a_match(index):
+    query = "marketing report for my business website"
+    assert all(term in BOILERPLATE_TERMS for term in tokenize(query))
+    assert index.search(query) == []
+
+def test_boilerplate_terms_still_rank_real_matches(index):
+    assert [result['path'] for result in index.search("gym marketing report")] == ['gym/report.md']
+
+def test_a_match_needs_min_score_on_content_terms(index):
+    for result in index.search("wedding flowers"): assert result['score'] >= MIN_SCORE
+    assert index.search("quantum spaceship") == []
+
+def test_results_are_cached_until_the_index_changes(index, tmp_path):
+    first = index.search("flowers")
+    assert index.search("flowers") is first and index.cache_hits == 1
+    path = tmp_path / 'garden' / 'report.md'; path.parent.mkdir(); text = "# Garden centre\nFlowers, seeds and flowers again."
+    path.write_text(text); index.add_document(str(path), text)
+    assert [result['path'] for result in index.search("flowers")][0] == 'garden/report.md'
+
+def test_refresh_drops_deleted_files_and_persists(index, tmp_path):
+    os.remove(tmp_path / 'gym' / 'report.md')
+    assert index.refresh()['removed'] == 1
+    assert index.search("gym") == []
+    reloaded = SearchIndex(str(tmp_path / SEARCH_INDEX_FILENAME), submit_inline, [str(tmp_path)])
+    assert reloaded.stats_snapshot()['documents'] == len(DOCS) - 1
+    assert [result['path'] for result in reloaded.search("wedding bouquets")] == ['florist/report.md']
@@ -0,0 +1,87 @@
+# SoftwareSim3d/tests/test_static_checks.py
+
+import pytest
+
+from src.simulation import static_checks
+from src.simulation.static_checks import CHECK_CLAIMS, StaticCheckReport, _js_scan_errors, check_page, linked_asset_paths
+
+PAGE = ('<!DOCTYPE html><html><head><link rel="stylesheet" href="css/style.css"></head>'
+        '<body><h1 id="title" class="big">Hi</h1><button id="go">Go</button><script src="js/app.js"></script></body></html>')
+ASSETS = {'site/css/style.css': 'h1 { color: blue; }', 'site/js/app.js': "document.getElementById('go').addEventListener('click', () => {});"}
+
+# --- JavaScript scan: regex literal or division ---
+@pytest.mark.parametrize('js', [
+    "const half = total / 2 / count;",
+    "const ratio = (a + b) / (c - d);",
+    "const x = items[0] / 2;",
+    "let i = 0; i++ / 2;",
+    "let i = 0; const y = i-- / 2; const z = /[/]/.test(s);",
+    "const r = a++ / b / c;",
+    "const re = /ab+c/gi; const t = re.test('abc');",
+    "if (/^\\d+$/.test(value)) { count = count / 2; }",
+    "return /[)\\]}]/.test(s);",
+    "const s = `total: ${a / b} and ${/x/.source}`;",
+    "x = y; /* a / comment */ z = 1 / 2;",
+])
+def test_valid_js_has_no_scan_errors(js):
+    assert _js_scan_errors(js, 'JS') == []
+
+def test_prefix_increment_is_followed_by_an_operand_not_a_division():
+    # `++/re/.lastIndex` is unusual, but after a prefix operator a '/' opens a regex literal
+    assert _js_scan_errors("let n = ++/x/.lastIndex;", 'JS') == []
+
+def test_postfix_decrement_then_division_keeps_brackets_balanced():
+    # Read as a regex, '/ 2); x = y /' would swallow the closing parenthesis
+    assert _js_scan_errors("f(a-- / 2); x = y / 3;", 'JS') == []
+
+@pytest.mark.parametrize('js, message', [
+    ("function f() { return 1;", "'{' opened at line 1 is never closed"),
+    ("const s = 'open;", "string opened at line 1 is never closed"),
+    ("const re = /abc;\n", "regular expression at line 1 is never closed"),
+    ("const t = `a ${b`;", "never closed"),
+    ("f(a]);", "does not match"),
+    ("/* never closed", "comment opened at line 1 is never closed"),
+])
+def test_broken_js_is_reported(js, message):
+    errors = _js_scan_errors(js, 'JS')
+    assert any(message in error for error in errors), errors
+
+# --- Page checks ---
+def test_linked_assets_resolve_relative_to_the_page():
+    assert linked_asset_paths(PAGE, 'site/index.html') == ['site/css/style.css', 'site/js/app.js']
+
+def test_clean_page_passes():
+    report = check_page(PAGE, 'site/index.html', ASSETS)
+    assert report.ok and not report.warnings
+    assert report.passed() == report.checks
+
+def test_missing_linked_file_is_an_error():
+    report = check_page(PAGE, 'site/index.html', {'site/css/style.css': None, 'site/js/app.js': ASSETS['site/js/app.js']})
+    assert not report.ok and 'links' in report.failed
+
+def test_dereferenced_missing_id_is_an_error_and_a_guarded_one_a_warning():
+    report = check_page(PAGE, 'site/index.html', dict(ASSETS, **{'site/js/app.js': "document.getElementById('nope').textContent = 'x';"}))
+    assert any("element id 'nope'" in error for error in report.errors)
+    report = check_page(PAGE, 'site/index.html', dict(ASSETS, **{'site/js/app.js': "const el = document.getElementById('nope'); if (el) el.remove();"}))
+    assert report.ok and any("element id 'nope'" in warning for warning in report.warnings)
+
+def test_truncated_page_is_an_error():
+    assert not check_page(PAGE[:-len('</body></html>')], 'site/index.html', ASSETS).ok
+
+# --- What the reviewer is told ---
+def test_prompt_only_claims_checks_that_ran_and_passed():
+    report = check_page(PAGE, 'site/index.html', dict(ASSETS, **{'site/js/app.js': "const el = document.getElementById('nope'); if (el) el.remove();"}))
+    section = StaticCheckReport.from_dict(report.to_dict()).prompt_section()
+    assert CHECK_CLAIMS['js-ids'] not in section and CHECK_CLAIMS['js-classes'] in section
+    assert CHECK_CLAIMS['links'] in section and CHECK_CLAIMS['html'] in section
+    assert "element id 'nope'" in section
+
+def test_prompt_does_not_claim_css_or_js_that_was_not_there():
+    section = check_page('<!DOCTYPE html><html><head></head><body><p>Hi</p></body></html>', 'index.html', {}).prompt_section()
+    assert section == f"Already verified by automated checks: {CHECK_CLAIMS['html']}."
+
+def test_without_parsers_the_prompt_claims_a_scan_not_a_parse(monkeypatch):
+    monkeypatch.setattr(static_checks, 'CSS_CHECK', 'css-scan'); monkeypatch.setattr(static_checks, 'JS_CHECK', 'js-scan')
+    section = check_page(PAGE, 'site/index.html', ASSETS).prompt_section()
+    assert CHECK_CLAIMS['css-scan'] in section and CHECK_CLAIMS['js-scan'] in section
+    assert CHECK_CLAIMS['css-parse'] not in section and CHECK_CLAIMS['js-parse'] not in section
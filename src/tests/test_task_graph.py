@@ -0,0 +1,74 @@
+# SoftwareSim3d/tests/test_task_graph.py
+
+from src.simulation.task import Task, STATUS_COMPLETED, STATUS_FAILED, STATUS_IN_PROGRESS, STATUS_PENDING
+from src.simulation.task_graph import TaskGraph
+
+def make(graph: TaskGraph, task_id: str, role: str = 'Coder', parent: str = None) -> Task:
+    return graph.add(Task('generic', task_id, assigned_to_role=role, originating_task_id=parent, task_id=task_id))
+
+def complete(task: Task, result: str):
+    task.result = result; task.update_status(STATUS_COMPLETED)
+
+def test_dependency_resolves_with_the_prerequisite_result():
+    graph = TaskGraph(); ready = []; graph.add_ready_listener(ready.append)
+    specs = make(graph, 'specs', 'ProductManager'); code = make(graph, 'code')
+    graph.add_dependency('code', 'specs', 'specifications')
+    assert code.is_waiting_for_dependencies() and graph.blocking_dependents('specs') == 1
+    complete(specs, 'the specs')
+    assert not code.is_waiting_for_dependencies() and ready == [code]
+    assert code.dependencies['specifications']['content'] == 'the specs'
+    assert code.dependencies['specifications']['task_id'] == 'specs'
+    assert graph.stats_snapshot()['waiting_on'] == 0
+
+def test_dependency_on_a_completed_task_resolves_at_once():
+    graph = TaskGraph(); specs = make(graph, 'specs'); complete(specs, 'done'); code = make(graph, 'code')
+    graph.add_dependency('code', 'specs')
+    assert not code.is_waiting_for_dependencies()
+
+def test_ready_only_once_every_dependency_resolved():
+    graph = TaskGraph(); ready = []; graph.add_ready_listener(ready.append)
+    home = make(graph, 'specs_home'); about = make(graph, 'specs_about'); code = make(graph, 'code')
+    graph.add_dependency('code', 'specs_home', 'specifications'); graph.add_dependency('code', 'specs_about', 'specifications:specs_about')
+    complete(home, 'home')
+    assert ready == [] and code.is_waiting_for_dependencies()
+    complete(about, 'about')
+    assert ready == [code]
+
+def test_blocking_dependents_are_transitive():
+    graph = TaskGraph()
+    for task_id in ('strategy', 'specs', 'code', 'review'): make(graph, task_id)
+    graph.add_dependency('specs', 'strategy'); graph.add_dependency('code', 'specs'); graph.add_dependency('review', 'code')
+    assert [graph.blocking_dependents(task_id) for task_id in ('strategy', 'specs', 'code', 'review')] == [3, 2, 1, 0]
+
+def test_failed_prerequisite_keeps_dependents_blocked():
+    graph = TaskGraph(); specs = make(graph, 'specs'); code = make(graph, 'code'); graph.add_dependency('code', 'specs')
+    specs.update_status(STATUS_FAILED)
+    assert code.is_waiting_for_dependencies() and graph.blocking_dependents('specs') == 1
+
+def test_removing_a_dependent_cleans_its_edges():
+    graph = TaskGraph(); specs = make(graph, 'specs'); make(graph, 'code'); graph.add_dependency('code', 'specs')
+    graph.remove('code')
+    assert graph.blocking_dependents('specs') == 0 and graph.stats_snapshot()['waiting_on'] == 0
+    complete(specs, 'done') # No edge left to resolve into a removed task
+
+def test_removing_a_prerequisite_drops_the_edges_waiting_on_it():
+    graph = TaskGraph(); make(graph, 'specs'); code = make(graph, 'code'); graph.add_dependency('code', 'specs')
+    graph.remove('specs')
+    assert graph.stats_snapshot()['waiting_on'] == 0 and code.is_waiting_for_dependencies()
+
+def test_restored_tasks_relink_unresolved_dependencies():
+    graph = TaskGraph(); make(graph, 'specs'); make(graph, 'code'); graph.add_dependency('code', 'specs', 'specifications')
+    snapshot = [graph[task_id].to_dict() for task_id in graph]
+    restored = TaskGraph(); ready = []; restored.add_ready_listener(ready.append)
+    for data in reversed(snapshot): restored.add(Task.from_dict(data)) # Dependent first, as a checkpoint may list it
+    complete(restored['specs'], 'the specs')
+    assert ready == [restored['code']]
+
+def test_status_and_role_indexes_follow_updates():
+    graph = TaskGraph(); parent = make(graph, 'ceo', 'CEO'); child = make(graph, 'code', 'Coder', parent='ceo')
+    child.update_status(STATUS_IN_PROGRESS)
+    assert graph.ids_with_status(STATUS_IN_PROGRESS) == {'code'} and graph.ids_with_status(STATUS_PENDING) == {'ceo'}
+    assert parent.child_tasks == {'code': STATUS_IN_PROGRESS} and graph.children_of('ceo') == [child] and graph.parent_of('code') is parent
+    assert graph.for_role('Coder') == [child]
+    graph.remove('code')
+    assert parent.child_tasks == {} and graph.count(STATUS_IN_PROGRESS) == 0